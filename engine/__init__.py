@@ -0,0 +1,7 @@
+# engine/__init__.py
+"""
+Motor importable del pipeline LaLiga (fuera de los notebooks).
+
+Los notebooks y los scripts de CI se ejecutan con cwd = raíz del repo,
+así que basta con `import engine` (los scripts añaden la raíz a sys.path).
+"""
@@ -0,0 +1,321 @@
+# engine/cumprofit.py
+# ============================================================
+# CURVAS DE PROFIT ACUMULADO (modelo vs Bet365) PARA LA WEB
+#  Motor de scripts/build_cumprofit_curves_from_matchlogs.py. Mismas salidas que la versión
+#  original (cumprofit_{s}.csv / .json, cumprofit_index.csv / .json), pero:
+#   - lee sólo las columnas que usa, con dtypes explícitos (MATCHLOG_DTYPES) en vez de
+#     inferirlos en cada CSV; o del almacén Parquet de outputs (engine/outputs_store.py):
+#     una partición por temporada y sólo esas columnas, sin volver a parsear texto
+#   - construye la serie por columnas (tolist por columna) en vez de iterrows + dict por fila
+#   - procesa las temporadas en paralelo (joblib, hilos: lectura CSV y escritura liberan el GIL)
+#   - layout="columnar" escribe "series" como {clave: [valores]} en lugar de [{fila}, ...]
+# ============================================================
+from __future__ import annotations
+
+import json, re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from engine.outputs_store import STORE_DIR, OutputsStore
+from engine.trace import traced
+
+TXT2LABEL = {"A": "Away", "D": "Draw", "H": "Home", "1": "Home", "0": "Draw", "2": "Away"}
+
+KEY = ["Date", "HomeTeam_norm", "AwayTeam_norm"]
+TRUE_COLS = ["y_true_model", "y_true", "true_result_model", "true_result"]
+MODEL_COLS = ["y_pred_model", "y_pred", "Pred", "predicted_result"]
+MARKET_COLS = ["y_pred_market", "bet365_pred", "y_pred_b365"]
+
+# Columnas que se leen de matchlogs_{s}.csv / matchlogs_market_{s}.csv (el resto se ignora)
+MATCHLOG_DTYPES: dict[str, str] = {
+    "Date": "str", "date": "str",
+    "HomeTeam_norm": "str", "AwayTeam_norm": "str",
+    "net_profit": "float64", "profit": "float64",
+    **{c: "str" for c in dict.fromkeys(TRUE_COLS + MODEL_COLS + MARKET_COLS)},
+}
+
+# Claves del JSON web ← columnas de series_df
+SERIES_KEYS = {"i": "match_num", "d": "date", "m": "model_cum", "b": "bet365_cum", "hm": "home",
+               "aw": "away", "t": "true_txt", "pm": "model_txt", "pb": "bet365_txt"}
+LAYOUTS = ("rows", "columnar")
+ARTIFACTS = ("matchlogs", "matchlogs_market")     # artefactos del almacén de outputs
+SOURCES = ("auto", "store", "csv")
+
+
+def season_from_name(path: Path) -> int | None:
+    m = re.search(r"(\d{4})", path.stem)
+    return int(m.group(1)) if m else None
+
+
+def detect_seasons(base: Path) -> list[int]:
+    """Temporadas con matchlogs_{s}.csv en base/ (sin los de mercado ni SMOTE)."""
+    paths = [p for p in base.glob("matchlogs_*.csv") if "market" not in p.name and "smote" not in p.name]
+    return sorted({season_from_name(p) for p in paths} - {None})
+
+
+# ============================================================
+# 1) Lectura
+# ============================================================
+def read_matchlog(path: Path) -> pd.DataFrame | None:
+    """CSV de matchlogs con sólo las columnas de MATCHLOG_DTYPES y sus dtypes."""
+    if not path.exists():
+        return None
+    try:
+        try:
+            return pd.read_csv(path, usecols=lambda c: c in MATCHLOG_DTYPES, dtype=MATCHLOG_DTYPES)
+        except ValueError:   # profit no numérico → mismo coerce que la versión original
+            df = pd.read_csv(path, usecols=lambda c: c in MATCHLOG_DTYPES, dtype="str")
+            for c in ("net_profit", "profit"):
+                if c in df.columns:
+                    df[c] = pd.to_numeric(df[c], errors="coerce")
+            return df
+    except Exception as e:
+        print(f"Error leyendo {path.name}: {e}")
+        return None
+
+
+def standardize(df: pd.DataFrame | None) -> pd.DataFrame | None:
+    """net_profit (o profit) + Date como datetime; None si faltan columnas para el cruce."""
+    if df is None:
+        return None
+    if "net_profit" not in df.columns:
+        if "profit" not in df.columns:
+            return None
+        df["net_profit"] = df["profit"]
+    if "Date" in df.columns:
+        df["Date"] = pd.to_datetime(df["Date"], errors="coerce", format="ISO8601")
+    elif "date" in df.columns:
+        df["Date"] = pd.to_datetime(df["date"], errors="coerce", format="ISO8601")
+    else:
+        return None
+    if any(c not in df.columns for c in KEY):
+        return None
+    return df
+
+
+def pack_store(base: Path, store: OutputsStore | None = None) -> OutputsStore | None:
+    """
+    Vuelca los matchlogs CSV de base/ al almacén de outputs (engine/outputs_store.py, por
+    defecto STORE_DIR) para árboles generados antes de que MODELOS escribiera el Parquet.
+    Devuelve el almacén.
+    """
+    store = store or OutputsStore(STORE_DIR)
+    packed = False
+    for s in detect_seasons(base):
+        for artifact, name in ((ARTIFACTS[0], f"matchlogs_{s}.csv"), (ARTIFACTS[1], f"matchlogs_market_{s}.csv")):
+            path = base / name
+            if path.exists():
+                df = pd.read_csv(path, dtype={c: t for c, t in MATCHLOG_DTYPES.items() if t == "str"})
+                store.write(artifact, df.assign(Season=s) if "Season" not in df.columns else df)
+                packed = True
+    return store if packed else None
+
+
+def read_from_store(store: OutputsStore, season: int) -> tuple[pd.DataFrame | None, pd.DataFrame | None]:
+    """
+    (modelo, mercado) de una temporada desde el almacén: sólo su partición y sólo las columnas
+    de MATCHLOG_DTYPES que tenía el matchlog (el manifest guarda el esquema de cada partición).
+    """
+    out = []
+    for artifact in ARTIFACTS:
+        cols = [c for c in store.columns(artifact, season) if c in MATCHLOG_DTYPES]
+        if not cols:
+            out.append(None)
+            continue
+        df = store.read(artifact, columns=cols, seasons=[season])
+        for c in df.columns:
+            if df[c].dtype == object:        # None de Arrow → NaN, como en read_csv
+                df[c] = df[c].where(df[c].notna(), np.nan)
+        out.append(df)
+    return out[0], out[1]
+
+
+# ============================================================
+# 2) Curvas de una temporada
+# ============================================================
+def _first(both: pd.DataFrame, cols: list[str]) -> pd.Series:
+    for c in cols:
+        if c in both.columns:
+            raw = both[c].astype(str)
+            return raw.map(TXT2LABEL).fillna(raw)
+    return pd.Series("", index=both.index, dtype="string")
+
+
+def _profit(both: pd.DataFrame, suffix: str) -> pd.Series:
+    for c in (f"net_profit{suffix}", "net_profit"):
+        if c in both.columns:
+            return pd.to_numeric(both[c], errors="coerce").fillna(0.0)
+    return pd.Series(0.0, index=both.index)
+
+
+def build_season(season: int, ml_m: pd.DataFrame | None, ml_b: pd.DataFrame | None
+                 ) -> tuple[pd.DataFrame, dict] | tuple[None, None]:
+    """(series_df, resumen) del cruce modelo vs mercado de `season`, o (None, None)."""
+    ml_m, ml_b = standardize(ml_m), standardize(ml_b)
+    if ml_m is None or ml_b is None or ml_m.empty or ml_b.empty:
+        return None, None
+    both = pd.merge(ml_m, ml_b, on=KEY, how="inner", suffixes=("_model", "_b365"))
+    if both.empty:
+        return None, None
+    both = both.sort_values("Date").reset_index(drop=True)
+
+    m_ret, b_ret = _profit(both, "_model"), _profit(both, "_b365")
+    n = len(both)
+    series_df = pd.DataFrame({
+        "match_num": np.arange(1, n + 1, dtype=int),
+        "date": both["Date"].dt.strftime("%Y-%m-%d"),
+        "model_cum": m_ret.cumsum().round(3),
+        "bet365_cum": b_ret.cumsum().round(3),
+        "model_ret": m_ret.round(3),
+        "bet365_ret": b_ret.round(3),
+        "home": both["HomeTeam_norm"].astype("string"),
+        "away": both["AwayTeam_norm"].astype("string"),
+        "true_txt": _first(both, TRUE_COLS).astype("string"),
+        "model_txt": _first(both, MODEL_COLS).astype("string"),
+        "bet365_txt": _first(both, MARKET_COLS).astype("string"),
+    })
+    final_m = float(series_df["model_cum"].iloc[-1])
+    final_b = float(series_df["bet365_cum"].iloc[-1])
+    summary = {
+        "train_until": int(season - 1),
+        "test_season": int(season),
+        "n_matches": int(n),
+        "profit_model": final_m,
+        "profit_bet365": final_b,
+        "roi_model": float(final_m / n),
+        "roi_bet365": float(final_b / n),
+    }
+    return series_df, summary
+
+
+def series_columns(series_df: pd.DataFrame) -> dict[str, list]:
+    """Serie web por columnas: mismos valores que el dict por fila (int/float/str de Python)."""
+    cols = {}
+    for key, col in SERIES_KEYS.items():
+        s = series_df[col]
+        if col == "match_num":
+            cols[key] = s.astype(np.int64).tolist()
+        elif col in ("model_cum", "bet365_cum"):
+            cols[key] = s.astype(np.float64).tolist()
+        else:
+            cols[key] = s.astype(str).tolist()
+    return cols
+
+
+def payload(series_df: pd.DataFrame, summary: dict, layout: str = "rows") -> dict:
+    cols = series_columns(series_df)
+    if layout == "rows":
+        keys = list(cols)
+        series = [dict(zip(keys, vals)) for vals in zip(*cols.values())]
+    elif layout == "columnar":
+        series = cols
+    else:
+        raise ValueError(f"layout desconocido: {layout!r} (usa {LAYOUTS})")
+    out = {
+        "train_until": summary["train_until"],
+        "test_season": summary["test_season"],
+        "n_matches": summary["n_matches"],
+        "series": series,
+        "final": {
+            "model": float(summary["profit_model"]),
+            "bet365": float(summary["profit_bet365"]),
+            "roi_model": float(summary["roi_model"]),
+            "roi_bet365": float(summary["roi_bet365"]),
+        },
+    }
+    if layout == "columnar":
+        out["layout"] = "columnar"
+    return out
+
+
+# ============================================================
+# 3) Todas las temporadas
+# ============================================================
+def _run_season(season: int, base: Path, curves_dir: Path, layout: str,
+                store: OutputsStore | None) -> dict | None:
+    if store is not None:
+        logs = read_from_store(store, season)
+    else:
+        logs = (read_matchlog(base / f"matchlogs_{season}.csv"),
+                read_matchlog(base / f"matchlogs_market_{season}.csv"))
+    series_df, summary = build_season(season, *logs)
+    if series_df is None or series_df.empty:
+        print(f"⚠️  Season {season}: No se pudo cruzar modelo vs bet365 (o faltan archivos/columnas).")
+        return None
+    series_df.to_csv(curves_dir / f"cumprofit_{season}.csv", index=False)
+    (curves_dir / f"cumprofit_{season}.json").write_text(
+        json.dumps(payload(series_df, summary, layout), ensure_ascii=False), encoding="utf-8"
+    )
+    print(f"[CURVAS] Season {season}: {len(series_df)} puntos → guardado CSV/JSON.")
+    return {
+        "test_season": int(season),
+        "train_until": int(season - 1),
+        "n_matches": int(summary["n_matches"]),
+        "profit_model": float(summary["profit_model"]),
+        "profit_bet365": float(summary["profit_bet365"]),
+        "roi_model": float(summary["roi_model"]),
+        "roi_bet365": float(summary["roi_bet365"]),
+        "csv_file": f"cumprofit_{season}.csv",
+        "json_file": f"cumprofit_{season}.json",
+    }
+
+
+def open_store(base: Path, source: str = "auto", store_dir: str | Path = STORE_DIR) -> OutputsStore | None:
+    """
+    Almacén de outputs (store_dir) si `source` lo pide (o, con "auto", si ya tiene matchlogs);
+    si no, None → CSV de base/.
+    """
+    if source not in SOURCES:
+        raise ValueError(f"source desconocido: {source!r} (usa {SOURCES})")
+    if source == "csv":
+        return None
+    store = OutputsStore(store_dir)
+    if all(store.has(a) for a in ARTIFACTS):
+        return store
+    if source == "store":
+        raise FileNotFoundError(f"{store.root} no tiene particiones de {ARTIFACTS}")
+    return None
+
+
+@traced
+def build_all(base: str | Path = "outputs", layout: str = "rows", n_jobs: int = 1,
+              source: str = "auto", store_dir: str | Path = STORE_DIR) -> list[dict]:
+    """
+    Curvas de todas las temporadas + índice global. Lee del almacén de outputs
+    (store_dir) si tiene los matchlogs, o de los CSV de base/ (`source` = auto | store | csv).
+    Devuelve las filas del índice (en orden de temporada). n_jobs > 1 reparte temporadas en
+    hilos; por defecto en serie: cada temporada tarda milisegundos y el GIL se come la ganancia.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"layout desconocido: {layout!r} (usa {LAYOUTS})")
+    base = Path(base)
+    curves_dir = base / "cumprofit_curves"
+    curves_dir.mkdir(parents=True, exist_ok=True)
+
+    store = open_store(base, source, store_dir)
+    seasons = store.seasons(ARTIFACTS[0]) if store is not None else detect_seasons(base)
+    if not seasons:
+        print(f"No se detectaron temporadas (matchlogs_YYYY.csv) en {base}/.")
+        return []
+    print(f"Temporadas detectadas para curvas: {seasons} ({'almacén Parquet' if store else 'CSV'})")
+
+    if n_jobs == 1 or len(seasons) == 1:
+        rows = [_run_season(s, base, curves_dir, layout, store) for s in seasons]
+    else:
+        from joblib import Parallel, delayed
+        rows = Parallel(n_jobs=n_jobs, backend="threading")(
+            delayed(_run_season)(s, base, curves_dir, layout, store) for s in seasons
+        )
+    index_rows = [r for r in rows if r is not None]
+
+    if index_rows:
+        pd.DataFrame(index_rows).sort_values("test_season").to_csv(base / "cumprofit_index.csv", index=False)
+        (base / "cumprofit_index.json").write_text(
+            json.dumps(index_rows, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        print("Guardados índice de curvas.")
+    else:
+        print("No se generaron curvas.")
+    return index_rows
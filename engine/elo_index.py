@@ -0,0 +1,126 @@
+# engine/elo_index.py
+# ============================================================
+# ÍNDICE ELO AS-OF (LIMPIEZA_Y_CREACION_DE_VARS · attach_elo)
+#  Sustituye a _build_clubelo_table + _merge_asof_by_team (un histórico ClubElo por equipo
+#  y un merge_asof por equipo en cada jornada) por un índice compacto construido una vez:
+#   - equipos ordenados + offsets (CSR): equipo i ocupa [offsets[i], offsets[i+1])
+#   - days:  int32, días desde 1970-01-01 de cada 'From' (ordenados dentro de cada equipo)
+#   - elo:   float32
+#   - keys:  int64 = id_equipo << 32 | día → una sola searchsorted para todo el lote
+#  lookup(teams, dates) = Elo PRE-PARTIDO: último 'From' estrictamente anterior al instante
+#  del partido (equivale a merge_asof direction="backward", allow_exact_matches=False).
+#  Se guarda en clubelo/_index.npz junto al almacén (engine/elo_store.py) y se reconstruye
+#  sólo si cambian sus particiones.
+# ============================================================
+from __future__ import annotations
+
+import hashlib, os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from engine.elo_store import EloStore
+
+INDEX_NAME = "_index.npz"
+DAY_NS = 86_400 * 10**9
+
+
+def _signature(paths: list[Path]) -> str:
+    h = hashlib.sha1()
+    for p in paths:
+        st = os.stat(p)
+        h.update(f"{p.name}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()
+
+
+def _as_ns(dates) -> np.ndarray:
+    """Instantes en ns (int64; NaT = mínimo int64). Evita pd.to_datetime si ya son datetime64."""
+    try:
+        arr = np.asarray(dates, dtype="datetime64[ns]")
+    except (TypeError, ValueError):
+        arr = pd.to_datetime(pd.Series(dates), errors="coerce").to_numpy("datetime64[ns]")
+    return arr.astype(np.int64)
+
+
+class EloIndex:
+    def __init__(self, teams: np.ndarray, offsets: np.ndarray, days: np.ndarray, elo: np.ndarray,
+                 signature: str = ""):
+        self.teams = np.asarray(teams, dtype=str)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.days = np.asarray(days, dtype=np.int32)
+        self.elo = np.asarray(elo, dtype=np.float32)
+        self.signature = signature
+        tid = np.repeat(np.arange(len(self.teams), dtype=np.int64), np.diff(self.offsets))
+        self.keys = (tid << 32) | (self.days.astype(np.int64) + (1 << 31))
+
+    # ---------- construcción ----------
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, team_col: str = "Team", date_col: str = "Date",
+                   elo_col: str = "Elo", signature: str = "") -> "EloIndex":
+        d = pd.DataFrame({
+            "team": df[team_col].astype(str).to_numpy(),
+            "day": pd.to_datetime(df[date_col]).to_numpy().astype("datetime64[D]").astype(np.int64),
+            "elo": pd.to_numeric(df[elo_col], errors="coerce").to_numpy(),
+        }).dropna(subset=["elo"])
+        d = d.sort_values(["team", "day"], kind="mergesort").drop_duplicates(["team", "day"], keep="last")
+        teams, counts = np.unique(d["team"].to_numpy(), return_counts=True)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return cls(teams, offsets, d["day"].to_numpy(np.int32), d["elo"].to_numpy(np.float32), signature)
+
+    def save(self, path: str | Path):
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp, teams=self.teams, offsets=self.offsets, days=self.days, elo=self.elo,
+                 signature=np.array(self.signature))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "EloIndex":
+        with np.load(path, allow_pickle=False) as z:
+            return cls(z["teams"], z["offsets"], z["days"], z["elo"], str(z["signature"]))
+
+    @classmethod
+    def from_store(cls, root: str | Path, legacy: str | Path | None = None) -> "EloIndex":
+        """Índice del almacén Elo; reutiliza clubelo/_index.npz si las particiones no han cambiado."""
+        store = EloStore(root, legacy=legacy)
+        sig = _signature(store.partitions())
+        path = store.root / INDEX_NAME
+        if path.exists():
+            try:
+                idx = cls.load(path)
+                if idx.signature == sig:
+                    return idx
+            except (OSError, ValueError, KeyError):
+                pass
+        idx = cls.from_frame(store.load(), signature=sig)
+        idx.save(path)
+        return idx
+
+    # ---------- consulta ----------
+    def lookup(self, teams, dates) -> np.ndarray:
+        """
+        Elo pre-partido de cada (equipo, instante) del lote: NaN si el equipo no está en el
+        índice, si la fecha es nula o si no hay ningún 'From' anterior.
+        """
+        tid = self.team_ids(teams)
+        ns = _as_ns(dates)
+        valid = (tid >= 0) & (ns != np.iinfo(np.int64).min)
+        # 'From' < instante  ⇔  día_From < ceil(instante / 1 día)
+        qday = -((-ns) // DAY_NS)
+        qkey = (tid.astype(np.int64) << 32) | (qday + (1 << 31))
+        pos = np.searchsorted(self.keys, qkey, side="left") - 1
+        posc = np.clip(pos, 0, None)
+        hit = valid & (pos >= 0) & ((self.keys[posc] >> 32) == tid)
+        return np.where(hit, self.elo[posc].astype(np.float64), np.nan)
+
+    def team_ids(self, teams) -> np.ndarray:
+        """Posición de cada equipo en self.teams (ordenado) o -1."""
+        q = np.asarray(teams, dtype=str)
+        if not len(self.teams):
+            return np.full(len(q), -1, dtype=np.int64)
+        pos = np.clip(np.searchsorted(self.teams, q), 0, len(self.teams) - 1)
+        return np.where(self.teams[pos] == q, pos, -1).astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.days)
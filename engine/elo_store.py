@@ -0,0 +1,214 @@
+# engine/elo_store.py
+# ============================================================
+# ALMACÉN ELO PARTICIONADO + ACTUALIZACIÓN DELTA (EXTRACCIÓN_DATOS · ClubElo)
+#  Antes: cada ejecución bajaba el histórico COMPLETO de cada club (api.clubelo.com/{Club})
+#  y deduplicaba contra un único clubelo_2005_2025.parquet que crecía sin límite.
+#  Ahora:
+#   - data/02_processed/clubelo/season_YYYY.parquet: una partición por temporada
+#     (YYYY = año de inicio, julio → junio), mismo esquema (Date, Elo, Team, team_norm)
+#   - clubelo/_state.json: high-water mark por club (última fecha 'From' guardada) y hasta
+#     dónde se ha comprobado (último 'To' visto), para no repetir consultas
+#   - la actualización pide sólo los snapshots por fecha (api.clubelo.com/YYYY-MM-DD: todos
+#     los clubes con su intervalo From–To vigente ese día) de los días aún sin comprobar, en
+#     paralelo. Todo intervalo nuevo contiene alguno de esos días → mismas filas que el
+#     histórico completo.
+#   - sólo se reescriben las particiones tocadas (tmp + os.replace)
+#  Un club sin high-water mark (nuevo en la lista) o con más de FULL_REFRESH_DAYS sin
+#  comprobar se trae con su histórico completo (una petición) y se filtra por su mark.
+# ============================================================
+from __future__ import annotations
+
+import json, os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from engine.fetch import FetchClient, fetch_clubelo_histories, fetch_clubelo_snapshots
+from engine.teams import text_key
+from engine.trace import traced
+
+STATE_VERSION = 1
+COLUMNS = ["Date", "Elo", "Team", "team_norm"]
+FULL_REFRESH_DAYS = 30       # más días sin comprobar → una petición de histórico sale más barata
+
+
+def norm(s: str) -> str:
+    """team_norm simple (sin acentos, minúsculas, _) — misma regla que EXTRACCIÓN_DATOS."""
+    return text_key(s).replace(" ", "_")
+
+
+def season_of(d: pd.Series) -> pd.Series:
+    """Año de inicio de temporada (julio → junio)."""
+    d = pd.to_datetime(d)
+    return (d.dt.year - (d.dt.month < 7)).astype(int)
+
+
+def _to_date(x) -> date:
+    return pd.Timestamp(x).date()
+
+
+# ============================================================
+# 1) Almacén
+# ============================================================
+class EloStore:
+    def __init__(self, root: str | Path, legacy: str | Path | None = None):
+        self.root = Path(root)
+        self.state_path = self.root / "_state.json"
+        self.root.mkdir(parents=True, exist_ok=True)
+        if legacy is not None and not self.partitions() and Path(legacy).exists():
+            self._migrate(Path(legacy))
+
+    # ---------- lectura ----------
+    def partitions(self) -> list[Path]:
+        return sorted(self.root.glob("season_*.parquet"))
+
+    def _path(self, season: int) -> Path:
+        return self.root / f"season_{season}.parquet"
+
+    def load(self, teams: list[str] | None = None) -> pd.DataFrame:
+        """Todo el histórico (o sólo `teams`), ordenado por (Team, Date) como el parquet único."""
+        files = [str(p) for p in self.partitions()]
+        if not files:
+            return pd.DataFrame({c: pd.Series(dtype="float64" if c == "Elo" else "object") for c in COLUMNS})
+        flt = pc.field("Team").isin(list(teams)) if teams else None
+        df = ds.dataset(files, format="parquet").to_table(filter=flt).to_pandas()
+        return df.sort_values(["Team", "Date"], kind="mergesort").reset_index(drop=True)[COLUMNS]
+
+    def state(self) -> dict:
+        if self.state_path.exists():
+            try:
+                st = json.loads(self.state_path.read_text(encoding="utf-8"))
+                if st.get("version") == STATE_VERSION:
+                    return st
+            except (OSError, ValueError):
+                pass
+        return self._rebuild_state()
+
+    def _rebuild_state(self) -> dict:
+        hwm, norms = {}, {}
+        for p in self.partitions():
+            part = pd.read_parquet(p, columns=["Date", "Team", "team_norm"])
+            for team, g in part.groupby("Team"):
+                last = str(max(g["Date"]))
+                if last > hwm.get(team, ""):
+                    hwm[team] = last
+                norms[team] = g["team_norm"].iloc[-1]
+        return {"version": STATE_VERSION, "hwm": hwm, "team_norm": norms}
+
+    # ---------- escritura ----------
+    def _save_state(self, st: dict):
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(st, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+    def _write_partition(self, season: int, df: pd.DataFrame):
+        path = self._path(season)
+        tmp = path.with_suffix(".parquet.tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+    def append(self, incoming: pd.DataFrame) -> list[int]:
+        """Concat + dedupe (Team, Date) conservando la última, sólo en las temporadas tocadas."""
+        if incoming.empty:
+            return []
+        incoming = incoming[COLUMNS].copy()
+        incoming["Date"] = pd.to_datetime(incoming["Date"]).dt.date
+        seasons = season_of(incoming["Date"])
+        touched = []
+        for season, new in incoming.groupby(seasons.values):
+            path = self._path(int(season))
+            base = pd.concat([pd.read_parquet(path), new], ignore_index=True) if path.exists() else new
+            base = (base.sort_values(["Team", "Date"], kind="mergesort")
+                        .drop_duplicates(subset=["Team", "Date"], keep="last")
+                        .reset_index(drop=True))
+            self._write_partition(int(season), base)
+            touched.append(int(season))
+        return touched
+
+    def _migrate(self, legacy: Path):
+        """Parte el parquet único heredado en particiones por temporada (una sola vez)."""
+        df = pd.read_parquet(legacy)
+        df["Date"] = pd.to_datetime(df["Date"]).dt.date
+        for season, part in df.groupby(season_of(df["Date"]).values):
+            self._write_partition(int(season), part.sort_values(["Team", "Date"], kind="mergesort")[COLUMNS]
+                                  .reset_index(drop=True))
+        self._save_state(self._rebuild_state())
+        print(f"[ELO] Migrado {legacy.name} → {self.root} ({len(self.partitions())} particiones)")
+
+    # ============================================================
+    # 2) Actualización delta
+    # ============================================================
+    @traced
+    def update(self, client: FetchClient, clubs: list[str], today: date | str | None = None,
+               verbose: bool = True) -> dict:
+        """
+        Añade los intervalos Elo nuevos de `clubs` hasta `today` y devuelve un informe
+        {rows, partitions, snapshots, bootstrapped, failed}.
+        """
+        today = _to_date(today) if today is not None else date.today()
+        settled = today - timedelta(days=1)      # el día en curso se vuelve a consultar en la siguiente
+        st = self.state()
+        hwm = {c: date.fromisoformat(st["hwm"][c]) for c in clubs if c in st["hwm"]}
+        checked = {c: max(hwm[c], date.fromisoformat(st.get("checked", {}).get(c, st["hwm"][c]))) for c in hwm}
+        team_norm = {c: st.get("team_norm", {}).get(c) or norm(c) for c in clubs}
+        incoming, failed = [], []
+
+        # Clubes nuevos o muy atrasados: histórico completo
+        fresh = [c for c in clubs if c not in hwm or (today - checked[c]).days > FULL_REFRESH_DAYS]
+        if fresh:
+            for club, hist in fetch_clubelo_histories(client, fresh, max_age=None).items():
+                if isinstance(hist, Exception) or hist.empty:
+                    failed.append(club)
+                    if verbose:
+                        print(f"X {club}: {hist if isinstance(hist, Exception) else 'sin datos'}")
+                    continue
+                rows = pd.DataFrame({"Date": hist.index.date, "Elo": hist["elo"].to_numpy()})
+                rows = rows[(rows["Date"] <= today) & (rows["Date"] > hwm.get(club, date.min))]
+                checked[club] = min(hist["to"].max().date(), settled)
+                if rows.empty:
+                    continue
+                incoming.append(rows.assign(Team=club, team_norm=team_norm[club]))
+                hwm[club] = max(rows["Date"])
+
+        # Clubes con high-water mark: un snapshot por cada día aún sin comprobar
+        tracked = {c: d for c, d in hwm.items() if c not in fresh}
+        start = min(checked[c] for c in tracked) + timedelta(days=1) if tracked else today + timedelta(days=1)
+        days = [start + timedelta(days=i) for i in range((today - start).days + 1)]
+        snaps = fetch_clubelo_snapshots(client, days) if days else {}
+        gaps = [day for day, snap in snaps.items() if isinstance(snap, Exception)]
+        for day, snap in snaps.items():
+            if isinstance(snap, Exception):
+                print(f"X ClubElo {day}: {snap}")
+                continue
+            snap = snap[snap["team"].isin(tracked.keys()) & snap["to"].notna()]
+            new = snap[[f > hwm[t] for f, t in zip(snap.index.date, snap["team"])]]
+            if not new.empty:
+                rows = pd.DataFrame({"Date": new.index.date, "Elo": new["elo"].to_numpy(), "Team": new["team"].to_numpy()})
+                rows["team_norm"] = rows["Team"].map(team_norm)
+                incoming.append(rows)
+                for t, d in zip(rows["Team"], rows["Date"]):
+                    tracked[t] = max(tracked[t], d)
+            for t, to in zip(snap["team"], snap["to"].dt.date):
+                checked[t] = max(checked[t], min(to, settled))
+        if gaps:   # un día sin snapshot se vuelve a pedir en la siguiente ejecución
+            checked.update({c: min(d, min(gaps) - timedelta(days=1)) for c, d in checked.items() if c in tracked})
+        hwm.update(tracked)
+
+        new_rows = (pd.concat(incoming, ignore_index=True).drop_duplicates(["Team", "Date"], keep="last")
+                    if incoming else pd.DataFrame(columns=COLUMNS))
+        touched = self.append(new_rows)
+        n_rows = len(new_rows)
+        st["hwm"].update({c: d.isoformat() for c, d in hwm.items()})
+        st.setdefault("checked", {}).update({c: d.isoformat() for c, d in checked.items()})
+        st.setdefault("team_norm", {}).update({c: team_norm[c] for c in hwm})
+        st["updated_at"] = datetime.now().isoformat(timespec="seconds")
+        self._save_state(st)
+        snapshots = len(snaps)
+        if verbose:
+            print(f"[ELO] +{n_rows} filas · {snapshots} snapshots · {len(fresh)} históricos completos · "
+                  f"particiones reescritas={touched or '-'}")
+        return {"rows": n_rows, "partitions": touched, "snapshots": snapshots,
+                "bootstrapped": fresh, "failed": failed}
@@ -0,0 +1,356 @@
+# engine/fetch.py
+# ============================================================
+# CAPA HTTP COMPARTIDA (EXTRACCIÓN_DATOS)
+#  FetchClient:
+#   - una requests.Session con pool de conexiones (keep-alive)
+#   - concurrencia acotada (fetch_many, hilos) + límite por host (peticiones
+#     simultáneas e intervalo mínimo entre peticiones)
+#   - caché en disco por URL (.cache/http): cuerpo + ETag/Last-Modified;
+#     las siguientes peticiones son condicionales (If-None-Match / If-Modified-Since)
+#     y un 304 devuelve el cuerpo cacheado
+#   - frozen=True: si ya está en caché NO se toca la red (temporadas ya cerradas)
+#   - max_age: respuestas recientes se sirven sin red
+#   - reintentos con backoff en 429/5xx (respeta Retry-After)
+#  Fuentes: football-data.co.uk (CSV por temporada), ClubElo (histórico por club),
+#  football-data.org v4 (partidos de una temporada), Transfermarkt (engine/transfermarkt.py).
+#  Sin red: LALIGA_HTTP_STUB=http://127.0.0.1:PUERTO redirige todos los hosts al stub
+#  local (engine/http_stub.py).
+# ============================================================
+from __future__ import annotations
+
+import hashlib, io, json, os, re, threading, time, unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit, urlunsplit
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_CACHE_DIR = Path(".cache/http")
+USER_AGENT = "Mozilla/5.0"
+
+FD_CSV_BASE = "https://www.football-data.co.uk/mmz4281"
+CLUBELO_API = "http://api.clubelo.com"
+FD_ORG_BASE = "https://api.football-data.org/v4"
+
+# Límites por host: (peticiones simultáneas, segundos mínimos entre peticiones)
+HOST_LIMITS = {
+    "www.football-data.co.uk": (4, 0.0),
+    "api.clubelo.com": (4, 0.1),
+    "api.football-data.org": (1, 6.0),   # plan gratuito: 10 peticiones/minuto
+    "www.transfermarkt.com": (2, 3.0),   # cortesía: bloquea con ráfagas (engine/transfermarkt.py)
+}
+DEFAULT_HOST_LIMIT = (2, 0.5)
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int                 # status HTTP real (304 si se revalidó)
+    content: bytes
+    source: str                 # "network" | "revalidated" | "cache"
+
+    @property
+    def from_cache(self) -> bool:
+        return self.source != "network"
+
+    def json(self):
+        return json.loads(self.content.decode("utf-8"))
+
+
+# ============================================================
+# 1) Límite por host
+# ============================================================
+class _HostGate:
+    def __init__(self, concurrent: int, min_interval: float):
+        self.sem = threading.Semaphore(max(1, concurrent))
+        self.min_interval = float(min_interval)
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def __enter__(self):
+        self.sem.acquire()
+        if self.min_interval > 0:
+            with self.lock:
+                now = time.monotonic()
+                wait = self.next_at - now
+                self.next_at = max(now, self.next_at) + self.min_interval
+            if wait > 0:
+                time.sleep(wait)
+        return self
+
+    def __exit__(self, *exc):
+        self.sem.release()
+
+
+# ============================================================
+# 2) Cliente
+# ============================================================
+class FetchClient:
+    def __init__(
+        self,
+        cache_dir: str | Path | None = DEFAULT_CACHE_DIR,
+        max_workers: int = 8,
+        timeout: float = 30,
+        retries: int = 3,
+        backoff: float = 1.0,
+        host_limits: dict | None = None,
+        stub_base: str | None = None,
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.host_limits = {**HOST_LIMITS, **(host_limits or {})}
+        self.stub_base = stub_base if stub_base is not None else os.environ.get("LALIGA_HTTP_STUB")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max(16, max_workers))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"User-Agent": USER_AGENT})
+        self._gates: dict[str, _HostGate] = {}
+        self._gates_lock = threading.Lock()
+        self.stats = {"network": 0, "revalidated": 0, "cache": 0, "bytes": 0}
+        self._stats_lock = threading.Lock()
+
+    # ---------- utilidades ----------
+    def _gate(self, host: str) -> _HostGate:
+        with self._gates_lock:
+            if host not in self._gates:
+                self._gates[host] = _HostGate(*self.host_limits.get(host, DEFAULT_HOST_LIMIT))
+            return self._gates[host]
+
+    def _route(self, url: str) -> str:
+        """Con stub: http(s)://host/path → {stub}/host/path (mismo path para el servidor local)."""
+        if not self.stub_base:
+            return url
+        parts = urlsplit(url)
+        base = urlsplit(self.stub_base)
+        return urlunsplit((base.scheme, base.netloc, f"/{parts.netloc}{parts.path}", parts.query, ""))
+
+    @staticmethod
+    def full_url(url: str, params: dict | None = None) -> str:
+        if not params:
+            return url
+        return f"{url}{'&' if '?' in url else '?'}{urlencode(sorted(params.items()))}"
+
+    def _paths(self, url: str) -> tuple[Path, Path] | None:
+        if not self.cache_dir:
+            return None
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+        return self.cache_dir / f"{key}.body", self.cache_dir / f"{key}.json"
+
+    def cached(self, url: str, params: dict | None = None) -> tuple[bytes, dict] | None:
+        paths = self._paths(self.full_url(url, params))
+        if not paths or not paths[0].exists() or not paths[1].exists():
+            return None
+        try:
+            meta = json.loads(paths[1].read_text(encoding="utf-8"))
+            return paths[0].read_bytes(), meta
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, url: str, content: bytes, resp: requests.Response):
+        paths = self._paths(url)
+        if not paths:
+            return
+        body, meta_path = paths
+        meta = {
+            "url": url,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "status": resp.status_code,
+        }
+        tmp = body.with_suffix(f".tmp{threading.get_ident()}")
+        tmp.write_bytes(content)
+        os.replace(tmp, body)
+        tmp = meta_path.with_suffix(f".tmp{threading.get_ident()}")
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, meta_path)
+
+    def _touch(self, url: str, meta: dict):
+        paths = self._paths(url)
+        if paths:
+            meta = {**meta, "fetched_at": time.time()}
+            paths[1].write_text(json.dumps(meta), encoding="utf-8")
+
+    def _count(self, source: str, nbytes: int = 0):
+        with self._stats_lock:
+            self.stats[source] += 1
+            self.stats["bytes"] += nbytes
+
+    # ---------- petición ----------
+    def get(
+        self,
+        url: str,
+        params: dict | None = None,
+        headers: dict | None = None,
+        frozen: bool = False,
+        max_age: float | None = None,
+    ) -> FetchResult:
+        """
+        GET con caché en disco. frozen: si hay copia, no hay red. max_age (s): copia más
+        reciente que eso → sin red. Resto: petición condicional (304 → cuerpo cacheado).
+        Las cabeceras (p.ej. X-Auth-Token) no forman parte de la clave ni se guardan.
+        """
+        full = self.full_url(url, params)
+        hit = self.cached(url, params)
+        if hit is not None:
+            content, meta = hit
+            fresh = max_age is not None and time.time() - meta.get("fetched_at", 0) <= max_age
+            if frozen or fresh:
+                self._count("cache")
+                return FetchResult(full, 200, content, "cache")
+
+        req_headers = dict(headers or {})
+        if hit is not None:
+            if hit[1].get("etag"):
+                req_headers["If-None-Match"] = hit[1]["etag"]
+            if hit[1].get("last_modified"):
+                req_headers["If-Modified-Since"] = hit[1]["last_modified"]
+
+        target = self._route(full)
+        gate = self._gate(urlsplit(full).netloc)
+        last_exc = None
+        for attempt in range(self.retries + 1):
+            try:
+                with gate:
+                    resp = self.session.get(target, headers=req_headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                last_exc = e
+                time.sleep(self.backoff * (2 ** attempt))
+                continue
+            if resp.status_code == 304 and hit is not None:
+                self._touch(full, hit[1])
+                self._count("revalidated")
+                return FetchResult(full, 304, hit[0], "revalidated")
+            if resp.status_code == 429 or resp.status_code >= 500:
+                if attempt < self.retries:
+                    retry_after = resp.headers.get("Retry-After", "")
+                    wait = float(retry_after) if retry_after.isdigit() else self.backoff * (2 ** attempt)
+                    time.sleep(wait)
+                    continue
+            resp.raise_for_status()
+            content = resp.content
+            self._store(full, content, resp)
+            self._count("network", len(content))
+            return FetchResult(full, resp.status_code, content, "network")
+        raise last_exc if last_exc else requests.HTTPError(f"Sin respuesta válida de {full}")
+
+    def fetch_many(self, jobs: list[dict], max_workers: int | None = None, return_exceptions: bool = True) -> list:
+        """
+        jobs: lista de kwargs para get(). Devuelve resultados en el mismo orden
+        (la excepción en su posición si return_exceptions).
+        """
+        def _one(kw):
+            try:
+                return self.get(**kw)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+        workers = max(1, min(max_workers or self.max_workers, len(jobs) or 1))
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            return list(ex.map(_one, jobs))
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ============================================================
+# 3) Fuentes
+# ============================================================
+def fd_csv_url(season: str, div: str = "SP1") -> str:
+    return f"{FD_CSV_BASE}/{season}/{div}.csv"
+
+
+def season_closed_ts(season: str) -> float:
+    """Instante a partir del cual una temporada 'AABB' se da por cerrada (1 de agosto de 20BB)."""
+    return datetime(2000 + int(season[2:]), 8, 1).timestamp()
+
+
+def fetch_fd_csvs(client: FetchClient, seasons: list[str], divisions: list[str],
+                  current_season: str, max_age: float | None = None) -> dict:
+    """
+    CSV de football-data.co.uk por (season, div) en paralelo. Una temporada anterior a
+    `current_season` cuya copia en caché se bajó ya cerrada no se vuelve a descargar; si la
+    copia es de antes del cierre se revalida una vez más (petición condicional).
+    Devuelve {(season, div): DataFrame | Exception}.
+    """
+    keys = [(s, d) for s in seasons for d in divisions]
+    jobs = []
+    for s, d in keys:
+        url = fd_csv_url(s, d)
+        hit = client.cached(url) if s != current_season else None
+        frozen = hit is not None and hit[1].get("fetched_at", 0) >= season_closed_ts(s)
+        jobs.append({"url": url, "frozen": frozen, "max_age": max_age})
+    out = {}
+    for key, res in zip(keys, client.fetch_many(jobs)):
+        out[key] = res if isinstance(res, Exception) else pd.read_csv(io.BytesIO(res.content))
+    return out
+
+
+def clubelo_slug(club: str) -> str:
+    """Nombre de ClubElo como en la API (sin espacios/apóstrofes ni acentos): 'Real Madrid' → 'RealMadrid'."""
+    t = unicodedata.normalize("NFKD", club)
+    t = "".join(c for c in t if not unicodedata.combining(c))
+    return re.sub(r"[\s']", "", t)
+
+
+def parse_clubelo_csv(content: bytes) -> pd.DataFrame:
+    """CSV de api.clubelo.com con el mismo esquema que soccerdata.ClubElo.read_team_history."""
+    df = pd.read_csv(io.BytesIO(content), parse_dates=["From", "To"], date_format="%Y-%m-%d")
+    df = df.rename(columns={"Rank": "rank", "Club": "team", "Country": "country", "Level": "level",
+                            "Elo": "elo", "From": "from", "To": "to"})
+    df = df.replace("None", float("nan"))
+    df["rank"] = df["rank"].astype("float")
+    return df.set_index("from").sort_index()
+
+
+def fetch_clubelo_histories(client: FetchClient, clubs: list[str], max_age: float | None = 6 * 3600) -> dict:
+    """Histórico Elo completo de cada club en paralelo. {club: DataFrame | Exception}."""
+    jobs = [{"url": f"{CLUBELO_API}/{clubelo_slug(c)}", "max_age": max_age} for c in clubs]
+    out = {}
+    for club, res in zip(clubs, client.fetch_many(jobs)):
+        out[club] = res if isinstance(res, Exception) else parse_clubelo_csv(res.content)
+    return out
+
+
+def fetch_clubelo_snapshots(client: FetchClient, days: list, settle_days: int = 2) -> dict:
+    """
+    Snapshots de ClubElo por fecha (api.clubelo.com/YYYY-MM-DD: todos los clubes con su
+    intervalo From–To vigente ese día), en paralelo. Una copia bajada `settle_days` después
+    de la fecha ya no cambia y se sirve de la caché. {día: DataFrame | Exception}.
+    """
+    days = [pd.Timestamp(d).normalize() for d in days]
+    jobs = []
+    for day in days:
+        url = f"{CLUBELO_API}/{day.strftime('%Y-%m-%d')}"
+        hit = client.cached(url)
+        settled = (day + pd.Timedelta(days=settle_days)).timestamp()
+        jobs.append({"url": url, "frozen": hit is not None and hit[1].get("fetched_at", 0) >= settled})
+    out = {}
+    for day, res in zip(days, client.fetch_many(jobs)):
+        out[day.date()] = res if isinstance(res, Exception) else parse_clubelo_csv(res.content)
+    return out
+
+
+def fetch_fd_org_matches(client: FetchClient, token: str, season: int, competition: str = "PD",
+                         max_age: float | None = None) -> dict:
+    """JSON de football-data.org v4: /competitions/{competition}/matches?season=..."""
+    res = client.get(f"{FD_ORG_BASE}/competitions/{competition}/matches", params={"season": season},
+                     headers={"X-Auth-Token": token}, max_age=max_age)
+    return res.json() or {}
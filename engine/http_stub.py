@@ -0,0 +1,207 @@
+# engine/http_stub.py
+# ============================================================
+# SERVIDOR HTTP LOCAL PARA PROBAR engine/fetch.py SIN RED
+#  Sirve /{host}/{path} (el esquema que usa FetchClient con LALIGA_HTTP_STUB):
+#   - www.football-data.co.uk/mmz4281/{season}/{div}.csv  → CSV sintético
+#   - api.clubelo.com/{Club}                               → histórico Elo sintético
+#   - api.clubelo.com/YYYY-MM-DD                           → snapshot de todos los clubes ese día
+#   - api.football-data.org/v4/competitions/{c}/matches    → JSON sintético
+#   - www.transfermarkt.com/{slug}/kader/verein/{id}/...?saison_id=YYYY → plantilla sintética
+#     (o el HTML guardado en tm_dir/{slug}_{YYYY}.html si existe)
+#  Cada respuesta lleva ETag y Last-Modified y responde 304 a peticiones condicionales.
+#  `latency` simula la latencia de red; `hits` cuenta peticiones (y 200/304) por path.
+#  `today` (YYYY-MM-DD) corta el histórico Elo en esa fecha, como la API real.
+# ============================================================
+from __future__ import annotations
+
+import hashlib, json, re, threading, time
+from collections import Counter
+from email.utils import formatdate
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+LAST_MODIFIED = formatdate(1_700_000_000, usegmt=True)
+CLUBS = ["RealMadrid", "Barcelona", "AtleticoMadrid", "Sevilla", "Valencia", "Villarreal",
+         "Betis", "Sociedad", "Bilbao", "Celta"]
+
+
+def fd_csv_body(season: str, div: str) -> bytes:
+    rng = np.random.default_rng(int(season) * 7 + len(div))
+    start = 2000 + int(season[:2])
+    lines = ["Div,Date,Time,HomeTeam,AwayTeam,FTHG,FTAG,FTR,B365H,B365D,B365A"]
+    for i in range(380):
+        h, a = rng.choice(len(CLUBS), 2, replace=False)
+        hg, ag = rng.poisson(1.5), rng.poisson(1.1)
+        res = "H" if hg > ag else ("A" if ag > hg else "D")
+        day = f"{1 + i % 28:02d}/{1 + (i // 38) % 12:02d}/{start + (i // 190)}"
+        lines.append(f"{div},{day},20:00,{CLUBS[h]},{CLUBS[a]},{hg},{ag},{res},"
+                     f"{rng.uniform(1.2, 5):.2f},{rng.uniform(2.8, 4.5):.2f},{rng.uniform(1.2, 8):.2f}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+@lru_cache(maxsize=None)
+def _clubelo_full(club: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(From, To, Elo) sintéticos desde 2005-07-01 hasta 2030-06-30."""
+    rng = np.random.default_rng(sum(map(ord, club)))
+    steps = rng.integers(3, 12, size=2400)
+    starts = np.datetime64("2005-07-01") + np.concatenate([[0], np.cumsum(steps)[:-1]]).astype("timedelta64[D]")
+    keep = starts <= np.datetime64("2030-06-30")
+    elo = np.round(1600.0 + np.cumsum(rng.normal(0, 8, size=len(steps))), 5)
+    return starts[keep], (starts + steps.astype("timedelta64[D]") - 1)[keep], elo[keep]
+
+
+def clubelo_intervals(club: str, today: str | None = None) -> list[tuple]:
+    """[(From, To, Elo)]; con `today`, el histórico se corta y el último intervalo llega hasta ese día."""
+    frm, to, elo = _clubelo_full(club)
+    end = np.datetime64(today) if today else to[-1]
+    n = int(np.searchsorted(frm, end, side="right"))
+    return [(frm[i], min(to[i], end), elo[i]) for i in range(n)]
+
+
+def clubelo_body(club: str, today: str | None = None) -> bytes:
+    lines = ["Rank,Club,Country,Level,Elo,From,To"]
+    lines += [f"None,{club},ESP,1,{elo:.5f},{f},{t}" for f, t, elo in clubelo_intervals(club, today)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def clubelo_snapshot_body(day: str, today: str | None = None) -> bytes:
+    d = np.datetime64(day)
+    end = np.datetime64(today) if today else None
+    lines = ["Rank,Club,Country,Level,Elo,From,To"]
+    for i, club in enumerate(CLUBS):
+        frm, to, elo = _clubelo_full(club)
+        k = int(np.searchsorted(frm, d, side="right")) - 1
+        if k < 0 or (end is not None and d > end):
+            continue
+        t = min(to[k], end) if end is not None else to[k]
+        lines.append(f"{i + 1},{club},ESP,1,{elo[k]:.5f},{frm[k]},{t}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def fd_org_body(comp: str, season: int) -> bytes:
+    matches = [{"id": season * 1000 + i, "utcDate": f"{season}-09-{1 + i % 28:02d}T19:00:00Z",
+                "competition": {"code": comp},
+                "homeTeam": {"name": CLUBS[i % len(CLUBS)]}, "awayTeam": {"name": CLUBS[(i + 1) % len(CLUBS)]},
+                "score": {"fullTime": {"home": i % 3, "away": i % 2}}} for i in range(20)]
+    return json.dumps({"matches": matches}).encode()
+
+
+def _tm_value(v: float) -> str:
+    return f"{v:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".") + " mill. €"
+
+
+def tm_squad_body(slug: str, team_id: int, season: int) -> bytes:
+    """Página de plantilla con la estructura de Transfermarkt (table.items + tfoot de totales)."""
+    rng = np.random.default_rng(team_id * 10_000 + season)
+    n = int(rng.integers(24, 41))
+    nats = ["España", "Francia", "Argentina", "Portugal", "Brasil", "Marruecos"]
+    rows = []
+    for i in range(n):
+        k = int(rng.choice(len(nats), p=[0.6, 0.1, 0.1, 0.08, 0.07, 0.05]))
+        flags = "".join(f'<img src="f.png" title="{nats[j]}" alt="{nats[j]}" class="flaggenrahmen">'
+                        for j in ([k] if rng.random() < 0.8 else [k, (k + 1) % len(nats)]))
+        if rng.random() < 0.03:
+            flags = ""
+        player = (f'<table class="inline-table"><tr><td rowspan="2"><img class="bilderrahmen-fixed"></td>'
+                  f'<td class="hauptlink"><a href="/p/{i}">Jugador {i}</a></td></tr><tr><td>Pos</td></tr></table>')
+        rows.append(f'<tr class="{"odd" if i % 2 else "even"}"><td class="zentriert rueckennummer">{i + 1}</td>'
+                    f'<td class="posrela">{player}</td><td class="zentriert">{int(rng.integers(17, 37))}</td>'
+                    f'<td class="zentriert">{flags}</td>'
+                    f'<td class="rechts hauptlink">{_tm_value(float(rng.uniform(0.5, 80)))}</td></tr>')
+    total = float(rng.uniform(30, 1200))
+    foot = (f'<tfoot><tr><td colspan="2">Total</td><td class="zentriert">{rng.uniform(24, 29):.1f}</td>'
+            f'<td class="rechts">-</td><td class="rechts">{_tm_value(total)}</td>'
+            f'<td class="rechts">{_tm_value(total / n)}</td></tr></tfoot>')
+    return (f'<!DOCTYPE html><html><head><title>{slug} {season}</title></head><body>'
+            f'<div class="responsive-table"><table class="items"><thead><tr><th>#</th><th>Jugador</th>'
+            f'<th>Edad</th><th>Nac.</th><th>Valor</th></tr></thead><tbody>{"".join(rows)}</tbody>{foot}'
+            f'</table></div></body></html>').encode()
+
+
+class StubServer:
+    """with StubServer(latency=0.05) as stub: os.environ["LALIGA_HTTP_STUB"] = stub.base"""
+
+    def __init__(self, latency: float = 0.0, port: int = 0, today: str | None = None, tm_dir: str | None = None):
+        self.latency = latency
+        self.today = today
+        self.tm_dir = Path(tm_dir) if tm_dir else None
+        self.hits: Counter = Counter()
+        self.status: Counter = Counter()
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                body = stub.body_for(parts.path, parse_qs(parts.query))
+                with stub._lock:
+                    stub.hits[parts.path] += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if body is None:
+                    self._send(404, b"not found")
+                    return
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                inm = self.headers.get("If-None-Match")
+                if inm == etag or (inm is None and self.headers.get("If-Modified-Since") == LAST_MODIFIED):
+                    self._send(304, b"", etag)
+                    return
+                self._send(200, body, etag)
+
+            def _send(self, code: int, body: bytes, etag: str | None = None):
+                with stub._lock:
+                    stub.status[code] += 1
+                self.send_response(code)
+                if etag:
+                    self.send_header("ETag", etag)
+                    self.send_header("Last-Modified", LAST_MODIFIED)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def body_for(self, path: str, query: dict) -> bytes | None:
+        seg = [s for s in path.split("/") if s]
+        if len(seg) == 4 and seg[0] == "www.football-data.co.uk" and seg[1] == "mmz4281" and seg[3].endswith(".csv"):
+            return fd_csv_body(seg[2], seg[3][:-4])
+        if len(seg) == 2 and seg[0] == "api.clubelo.com":
+            if re.fullmatch(r"\d{4}-\d{2}-\d{2}", seg[1]):
+                return clubelo_snapshot_body(seg[1], self.today)
+            return clubelo_body(seg[1], self.today)
+        if len(seg) == 5 and seg[0] == "api.football-data.org" and seg[4] == "matches":
+            return fd_org_body(seg[3], int(query.get("season", ["0"])[0]))
+        if len(seg) >= 5 and seg[0] == "www.transfermarkt.com" and seg[2] == "kader" and seg[3] == "verein":
+            season = int(query.get("saison_id", ["0"])[0])
+            saved = self.tm_dir / f"{seg[1]}_{season}.html" if self.tm_dir else None
+            if saved is not None and saved.exists():
+                return saved.read_bytes()
+            return tm_squad_body(seg[1], int(seg[4]), season)
+        return None
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,482 @@
+# engine/incremental.py
+# ============================================================
+# MATERIALIZACIÓN INCREMENTAL DE df_final.parquet
+#  Cada ronda de Stage 2 sólo cambia ~20 partidos (resultados de la jornada
+#  jugada + la jornada nueva con cuotas de manual/b365_filled_*.csv). En vez de
+#  re-ejecutar LIMPIEZA + PREPROCESADO sobre todo el histórico:
+#   1) LIMPIEZA (update_features): se compara la entrada (df tras la celda 18)
+#      con la del estado → partidos nuevos o modificados (todos en la fecha de
+#      corte del estado o después: el primer partido sin resultado de la ronda
+#      anterior). Las ventanas/EWM por equipo arrancan del snapshot por grupo
+#      guardado en el corte (engine/team_state.py) y sólo recorren las filas desde
+#      el corte; las tablas de temporada se recalculan sólo en las temporadas
+#      tocadas. El notebook escribe df_new_features.parquet como siempre y queda
+#      preparado el plan (partidos que cambian + snapshot en el nuevo corte).
+#   2) PREPROCESADO (patch_df_final): preprocess sólo para esas filas y parche de
+#      df_final (mismas filas, orden y dtypes que una reconstrucción completa);
+#      commit() confirma el estado con el snapshot preparado.
+#
+# Estado (data/03_features/state/):
+#   inputs.parquet          entrada materializada (histórico por equipo)
+#   features.parquet        df_new_features de esa entrada
+#   team_state.npz          estado de los kernels por grupo en `cut_date`
+#   manifest.json           versión, RUN_DATE, modo, corte, huella de df_final.parquet
+#   input_staged.parquet    entrada de la ejecución en curso (hasta commit)
+#   plan_staged.json        plan incremental de la ejecución en curso (+ team_state_staged.npz)
+#
+# Si algo no encaja (sin estado, columnas distintas, partidos borrados o cambiados
+# antes del corte, nueva categoría en df_final, ...) cada paso devuelve
+# applied=False y el notebook sigue el camino completo.
+# ============================================================
+from __future__ import annotations
+
+import hashlib, json, os, time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from engine.match_features import (_season_block, assemble_new_features, build_new_features,
+                                   notebook_row_order, preprocess, transfermarkt_prev_season)
+from engine.team_features import team_match_long
+from engine.team_state import TeamState, kernel_frame
+from engine.trace import traced
+
+STATE_VERSION = 2
+KEY_COLS = ['Season', 'Date', 'HomeTeam_norm', 'AwayTeam_norm']
+DUMMY_PREFIXES = ('home_playstyle_', 'away_playstyle_')
+
+
+# ============================================================
+# 1) Utilidades
+# ============================================================
+def match_keys(df: pd.DataFrame) -> pd.MultiIndex:
+    """Clave de partido (Season, Date normalizada, local, visitante) con tipos homogéneos."""
+    return pd.MultiIndex.from_arrays([
+        pd.to_numeric(df['Season']).astype('int64').to_numpy(),
+        pd.to_datetime(df['Date']).dt.normalize().to_numpy(),
+        df['HomeTeam_norm'].astype(str).to_numpy(),
+        df['AwayTeam_norm'].astype(str).to_numpy(),
+    ], names=KEY_COLS)
+
+
+def feature_cut(df: pd.DataFrame) -> pd.Timestamp:
+    """
+    Fecha de corte del estado: primer partido sin resultado (jornada pendiente). Las filas
+    anteriores ya no cambian entre rondas; sin partidos pendientes, el día siguiente al último.
+    """
+    dates = pd.to_datetime(df['Date']).dt.normalize()
+    pending = ~df['FTR'].isin(['H', 'D', 'A']).to_numpy()
+    return dates[pending].min() if pending.any() else dates.max() + pd.Timedelta(days=1)
+
+
+def _frame_sha256(df: pd.DataFrame) -> str:
+    """Huella de un DataFrame (columnas + valores por fila)."""
+    h = hashlib.sha256('\x1f'.join(map(str, df.columns)).encode('utf-8'))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _keys_to_json(keys: pd.MultiIndex) -> list:
+    return [[int(s), str(pd.Timestamp(d).date()), h, a] for s, d, h, a in keys]
+
+
+def _keys_from_json(rows: list) -> pd.MultiIndex:
+    cols = list(zip(*rows)) if rows else [[], [], [], []]
+    return pd.MultiIndex.from_arrays([np.asarray(cols[0], dtype='int64'), pd.to_datetime(list(cols[1])),
+                                      np.asarray(cols[2], dtype=object), np.asarray(cols[3], dtype=object)],
+                                     names=KEY_COLS)
+
+
+def _file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def compare_frames(a: pd.DataFrame, b: pd.DataFrame) -> dict:
+    """
+    Igualdad exacta de dos df_final (columnas, orden, dtypes y valores; NaN == NaN).
+    Devuelve un informe con las primeras diferencias.
+    """
+    report = {'identical': False, 'shape_a': list(a.shape), 'shape_b': list(b.shape)}
+    if list(a.columns) != list(b.columns):
+        report['columns_only_a'] = [c for c in a.columns if c not in b.columns]
+        report['columns_only_b'] = [c for c in b.columns if c not in a.columns]
+        report['column_order_differs'] = sorted(a.columns) == sorted(b.columns)
+        return report
+    report['dtype_diff'] = {c: [str(a[c].dtype), str(b[c].dtype)] for c in a.columns if a[c].dtype != b[c].dtype}
+    if a.shape != b.shape:
+        return report
+    value_diff = []
+    for c in a.columns:
+        try:
+            pd.testing.assert_series_equal(a[c].reset_index(drop=True), b[c].reset_index(drop=True),
+                                           check_exact=True, check_dtype=False)
+        except AssertionError:
+            value_diff.append(c)
+    report['value_diff'] = value_diff
+    report['identical'] = not value_diff and not report['dtype_diff']
+    return report
+
+
+def check_full_rebuild(df_input: pd.DataFrame, df_final: pd.DataFrame) -> dict:
+    """Compara df_final con una reconstrucción completa (vectorizada) desde la entrada."""
+    t0 = time.perf_counter()
+    full = preprocess(build_new_features(df_input))
+    report = compare_frames(full, df_final)
+    report['rebuild_s'] = round(time.perf_counter() - t0, 3)
+    return report
+
+
+# ============================================================
+# 2) Estado en disco
+# ============================================================
+class FeatureState:
+    """Estado de la materialización: entrada y features ya materializadas, snapshot por grupo + manifest."""
+
+    def __init__(self, state_dir: str | Path):
+        self.dir = Path(state_dir)
+        self.inputs_path = self.dir / 'inputs.parquet'
+        self.features_path = self.dir / 'features.parquet'
+        self.team_state_path = self.dir / 'team_state.npz'
+        self.manifest_path = self.dir / 'manifest.json'
+        self.staged_path = self.dir / 'input_staged.parquet'
+        self.plan_path = self.dir / 'plan_staged.json'
+        self.team_state_staged_path = self.dir / 'team_state_staged.npz'
+
+    def manifest(self) -> dict | None:
+        if not self.manifest_path.exists():
+            return None
+        with open(self.manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def load_inputs(self) -> pd.DataFrame | None:
+        return pd.read_parquet(self.inputs_path) if self.inputs_path.exists() else None
+
+    def load_features(self) -> pd.DataFrame:
+        return pd.read_parquet(self.features_path)
+
+    def load_team_state(self) -> TeamState:
+        return TeamState.load(self.team_state_path)
+
+    def complete(self) -> bool:
+        return all(p.exists() for p in (self.manifest_path, self.inputs_path, self.features_path,
+                                        self.team_state_path))
+
+    def stage_input(self, df_input: pd.DataFrame):
+        """Guarda la entrada de esta ejecución (sin plan incremental); se confirma con commit()."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        df_input.to_parquet(self.staged_path, index=False)
+        self._clear_plan()
+
+    def stage_plan(self, features: pd.DataFrame, changed: pd.MultiIndex, team_state: TeamState, cut, **info):
+        """Plan incremental de LIMPIEZA para PREPROCESADO: filas que cambian + snapshot en el nuevo corte."""
+        team_state.save(self.team_state_staged_path)
+        plan = {'cut_date': str(pd.Timestamp(cut).date()), 'features_sha256': _frame_sha256(features),
+                'changed': _keys_to_json(changed), **info}
+        with open(self.plan_path, 'w', encoding='utf-8') as f:
+            json.dump(plan, f, ensure_ascii=False)
+
+    def staged_plan(self) -> dict | None:
+        if not (self.plan_path.exists() and self.team_state_staged_path.exists()):
+            return None
+        with open(self.plan_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _clear_plan(self):
+        for p in (self.plan_path, self.team_state_staged_path):
+            if p.exists():
+                p.unlink()
+
+    def _write(self, df_input: pd.DataFrame, features: pd.DataFrame, team_state: TeamState, cut,
+               df_final_path: Path, run_date, mode: str, **extra):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        for frame, path in ((df_input, self.inputs_path), (features, self.features_path)):
+            tmp = path.with_suffix('.tmp')
+            frame.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+        team_state.save(self.team_state_path)
+        manifest = {
+            'version': STATE_VERSION,
+            'mode': mode,
+            'run_date': run_date,
+            'written_at': datetime.now().isoformat(timespec='seconds'),
+            'n_matches': int(len(df_input)),
+            'cut_date': str(pd.Timestamp(cut).date()),
+            'input_columns': list(df_input.columns),
+            'df_final': str(df_final_path),
+            'df_final_sha256': _file_sha256(df_final_path),
+            **extra,
+        }
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        if self.staged_path.exists():
+            self.staged_path.unlink()
+        self._clear_plan()
+        return manifest
+
+    def commit(self, df_final_path: str | Path, run_date=None, features: pd.DataFrame | None = None) -> dict | None:
+        """
+        Confirma la entrada preparada en LIMPIEZA con el df_final recién escrito.
+        features = df_new_features de esa entrada (si no se pasa, se recalcula). Con plan
+        incremental para esas features se guarda su snapshot; si no, el snapshot por grupo se
+        construye recorriendo una vez el histórico hasta el corte.
+        """
+        if not self.staged_path.exists():
+            print("[STATE] No hay entrada preparada (¿LIMPIEZA no se ejecutó?). Estado sin cambios.")
+            return None
+        df_input = pd.read_parquet(self.staged_path)
+        plan = self.staged_plan()
+        if plan is not None and features is not None and _frame_sha256(features) == plan['features_sha256']:
+            team_state, cut, mode = TeamState.load(self.team_state_staged_path), plan['cut_date'], 'incremental'
+        else:
+            if features is None:
+                features = build_new_features(df_input)
+            cut, mode = feature_cut(df_input), 'full'
+            _, team_state = TeamState().advance(kernel_frame(df_input.reset_index(drop=True)), cut)
+        manifest = self._write(df_input, features, team_state, cut, Path(df_final_path), run_date, mode)
+        print(f"[STATE] Estado actualizado ({'completo' if mode == 'full' else mode}) · "
+              f"partidos={manifest['n_matches']:,} · corte={manifest['cut_date']}")
+        return manifest
+
+    def applied_incremental(self, run_date) -> bool:
+        """True si el último commit de run_date vino del plan incremental de LIMPIEZA."""
+        m = self.manifest()
+        return bool(m and m.get('mode') == 'incremental' and m.get('run_date') == run_date)
+
+
+# ============================================================
+# 3) Actualización incremental
+# ============================================================
+def _plan(prev: pd.DataFrame, new: pd.DataFrame) -> tuple[np.ndarray | None, str]:
+    """Máscara (sobre new) de partidos nuevos o modificados, o (None, motivo) si hay que reconstruir."""
+    if list(prev.columns) != list(new.columns):
+        return None, "columnas de entrada distintas"
+    dtype_diff = [c for c in new.columns if prev[c].dtype != new[c].dtype]
+    if dtype_diff:
+        return None, f"dtypes de entrada distintos: {dtype_diff[:5]}"
+    k_prev, k_new = match_keys(prev), match_keys(new)
+    if k_prev.has_duplicates or k_new.has_duplicates:
+        return None, "claves (Season, Date, local, visitante) duplicadas"
+    if not k_prev.isin(k_new).all():
+        return None, "hay partidos del estado que ya no están en la entrada"
+    h_prev = pd.Series(pd.util.hash_pandas_object(prev, index=False).to_numpy(), index=k_prev)
+    h_new = pd.util.hash_pandas_object(new, index=False).to_numpy()
+    old = h_prev.reindex(k_new).to_numpy()
+    changed = ~k_new.isin(k_prev) | (old != h_new)
+    return changed, ""
+
+
+def _sides(long: pd.DataFrame, values: pd.Series, n: int) -> tuple[np.ndarray, np.ndarray]:
+    """Valor por fila de `long` → arrays local / visitante por `_row` (0..n-1)."""
+    home, away = np.empty(n, dtype=values.dtype), np.empty(n, dtype=values.dtype)
+    is_home = long['is_home'].to_numpy()
+    rows = long['_row'].to_numpy()
+    home[rows[is_home]] = values.to_numpy()[is_home]
+    away[rows[~is_home]] = values.to_numpy()[~is_home]
+    return home, away
+
+
+def _same_values(a: pd.DataFrame, b: pd.DataFrame) -> np.ndarray:
+    """Filas iguales en todas las columnas (NaN == NaN); a y b alineados por posición."""
+    same = np.ones(len(a), dtype=bool)
+    for c in a.columns:
+        x, y = a[c].to_numpy(), b[c].to_numpy()
+        same &= (x == y) | (pd.isna(x) & pd.isna(y))
+    return same
+
+
+def _tail_features(df_input: pd.DataFrame, prev_feats: pd.DataFrame, team_state: TeamState,
+                   cut_prev: pd.Timestamp, cut_new: pd.Timestamp) -> tuple[pd.DataFrame, pd.MultiIndex, TeamState]:
+    """
+    df_new_features de df_input a partir del estado: kernels por grupo sólo sobre las filas
+    con Date >= cut_prev y tablas de temporada sólo en sus temporadas (+ la anterior, por la
+    posición final). Devuelve (features en orden de notebook, claves de filas que cambian,
+    snapshot en cut_new).
+    """
+    keys_input = match_keys(df_input)
+    dates = keys_input.get_level_values('Date')
+    seasons = df_input['Season'].to_numpy()
+    s0 = seasons[dates >= cut_prev].min()
+    in_sub = seasons >= s0 - 1
+    sub = df_input[in_sub].reset_index(drop=True)
+    sub_keys = keys_input[in_sub]
+    tail = sub_keys.get_level_values('Date') >= cut_prev
+
+    # Ventanas / EWM por grupo desde el snapshot
+    sub_tail = sub[tail].reset_index(drop=True)
+    long_tail = kernel_frame(sub_tail)
+    outs, snapshot = team_state.advance(long_tail, cut_new)
+    tf_tail = team_state.team_features(long_tail, outs, len(sub_tail))
+
+    # Filas anteriores al corte: features ya materializadas
+    prev_keys = match_keys(prev_feats)
+    old = prev_feats.set_axis(prev_keys).reindex(sub_keys).reset_index(drop=True)
+    tf = old[tf_tail.columns].copy()
+    for c in tf_tail.columns:
+        col = tf[c].to_numpy(dtype=tf_tail[c].dtype, copy=True)
+        col[tail] = tf_tail[c].to_numpy()
+        tf[c] = col
+
+    # Tablas de temporada; los flags del partido previo cruzan temporadas → kernel
+    season = _season_block(sub, team_match_long(sub, pd.to_datetime(sub['Date'])))
+    for src, base in [('prev_big_win_any', 'prev_big_odds_win_any'),
+                      ('prev_big_fav_loss_any', 'prev_big_odds_loss_any')]:
+        flags = pd.Series(outs['flags'][src].eq(1.0).astype(int).to_numpy())
+        for side, vals in zip(('home', 'away'), _sides(long_tail, flags, len(sub_tail))):
+            col = old[f'{side}_{base}'].to_numpy(dtype=float, copy=True)
+            col[tail] = vals
+            season[f'{side}_{base}'] = pd.Series(col.astype(season[f'{side}_{base}'].dtype), index=sub.index)
+
+    recalc = (sub['Season'] >= s0).to_numpy()
+    out = assemble_new_features(sub, tf, season)[recalc]
+    keys = sub_keys[recalc]
+    changed = keys[~_same_values(out[prev_feats.columns], old[recalc][prev_feats.columns])
+                   | ~keys.isin(prev_keys)]
+
+    feats = pd.concat([prev_feats[~prev_keys.isin(keys)], out], ignore_index=True)
+    feats.index = prev_keys[~prev_keys.isin(keys)].append(keys)
+    feats = feats.loc[keys_input[notebook_row_order(df_input)]].reset_index(drop=True)
+    return feats, changed, snapshot
+
+
+@traced
+def update_features(df_input: pd.DataFrame, state: FeatureState) -> dict:
+    """
+    LIMPIEZA: df_new_features de df_input (frame de la celda 18) a partir del estado, y plan
+    para PREPROCESADO. Devuelve un informe con 'features'; applied=False (+ reason) → camino
+    completo. Llamar después de state.stage_input(df_input).
+    """
+    t0 = time.perf_counter()
+    df_input = df_input.reset_index(drop=True)
+
+    def skip(reason):
+        return {'applied': False, 'reason': reason, 'elapsed_s': round(time.perf_counter() - t0, 3)}
+
+    manifest = state.manifest()
+    if manifest is None or not state.complete():
+        return skip("sin estado previo")
+    if manifest.get('version') != STATE_VERSION:
+        return skip(f"versión de estado {manifest.get('version')} != {STATE_VERSION}")
+
+    prev = state.load_inputs()
+    changed, reason = _plan(prev, df_input)
+    if changed is None:
+        return skip(reason)
+    cut_prev = pd.Timestamp(manifest['cut_date'])
+    dates = pd.to_datetime(df_input['Date']).dt.normalize()
+    if (dates[changed] < cut_prev).any():
+        return skip(f"hay partidos modificados antes del corte del estado ({manifest['cut_date']})")
+
+    n_changed = int(changed.sum())
+    if n_changed == 0:
+        feats, changed_keys, snapshot, cut_new = state.load_features(), match_keys(df_input)[:0], \
+            state.load_team_state(), cut_prev
+    else:
+        cut_new = feature_cut(df_input)
+        feats, changed_keys, snapshot = _tail_features(df_input, state.load_features(), state.load_team_state(),
+                                                       cut_prev, cut_new)
+    report = {'applied': True, 'reason': "", 'n_changed': n_changed, 'n_new': int(len(df_input) - len(prev)),
+              'n_tail': int((dates >= cut_prev).sum()), 'n_features_changed': int(len(changed_keys)),
+              'cut_date': str(cut_new.date())}
+    state.stage_plan(feats, changed_keys, snapshot, cut_new, df_final_sha256=manifest['df_final_sha256'],
+                     n_changed=n_changed)
+    report['elapsed_s'] = round(time.perf_counter() - t0, 3)
+    return {**report, 'features': feats}
+
+
+@traced
+def patch_df_final(df_new: pd.DataFrame, df_final_path: str | Path, state: FeatureState) -> dict:
+    """
+    PREPROCESADO: df_final con preprocess sólo en las filas del plan de update_features (sin
+    escribir). Devuelve un informe con 'df_final'; applied=False (+ reason) → preprocess completo.
+    """
+    t0 = time.perf_counter()
+    df_final_path = Path(df_final_path)
+
+    def skip(reason):
+        return {'applied': False, 'reason': reason, 'elapsed_s': round(time.perf_counter() - t0, 3)}
+
+    plan = state.staged_plan()
+    if plan is None:
+        return skip("sin plan incremental (LIMPIEZA siguió el camino completo)")
+    if not df_final_path.exists() or _file_sha256(df_final_path) != plan['df_final_sha256']:
+        return skip("df_final.parquet no coincide con el estado (¿se regeneró fuera del pipeline?)")
+    if _frame_sha256(df_new) != plan['features_sha256']:
+        return skip("df_new_features no es el del plan incremental de LIMPIEZA")
+
+    old = pd.read_parquet(df_final_path)
+    order = match_keys(df_new)
+    affected = order.isin(_keys_from_json(plan['changed']))
+    if not affected.any():
+        return {'applied': True, 'reason': "sin cambios", 'n_patched': 0, 'df_final': old,
+                'elapsed_s': round(time.perf_counter() - t0, 3)}
+    tm_prev = transfermarkt_prev_season(df_new)
+    if tm_prev.duplicated(['Season', 'Team']).any():
+        return skip("Transfermarkt con varias filas por (Season, Team)")
+
+    dummies = [c for c in old.columns if c.startswith(DUMMY_PREFIXES)]
+    patch = preprocess(df_new[affected], tm_prev=tm_prev, dummy_columns=dummies)
+    if sorted(patch.columns) != sorted(old.columns):
+        return skip("las columnas de df_final cambiarían (nueva categoría o variable)")
+    patch = patch[old.columns]
+
+    # Parche: filas no afectadas del df_final anterior + filas recalculadas, en el orden final
+    keep = old[~match_keys(old).isin(order[affected])]
+    patched = pd.concat([keep, patch], ignore_index=True)
+    target = order[df_new['Season'].to_numpy() > 2005]
+    patched.index = match_keys(patched)
+    if len(patched) != len(target) or not patched.index.isin(target).all():
+        return skip("las filas del parche no cuadran con la entrada")
+    patched = patched.loc[target].reset_index(drop=True)
+    # Columnas enteras que eran float sólo por los NaN de la jornada pendiente (p.ej. target)
+    for c in patched.columns:
+        if patch[c].dtype != patched[c].dtype and pd.api.types.is_integer_dtype(patch[c].dtype) \
+                and patched[c].notna().all():
+            patched[c] = patched[c].astype(patch[c].dtype)
+    return {'applied': True, 'reason': "", 'n_patched': int(len(patch)), 'df_final': patched,
+            'elapsed_s': round(time.perf_counter() - t0, 3)}
+
+
+@traced
+def update_df_final(
+    df_input: pd.DataFrame,
+    df_final_path: str | Path,
+    state: FeatureState,
+    run_date=None,
+    verify: bool = False,
+) -> dict:
+    """
+    Los dos pasos sin notebooks (update_features + patch_df_final), escritura de df_final.parquet
+    y commit del estado. Devuelve un informe; applied=False (+ reason) → reconstrucción completa.
+      verify: compara además con una reconstrucción completa vectorizada antes de escribir.
+    """
+    t0 = time.perf_counter()
+    df_final_path = Path(df_final_path)
+    state.stage_input(df_input)
+    inc = update_features(df_input, state)
+    if not inc['applied']:
+        return inc
+    feats = inc.pop('features')
+    patch = patch_df_final(feats, df_final_path, state)
+    if not patch['applied']:
+        return {**patch, 'elapsed_s': round(time.perf_counter() - t0, 3)}
+    patched = patch.pop('df_final')
+    report = {**inc, 'n_patched': patch['n_patched'], 'features_s': inc['elapsed_s']}
+    if verify:
+        check = check_full_rebuild(df_input, patched)
+        report['full_rebuild_check'] = check
+        if not check['identical']:
+            return {**report, 'applied': False, 'reason': "el parche no coincide con la reconstrucción completa",
+                    'elapsed_s': round(time.perf_counter() - t0, 3)}
+
+    tmp = df_final_path.with_suffix('.tmp')
+    patched.to_parquet(tmp, index=False)
+    os.replace(tmp, df_final_path)
+    state.commit(df_final_path, run_date=run_date, features=feats)
+    report['elapsed_s'] = round(time.perf_counter() - t0, 3)
+    return report
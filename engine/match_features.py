@@ -0,0 +1,326 @@
+# engine/match_features.py
+# ============================================================
+# df_new_features / df_final SIN NOTEBOOKS (versión vectorizada)
+#  - build_new_features(df): celdas 22-61 de LIMPIEZA_Y_CREACION_DE_VARS.ipynb
+#      (df = frame tras la celda 18: histórico + jornada siguiente con cuotas)
+#  - preprocess(df_new):     PREPROCESADO.ipynb (el notebook llama a esta función; antes, celdas 8-55)
+#
+# Mismas columnas, dtypes, valores y ORDEN DE FILAS que los notebooks: el orden
+# final sale de la misma secuencia de sort_values (estable por Season/Date y
+# tres quicksort por Date), que sólo depende de las claves.
+# Lo usa engine/incremental.py para materializar sólo la jornada nueva.
+# ============================================================
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from engine.team_features import STATS_LAST7, build_team_features, team_match_long
+from engine.team_join import attach_team_tables
+from engine.trace import traced
+
+BIG_WIN_THRESHOLD = 4.0          # celda 54
+SMALL_ODDS_FAV_THRESHOLD = 1.60  # celda 55
+TM_VARS = ['avg_age', 'value_mio', 'value_avg_mio', 'squad_size', 'pct_foreigners']
+POSITION_ZONE_MAP = {'descenso': 0, 'mid_table': 1, 'europa': 2, 'champions': 3}
+
+# PREPROCESADO celda 8 (variables con fuga)
+LEAK_COLS = ['FTHG', 'FTAG', 'HTHG', 'HTAG', 'HTR', 'HS', 'AS', 'HST', 'AST', 'HF', 'AF', 'HC', 'AC',
+             'HY', 'AY', 'HR', 'AR', 'home_points', 'away_points', 'home_gd', 'away_gd', 'h_xg', 'a_xg',
+             'pH_adj', 'pA_adj']
+
+
+# ============================================================
+# 1) Orden de filas de los notebooks
+# ============================================================
+def notebook_row_order(df: pd.DataFrame) -> np.ndarray:
+    """
+    Posiciones de df (frame de la celda 18) en el orden final de df_new_features:
+    sort estable por ['Season','Date'] (celda 25) y quicksort por Date en las celdas 35, 54 y 55.
+    """
+    keys = pd.DataFrame({'Season': df['Season'].to_numpy(), 'Date': df['Date'].to_numpy(),
+                         '_pos': np.arange(len(df))})
+    keys = keys.sort_values(['Season', 'Date']).reset_index(drop=True)
+    keys['Date'] = pd.to_datetime(keys['Date']).dt.normalize()
+    for _ in range(3):
+        keys = keys.sort_values('Date').reset_index(drop=True)
+    return keys['_pos'].to_numpy()
+
+
+# ============================================================
+# 2) Features de temporada (celdas 25, 27, 29, 35, 36, 41, 48, 54, 55)
+# ============================================================
+def _cum_pre(values: pd.Series, by: list) -> pd.Series:
+    """s.fillna(0).cumsum().shift(1) por grupo y fillna(0) (frame ya ordenado por fecha)."""
+    cum = values.fillna(0).groupby(by, sort=False).cumsum()
+    return cum.groupby(by, sort=False).shift(1).fillna(0)
+
+
+def _prev_positions(long: pd.DataFrame) -> pd.Series:
+    """
+    Celda 35: posición en la tabla con los partidos de jornadas (nº de partido del equipo)
+    anteriores. Empates de puntos y GD en orden alfabético, como el sort estable del notebook.
+    """
+    out = pd.Series(np.nan, index=long.index)
+    for _, g in long.groupby('Season', sort=False):
+        teams, t_idx = np.unique(g['Team'].to_numpy(), return_inverse=True)
+        md = g['Matchday'].to_numpy() - 1
+        n_md = md.max() + 1
+        pts = np.zeros((len(teams), n_md))
+        gd = np.zeros((len(teams), n_md))
+        np.add.at(pts, (t_idx, md), np.nan_to_num(g['Points'].to_numpy(dtype=float)))
+        np.add.at(gd, (t_idx, md), np.nan_to_num(g['GD'].to_numpy(dtype=float)))
+        pts, gd = pts.cumsum(axis=1), gd.cumsum(axis=1)
+        pos = np.full((len(teams), n_md), np.nan)
+        alpha = np.arange(len(teams))
+        for j in range(1, n_md):
+            order = np.lexsort((alpha, -gd[:, j - 1], -pts[:, j - 1]))
+            pos[order, j] = np.arange(1, len(teams) + 1)
+        out.loc[g.index] = pos[t_idx, md]
+    return out
+
+
+def _classify_zone(pos):
+    if pos <= 4:
+        return 'champions'
+    elif pos <= 6:
+        return 'europa'
+    elif pos <= 17:
+        return 'mid_table'
+    else:
+        return 'descenso'
+
+
+def match_flags(df: pd.DataFrame, long: pd.DataFrame) -> pd.DataFrame:
+    """Celdas 54 / 55: gran victoria (cuota > 4) y derrota de favorito (cuota < 1.60) por fila de `long`."""
+    oh = pd.to_numeric(df['B365H'], errors='coerce').to_numpy()
+    oa = pd.to_numeric(df['B365A'], errors='coerce').to_numpy()
+    rows = long['_row'].to_numpy()
+    is_home = long['is_home'].to_numpy()
+    ftr_l = df['FTR'].to_numpy()[rows]
+    odds_own = np.where(is_home, oh[rows], oa[rows])
+    won = np.where(is_home, ftr_l == 'H', ftr_l == 'A')
+    lost = np.where(is_home, ftr_l == 'A', ftr_l == 'H')
+    return pd.DataFrame({'big_win': won & (odds_own > BIG_WIN_THRESHOLD),
+                         'big_fav_loss': lost & (odds_own < SMALL_ODDS_FAV_THRESHOLD)}, index=long.index)
+
+
+def _season_block(df: pd.DataFrame, long: pd.DataFrame) -> dict:
+    """Columnas de las celdas 25-55 que no son ventanas móviles, alineadas con df."""
+    cols = {}
+    ftr = df['FTR']
+    home_points = ftr.map({'H': 3, 'D': 1, 'A': 0})
+    away_points = ftr.map({'H': 0, 'D': 1, 'A': 3})
+    home_gd = df['FTHG'] - df['FTAG']
+    away_gd = df['FTAG'] - df['FTHG']
+    cols.update(home_points=home_points, away_points=away_points, home_gd=home_gd, away_gd=away_gd)
+
+    # celda 25: acumulados sólo como local / sólo como visitante (orden Season, Date)
+    order = df.assign(home_points=home_points, away_points=away_points, home_gd=home_gd, away_gd=away_gd)
+    order = order.sort_values(['Season', 'Date'])
+    hk = [order['Season'], order['HomeTeam_norm']]
+    ak = [order['Season'], order['AwayTeam_norm']]
+    cols['home_points_cum'] = _cum_pre(order['home_points'], hk).reindex(df.index)
+    cols['away_points_cum'] = _cum_pre(order['away_points'], ak).reindex(df.index)
+    cols['home_gd_cum'] = _cum_pre(order['home_gd'], hk).reindex(df.index)
+    cols['away_gd_cum'] = _cum_pre(order['away_gd'], ak).reindex(df.index)
+
+    # celdas 27 / 29 / 48: por (Season, Team) en orden de fecha
+    lo = long.sort_values(['Season', 'Team', 'Date'], kind='mergesort')
+    keys = [lo['Season'], lo['Team']]
+    lo['total_points_cum'] = _cum_pre(lo['Points'], keys)
+    lo['total_gd_cum'] = _cum_pre(lo['GD'], keys)
+    lo['matches_prev'] = lo.groupby(keys, sort=False).cumcount()
+    lo['Matchday'] = lo['matches_prev'] + 1
+    eff_pts = _cum_pre(lo['Points'], keys)
+    eff_sot = _cum_pre(lo['ShotsOnTarget'], keys)
+    lo['effectiveness'] = eff_pts / eff_sot.replace(0, np.nan)
+    lo['prev_position'] = _prev_positions(lo)
+
+    # celda 36: posición final de la temporada anterior
+    tot = long.groupby(['Season', 'Team'])[['Points', 'GD']].sum().reset_index()
+    tot = tot.sort_values(['Season', 'Points', 'GD'], ascending=[True, False, False])
+    tot['FinalPosition'] = tot.groupby('Season').cumcount() + 1
+    final_prev = dict(zip(zip(tot['Season'] + 1, tot['Team']), tot['FinalPosition']))
+    lo['final_prev'] = pd.Series([final_prev.get(k, np.nan) for k in zip(lo['Season'], lo['Team'])],
+                                 index=lo.index, dtype=float)
+
+    # celdas 54 / 55: gran victoria / gran derrota de favorito en el partido anterior del equipo
+    flags = match_flags(df, long)
+    ord_t = long.sort_values(['Team', 'Date'], kind='mergesort').index
+    prev_flags = flags.loc[ord_t].groupby(long.loc[ord_t, 'Team'].to_numpy(), sort=False).shift(1)
+    lo[['prev_big_win_any', 'prev_big_fav_loss_any']] = prev_flags.eq(True).astype(int).reindex(lo.index)
+
+    def split(col):
+        s = lo[col].sort_index()
+        home = s[long['is_home']].set_axis(long.loc[long['is_home'], '_row'].to_numpy()).sort_index()
+        away = s[~long['is_home']].set_axis(long.loc[~long['is_home'], '_row'].to_numpy()).sort_index()
+        return home.set_axis(df.index), away.set_axis(df.index)
+
+    for src, base in [('total_points_cum', 'total_points_cum'), ('total_gd_cum', 'total_gd_cum'),
+                      ('matches_prev', 'total_matches_prev'), ('prev_position', 'prev_position'),
+                      ('final_prev', 'final_position_prev_season'), ('effectiveness', 'effectiveness'),
+                      ('prev_big_win_any', 'prev_big_odds_win_any'),
+                      ('prev_big_fav_loss_any', 'prev_big_odds_loss_any')]:
+        cols[f'home_{base}'], cols[f'away_{base}'] = split(src)
+    for side in ('home', 'away'):
+        cols[f'{side}_dynamic_pos_change_prev_season'] = (
+            cols[f'{side}_final_position_prev_season'] - cols[f'{side}_prev_position'])
+        cols[f'{side}_position_zone'] = cols[f'{side}_prev_position'].apply(_classify_zone)
+    return cols
+
+
+# ============================================================
+# 3) API: LIMPIEZA (celdas 22-61)
+# ============================================================
+@traced
+def build_new_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    df_new_features.parquet a partir del frame de la celda 18 de LIMPIEZA
+    (mismo resultado que ejecutar las celdas 22-61).
+    """
+    df = df.reset_index(drop=True)
+    tf = build_team_features(df)
+    season = _season_block(df, team_match_long(df, pd.to_datetime(df['Date'])))
+    return assemble_new_features(df, tf, season).iloc[notebook_row_order(df)].reset_index(drop=True)
+
+
+def assemble_new_features(df: pd.DataFrame, tf: pd.DataFrame, season: dict) -> pd.DataFrame:
+    """
+    Columnas de df_new_features en el orden del notebook a partir de las features de equipo
+    (build_team_features) y de temporada (_season_block), todas alineadas con df; sin reordenar filas.
+    """
+    dates = pd.to_datetime(df['Date'])
+    out = df.copy()
+    stats = [s.lower() for s in STATS_LAST7]
+    for c in [f'home_avg_{s}_last7' for s in stats] + [f'away_avg_{s}_last7' for s in stats]:
+        out[c] = tf[c]
+    for c in ['home_points', 'away_points', 'home_gd', 'away_gd',
+              'home_points_cum', 'away_points_cum', 'home_gd_cum', 'away_gd_cum',
+              'home_total_points_cum', 'home_total_gd_cum', 'away_total_points_cum', 'away_total_gd_cum',
+              'home_total_matches_prev', 'away_total_matches_prev']:
+        out[c] = season[c]
+    out['home_playstyle'] = tf['home_playstyle']
+    out['away_playstyle'] = tf['away_playstyle']
+    for c in ['home_prev_position', 'away_prev_position',
+              'home_final_position_prev_season', 'away_final_position_prev_season',
+              'home_dynamic_pos_change_prev_season', 'away_dynamic_pos_change_prev_season']:
+        out[c] = season[c]
+    for c in ['home_form_points_6', 'away_form_points_6', 'home_form_gd_6', 'away_form_gd_6']:
+        out[c] = tf[c]
+    for c in ['home_position_zone', 'away_position_zone', 'home_effectiveness', 'away_effectiveness']:
+        out[c] = season[c]
+    h2h = [c for c in tf.columns if 'h2h' in c]
+    out[h2h] = tf[h2h]
+    for c in ['home_prev_big_odds_win_any', 'away_prev_big_odds_win_any',
+              'home_prev_big_odds_loss_any', 'away_prev_big_odds_loss_any']:
+        out[c] = season[c]
+
+    # celda 58
+    p = pd.DataFrame({
+        'H': 1.0 / pd.to_numeric(df['B365H'], errors='coerce'),
+        'D': 1.0 / pd.to_numeric(df['B365D'], errors='coerce') if 'B365D' in df.columns else np.nan,
+        'A': 1.0 / pd.to_numeric(df['B365A'], errors='coerce'),
+    })
+    p_adj = p.div(p.sum(axis=1, skipna=True), axis=0)
+    out['pH_adj'] = p_adj['H']
+    out['pA_adj'] = p_adj['A']
+    out['home_relative_perf'] = tf['home_relative_perf']
+    out['away_relative_perf'] = tf['away_relative_perf']
+
+    # celda 61
+    inv = 1 / df[['B365H', 'B365D', 'B365A']]
+    out['overround'] = inv['B365H'] + inv['B365D'] + inv['B365A']
+    out['pimp1'] = inv['B365H'] / out['overround']
+    out['pimpx'] = inv['B365D'] / out['overround']
+    out['pimp2'] = inv['B365A'] / out['overround']
+
+    out['Date'] = dates.dt.normalize()
+    return out
+
+
+# ============================================================
+# 4) API: PREPROCESADO (celdas 8-55)
+# ============================================================
+def transfermarkt_prev_season(df_new: pd.DataFrame) -> pd.DataFrame:
+    """Celda 11: tabla (Season, Team) → valores Transfermarkt de la temporada anterior."""
+    home = df_new[['Season', 'HomeTeam_norm'] + [f'h_{v}' for v in TM_VARS]].copy()
+    away = df_new[['Season', 'AwayTeam_norm'] + [f'a_{v}' for v in TM_VARS]].copy()
+    home.columns = ['Season', 'Team'] + TM_VARS
+    away.columns = ['Season', 'Team'] + TM_VARS
+    team_data = pd.concat([home, away], ignore_index=True).drop_duplicates()
+    team_data = team_data.sort_values(['Team', 'Season'])
+    for var in TM_VARS:
+        team_data[f'{var}_prev_season'] = team_data.groupby('Team')[var].shift(1)
+    return team_data[['Season', 'Team'] + [f'{v}_prev_season' for v in TM_VARS]]
+
+
+@traced
+def preprocess(df_new: pd.DataFrame, tm_prev: pd.DataFrame | None = None,
+               dummy_columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    df_final.parquet a partir de df_new_features (celdas 8-55 de PREPROCESADO).
+      tm_prev:       tabla de transfermarkt_prev_season (por defecto, la de df_new).
+      dummy_columns: columnas home/away_playstyle_* ya existentes (para procesar sólo
+                     unas filas sin que get_dummies dependa de las categorías presentes).
+    """
+    df = df_new.drop(columns=LEAK_COLS)
+
+    # celdas 11-13: Transfermarkt de la temporada previa (una unión local/visitante, engine/team_join.py)
+    tm_prev = transfermarkt_prev_season(df_new) if tm_prev is None else tm_prev
+    df = attach_team_tables(df, tm_prev, [f'{v}_prev_season' for v in TM_VARS], on=['Season'],
+                            home='h_{}', away='a_{}')
+    df = df.drop(columns=[f'h_{v}' for v in TM_VARS] + [f'a_{v}' for v in TM_VARS])
+    for v in TM_VARS:
+        h, a = f'h_{v}_prev_season', f'a_{v}_prev_season'
+        df[h] = pd.to_numeric(df[h], errors='coerce')
+        df[a] = pd.to_numeric(df[a], errors='coerce')
+        df[f'{v}_prev_season_diff'] = df[h] - df[a]
+
+    # celdas 17-38: filtro de temporada e imputaciones
+    df = df[df['Season'] > 2005].copy()
+    df['has_xg_data'] = (~df['home_avg_xg_last7'].isna()) & (~df['away_avg_xg_last7'].isna())
+    df['has_xg_data'] = df['has_xg_data'].astype(int)
+    cond_early = df['Season'] <= 2013
+    cond_late = df['Season'] >= 2014
+    for c in ['home_avg_xg_last7', 'away_avg_xg_last7']:
+        df.loc[cond_early, c] = df.loc[cond_early, c].fillna(-1)
+        df.loc[cond_late, c] = df.loc[cond_late, c].fillna(0)
+    df['home_prev_position'] = df['home_prev_position'].fillna(0)
+    df['away_prev_position'] = df['away_prev_position'].fillna(0)
+    df['home_final_position_prev_season'] = df['home_final_position_prev_season'].fillna(20)
+    df['away_final_position_prev_season'] = df['away_final_position_prev_season'].fillna(20)
+    df['home_dynamic_pos_change_prev_season'] = df['home_prev_position'] - df['home_final_position_prev_season']
+    df['away_dynamic_pos_change_prev_season'] = df['away_prev_position'] - df['away_final_position_prev_season']
+    df['home_effectiveness'] = df['home_effectiveness'].fillna(0)
+    df['away_effectiveness'] = df['away_effectiveness'].fillna(0)
+    df = df.fillna(0)
+
+    # celdas 41-47: diferencias home - away
+    num = lambda c: pd.to_numeric(df[c], errors='coerce')
+    for m in [s.lower() for s in STATS_LAST7]:
+        h, a = f'home_avg_{m}_last7', f'away_avg_{m}_last7'
+        df[h], df[a] = num(h), num(a)
+        df[f'avg_{m}_last7_diff'] = df[h] - df[a]
+    for base in ['points_cum', 'gd_cum', 'total_points_cum', 'total_gd_cum']:
+        h, a = f'home_{base}', f'away_{base}'
+        df[h], df[a] = num(h), num(a)
+        df[f'{base}_diff'] = df[h] - df[a]
+    for base in ['prev_position', 'final_position_prev_season', 'dynamic_pos_change_prev_season']:
+        df[f'{base}_diff'] = num(f'away_{base}') - num(f'home_{base}')
+    for base in ['form_points_6', 'form_gd_6', 'effectiveness', 'relative_perf']:
+        df[f'{base}_diff'] = num(f'home_{base}') - num(f'away_{base}')
+
+    # celdas 50-55: target, zonas y one-hot de estilo
+    df['target'] = df['FTR'].map({'A': 0, 'D': 1, 'H': 2})
+    df['home_position_zone'] = df['home_position_zone'].map(POSITION_ZONE_MAP)
+    df['away_position_zone'] = df['away_position_zone'].map(POSITION_ZONE_MAP)
+    if dummy_columns is None:
+        df = pd.get_dummies(df, columns=['home_playstyle', 'away_playstyle'], dummy_na=False, drop_first=True)
+    else:
+        for side in ('home_playstyle', 'away_playstyle'):
+            values = df.pop(side).astype(str)
+            for c in [c for c in dummy_columns if c.startswith(f'{side}_')]:
+                df[c] = values == c[len(side) + 1:]
+    df['FTR'] = df['FTR'].astype(str)
+    return df.reset_index(drop=True)  # como to_parquet(index=False)
@@ -0,0 +1,393 @@
+# engine/metrics.py
+# ============================================================
+# MÉTRICAS POR TEMPORADA EN UNA PASADA (MODELOS.ipynb: métricas principales,
+# matrices de confusión y curvas ROC)
+#  Antes cada bloque volvía a pegar Season a preds con un merge por fecha, filtraba,
+#  ordenaba y hacía su propio groupby/apply (y _confusion_counts / _multiclass_roc_block
+#  por temporada). Ahora:
+#   - encode(): un único array float64 (season, y_true, y_pred, P_H/D/A, cuotas H/D/A)
+#     ordenado por temporada una sola vez; las temporadas son tramos contiguos
+#   - season_table(): accuracy, logloss, brier, roi, apuestas, confianza… de todas las
+#     temporadas con np.add.reduceat (esquema de metrics_main_by_season.csv) + IC bootstrap
+#   - confusion_payload(): todas las matrices con un único bincount
+#   - roc_payload(): todas las curvas (temporada × clase + micro, y global) con un único
+#     lexsort; mismos puntos que sklearn.metrics.roc_curve(drop_intermediate=True)
+#   - bootstrap por lotes: matrices de índices (B × n) remuestreando partidos dentro de
+#     cada temporada → IC percentil de accuracy, logloss y ROI
+# ============================================================
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from engine.trace import traced
+
+LABELS = ("H", "D", "A")
+EPS = 1e-15
+ODDS_COLS = ("B365H", "B365D", "B365A")
+PROBA_COLS = ("proba_H", "proba_D", "proba_A")
+# Columnas del array codificado
+SEASON, Y_TRUE, Y_PRED = 0, 1, 2
+P_COLS = slice(3, 6)
+O_COLS = slice(6, 9)
+
+MAIN_COLS = [
+    "Season", "accuracy", "logloss", "brier", "roi",
+    "n_bets", "n_wins", "hit_rate", "avg_odds_win", "avg_overround",
+    "avg_conf", "avg_entropy", "avg_margin",
+]
+CI_METRICS = ("accuracy", "logloss", "roi")
+
+
+def _label_idx(s: pd.Series) -> np.ndarray:
+    """H/D/A → 0/1/2 (normalizado como en el notebook: upper + strip); otra cosa → -1."""
+    codes = pd.Categorical(s.astype(str).str.upper().str.strip(), categories=list(LABELS)).codes
+    return codes.astype(float)
+
+
+@dataclass
+class Encoded:
+    """Filas ordenadas por temporada (estable); `starts` = inicio de cada tramo de `seasons`."""
+    A: np.ndarray
+    seasons: np.ndarray
+    starts: np.ndarray
+    n_seasoned: int          # filas con temporada (las sin temporada van al final)
+
+    @property
+    def labeled(self) -> np.ndarray:
+        return self.A[:, Y_TRUE] >= 0
+
+    def bounds(self):
+        ends = np.append(self.starts[1:], self.n_seasoned)
+        return zip(self.seasons, self.starts, ends)
+
+
+@traced
+def encode(merged: pd.DataFrame, season_col: str = "Season") -> Encoded:
+    """
+    preds / merged (y_true, y_pred, proba_H/D/A, Season y, si están, B365H/D/A) → Encoded.
+    Season ausente o no numérica = NaN: la fila cuenta en el global pero no en ninguna temporada.
+    """
+    for col in PROBA_COLS:
+        if col not in merged.columns:
+            raise ValueError(f"Falta la columna {col} en preds. Usa la versión que añade proba_H/D/A.")
+    n = len(merged)
+    A = np.full((n, 9), np.nan)
+    A[:, SEASON] = pd.to_numeric(merged[season_col], errors="coerce").to_numpy(dtype=float) \
+        if season_col in merged.columns else np.nan
+    A[:, Y_TRUE] = _label_idx(merged["y_true"])
+    A[:, Y_PRED] = _label_idx(merged["y_pred"])
+    A[:, P_COLS] = merged[list(PROBA_COLS)].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    for j, c in enumerate(ODDS_COLS):
+        if c in merged.columns:
+            A[:, 6 + j] = pd.to_numeric(merged[c], errors="coerce").to_numpy(dtype=float)
+
+    order = np.argsort(A[:, SEASON], kind="mergesort")     # NaN al final
+    A = A[order]
+    n_seasoned = int(np.count_nonzero(~np.isnan(A[:, SEASON])))
+    s = A[:n_seasoned, SEASON]
+    starts = np.flatnonzero(np.r_[True, s[1:] != s[:-1]]) if n_seasoned else np.array([], dtype=int)
+    return Encoded(A, s[starts].astype(int), starts, n_seasoned)
+
+
+# ============================================================
+# 1) Columnas por fila (todas las temporadas a la vez)
+# ============================================================
+def _row_terms(A: np.ndarray) -> dict[str, np.ndarray]:
+    yt = A[:, Y_TRUE]
+    yp = A[:, Y_PRED]
+    P = A[:, P_COLS]
+    labeled = yt >= 0
+    rows = np.arange(len(A))
+    yi = np.where(labeled, yt, 0).astype(int)
+    pi = np.where(yp >= 0, yp, 0).astype(int)
+
+    p_true = np.clip(P, EPS, 1.0 - EPS)[rows, yi]
+    onehot = np.zeros_like(P)
+    onehot[rows, yi] = 1.0
+    brier = np.sum((np.clip(P, 0.0, 1.0) - onehot) ** 2, axis=1)
+
+    # apuesta de 1 unidad al pronóstico (compute_accuracy_roi): etiqueta válida y cuota >= 1.01
+    odds_pred = np.where(yp >= 0, A[:, O_COLS][rows, pi], np.nan)
+    bet = labeled & np.isfinite(odds_pred) & (odds_pred >= 1.01)
+    win = bet & (yp == yt)
+    profit = np.where(bet, np.where(win, odds_pred - 1.0, -1.0), 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        overround = (1 / np.clip(A[:, 6], 1.0, None)) + (1 / np.clip(A[:, 7], 1.0, None)) \
+            + (1 / np.clip(A[:, 8], 1.0, None))
+
+    with np.errstate(invalid="ignore"):
+        conf = np.nanmax(P, axis=1) if len(P) else np.zeros(0)
+    srt = np.sort(P, axis=1)
+    return {
+        "labeled": labeled, "correct": labeled & (yp == yt),
+        "ll": -np.log(p_true), "brier": brier,
+        "bet": bet, "win": win, "profit": profit, "odds_pred": odds_pred, "overround": overround,
+        "conf": conf, "margin": srt[:, -1] - srt[:, -2],
+        "entropy": -(P * np.log(np.clip(P, EPS, 1.0))).sum(axis=1),
+    }
+
+
+def _seg_sum(x: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    return np.add.reduceat(x, starts) if len(starts) else np.zeros(0)
+
+
+def _seg_mean(x: np.ndarray, mask: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Media por tramo de x[mask] (un NaN en x da NaN, como np.mean en _log_loss_mc_vec)."""
+    n = _seg_sum(mask.astype(float), starts)
+    s = _seg_sum(np.where(mask, x, 0.0), starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, s / n, np.nan)
+
+
+def _seg_nanmean(x: np.ndarray, mask: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Media por tramo de x[mask] ignorando NaN (como pandas .mean()); NaN si no queda nada."""
+    ok = mask & ~np.isnan(x)
+    n = _seg_sum(ok.astype(float), starts)
+    s = _seg_sum(np.where(ok, x, 0.0), starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, s / n, np.nan)
+
+
+# ============================================================
+# 2) Tabla por temporada (metrics_main_by_season.csv) + IC bootstrap
+# ============================================================
+@traced
+def season_table(enc: Encoded, n_boot: int = 2000, alpha: float = 0.05, seed: int = 42,
+                 batch: int = 500) -> pd.DataFrame:
+    """
+    Una fila por temporada con al menos un partido con etiqueta (columnas MAIN_COLS) y,
+    si n_boot > 0, <métrica>_ci_low / <métrica>_ci_high para accuracy, logloss y roi.
+    """
+    A = enc.A[:enc.n_seasoned]
+    t = _row_terms(A)
+    starts = enc.starts
+    lab = t["labeled"]
+    n_lab = _seg_sum(lab.astype(float), starts)
+    n_bets = _seg_sum(t["bet"].astype(float), starts)
+    n_wins = _seg_sum(t["win"].astype(float), starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = pd.DataFrame({
+            "Season": enc.seasons,
+            "accuracy": _seg_sum(t["correct"].astype(float), starts) / n_lab,
+            "logloss": _seg_mean(t["ll"], lab, starts),
+            "brier": _seg_mean(t["brier"], lab, starts),
+            "roi": np.where(n_bets > 0, _seg_sum(t["profit"], starts) / n_bets, np.nan),
+            "n_bets": n_bets.astype(int),
+            "n_wins": n_wins.astype(int),
+            "hit_rate": np.where(n_bets > 0, n_wins / n_bets, np.nan),
+            "avg_odds_win": _seg_nanmean(t["odds_pred"], t["win"], starts),
+            "avg_overround": _seg_nanmean(np.where(np.isfinite(t["overround"]), t["overround"], np.nan),
+                                          t["bet"], starts),
+            "avg_conf": _seg_nanmean(t["conf"], lab, starts),
+            "avg_entropy": _seg_nanmean(t["entropy"], lab, starts),
+            "avg_margin": _seg_nanmean(t["margin"], lab, starts),
+        })
+    keep = n_lab > 0
+    out = out[keep].reset_index(drop=True)
+    if n_boot > 0:
+        ci = bootstrap_ci(enc, t, n_boot=n_boot, alpha=alpha, seed=seed, batch=batch)
+        out = out.merge(ci, on="Season", how="left")
+    out["Season"] = out["Season"].astype("Int64")
+    return out
+
+
+def bootstrap_ci(enc: Encoded, terms: dict | None = None, n_boot: int = 2000, alpha: float = 0.05,
+                 seed: int = 42, batch: int = 500) -> pd.DataFrame:
+    """
+    IC percentil (1-alpha) de accuracy, logloss y ROI por temporada: se remuestrean con
+    reemplazo los partidos con etiqueta de la temporada, `batch` remuestras a la vez con una
+    matriz de índices (batch × n). Misma semilla → mismos intervalos.
+    """
+    A = enc.A[:enc.n_seasoned]
+    t = terms or _row_terms(A)
+    rng = np.random.default_rng(seed)
+    q = [100 * alpha / 2, 100 * (1 - alpha / 2)]
+    rows = []
+    for season, lo, hi in enc.bounds():
+        idx_lab = lo + np.flatnonzero(t["labeled"][lo:hi])
+        n = idx_lab.size
+        rec = {"Season": int(season)}
+        if n == 0:
+            rows.append(rec)
+            continue
+        correct = t["correct"][idx_lab].astype(float)
+        ll = t["ll"][idx_lab]
+        bet = t["bet"][idx_lab].astype(float)
+        profit = t["profit"][idx_lab]
+        acc_b, ll_b, roi_b = [], [], []
+        for b0 in range(0, n_boot, batch):
+            I = rng.integers(0, n, size=(min(batch, n_boot - b0), n))
+            acc_b.append(correct[I].mean(axis=1))
+            ll_b.append(ll[I].mean(axis=1))
+            nb = bet[I].sum(axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                roi_b.append(np.where(nb > 0, profit[I].sum(axis=1) / nb, np.nan))
+        for name, vals in zip(CI_METRICS, (acc_b, ll_b, roi_b)):
+            v = np.concatenate(vals)
+            v = v[np.isfinite(v)]
+            lo_q, hi_q = np.percentile(v, q) if v.size else (np.nan, np.nan)
+            rec[f"{name}_ci_low"], rec[f"{name}_ci_high"] = float(lo_q), float(hi_q)
+        rows.append(rec)
+    cols = ["Season"] + [f"{m}_ci_{s}" for m in CI_METRICS for s in ("low", "high")]
+    return pd.DataFrame(rows, columns=cols)
+
+
+# ============================================================
+# 3) Matrices de confusión (confusion_matrices_by_season.json)
+# ============================================================
+def _confusion_block(M: np.ndarray, support: np.ndarray) -> dict:
+    return {
+        "labels": list(LABELS),
+        "matrix": M.astype(int).tolist(),       # filas = verdaderas (H,D,A), columnas = predichas
+        "support": {lab: int(support[i]) for i, lab in enumerate(LABELS)},
+        "n_scored": int(support.sum()),
+    }
+
+
+@traced
+def confusion_payload(enc: Encoded) -> dict:
+    """Mismo JSON que la celda de matrices de confusión; todas las temporadas con un bincount."""
+    A = enc.A
+    lab = A[:, Y_TRUE] >= 0
+    pair = lab & (A[:, Y_PRED] >= 0)
+    k, g = len(LABELS), len(enc.seasons) + 1
+    seg = np.full(len(A), g - 1)                     # último grupo = sin temporada
+    for i, (_, lo, hi) in enumerate(enc.bounds()):
+        seg[lo:hi] = i
+    yt = A[:, Y_TRUE].clip(0).astype(int)
+    yp = A[:, Y_PRED].clip(0).astype(int)
+    M = np.bincount(((seg * k + yt) * k + yp)[pair], minlength=g * k * k).reshape(g, k, k)
+    support = np.bincount((seg * k + yt)[lab], minlength=g * k).reshape(g, k)
+    by_season = [{"Season": int(s), **_confusion_block(M[i], support[i])}
+                 for i, s in enumerate(enc.seasons) if support[i].sum() > 0]
+    return {
+        "meta": {"row_axis": "y_true", "col_axis": "y_pred", "labels_order": list(LABELS)},
+        "by_season": by_season,
+        "overall": _confusion_block(M.sum(axis=0), support.sum(axis=0)),
+    }
+
+
+# ============================================================
+# 4) Curvas ROC (roc_curves_by_season.json)
+# ============================================================
+def _roc_curves(block: np.ndarray, score: np.ndarray, truth: np.ndarray) -> list[tuple]:
+    """
+    roc_curve(drop_intermediate=True) de sklearn para todos los bloques a la vez:
+    un lexsort (bloque, score descendente), acumulados por tramo y esquinas por bloque.
+    Devuelve [(fpr, tpr, thresholds, auc)] en el orden de bloque.
+    """
+    order = np.lexsort((-score, block))
+    b, s, y = block[order], score[order], truth[order].astype(float)
+    n = len(b)
+    new_block = np.r_[True, b[1:] != b[:-1]]
+    starts = np.flatnonzero(new_block)
+    # último índice de cada valor distinto dentro de su bloque (umbral)
+    last = np.r_[(s[1:] != s[:-1]) | new_block[1:], True]
+    cum = np.cumsum(y)
+    base = np.repeat(np.r_[0.0, cum[starts[1:] - 1]], np.diff(np.r_[starts, n]))
+    pos_in_block = np.arange(n) - np.repeat(starts, np.diff(np.r_[starts, n]))
+    tps_all = cum - base
+    fps_all = 1 + pos_in_block - tps_all
+    thr_idx = np.flatnonzero(last)
+    tb = b[thr_idx]
+    bounds = np.flatnonzero(np.r_[True, tb[1:] != tb[:-1], True])
+
+    out = []
+    from sklearn.metrics import auc
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        idx = thr_idx[lo:hi]
+        fps, tps, thr = fps_all[idx], tps_all[idx], s[idx]
+        if len(fps) > 2:
+            keep = np.flatnonzero(np.r_[True, np.logical_or(np.diff(fps, 2), np.diff(tps, 2)), True])
+            fps, tps, thr = fps[keep], tps[keep], thr[keep]
+        tps = np.r_[0, tps]
+        fps = np.r_[0, fps]
+        thr = np.r_[np.inf, thr]
+        fpr = fps / fps[-1] if fps[-1] > 0 else np.repeat(np.nan, fps.shape)
+        tpr = tps / tps[-1] if tps[-1] > 0 else np.repeat(np.nan, tps.shape)
+        out.append((fpr, tpr, thr, auc(fpr, tpr) if len(fpr) > 1 else np.nan))
+    return out
+
+
+def _roc_block(curves: list[tuple], n_scored: int) -> dict:
+    """curves: [H, D, A, micro] → bloque con el formato de _multiclass_roc_block."""
+    def _c(c):
+        fpr, tpr, thr, a = c
+        return {"fpr": fpr.tolist(), "tpr": tpr.tolist(), "thresholds": thr.tolist(),
+                "auc": float(a) if np.isfinite(a) else np.nan}
+    per_class = {lab: _c(curves[j]) for j, lab in enumerate(LABELS)}
+    aucs = [c[3] for c in curves[:len(LABELS)] if np.isfinite(c[3])]
+    macro = float(np.mean(aucs)) if aucs else np.nan
+    return {"per_class": per_class, "micro": _c(curves[len(LABELS)]),
+            "macro_auc": macro if np.isfinite(macro) else np.nan, "n_scored": int(n_scored)}
+
+
+@traced
+def roc_payload(enc: Encoded) -> dict:
+    """
+    Mismo JSON que la celda de ROC + AUC (one-vs-rest por clase, micro y macro AUC),
+    global y por temporada. Filas: etiqueta válida y proba_H/D/A finitas.
+    """
+    A = enc.A
+    P = A[:, P_COLS]
+    ok = (A[:, Y_TRUE] >= 0) & np.isfinite(P).all(axis=1)
+    P = np.clip(P[ok], 0.0, 1.0)
+    row_sums = P.sum(axis=1, keepdims=True)
+    pos = row_sums.squeeze(axis=1) > 0
+    P[pos] = P[pos] / np.clip(row_sums[pos], EPS, None)
+    y = A[ok, Y_TRUE].astype(int)
+    Y = np.zeros_like(P)
+    Y[np.arange(len(y)), y] = 1.0
+
+    k = len(LABELS)
+    seg = np.full(len(A), -1)
+    for i, (_, lo, hi) in enumerate(enc.bounds()):
+        seg[lo:hi] = i
+    seg = seg[ok]
+    n_groups = len(enc.seasons) + 1                     # temporadas + global (último)
+    # bloques: grupo g × (clase 0..k-1, micro = k)
+    blocks, scores, truth = [], [], []
+    for g_rows, g in ((seg >= 0, None), (np.ones(len(seg), dtype=bool), n_groups - 1)):
+        gid = seg[g_rows] if g is None else np.full(int(g_rows.sum()), g)
+        Pg, Yg = P[g_rows], Y[g_rows]
+        for j in range(k):
+            blocks.append(gid * (k + 1) + j)
+            scores.append(Pg[:, j])
+            truth.append(Yg[:, j])
+        blocks.append(np.repeat(gid * (k + 1) + k, k))
+        scores.append(Pg.ravel())
+        truth.append(Yg.ravel())
+    block = np.concatenate(blocks)
+    by_block = {}
+    if len(block):
+        curves = _roc_curves(block, np.concatenate(scores), np.concatenate(truth))
+        by_block = dict(zip(np.unique(block).tolist(), curves))
+
+    n_per = np.bincount(seg[seg >= 0], minlength=n_groups)
+    n_per[-1] = len(seg)
+    group_blocks = {g: [by_block[g * (k + 1) + j] for j in range(k + 1)]
+                    for g in range(n_groups) if n_per[g] > 0}
+    # sin ninguna fila puntuable el bloque global queda vacío (curvas sin puntos, AUC NaN)
+    empty = (np.empty(0), np.empty(0), np.empty(0), np.nan)
+    overall = group_blocks.get(n_groups - 1, [empty] * (k + 1))
+    by_season = []
+    for g, s in enumerate(enc.seasons):
+        if g in group_blocks:
+            blk = _roc_block(group_blocks[g], n_per[g])
+            blk["Season"] = int(s)
+            by_season.append(blk)
+    return {
+        "meta": {
+            "labels": list(LABELS),
+            "proba_cols": list(PROBA_COLS),
+            "row_axis": "y_true (one-vs-rest)",
+            "col_axis": "score",
+            "generated_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        },
+        "overall": _roc_block(overall, n_per[-1]),
+        "by_season": by_season,
+    }
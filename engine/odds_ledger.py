@@ -0,0 +1,174 @@
+# engine/odds_ledger.py
+# ============================================================
+# LEDGER DE CUOTAS MANUALES (manual/b365_filled_*.csv → EXTRACCIÓN_DATOS / LIMPIEZA)
+#  Antes, en cada ejecución, load_all_manual_b365 volvía a leer, normalizar (clave temporal
+#  FD) y concatenar TODOS los b365_filled_*.csv (uno más por jornada), y las cuotas se
+#  aplicaban con merge + bucle por columna (LIMPIEZA: iterrows por row_id). Ahora:
+#   - data/02_processed/odds_ledger/ledger.parquet: filas (clave, B365H/D/A, fichero origen)
+#     ya parseadas; una por (clave, fichero), las de ficheros borrados o cambiados se quitan
+#   - odds_ledger/manifest.json: por fichero ingerido su sha256, bytes y filas; sólo se
+#     parsean los CSV nuevos o cuyo hash cambia. `key_version` invalida todo el ledger si
+#     cambian las reglas de la clave
+#   - view(): cuotas vigentes por clave con la misma precedencia de siempre (concat de los
+#     ficheros en orden de nombre + drop_duplicates(keep="last"))
+#   - apply_odds(): una única actualización indexada (get_indexer + asignación por posición)
+#     de las columnas de cuotas de la tabla de partidos
+#  El coste por ronda depende de los ficheros nuevos, no de cuántos se hayan acumulado.
+# ============================================================
+from __future__ import annotations
+
+import glob, hashlib, json, os
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from engine.trace import traced
+
+LEDGER_DIR = Path("data/02_processed/odds_ledger")
+MANIFEST_VERSION = 1
+ODDS_COLS = ["B365H", "B365D", "B365A"]
+SRC_COL = "_src"
+
+
+def file_sha256(path: str | Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class OddsLedger:
+    """
+    Cuotas manuales por `key_col` (p. ej. la clave temporal FD de EXTRACCIÓN). `parse(path)`
+    convierte un CSV en un frame [key_col] + ODDS_COLS; sólo se llama con ficheros nuevos o
+    modificados.
+    """
+
+    def __init__(self, root: str | Path = LEDGER_DIR, key_col: str = "_TMP_KEY_",
+                 key_version: str = "v1", odds_cols=ODDS_COLS):
+        self.root = Path(root)
+        self.key_col = key_col
+        self.key_version = key_version
+        self.odds_cols = list(odds_cols)
+        self.ledger_path = self.root / "ledger.parquet"
+        self.manifest_path = self.root / "manifest.json"
+        self.manifest = self._load_manifest()
+        self.rows = self._load_rows()
+
+    # ---------- estado en disco ----------
+    def _empty(self) -> pd.DataFrame:
+        out = pd.DataFrame({self.key_col: pd.Series(dtype=object), SRC_COL: pd.Series(dtype=object)})
+        for c in self.odds_cols:
+            out[c] = pd.Series(dtype=float)
+        return out[[self.key_col] + self.odds_cols + [SRC_COL]]
+
+    def _load_manifest(self) -> dict:
+        m = None
+        if self.manifest_path.exists():
+            try:
+                m = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                m = None
+        if (not m or m.get("version") != MANIFEST_VERSION or m.get("key_version") != self.key_version
+                or m.get("key_col") != self.key_col):
+            m = {"version": MANIFEST_VERSION, "key_version": self.key_version, "key_col": self.key_col, "files": {}}
+        return m
+
+    def _load_rows(self) -> pd.DataFrame:
+        if not self.manifest["files"] or not self.ledger_path.exists():
+            self.manifest["files"] = {}
+            return self._empty()
+        rows = pd.read_parquet(self.ledger_path)
+        if set(rows.columns) != set(self._empty().columns):
+            self.manifest["files"] = {}
+            return self._empty()
+        return rows
+
+    def _save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.ledger_path.with_suffix(".parquet.tmp")
+        self.rows.to_parquet(tmp, index=False)
+        os.replace(tmp, self.ledger_path)
+        self.manifest["updated_at"] = datetime.now().isoformat(timespec="seconds")
+        tmp = self.manifest_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(self.manifest, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+
+    # ---------- ingesta ----------
+    @traced
+    def sync(self, paths, parse: Callable[[str], pd.DataFrame]) -> dict:
+        """
+        Deja el ledger igual a `paths` (la lista actual de CSV): ingiere los nuevos o cambiados,
+        quita los que ya no están. Devuelve {"new", "changed", "removed", "unchanged", "rows"}.
+        """
+        paths = sorted(str(p) for p in paths)
+        files = self.manifest["files"]
+        names = {Path(p).name: p for p in paths}
+        report = {"new": [], "changed": [], "removed": sorted(set(files) - set(names)), "unchanged": 0}
+        fresh, drop = [], set(report["removed"])
+        for name, p in names.items():
+            digest = file_sha256(p)
+            if files.get(name, {}).get("sha256") == digest:
+                report["unchanged"] += 1
+                continue
+            report["changed" if name in files else "new"].append(name)
+            drop.add(name)
+            part = parse(p)
+            part = part[[self.key_col] + self.odds_cols].copy()
+            part[self.key_col] = part[self.key_col].astype(str)
+            for c in self.odds_cols:
+                part[c] = pd.to_numeric(part[c], errors="coerce").astype(float)
+            part = part.drop_duplicates(self.key_col, keep="last")      # última fila del fichero
+            part[SRC_COL] = name
+            fresh.append(part)
+            files[name] = {"sha256": digest, "bytes": os.path.getsize(p), "rows": int(len(part)),
+                           "ingested_at": datetime.now().isoformat(timespec="seconds")}
+        for name in report["removed"]:
+            files.pop(name, None)
+        if drop or fresh:
+            keep = self.rows[~self.rows[SRC_COL].isin(drop)]
+            self.rows = pd.concat([keep] + fresh, ignore_index=True) if fresh else keep.reset_index(drop=True)
+            self._save()
+        report["rows"] = int(len(self.rows))
+        return report
+
+    def sync_glob(self, manual_dir: str | Path, pattern: str, parse: Callable[[str], pd.DataFrame]) -> dict:
+        return self.sync(glob.glob(str(Path(manual_dir) / pattern)), parse)
+
+    # ---------- lectura ----------
+    def view(self) -> pd.DataFrame:
+        """[key_col] + ODDS_COLS vigentes: el fichero de nombre mayor manda (= concat ordenado + keep last)."""
+        v = self.rows.sort_values(SRC_COL, kind="mergesort").drop_duplicates(self.key_col, keep="last")
+        return v[[self.key_col] + self.odds_cols].reset_index(drop=True)
+
+
+# ============================================================
+# Aplicación vectorizada de cuotas
+# ============================================================
+def apply_odds(frame: pd.DataFrame, odds: pd.DataFrame, key_col: str, cols=ODDS_COLS,
+               frame_key: pd.Series | np.ndarray | None = None) -> tuple[pd.DataFrame, np.ndarray, dict]:
+    """
+    Escribe en `frame` (en sitio) las cuotas no nulas de `odds` (clave única `key_col`) en las
+    filas cuya clave coincide. `frame_key` sustituye a frame[key_col] (p. ej. posiciones).
+    Devuelve (frame, máscara de filas con clave en `odds`, nº de valores escritos por columna).
+    """
+    keys = frame[key_col] if frame_key is None else frame_key
+    odds = odds.drop_duplicates(key_col, keep="last")
+    pos = pd.Index(odds[key_col]).get_indexer(pd.Index(keys))
+    hit = pos >= 0
+    rows = np.flatnonzero(hit)
+    vals = odds[list(cols)].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)[pos[hit]]
+    applied = {}
+    for j, c in enumerate(cols):
+        if c not in frame.columns:
+            frame[c] = np.nan
+        col = pd.to_numeric(frame[c], errors="coerce").to_numpy(dtype=float, copy=True)
+        ok = ~np.isnan(vals[:, j])
+        col[rows[ok]] = vals[ok, j]
+        frame[c] = col
+        applied[c] = int(ok.sum())
+    return frame, hit, applied
@@ -0,0 +1,192 @@
+# engine/outputs_store.py
+# ============================================================
+# ALMACÉN COLUMNAR DE outputs/ (MODELOS → cumprofit / verify_outputs)
+#  MODELOS escribía sólo CSV/JSON por temporada (matchlogs_{s}.csv, metrics_*_by_season.csv…)
+#  y los scripts posteriores los volvían a encontrar con glob + regex y a parsear como texto.
+#  Ahora los exportadores escriben además un dataset Parquet:
+#   data/05_store/artifact=<artefacto>/season=<temporada>/part-0.parquet
+#   data/05_store/manifest.json: por partición filas, esquema (columna, tipo), hash del
+#   contenido y bytes; por fichero JSON registrado, hash y bytes
+#  Vive fuera de outputs/ porque outputs/ se publica tal cual en el repo B.
+#  Los CSV/JSON se siguen escribiendo igual: son vistas derivadas para la web.
+#  - write(): sólo reescribe las particiones cuyo contenido cambia (hash del stream Arrow)
+#  - read(): poda de columnas + filtro por temporada (particiones) y por filas (pushdown)
+#  - el manifest basta para conocer temporadas, filas y columnas sin abrir los datos
+# ============================================================
+from __future__ import annotations
+
+import hashlib, json, os
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from engine.trace import traced
+
+STORE_DIR = Path("data") / "05_store"
+MANIFEST_VERSION = 1
+PART_FILE = "part-0.parquet"
+
+
+def _sha256_table(table: pa.Table) -> str:
+    """Hash del contenido (stream IPC de Arrow): no depende de metadatos del fichero Parquet."""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema.remove_metadata()) as w:
+        w.write_table(table.replace_schema_metadata(None))
+    return hashlib.sha256(sink.getvalue()).hexdigest()
+
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _canonical(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tipos del almacén independientes de cómo se cargó df en memoria (engine/schema.lean):
+    categóricas → sus valores, enteros → int64 / Int64, float32 → float64.
+    """
+    cast = {}
+    for c, dt in df.dtypes.items():
+        if isinstance(dt, pd.CategoricalDtype):
+            cast[c] = dt.categories.dtype
+        elif isinstance(dt, pd.api.extensions.ExtensionDtype):
+            if pd.api.types.is_signed_integer_dtype(dt) and dt != "Int64":
+                cast[c] = "Int64"
+        elif pd.api.types.is_signed_integer_dtype(dt) and dt != np.int64:
+            cast[c] = np.int64
+        elif dt == np.float32:
+            cast[c] = np.float64
+    return df.astype(cast) if cast else df
+
+
+def _to_table(df: pd.DataFrame) -> pa.Table:
+    """DataFrame → Arrow; columnas object con tipos mezclados se guardan como texto."""
+    df = _canonical(df)
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        obj = df.select_dtypes(include="object").columns
+        return pa.Table.from_pandas(df.astype({c: "string" for c in obj}), preserve_index=False)
+
+
+class OutputsStore:
+    def __init__(self, root: str | Path = STORE_DIR):
+        self.root = Path(root)
+        self.manifest_path = self.root / "manifest.json"
+        self._manifest: dict | None = None
+
+    # ---------- manifest ----------
+    def manifest(self) -> dict:
+        if self._manifest is None:
+            m = None
+            if self.manifest_path.exists():
+                try:
+                    m = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    m = None
+            if not m or m.get("version") != MANIFEST_VERSION:
+                m = {"version": MANIFEST_VERSION, "partitions": {}, "files": {}}
+            self._manifest = m
+        return self._manifest
+
+    def _save_manifest(self):
+        m = self.manifest()
+        m["updated_at"] = datetime.now().isoformat(timespec="seconds")
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(m, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+
+    def partitions(self, artifact: str | None = None) -> list[dict]:
+        parts = self.manifest()["partitions"].values()
+        return sorted((p for p in parts if artifact is None or p["artifact"] == artifact),
+                      key=lambda p: (p["artifact"], p["season"]))
+
+    def has(self, artifact: str) -> bool:
+        return any(p["artifact"] == artifact for p in self.manifest()["partitions"].values())
+
+    def seasons(self, artifact: str) -> list[int]:
+        return [p["season"] for p in self.partitions(artifact)]
+
+    def columns(self, artifact: str, season: int) -> list[str]:
+        """Columnas de la partición tal y como se escribió (ausente ≠ columna toda nula)."""
+        p = self.manifest()["partitions"].get(f"{artifact}/{season}")
+        return [c for c, _ in p["schema"]] if p else []
+
+    # ---------- escritura ----------
+    def _path(self, artifact: str, season: int) -> Path:
+        return self.root / f"artifact={artifact}" / f"season={season}" / PART_FILE
+
+    @traced
+    def write(self, artifact: str, df: pd.DataFrame, season_col: str = "Season") -> list[int]:
+        """
+        Una partición por temporada de `df` (las filas sin temporada se descartan, como en los
+        CSV por temporada). Sólo se reescriben las que cambian; devuelve las temporadas escritas.
+        """
+        seasons = pd.to_numeric(df[season_col], errors="coerce")
+        written = []
+        parts = self.manifest()["partitions"]
+        for season, part in df[seasons.notna()].groupby(seasons[seasons.notna()].astype(int), sort=True):
+            season = int(season)
+            table = _to_table(part.reset_index(drop=True))
+            digest = _sha256_table(table)
+            key = f"{artifact}/{season}"
+            path = self._path(artifact, season)
+            if parts.get(key, {}).get("sha256") == digest and path.exists():
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".parquet.tmp")
+            pq.write_table(table, tmp)
+            os.replace(tmp, path)
+            parts[key] = {
+                "artifact": artifact, "season": season,
+                "path": str(path.relative_to(self.root)),
+                "rows": table.num_rows,
+                "schema": [[f.name, str(f.type)] for f in table.schema],
+                "sha256": digest, "bytes": path.stat().st_size,
+                "written_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            written.append(season)
+        if written:
+            self._save_manifest()
+        return written
+
+    def add_file(self, path: str | Path, name: str | None = None):
+        """Registra un fichero (JSON, etc.) en el manifest: hash y bytes, para verificar sin abrirlo."""
+        path = Path(path)
+        self.manifest()["files"][name or path.name] = {
+            "path": str(path), "sha256": _sha256_file(path), "bytes": path.stat().st_size,
+            "written_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        self._save_manifest()
+
+    # ---------- lectura ----------
+    @traced
+    def read(self, artifact: str, columns: list[str] | None = None, seasons: list[int] | None = None,
+             where: ds.Expression | None = None) -> pd.DataFrame:
+        """
+        Filas de `artifact`. Sólo se abren las particiones de `seasons` (el manifest dice cuáles);
+        `columns` poda columnas y `where` (expresión de pyarrow.dataset) se empuja al lector.
+        Las columnas que faltan en alguna temporada salen nulas.
+        """
+        wanted = None if seasons is None else {int(s) for s in seasons}
+        parts = [p for p in self.partitions(artifact) if wanted is None or p["season"] in wanted]
+        if not parts:
+            return pd.DataFrame(columns=columns or [])
+        files = [str(self.root / p["path"]) for p in parts]
+        if len(files) == 1:     # una temporada: lector directo, sin montar el dataset
+            names = {c for c, _ in parts[0]["schema"]}
+            cols = None if columns is None else [c for c in columns if c in names]
+            return pq.read_table(files[0], columns=cols, filters=where).to_pandas()
+        schema = pa.unify_schemas([pq.read_schema(f) for f in files], promote_options="permissive")
+        dataset = ds.dataset(files, schema=schema, format="parquet")
+        cols = None if columns is None else [c for c in columns if c in schema.names]
+        return dataset.to_table(columns=cols, filter=where).to_pandas()
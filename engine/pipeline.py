@@ -0,0 +1,457 @@
+# engine/pipeline.py
+# ============================================================
+# PIPELINE EN PROCESO (sin kernels de Jupyter)
+#  Etapas importables que se pasan los DataFrames en memoria:
+#    extract        → EXTRACCIÓN_DATOS (descargas externas)
+#    clean_features → LIMPIEZA_Y_CREACION_DE_VARS (df_new_features)
+#    preprocess     → engine/match_features.preprocess (la función a la que llama PREPROCESADO)
+#    model          → MODELOS (predicciones, métricas, matchlogs, radar)
+#    export         → curvas cumprofit (+ backtest de estrategias de stake) + verify_outputs
+#  Las etapas de notebook ejecutan sus celdas de código en este proceso (un namespace por
+#  notebook, como un kernel nuevo) con los parámetros de papermill precargados. No hay
+#  arranque de kernel ni guardado del .ipynb tras cada celda, y los parquet que escribe una
+#  etapa se sirven desde memoria a las siguientes (ArtifactStore: los notebooks reciben sus
+#  ganchos READ_PARQUET / WRITE_PARQUET, sin parchear pandas).
+#  El camino papermill (run_notebook_papermill, scripts/run_stage*.py) queda para depurar.
+#  Con un tracer activo (engine/trace.py) cada etapa, celda de notebook y script de export
+#  es un span de la traza de la ejecución.
+#  CLI: scripts/run_pipeline.py
+# ============================================================
+from __future__ import annotations
+
+import json, os, runpy, sys, time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pandas as pd
+
+from engine.stage_cache import ENGINE_DIR, engine_code
+from engine.trace import span
+
+NOTEBOOKS_DIR = Path("notebooks")
+EXECUTED_DIR = Path("artifacts/executed")
+
+NB_EXTRACT = "EXTRACCIÓN_DATOS.ipynb"
+NB_CLEAN = "LIMPIEZA_Y_CREACION_DE_VARS.ipynb"
+NB_PREPROC = "PREPROCESADO.ipynb"
+NB_MODEL = "MODELOS.ipynb"
+
+# Artefactos entre etapas
+PQ_EXTRACT = Path("data/02_processed/fd_xg_elo_transfermarkt_2005_2025.parquet")
+PQ_NEW_FEATURES = Path("data/02_processed/df_new_features.parquet")
+PQ_FINAL = Path("data/03_features/df_final.parquet")
+STATE_DIR = PQ_FINAL.parent / "state"
+
+# Entradas/salidas declaradas por etapa (caché por huella: engine/stage_cache.py)
+CLEAN_INPUTS = (
+    "data/02_processed/fd_xg_elo_transfermarkt_wk_2005_2025.parquet",
+    "data/02_processed/wk_actualizado_2005_2025.parquet",
+    "data/02_processed/wk_2005_2025.parquet",
+    "data/02_processed/clubelo/season_*.parquet",
+    "manual/b365_filled_{RUN_DATE}.csv",
+    "manual/plantilla_bet365.csv",
+)
+CLEAN_OUTPUTS = ("data/02_processed/df_clean_vars.parquet", str(PQ_NEW_FEATURES))
+# Código de cada etapa: cierre de los imports engine.* de su notebook (y de lo que la
+# versión en proceso llama directamente); ver engine/stage_cache.engine_code
+_NB_SRC = ENGINE_DIR.parent / NOTEBOOKS_DIR
+CLEAN_CODE = engine_code(_NB_SRC / NB_CLEAN)
+TEMPLATE_OUTPUTS = ("manual/b365_template_{RUN_DATE}.csv",)
+PREPROC_INPUTS = (str(PQ_NEW_FEATURES),)
+PREPROC_CODE = engine_code(_NB_SRC / NB_PREPROC, ENGINE_DIR / "incremental.py", ENGINE_DIR / "match_features.py")
+# MODELOS también lee (celda 53, simulación de temporada) los goles de df_new_features, el
+# calendario wk_* y el registro de equipos/alias; canon.save() reescribe estos dos últimos
+TEAM_FILES = ("data/02_processed/team_ids.json", "data/02_processed/team_aliases.json")
+MODEL_INPUTS = (
+    str(PQ_FINAL),
+    str(PQ_NEW_FEATURES),
+    "data/02_processed/wk_actualizado_2005_2025.parquet",
+    "data/02_processed/wk_2005_2025.parquet",
+    *TEAM_FILES,
+)
+MODEL_OUTPUTS = (
+    "outputs/future_predictions_*",
+    "outputs/metrics_*",
+    "outputs/confusion_matrices_by_season.json",
+    "outputs/classification_report_by_season.csv",
+    "outputs/roc_curves_by_season.json",
+    "outputs/matchlogs_*.csv",
+    "outputs/season_sim_*.csv",
+    "outputs/radar_prematch/*",
+    "data/04_models/logit_{RUN_DATE}.joblib",
+    *TEAM_FILES,
+)
+MODEL_CODE = engine_code(_NB_SRC / NB_MODEL)
+EXPORT_SCRIPTS = ("scripts/build_cumprofit_curves_from_matchlogs.py", "scripts/verify_outputs.py")
+
+
+class NotebookCellError(RuntimeError):
+    """Fallo en una celda de un notebook ejecutado en proceso."""
+
+
+# ============================================================
+# 1) Parquet en memoria entre etapas
+# ============================================================
+def _as_read_back(df: pd.DataFrame) -> pd.DataFrame | None:
+    """
+    DataFrame tal y como lo devolvería pd.read_parquet tras to_parquet(index=False), o None
+    si no se puede garantizar. Admite numéricos/bool/datetime64[ns]/nullable y object de str
+    (los nulos de esas columnas vuelven como None).
+    """
+    if not all(isinstance(c, str) for c in df.columns) or df.columns.has_duplicates:
+        return None
+    out = df.reset_index(drop=True).copy()
+    for c in out.columns:
+        s = out[c]
+        dt = s.dtype
+        if isinstance(dt, pd.CategoricalDtype):
+            return None
+        if dt == object:
+            if pd.api.types.infer_dtype(s, skipna=True) not in ("string", "empty"):
+                return None
+            if s.isna().any():
+                out[c] = s.astype(object).where(s.notna(), None)
+        elif pd.api.types.is_datetime64_any_dtype(dt):
+            if str(dt) != "datetime64[ns]":
+                return None
+        elif not (pd.api.types.is_numeric_dtype(dt) or pd.api.types.is_bool_dtype(dt)
+                  or pd.api.types.is_string_dtype(dt)):
+            return None
+    return out
+
+
+class ArtifactStore:
+    """
+    Copia en memoria de los parquet escritos durante la ejecución. read() de una ruta escrita
+    con write() en este proceso —y no modificada después en disco— devuelve una copia del
+    DataFrame sin decodificar el fichero. Los ficheros se siguen escribiendo en disco (CI,
+    caché de etapas, verify_outputs). No toca pandas: los notebooks reciben read/write como
+    READ_PARQUET / WRITE_PARQUET en su namespace (hooks()) y el resto del proceso lee de disco.
+    """
+
+    def __init__(self):
+        self.frames: dict[str, tuple[pd.DataFrame, tuple[int, int]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(path) -> str | None:
+        if isinstance(path, (str, os.PathLike)):
+            return os.path.abspath(os.fspath(path))
+        return None
+
+    @staticmethod
+    def _stamp(key: str) -> tuple[int, int] | None:
+        try:
+            st = os.stat(key)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def put(self, path, df: pd.DataFrame):
+        key = self._key(path)
+        stamp = self._stamp(key) if key else None
+        if key is None or stamp is None:
+            return
+        read_back = _as_read_back(df)
+        if read_back is not None:
+            self.frames[key] = (read_back, stamp)
+        else:
+            self.frames.pop(key, None)
+
+    def get(self, path, columns=None) -> pd.DataFrame | None:
+        key = self._key(path)
+        entry = self.frames.get(key) if key else None
+        if entry is None or self._stamp(key) != entry[1]:
+            self.misses += 1
+            return None
+        df = entry[0]
+        if columns is not None:
+            if any(c not in df.columns for c in columns):
+                return None
+            df = df[list(columns)]
+        self.hits += 1
+        return df.copy()
+
+    def read(self, path, columns=None) -> pd.DataFrame:
+        """pd.read_parquet(path, columns=...), desde memoria si la ruta la escribió write()."""
+        df = self.get(path, columns)
+        return df if df is not None else pd.read_parquet(path, columns=columns)
+
+    def write(self, df: pd.DataFrame, path):
+        """df.to_parquet(path, index=False) y copia en memoria para las lecturas siguientes."""
+        df.to_parquet(path, index=False)
+        self.put(path, df)
+
+    def hooks(self) -> dict:
+        """Ganchos de IO para el namespace de los notebooks (los usan sus load_*/save_*)."""
+        return {"READ_PARQUET": self.read, "WRITE_PARQUET": self.write}
+
+
+# ============================================================
+# 2) Ejecución de notebooks
+# ============================================================
+def _code_cells(nb_path: Path) -> list[str]:
+    nb = json.loads(nb_path.read_text(encoding="utf-8"))
+    return [''.join(c.get("source", [])) for c in nb["cells"] if c.get("cell_type") == "code"]
+
+
+def _strip_magics(src: str) -> str:
+    """Las líneas !shell / %magic no tienen sentido fuera de IPython (las deps vienen de requirements.txt)."""
+    lines = []
+    for line in src.splitlines():
+        s = line.lstrip()
+        if s.startswith(("!", "%")):
+            line = line[: len(line) - len(s)] + f"pass  # [inprocess] omitido: {s}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _display(*objs, **kwargs):
+    for o in objs:
+        if isinstance(o, (pd.DataFrame, pd.Series)):
+            print(o.head(10).to_string())
+        else:
+            print(o)
+
+
+def run_notebook_inprocess(nb_name: str, params: dict | None = None, notebooks_dir: Path = NOTEBOOKS_DIR,
+                           hooks: dict | None = None) -> dict:
+    """
+    Ejecuta las celdas de código del notebook en un namespace nuevo con `params` precargados
+    (equivalente a la celda de parámetros que inyecta papermill) y los ganchos de IO `hooks`
+    (ArtifactStore.hooks; sin ellos el notebook lee y escribe en disco). Igual que con papermill,
+    un SystemExit (p.ej. make_template) detiene el notebook sin error.
+    Devuelve el namespace final y marca '__stopped_at__' / '__timings__'.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    t0 = time.perf_counter()
+    nb_path = Path(notebooks_dir) / nb_name
+    cells = _code_cells(nb_path)
+    ns = {"__name__": "__main__", "display": _display, **(hooks or {}), **(params or {})}
+    startup = time.perf_counter() - t0
+    stopped_at = None
+    print(f"\n=== Ejecutando (en proceso): {nb_name} · {len(cells)} celdas ===")
+    try:
+        for i, src in enumerate(cells):
+            code = compile(_strip_magics(src), f"<{nb_name}:celda {i}>", "exec")
+            try:
+                with span(f"{nb_name}:celda {i}", cat="cell", notebook=nb_name, cell=i):
+                    exec(code, ns)
+            except SystemExit as e:
+                stopped_at = i
+                print(f"[i] {nb_name}: SystemExit({e.code}) en la celda {i}; fin del notebook.")
+                break
+            except Exception as e:
+                raise NotebookCellError(f"{nb_name}: celda {i} falló: {type(e).__name__}: {e}") from e
+    finally:
+        plt.close("all")
+    ns["__stopped_at__"] = stopped_at
+    ns["__timings__"] = {"startup_s": round(startup, 4), "total_s": round(time.perf_counter() - t0, 3)}
+    return ns
+
+
+def run_notebook_papermill(nb_name: str, params: dict | None = None, notebooks_dir: Path = NOTEBOOKS_DIR) -> dict:
+    """Camino clásico (un kernel por notebook, guardado por celda). Sólo para depurar."""
+    import papermill as pm
+
+    EXECUTED_DIR.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    print(f"\n=== Ejecutando (papermill): {nb_name} ===")
+    pm.execute_notebook(
+        input_path=str(Path(notebooks_dir) / nb_name),
+        output_path=str(EXECUTED_DIR / nb_name),
+        parameters=params or {},
+        request_save_on_cell_execute=True,
+        kernel_name="python3",
+    )
+    return {"__timings__": {"total_s": round(time.perf_counter() - t0, 3)}}
+
+
+# ============================================================
+# 3) Contexto + etapas
+# ============================================================
+@dataclass
+class PipelineContext:
+    run_date: str
+    engine: str = "inprocess"                  # "inprocess" | "papermill"
+    incremental: bool = False
+    store: ArtifactStore = field(default_factory=ArtifactStore)
+    timings: list = field(default_factory=list)
+
+    def run_notebook(self, stage: str, nb_name: str, params: dict) -> dict:
+        with span(stage, cat="stage", notebook=nb_name, engine=self.engine):
+            if self.engine == "inprocess":
+                ns = run_notebook_inprocess(nb_name, params, hooks=self.store.hooks())
+            else:
+                ns = run_notebook_papermill(nb_name, params)
+        self.timings.append({"stage": stage, "engine": self.engine, "notebook": nb_name, **ns["__timings__"]})
+        return ns
+
+    def timed(self, stage: str, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        with span(stage, cat="stage", engine="python") as sp:
+            out = fn(*args, **kwargs)
+            sp.set(rows=len(out) if isinstance(out, pd.DataFrame) else None)
+        self.timings.append({"stage": stage, "engine": "python", "total_s": round(time.perf_counter() - t0, 3)})
+        return out
+
+
+def _read_artifact(ctx: PipelineContext, path: Path) -> pd.DataFrame | None:
+    """Artefacto de una etapa tal y como lo leería la siguiente (memoria si es exacto, si no disco)."""
+    return ctx.store.read(path) if path.exists() else None
+
+
+def extract(ctx: PipelineContext) -> None:
+    """EXTRACCIÓN_DATOS: descarga y une football-data/xG/Elo/Transfermarkt/semanas."""
+    ctx.run_notebook("extract", NB_EXTRACT, {})
+
+
+def clean_features(ctx: PipelineContext, mode: str = "consume") -> pd.DataFrame | None:
+    """
+    LIMPIEZA_Y_CREACION_DE_VARS. Devuelve df_new_features, o None si el notebook se detuvo
+    antes (make_template). Con ctx.incremental las features salen del estado por equipo y
+    queda preparado el plan que aplica preprocess.
+    """
+    params = {"MODE": mode, "RUN_DATE": ctx.run_date}
+    if ctx.incremental:
+        params["INCREMENTAL"] = True
+    ns = ctx.run_notebook("clean_features", NB_CLEAN, params)
+    if ns.get("__stopped_at__") is not None:
+        return None
+    return _read_artifact(ctx, PQ_NEW_FEATURES)
+
+
+def preprocess(ctx: PipelineContext, df_new: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    PREPROCESADO → df_final.parquet. El notebook sólo documenta y llama a
+    engine.match_features.preprocess (o a engine.incremental.patch_df_final si LIMPIEZA preparó
+    un plan incremental), así que en proceso se llama directamente (sin los diagnósticos ni la
+    relectura del parquet); con engine=papermill ejecuta el notebook.
+    """
+    from engine.incremental import FeatureState, patch_df_final
+
+    if ctx.engine != "inprocess":
+        ctx.run_notebook("preprocess", NB_PREPROC, {"RUN_DATE": ctx.run_date})
+        return pd.read_parquet(PQ_FINAL)
+
+    from engine.match_features import preprocess as _preprocess
+
+    def _run():
+        src = df_new if df_new is not None else ctx.store.read(PQ_NEW_FEATURES)
+        state = FeatureState(STATE_DIR)
+        inc = patch_df_final(src, PQ_FINAL, state)
+        if inc["applied"]:
+            print(f"✅ df_final parcheado en incremental · recalculadas={inc['n_patched']} · {inc['elapsed_s']}s")
+            out = inc["df_final"]
+        else:
+            out = _preprocess(src)
+        PQ_FINAL.parent.mkdir(parents=True, exist_ok=True)
+        ctx.store.write(out, PQ_FINAL)
+        print(f"Guardado: {PQ_FINAL} · filas={len(out):,} · cols={out.shape[1]}")
+        state.commit(PQ_FINAL, run_date=ctx.run_date, features=src)
+        return out
+
+    return ctx.timed("preprocess", _run)
+
+
+def run_stage1(ctx: PipelineContext, cache=None, skip_extract: bool = False):
+    """Stage 1: extract → clean_features(make_template). Crea manual/b365_template_{RUN_DATE}.csv."""
+    from engine.stage_cache import Stage
+
+    if not skip_extract:
+        extract(ctx)
+    stage = Stage("limpieza_template", NB_CLEAN, inputs=CLEAN_INPUTS[:3], outputs=TEMPLATE_OUTPUTS,
+                  params={"MODE": "make_template", "RUN_DATE": ctx.run_date}, code=CLEAN_CODE)
+    _cached(cache, stage, lambda: clean_features(ctx, mode="make_template"))
+
+
+def run_stage2(ctx: PipelineContext, cache=None, force_extract: bool = False,
+               stages: tuple[str, ...] = ("clean_features", "preprocess", "model", "export")):
+    """
+    Stage 2: [extract si falta su parquet] → clean_features(consume) → preprocess → model → export.
+    Con cache (StageCache) cada etapa de notebook se salta si su huella no cambió.
+    """
+    from engine.stage_cache import Stage
+
+    if force_extract or ("clean_features" in stages and not PQ_EXTRACT.exists()):
+        print(f"[i] {PQ_EXTRACT} no existe (o forzado). Ejecutando extract.")
+        extract(ctx)
+
+    df_new = None
+    if "clean_features" in stages:
+        params = {"MODE": "consume", "RUN_DATE": ctx.run_date, **({"INCREMENTAL": True} if ctx.incremental else {})}
+        stage = Stage("limpieza", NB_CLEAN, inputs=CLEAN_INPUTS, outputs=CLEAN_OUTPUTS, params=params, code=CLEAN_CODE)
+        df_new = _cached(cache, stage, lambda: clean_features(ctx, mode="consume"))
+
+    df_final = None
+    if "preprocess" in stages:
+        stage = Stage("preprocesado", NB_PREPROC, inputs=PREPROC_INPUTS, outputs=(str(PQ_FINAL),),
+                      params={"RUN_DATE": ctx.run_date}, deps=("limpieza",) if "clean_features" in stages else (),
+                      code=PREPROC_CODE)
+        df_final = _cached(cache, stage, lambda: preprocess(ctx, df_new))
+
+    if not PQ_FINAL.exists():
+        raise FileNotFoundError(f"MODELOS requiere {PQ_FINAL}, pero no existe tras preprocess.")
+
+    if "model" in stages:
+        stage = Stage("modelos", NB_MODEL, inputs=MODEL_INPUTS, outputs=MODEL_OUTPUTS,
+                      params={"RUN_DATE": ctx.run_date}, code=MODEL_CODE)
+        _cached(cache, stage, lambda: model(ctx, df_final))
+
+    if "export" in stages:
+        export(ctx)
+
+
+def _cached(cache, stage, fn):
+    """Ejecuta fn a través de la caché de etapas (si hay). Devuelve su resultado o None si se saltó."""
+    if cache is None:
+        return fn()
+    result = {}
+    cache.run(stage, lambda st: result.setdefault("out", fn()))
+    return result.get("out")
+
+
+def model(ctx: PipelineContext, df_final: pd.DataFrame | None = None) -> dict:
+    """MODELOS: lee df_final (en memoria si lo escribió preprocess) y escribe outputs/."""
+    if df_final is not None and ctx.store.get(PQ_FINAL) is None:
+        ctx.store.put(PQ_FINAL, df_final)
+    return ctx.run_notebook("model", NB_MODEL, {"RUN_DATE": ctx.run_date})
+
+
+def export(ctx: PipelineContext, scripts: tuple[str, ...] = EXPORT_SCRIPTS):
+    """Curvas cumprofit + verificación de outputs/ (mismos scripts que el workflow)."""
+    for script in scripts:
+        t0 = time.perf_counter()
+        print(f"\n=== Ejecutando (en proceso): {script} ===")
+        argv, sys.argv = sys.argv, [script]       # el script no debe ver los argumentos del runner
+        try:
+            with span(f"export:{Path(script).name}", cat="stage", script=script):
+                runpy.run_path(script, run_name="__main__")
+        except SystemExit as e:
+            if e.code not in (0, None):
+                raise
+        finally:
+            sys.argv = argv
+        ctx.timings.append({"stage": "export", "engine": "python", "script": script,
+                            "total_s": round(time.perf_counter() - t0, 3)})
+
+
+def save_timings(ctx: PipelineContext, label: str, out_dir: Path = Path("artifacts/pipeline")) -> Path:
+    """Añade las tiempos de esta ejecución a artifacts/pipeline/timings.json."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / "timings.json"
+    runs = json.loads(path.read_text(encoding="utf-8")) if path.exists() else []
+    runs.append({
+        "label": label,
+        "engine": ctx.engine,
+        "run_date": ctx.run_date,
+        "stages": ctx.timings,
+        "total_s": round(sum(t["total_s"] for t in ctx.timings), 3),
+        "parquet_memory_hits": ctx.store.hits,
+    })
+    path.write_text(json.dumps(runs, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
@@ -0,0 +1,316 @@
+# engine/radar.py
+# ============================================================
+# EXPORTADOR radar_prematch (MODELOS.ipynb, última celda → outputs/radar_prematch/)
+#  Antes: df_final.parquet entero en memoria, match_id con apply(axis=1), cada *_norm con
+#  .map(lambda) y cada radar_prematch_{SEASON}.csv reescrito desde cero en cada ronda
+#  (concat con todo lo anterior + sort + drop_duplicates). Ahora:
+#   - load_futures(): sólo las columnas clave + las de RADAR_METRICS y barras (poda de
+#     columnas en el Parquet) y filtro Date >= hoy empujado al lector si Date es timestamp
+#   - build_radar_frame(): match_id y todas las *_norm con operaciones de columna
+#   - upsert_season(): por (match_id, norm_version) sólo se tocan las filas nuevas o cuyo
+#     contenido cambia (se compara el texto CSV, sin generated_at/schema_path); las demás
+#     se quedan byte a byte. Sin cambios no se escribe; sólo altas → append al CSV.
+#  Coste proporcional a los partidos de la ronda, no al histórico.
+# ============================================================
+from __future__ import annotations
+
+import io, json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from engine.trace import traced
+
+NORM_VERSION = "radar_v1.0"
+KEY_COLS = ["match_id", "norm_version"]
+VOLATILE_COLS = ("generated_at", "schema_path")   # no cuentan como cambio de contenido
+
+# RADAR: 8 ejes (normalización fija a [0,1])
+RADAR_METRICS = {
+    "xG7": ("home_avg_xg_last7", "away_avg_xg_last7"),                              # 0–4
+    "OnTarget7": ("home_avg_shotsontarget_last7", "away_avg_shotsontarget_last7"),  # 0–12
+    "Corners7": ("home_avg_corners_last7", "away_avg_corners_last7"),               # 0–12
+    "Effectiveness": ("home_effectiveness", "away_effectiveness"),                  # 0–1
+    "FormPts6": ("home_form_points_6", "away_form_points_6"),                       # 0–18
+    "FormGD6": ("home_form_gd_6", "away_form_gd_6"),                                # -10–10
+    "Elo": ("h_elo", "a_elo"),                                                      # 1450–2150
+    "RelPerf": ("home_relative_perf", "away_relative_perf"),                        # 0–2
+}
+RADAR_RANGES = {
+    "xG7": (0.0, 4.0),
+    "OnTarget7": (0.0, 12.0),
+    "Corners7": (0.0, 12.0),
+    "Effectiveness": (0.0, 1.0),
+    "FormPts6": (0.0, 18.0),
+    "FormGD6": (-10.0, 10.0),
+    "Elo": (1450.0, 2150.0),
+    "RelPerf": (0.0, 2.0),
+}
+
+# BARRAS: valores brutos + normalizados (algunos invertidos)
+BARS_RANGES = {
+    "TotalPoints": (0.0, 114.0),    # 38*3
+    "PointsPct": (0.0, 1.0),
+    "Position": (1.0, 20.0),        # invertida
+    "GDCum": (-30.0, 30.0),
+    "Shots7": (0.0, 30.0),
+    "Corners7_bar": (0.0, 12.0),
+    "Fouls7": (5.0, 25.0),          # invertida
+    "Yellows7": (0.0, 5.0),         # invertida
+    "ImpProb": (0.0, 1.0),
+}
+BARS_INVERT = {"Position", "Fouls7", "Yellows7"}
+BARS_RAW_LABEL = {
+    "home_total_points_cum": "TotalPoints", "away_total_points_cum": "TotalPoints",
+    "home_points_pct": "PointsPct", "away_points_pct": "PointsPct",
+    "home_prev_position": "Position", "away_prev_position": "Position",
+    "home_gd_cum": "GDCum", "away_gd_cum": "GDCum",
+    "home_avg_shots_last7": "Shots7", "away_avg_shots_last7": "Shots7",
+    "home_avg_corners_last7": "Corners7_bar", "away_avg_corners_last7": "Corners7_bar",
+    "home_avg_fouls_last7": "Fouls7", "away_avg_fouls_last7": "Fouls7",
+    "home_avg_yellows_last7": "Yellows7", "away_avg_yellows_last7": "Yellows7",
+    "pimp1": "ImpProb", "pimp2": "ImpProb",
+}
+
+ID_COLS = ["Season", "Date", "Matchweek", "HomeTeam_norm", "AwayTeam_norm", "match_id"]
+MARKET_COLS = ["B365H", "B365D", "B365A", "pimp1", "pimpx", "pimp2", "overround"]
+BARS_SOURCE_COLS = ["home_total_matches_prev", "away_total_matches_prev",
+                    "home_total_points_cum", "away_total_points_cum",
+                    "home_prev_position", "away_prev_position",
+                    "home_gd_cum", "away_gd_cum",
+                    "home_avg_shots_last7", "away_avg_shots_last7",
+                    "home_avg_corners_last7", "away_avg_corners_last7",
+                    "home_avg_fouls_last7", "away_avg_fouls_last7",
+                    "home_avg_yellows_last7", "away_avg_yellows_last7",
+                    "pimp1", "pimp2"]
+BARS_RAW_COLS = ["home_total_points_cum", "away_total_points_cum",
+                 "home_points_pct", "away_points_pct",
+                 "home_prev_position", "away_prev_position",
+                 "home_gd_cum", "away_gd_cum",
+                 "home_avg_shots_last7", "away_avg_shots_last7",
+                 "home_avg_corners_last7", "away_avg_corners_last7",
+                 "home_avg_fouls_last7", "away_avg_fouls_last7",
+                 "home_avg_yellows_last7", "away_avg_yellows_last7",
+                 "pimp1", "pimp2", "overround"]
+BARS_NORM_COLS = [f"{c}_norm" for c in BARS_RAW_COLS if c != "overround"]
+ID_MARKET_COLS = ID_COLS + MARKET_COLS + ["has_odds"]
+META_COLS = ["generated_at", "norm_version", "schema_path"]
+
+
+def _dedup(seq):
+    return list(dict.fromkeys(seq))
+
+
+def radar_columns() -> tuple[list[str], list[str]]:
+    raw = [c for pair in RADAR_METRICS.values() for c in pair]
+    return raw, [f"{c}_norm" for c in raw]
+
+
+def final_columns() -> list[str]:
+    """Columnas del CSV, en el orden del exportador original."""
+    raw, norm = radar_columns()
+    return _dedup(ID_MARKET_COLS + raw + norm + BARS_RAW_COLS + BARS_NORM_COLS + META_COLS)
+
+
+def source_columns() -> list[str]:
+    """Columnas de df_final que necesita el exportador (el resto no se lee)."""
+    raw, _ = radar_columns()
+    return _dedup([c for c in ID_COLS if c != "match_id"] + ["season"] + MARKET_COLS + raw + BARS_SOURCE_COLS)
+
+
+def write_schemas(out_dir: Path) -> Path:
+    """Esquemas de normalización (trazabilidad) → radar_prematch/schemas.json."""
+    schema_path = Path(out_dir) / "schemas.json"
+    with open(schema_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "norm_version": NORM_VERSION,
+            "radar_ranges": RADAR_RANGES,
+            "bars_ranges": BARS_RANGES,
+            "bars_invert": sorted(list(BARS_INVERT)),
+        }, f, ensure_ascii=False, indent=2)
+    return schema_path
+
+
+# ============================================================
+# 1) Lectura podada
+# ============================================================
+@traced
+def load_futures(src_path: str | Path, today: pd.Timestamp) -> pd.DataFrame:
+    """
+    Partidos con Date >= today de df_final.parquet, leyendo sólo source_columns().
+    Si Date es timestamp en el Parquet, el filtro se resuelve en el lector (row groups).
+    """
+    import pyarrow.parquet as pq
+    import pyarrow.types as pat
+
+    schema = pq.read_schema(src_path)
+    cols = [c for c in source_columns() if c in schema.names]
+    if "Season" in cols and "season" in cols:
+        cols.remove("season")
+    filters = None
+    if "Date" in schema.names:
+        dtype = schema.field("Date").type
+        if pat.is_timestamp(dtype) and dtype.tz is None:
+            filters = [("Date", ">=", pd.Timestamp(today))]
+    df = pd.read_parquet(src_path, columns=cols, filters=filters).reset_index(drop=True)
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    if "Season" not in df.columns and "season" in df.columns:
+        df = df.rename(columns={"season": "Season"})
+    df["Season"] = pd.to_numeric(df["Season"], errors="coerce").astype("Int64")
+    return df.loc[df["Date"] >= today].reset_index(drop=True)
+
+
+# ============================================================
+# 2) Columnas del radar (vectorizado)
+# ============================================================
+def norm_plan(present=()) -> dict[str, tuple[str, float, float, bool]]:
+    """
+    {col_norm: (col_bruta, lo, hi, invertida)}: radar primero y luego barras, sin pisar un *_norm
+    ya existente (los córners del radar y de barras comparten columna y rango).
+    """
+    plan = {}
+    for label, cols in RADAR_METRICS.items():
+        lo, hi = RADAR_RANGES[label]
+        for c in cols:
+            plan[f"{c}_norm"] = (c, lo, hi, False)
+    for raw, label in BARS_RAW_LABEL.items():
+        if f"{raw}_norm" not in plan and f"{raw}_norm" not in present:
+            lo, hi = BARS_RANGES[label]
+            plan[f"{raw}_norm"] = (raw, lo, hi, label in BARS_INVERT)
+    return plan
+
+
+def _norm_block(X: np.ndarray, lo: np.ndarray, hi: np.ndarray, invert: np.ndarray) -> np.ndarray:
+    """(X - lo) / (hi - lo) recortado a [0, 1] por columna (1 - x en las invertidas); NaN se mantiene."""
+    x = np.clip((X - lo) / (hi - lo + 1e-12), 0, 1)
+    return np.where(invert, 1.0 - x, x)
+
+
+def _points_pct(points: pd.Series, matches: pd.Series) -> pd.Series:
+    points = pd.to_numeric(points, errors="coerce").astype(float)
+    matches = pd.to_numeric(matches, errors="coerce").astype(float)
+    return (points / (3.0 * matches)).where(matches > 0).clip(lower=0.0, upper=1.0)
+
+
+def match_ids(df: pd.DataFrame) -> pd.Series:
+    """{Season}__{YYYY-MM-DD}__{home}__{away} (como _mk_match_id, por columnas)."""
+    return (df["Season"].astype("Int64").astype(str) + "__"
+            + pd.to_datetime(df["Date"]).dt.strftime("%Y-%m-%d") + "__"
+            + df["HomeTeam_norm"].astype(str) + "__" + df["AwayTeam_norm"].astype(str))
+
+
+@traced
+def build_radar_frame(futuros: pd.DataFrame, schema_path: str | Path,
+                      generated_at: pd.Timestamp | None = None) -> pd.DataFrame:
+    """Brutos + *_norm de radar y barras, flags y metadatos, en las columnas de final_columns()."""
+    f = futuros.copy()
+    new = {"match_id": match_ids(f)}
+    for c in ID_COLS + MARKET_COLS + BARS_SOURCE_COLS + radar_columns()[0]:
+        if c not in f.columns and c not in new:
+            new[c] = np.nan
+    f = f.assign(**new)
+
+    f = f.assign(home_points_pct=_points_pct(f["home_total_points_cum"], f["home_total_matches_prev"]),
+                 away_points_pct=_points_pct(f["away_total_points_cum"], f["away_total_matches_prev"]))
+
+    # todas las *_norm en una sola operación sobre la matriz de columnas brutas
+    plan = norm_plan(present=set(f.columns) - set(radar_columns()[1]))
+    raw = [r for r, *_ in plan.values()]
+    X = f[raw].copy()
+    obj = [c for c in raw if not pd.api.types.is_numeric_dtype(X[c])]
+    X[obj] = X[obj].apply(pd.to_numeric, errors="coerce")
+    X = X.to_numpy(dtype=float)
+    lo, hi, inv = (np.array([p[i] for p in plan.values()]) for i in (1, 2, 3))
+    N = pd.DataFrame(_norm_block(X, lo, hi, inv), columns=list(plan), index=f.index)
+    f = pd.concat([f.drop(columns=[c for c in plan if c in f.columns]), N], axis=1)
+    f = f.assign(has_odds=f[["B365H", "B365D", "B365A"]].notna().all(axis=1),
+                 generated_at=pd.Timestamp.utcnow() if generated_at is None else generated_at,
+                 norm_version=NORM_VERSION,
+                 schema_path=str(schema_path))
+    return f[[c for c in final_columns() if c in f.columns]]
+
+
+# ============================================================
+# 3) Upsert por temporada
+# ============================================================
+def _as_text(csv: str) -> pd.DataFrame:
+    """Las filas tal y como quedan en el CSV (texto), para comparar con lo ya escrito."""
+    return pd.read_csv(io.StringIO(csv), dtype=str, keep_default_na=False)
+
+
+@traced
+def upsert_season(out_path: str | Path, part: pd.DataFrame) -> dict:
+    """
+    Inserta/actualiza `part` (una temporada) en radar_prematch_{SEASON}.csv por (match_id, norm_version).
+    Filas sin cambios → intactas (incluido su generated_at); cambiadas → se quitan de su sitio
+    y van al final, como hacía el sort por generated_at + drop_duplicates(keep="last").
+    Devuelve {"new", "changed", "unchanged", "mode": "create" | "append" | "rewrite" | "skip"}.
+    """
+    out_path = Path(out_path)
+    part = part.sort_values(["Date", "HomeTeam_norm", "AwayTeam_norm"]).reset_index(drop=True)
+    part = part.assign(generated_at=pd.to_datetime(part["generated_at"], utc=True)
+                       .dt.strftime("%Y-%m-%dT%H:%M:%SZ"))
+    part = part.drop_duplicates(subset=KEY_COLS, keep="last")
+    csv = part.to_csv(index=False)                   # los floats se formatean una sola vez
+    if not out_path.exists():
+        out_path.write_text(csv, encoding="utf-8-sig")
+        return {"new": len(part), "changed": 0, "unchanged": 0, "mode": "create"}
+
+    new_txt = _as_text(csv)
+    prev = pd.read_csv(out_path, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    prev = prev.loc[:, _dedup(list(prev.columns))]
+    for c in KEY_COLS:
+        if c not in prev.columns:
+            prev[c] = ""
+    content = [c for c in new_txt.columns if c not in VOLATILE_COLS]
+    key = lambda d: d["match_id"] + "\x1f" + d["norm_version"]
+    prev_key, new_key = key(prev), key(new_txt)
+    prev_pos = pd.Series(np.arange(len(prev)), index=prev_key.to_numpy())
+    prev_pos = prev_pos[~prev_pos.index.duplicated(keep="last")]
+
+    hit = new_key.isin(prev_pos.index).to_numpy()
+    same_schema = list(prev.columns) == list(new_txt.columns)
+    unchanged = np.zeros(len(new_txt), dtype=bool)
+    if hit.any() and set(content) <= set(prev.columns):
+        old = prev.iloc[prev_pos[new_key[hit]].to_numpy()][content].to_numpy()
+        unchanged[hit] = (old == new_txt.loc[hit, content].to_numpy()).all(axis=1)
+    changed = hit & ~unchanged
+    fresh = ~hit
+    stats = {"new": int(fresh.sum()), "changed": int(changed.sum()), "unchanged": int(unchanged.sum())}
+
+    if not changed.any() and not fresh.any():
+        return {**stats, "mode": "skip"}
+    if not changed.any() and same_schema:
+        # sólo altas: se añaden al final (mismo orden que la reescritura)
+        with open(out_path, "a", encoding="utf-8", newline="") as f:
+            new_txt[fresh].to_csv(f, index=False, header=False)
+        return {**stats, "mode": "append"}
+    keep = ~prev_key.isin(new_key[changed]).to_numpy()
+    merged = pd.concat([prev[keep], new_txt[changed | fresh]], ignore_index=True)
+    merged.to_csv(out_path, index=False, encoding="utf-8-sig")
+    return {**stats, "mode": "rewrite"}
+
+
+def export_radar(src_path: str | Path, out_dir: str | Path, today: pd.Timestamp, store=None,
+                 generated_at: pd.Timestamp | None = None) -> tuple[list[dict], Path] | None:
+    """
+    Flujo completo de la celda: lectura podada → frame vectorizado → upsert por temporada.
+    `store` (OutputsStore) recibe la temporada completa sólo si su CSV ha cambiado.
+    Devuelve (resumen por temporada, schemas.json) o None si no hay partidos futuros.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    futuros = load_futures(src_path, today)
+    if futuros.empty:
+        return None
+    schema_path = write_schemas(out_dir)
+    frame = build_radar_frame(futuros, schema_path, generated_at)
+    summary = []
+    for season in sorted(frame["Season"].dropna().unique().tolist()):
+        out_path = out_dir / f"radar_prematch_{int(season)}.csv"
+        res = upsert_season(out_path, frame[frame["Season"] == season])
+        if store is not None and res["mode"] != "skip":
+            store.write("radar_prematch", pd.read_csv(out_path, encoding="utf-8-sig"))
+        summary.append({"season": int(season), "path": out_path, **res})
+    return summary, schema_path
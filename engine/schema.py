@@ -0,0 +1,285 @@
+# engine/schema.py
+# ============================================================
+# ESQUEMA COMPACTO DE LOS PARQUET PROCESADOS / DE FEATURES (02_processed, 03_features)
+#  Los notebooks leían siempre el fichero entero (load_feat / load_proc = pd.read_parquet)
+#  y df_final vivía en memoria con los equipos como object (un str por fila y columna) y
+#  todas las features en float64.
+#  - read_table(path, columns, lean): poda de columnas en el lector (pyarrow) y, si se pide,
+#    tipos compactos. Lee con reader(path, columns=...) (pd.read_parquet por defecto); los
+#    notebooks pasan READ_PARQUET → el ArtifactStore de engine/pipeline.py sigue sirviendo
+#    desde memoria lo escrito en la misma ejecución.
+#  - lean(df): equipos → categórica compartida (categorías en orden alfabético: ordenar,
+#    agrupar y comparar dan lo mismo que con str), enteros → el int más pequeño que cabe,
+#    features float64 → float32. Cuotas, probabilidades implícitas y similares se quedan
+#    en float64 (se exportan y se usan en ROI/overround).
+#  - TeamIndex: registro append-only nombre → team_id estable
+#    (data/02_processed/team_ids.json); un equipo nuevo recibe el siguiente id.
+#  - match_keys / pack_match_keys / unpack_match_keys / format_pred_keys: clave de partido como entero
+#    (Season, día, team_id local, team_id visitante) empaquetado en un int64. Las claves
+#    pred_key "Season|YYYY-MM-DD|local|visitante" siguen siendo el contrato de los CSV;
+#    format_pred_keys las genera a partir del entero cuando hay que exportarlas.
+# ============================================================
+from __future__ import annotations
+
+import json, os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+TEAM_IDS_PATH = Path("data") / "02_processed" / "team_ids.json"
+TEAM_COLS = ("HomeTeam_norm", "AwayTeam_norm", "HomeTeam", "AwayTeam", "Home", "Away", "Team", "team_norm")
+# Columnas float que se quedan en float64 (prefijos): cuotas, prob. implícitas, probabilidades del modelo
+EXACT_PREFIXES = ("B365", "pimp", "proba_", "pH_", "pD_", "pA_", "odds", "overround")
+
+# Clave entera: Season (16 bits) | día desde 1970-01-01 (16 bits) | local (16) | visitante (16)
+_SHIFT_SEASON, _SHIFT_DAY, _SHIFT_HOME = 48, 32, 16
+_MASK16 = (1 << 16) - 1
+
+
+# ============================================================
+# 1) Registro de equipos (team_id estable)
+# ============================================================
+class TeamIndex:
+    """
+    Nombre de equipo → team_id (int) estable entre ejecuciones. Sólo se añaden nombres:
+    un id asignado no cambia ni se reutiliza. `dtype` es la categórica compartida por todas
+    las columnas de equipos (categorías ordenadas alfabéticamente, no por id).
+    """
+
+    def __init__(self, names: list[str] | None = None, path: str | Path | None = None):
+        self.path = Path(path) if path is not None else None
+        self.names: list[str] = []
+        self._ids: dict[str, int] = {}
+        self._dtype: pd.CategoricalDtype | None = None
+        self.dirty = False
+        self.register(names or [])
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: str | Path = TEAM_IDS_PATH) -> "TeamIndex":
+        path = Path(path)
+        names = []
+        if path.exists():
+            doc = json.loads(path.read_text(encoding="utf-8"))
+            names = [n for n, _ in sorted(doc["teams"].items(), key=lambda kv: kv[1])]
+        return cls(names, path=path)
+
+    def save(self, path: str | Path | None = None) -> Path | None:
+        """Escribe el registro (tmp + os.replace) si hay nombres nuevos o si se pide otra ruta."""
+        path = Path(path) if path is not None else self.path
+        if path is None or (not self.dirty and path == self.path and path.exists()):
+            return None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".json.tmp")
+        doc = {"version": 1, "teams": self._ids}
+        tmp.write_text(json.dumps(doc, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, path)
+        if path == self.path:
+            self.dirty = False
+        return path
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name) -> bool:
+        return name in self._ids
+
+    def register(self, values) -> int:
+        """Añade los nombres no vistos (en orden alfabético, para que el id no dependa del orden de filas)."""
+        uniq = pd.unique(pd.Series(values, dtype=object).dropna().astype(str))
+        new = sorted(set(uniq) - self._ids.keys())
+        if len(self.names) + len(new) > _MASK16:
+            raise ValueError(f"TeamIndex: demasiados equipos ({len(self.names) + len(new)})")
+        for name in new:
+            self._ids[name] = len(self.names)
+            self.names.append(name)
+        if new:
+            self._dtype = None
+            self.dirty = True
+        return len(new)
+
+    @property
+    def dtype(self) -> pd.CategoricalDtype:
+        if self._dtype is None:
+            self._dtype = pd.CategoricalDtype(sorted(self.names), ordered=False)
+        return self._dtype
+
+    def categorical(self, values) -> pd.Series:
+        """Serie de nombres → categórica compartida (registra los que falten)."""
+        s = values if isinstance(values, pd.Series) else pd.Series(values)
+        if isinstance(s.dtype, pd.CategoricalDtype) and s.dtype == self.dtype:
+            return s
+        self.register(s.cat.categories if isinstance(s.dtype, pd.CategoricalDtype) else s)
+        return s.astype(str).where(s.notna()).astype(self.dtype)
+
+    def ids(self, values) -> np.ndarray:
+        """team_id por fila (int32; -1 para nulos). Se resuelven sólo los nombres distintos."""
+        s = values if isinstance(values, pd.Series) else pd.Series(values)
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            cats, codes = s.cat.categories, s.cat.codes.to_numpy()
+        else:
+            codes, cats = pd.factorize(s, use_na_sentinel=True)
+        cats = pd.Index(cats).astype(str)
+        self.register(cats)
+        lut = np.array([self._ids[c] for c in cats] + [-1], dtype=np.int32)
+        return lut[codes]                                # código -1 (nulo) → último = -1
+
+    def team_names(self, ids) -> np.ndarray:
+        """team_id → nombre (None para -1)."""
+        lut = np.array(self.names + [None], dtype=object)
+        ids = np.asarray(ids, dtype=np.int64)
+        return lut[np.where(ids < 0, len(self.names), ids)]
+
+
+# ============================================================
+# 2) Tipos compactos
+# ============================================================
+def _small_int(s: pd.Series) -> pd.Series:
+    """int64 / Int64 → el entero con signo más pequeño que contiene el rango de la columna."""
+    nullable = isinstance(s.dtype, pd.api.extensions.ExtensionDtype)
+    if not len(s) or s.isna().all():
+        return s
+    lo, hi = s.min(), s.max()
+    for np_t, pd_t in ((np.int8, "Int8"), (np.int16, "Int16"), (np.int32, "Int32")):
+        info = np.iinfo(np_t)
+        if info.min <= lo and hi <= info.max:
+            return s.astype(pd_t if nullable else np_t)
+    return s
+
+
+def _is_exact(col: str) -> bool:
+    return col.startswith(EXACT_PREFIXES)
+
+
+def lean(df: pd.DataFrame, teams: TeamIndex | None = None, team_cols=TEAM_COLS,
+         keep=(), floats: bool = True) -> pd.DataFrame:
+    """
+    Copia de `df` con tipos compactos (ver cabecera). `teams` fija la categórica compartida
+    (y registra los equipos nuevos); sin él, las categorías son los equipos presentes en las
+    columnas de equipos del propio df. `keep`: columnas que no se tocan.
+    """
+    keep = set(keep)
+    tcols = [c for c in team_cols if c in df.columns and c not in keep]
+    if teams is None:
+        teams = TeamIndex()
+    for c in tcols:
+        s = df[c]
+        teams.register(s.cat.categories if isinstance(s.dtype, pd.CategoricalDtype) else s)
+
+    out = {}
+    for c in df.columns:
+        s = df[c]
+        if c in keep:
+            out[c] = s
+        elif c in tcols:
+            out[c] = teams.categorical(s)
+        elif pd.api.types.is_bool_dtype(s.dtype):
+            out[c] = s
+        elif pd.api.types.is_integer_dtype(s.dtype):
+            out[c] = _small_int(s)
+        elif floats and s.dtype == np.float64 and not _is_exact(c):
+            out[c] = s.astype(np.float32)
+        else:
+            out[c] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+_lean = lean                        # read_table(lean=...) tapa el nombre
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return round(df.memory_usage(deep=True).sum() / 1024 ** 2, 2)
+
+
+# ============================================================
+# 3) Lectura con poda de columnas
+# ============================================================
+def parquet_columns(path: str | Path) -> list[str]:
+    """Columnas del fichero (sólo metadatos)."""
+    return list(pq.read_schema(path).names)
+
+
+def read_table(path: str | Path, columns=None, lean: bool = False, teams: TeamIndex | None = None,
+               strict: bool = False, reader=None) -> pd.DataFrame:
+    """
+    pd.read_parquet (o reader, misma firma) con las columnas pedidas (en el orden del fichero).
+    Las que no existen se ignoran, o KeyError con strict=True. lean=True aplica tipos
+    compactos (ver lean()).
+    """
+    if columns is not None:
+        want = list(dict.fromkeys(columns))
+        avail = parquet_columns(path)
+        missing = [c for c in want if c not in avail]
+        if missing and strict:
+            raise KeyError(f"{Path(path).name}: faltan columnas {missing}")
+        columns = [c for c in avail if c in set(want)]
+    df = (reader or pd.read_parquet)(path, columns=columns)
+    return _lean(df, teams=teams) if lean else df
+
+
+# ============================================================
+# 4) Clave entera de partido
+# ============================================================
+def day_numbers(dates) -> np.ndarray:
+    """Fechas → día desde 1970-01-01 (int64, hora y zona horaria fuera); NaT → -1."""
+    day = pd.to_datetime(pd.Series(dates), errors="coerce")
+    if getattr(day.dt, "tz", None) is not None:
+        day = day.dt.tz_localize(None)
+    out = day.dt.normalize().to_numpy(dtype="datetime64[D]").astype(np.int64)
+    return np.where(day.isna().to_numpy(), -1, out)
+
+
+def pack_match_keys(season, day, home, away) -> np.ndarray:
+    """
+    Enteros (temporada, día, código local, código visitante) → int64 de 16 bits por campo;
+    -1 si alguno es negativo, nulo o no cabe.
+    """
+    parts = [np.asarray(x, dtype=float) for x in (season, day, home, away)]
+    bad = np.zeros(len(parts[0]), dtype=bool)
+    for x in parts:
+        bad |= np.isnan(x) | (x < 0) | (x > _MASK16)
+    s, d, h, a = (np.where(bad, 0, x).astype(np.int64) for x in parts)
+    key = (s << _SHIFT_SEASON) | (d << _SHIFT_DAY) | (h << _SHIFT_HOME) | a
+    return np.where(bad, -1, key)
+
+
+def match_keys(df: pd.DataFrame, teams: TeamIndex, season_col: str = "Season", date_col: str = "Date",
+               home_col: str = "HomeTeam_norm", away_col: str = "AwayTeam_norm") -> np.ndarray:
+    """
+    (Season, día, team_id local, team_id visitante) empaquetado en int64; -1 si falta alguna
+    parte. Dos filas tienen la misma clave ⇔ misma temporada, mismo día y mismos equipos.
+    """
+    season = pd.to_numeric(df[season_col], errors="coerce").to_numpy(dtype=float)
+    return pack_match_keys(season, day_numbers(df[date_col]), teams.ids(df[home_col]), teams.ids(df[away_col]))
+
+
+def unpack_match_keys(keys) -> pd.DataFrame:
+    """int64 → columnas Season (int16), Date (datetime64), home_id, away_id (int32)."""
+    k = np.asarray(keys, dtype=np.int64)
+    bad = k < 0
+    k = np.where(bad, 0, k)
+    out = pd.DataFrame({
+        "Season": ((k >> _SHIFT_SEASON) & _MASK16).astype(np.int16),
+        "Date": ((k >> _SHIFT_DAY) & _MASK16).astype("datetime64[D]").astype("datetime64[ns]"),
+        "home_id": ((k >> _SHIFT_HOME) & _MASK16).astype(np.int32),
+        "away_id": (k & _MASK16).astype(np.int32),
+    })
+    if bad.any():
+        out = out.astype({"Season": "Int16"})
+        out.loc[bad, "Season"] = pd.NA
+        out.loc[bad, "Date"] = pd.NaT
+        out.loc[bad, ["home_id", "away_id"]] = -1
+    return out
+
+
+def format_pred_keys(keys, teams: TeamIndex) -> pd.Series:
+    """Clave entera → "Season|YYYY-MM-DD|local|visitante" (formato de pred_key_match), None si -1."""
+    uniq, inv = np.unique(np.asarray(keys, dtype=np.int64), return_inverse=True)
+    u = unpack_match_keys(uniq)
+    txt = (u["Season"].astype(str) + "|" + u["Date"].dt.strftime("%Y-%m-%d") + "|"
+           + pd.Series(teams.team_names(u["home_id"]), dtype=object) + "|"
+           + pd.Series(teams.team_names(u["away_id"]), dtype=object))
+    txt = txt.where(uniq >= 0, None)
+    return pd.Series(txt.to_numpy()[inv], dtype=object)
@@ -0,0 +1,346 @@
+# engine/season_sim.py
+# ============================================================
+# SIMULACIÓN MONTE CARLO DE LA CLASIFICACIÓN FINAL (MODELOS.ipynb, tras future_predictions)
+#  El motor da proba_H/D/A de la jornada siguiente y df_final tiene los resultados jugados;
+#  faltaba pasar de ahí a la tabla final: título, Europa, descenso y puntos esperados.
+#   - standings(): clasificación actual (puntos, GF, GC, DG) de los partidos jugados
+#   - remaining_fixtures(): calendario de la temporada (wk_*.parquet) menos lo ya jugado
+#   - fixture_probs(): P(H/D/A) del modelo para los partidos que tiene; el resto con un
+#     Poisson por equipo (ataque/defensa de la temporada, encogidos hacia la media de liga)
+#   - SeasonSetup: todo en arrays (equipos → índice, partidos pendientes → home/away/prob.)
+#   - iter_chunks(): N temporadas por lotes: un uniforme por partido y simulación →
+#     resultado por comparación con las probabilidades acumuladas; puntos y DG aproximada
+#     por producto con las matrices de incidencia partido × equipo; posición por argsort
+#     de una clave (puntos, DG, GF, desempate aleatorio) en todas las filas a la vez
+#   - simulate(): acumula histogramas posición × equipo y puntos × equipo (memoria fija,
+#     independiente de N) → SimResult con resumen, matriz de posiciones y distribución
+#   - export_season_sim(): outputs/season_sim_<Season>.csv, season_sim_positions_<Season>.csv
+#     y season_sim_points_<Season>.csv (+ particiones en el OutputsStore)
+#  Desempate: LaLiga usa el enfrentamiento directo; aquí se aproxima con DG actual + saldo de
+#  resultados simulados (+1/0/-1), GF actuales y, al final, sorteo.
+# ============================================================
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from engine.trace import traced
+
+LABELS = ("H", "D", "A")
+# Zonas: (primera, última) posición, 1-based; negativas cuentan desde abajo
+ZONES = {
+    "title": (1, 1),
+    "top4": (1, 4),
+    "europe": (1, 6),
+    "relegation": (-3, -1),
+}
+PROBA_CANDIDATES = (("pH_pred", "pD_pred", "pA_pred"), ("proba_H", "proba_D", "proba_A"))
+POINTS_HOME = np.array([3, 1, 0], dtype=np.float32)
+POINTS_AWAY = np.array([0, 1, 3], dtype=np.float32)
+MAX_GOALS = 10            # Poisson truncado (la masa por encima es despreciable)
+PRIOR_MATCHES = 5.0       # partidos "de media de liga" que se suman a cada equipo
+DEFAULT_CHUNK = 25_000
+
+
+# ============================================================
+# 1) Tabla actual y partidos pendientes
+# ============================================================
+def _results(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (resultado 0=H/1=D/2=A, -1 = sin jugar; goles local; goles visitante) por fila.
+    El resultado sale de FTHG/FTAG si están y, si no, de FTR (df_final no trae goles: son
+    columnas con fuga); sin goles, GF/GC cuentan 0.
+    """
+    n = len(df)
+    hg = pd.to_numeric(df["FTHG"], errors="coerce").to_numpy(dtype=float) if "FTHG" in df else np.full(n, np.nan)
+    ag = pd.to_numeric(df["FTAG"], errors="coerce").to_numpy(dtype=float) if "FTAG" in df else np.full(n, np.nan)
+    res = np.where(hg > ag, 0, np.where(hg == ag, 1, 2))
+    res = np.where(np.isnan(hg) | np.isnan(ag), -1, res)
+    if "FTR" in df:
+        ftr = pd.Categorical(df["FTR"].astype(str).str.upper().str.strip(), categories=list(LABELS)).codes
+        res = np.where(res < 0, ftr, res)
+    return res, hg, ag
+
+
+def standings(played: pd.DataFrame, teams=None, home_col: str = "HomeTeam_norm",
+              away_col: str = "AwayTeam_norm") -> pd.DataFrame:
+    """
+    Clasificación de los partidos con resultado: índice equipo → played, points, gf, ga, gd.
+    `teams` añade (a cero) los equipos que aún no han jugado.
+    """
+    res, hg, ag = _results(played)
+    done = res >= 0
+    res, hg, ag = res[done], np.nan_to_num(hg[done]).astype(np.int64), np.nan_to_num(ag[done]).astype(np.int64)
+    long = pd.DataFrame({
+        "team": np.concatenate([played[home_col].astype(str).to_numpy()[done],
+                                played[away_col].astype(str).to_numpy()[done]]),
+        "points": np.concatenate([POINTS_HOME[res], POINTS_AWAY[res]]).astype(np.int64),
+        "gf": np.concatenate([hg, ag]),
+        "ga": np.concatenate([ag, hg]),
+    })
+    long["played"] = 1
+    tab = long.groupby("team")[["played", "points", "gf", "ga"]].sum()
+    if teams is not None:
+        tab = tab.reindex(tab.index.union(pd.Index(pd.unique(pd.Series(teams, dtype=str)))), fill_value=0)
+    tab["gd"] = tab["gf"] - tab["ga"]
+    tab.index.name = "team"
+    return tab.astype(np.int64)
+
+
+def remaining_fixtures(calendar: pd.DataFrame, played: pd.DataFrame, home_col: str = "HomeTeam_norm",
+                       away_col: str = "AwayTeam_norm") -> pd.DataFrame:
+    """
+    Partidos del calendario (local, visitante ya canonizados) sin resultado en `played`.
+    En liga cada cruce local-visitante se juega una vez por temporada.
+    """
+    done = played[_results(played)[0] >= 0]
+    done_pairs = pd.MultiIndex.from_arrays([done[home_col].astype(str), done[away_col].astype(str)])
+    cal = calendar.drop_duplicates([home_col, away_col])
+    pairs = pd.MultiIndex.from_arrays([cal[home_col].astype(str), cal[away_col].astype(str)])
+    return cal[~pairs.isin(done_pairs)].reset_index(drop=True)
+
+
+# ============================================================
+# 2) Probabilidades por partido
+# ============================================================
+def poisson_probs(played: pd.DataFrame, home: np.ndarray, away: np.ndarray, prior: float = PRIOR_MATCHES,
+                  home_col: str = "HomeTeam_norm", away_col: str = "AwayTeam_norm") -> np.ndarray:
+    """
+    P(H/D/A) (n × 3) con goles Poisson independientes: λ_local = μ_local · ataque(local) ·
+    defensa(visitante) y simétrico, con ataque/defensa = tasa del equipo en la temporada
+    encogida hacia la media con `prior` partidos. Sólo cuentan las filas con goles; sin
+    ninguna → todos los equipos con la media de liga.
+    """
+    _, hg, ag = _results(played)
+    goals = ~(np.isnan(hg) | np.isnan(ag))
+    mu_h = hg[goals].mean() if goals.any() else 1.5
+    mu_a = ag[goals].mean() if goals.any() else 1.1
+    mu = (mu_h + mu_a) / 2
+    tab = standings(played[goals], teams=np.concatenate([np.asarray(home, dtype=str), np.asarray(away, dtype=str)]),
+                    home_col=home_col, away_col=away_col)
+    att = ((tab["gf"] + prior * mu) / (tab["played"] + prior) / mu).to_dict()
+    dfn = ((tab["ga"] + prior * mu) / (tab["played"] + prior) / mu).to_dict()
+    home = pd.Series(home, dtype=str)
+    away = pd.Series(away, dtype=str)
+    lam_h = mu_h * home.map(att).to_numpy() * away.map(dfn).to_numpy()
+    lam_a = mu_a * away.map(att).to_numpy() * home.map(dfn).to_numpy()
+
+    def pmf(lam):
+        out = np.empty((len(lam), MAX_GOALS + 1))
+        out[:, 0] = np.exp(-lam)
+        for k in range(1, MAX_GOALS + 1):
+            out[:, k] = out[:, k - 1] * lam / k
+        return out
+
+    joint = pmf(lam_h)[:, :, None] * pmf(lam_a)[:, None, :]
+    ph = np.tril(np.ones((MAX_GOALS + 1,) * 2), -1)
+    pd_ = np.eye(MAX_GOALS + 1)
+    probs = np.stack([(joint * ph).sum(axis=(1, 2)), (joint * pd_).sum(axis=(1, 2)),
+                      (joint * ph.T).sum(axis=(1, 2))], axis=1)
+    return probs / probs.sum(axis=1, keepdims=True)
+
+
+def _proba_cols(df: pd.DataFrame) -> tuple[str, str, str] | None:
+    return next((c for c in PROBA_CANDIDATES if set(c).issubset(df.columns)), None)
+
+
+def fixture_probs(fixtures: pd.DataFrame, played: pd.DataFrame, preds: pd.DataFrame | None = None,
+                  home_col: str = "HomeTeam_norm", away_col: str = "AwayTeam_norm") -> pd.DataFrame:
+    """
+    Pendientes + p_H/p_D/p_A + proba_src: 'model' si `preds` (future_predictions_*.csv:
+    pH_pred/pD_pred/pA_pred o proba_H/D/A) trae el cruce, 'poisson' en otro caso.
+    """
+    out = fixtures[[home_col, away_col]].astype(str).reset_index(drop=True)
+    probs = poisson_probs(played, out[home_col].to_numpy(), out[away_col].to_numpy(),
+                          home_col=home_col, away_col=away_col)
+    src = np.full(len(out), "poisson", dtype=object)
+    cols = _proba_cols(preds) if preds is not None and len(preds) else None
+    if cols is not None:
+        pm = preds[[home_col, away_col, *cols]].copy()
+        pm[[home_col, away_col]] = pm[[home_col, away_col]].astype(str)
+        pm = pm.drop_duplicates([home_col, away_col], keep="last")
+        m = out.merge(pm, on=[home_col, away_col], how="left")
+        model = m[list(cols)].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+        ok = np.isfinite(model).all(axis=1) & (model.sum(axis=1) > 0)
+        probs[ok] = model[ok] / model[ok].sum(axis=1, keepdims=True)
+        src[ok] = "model"
+    out["p_H"], out["p_D"], out["p_A"] = probs[:, 0], probs[:, 1], probs[:, 2]
+    out["proba_src"] = src
+    return out
+
+
+# ============================================================
+# 3) Simulación vectorizada
+# ============================================================
+@dataclass
+class SeasonSetup:
+    """Estado de partida en arrays: equipos (orden de `teams`) y partidos pendientes."""
+    teams: np.ndarray          # (T,) nombres
+    points: np.ndarray         # (T,) puntos actuales
+    gd: np.ndarray             # (T,) diferencia de goles actual
+    gf: np.ndarray             # (T,) goles a favor actuales
+    home: np.ndarray           # (F,) índice del local
+    away: np.ndarray           # (F,) índice del visitante
+    probs: np.ndarray          # (F, 3) P(H/D/A)
+
+    @classmethod
+    def from_frames(cls, played: pd.DataFrame, fixtures: pd.DataFrame, home_col: str = "HomeTeam_norm",
+                    away_col: str = "AwayTeam_norm") -> "SeasonSetup":
+        """`fixtures` con p_H/p_D/p_A (fixture_probs); equipos = los de la tabla ∪ los pendientes."""
+        names = np.concatenate([fixtures[home_col].astype(str).to_numpy(),
+                                fixtures[away_col].astype(str).to_numpy()])
+        tab = standings(played, teams=names, home_col=home_col, away_col=away_col)
+        teams = tab.index.to_numpy(dtype=object)
+        pos = pd.Index(teams)
+        probs = fixtures[["p_H", "p_D", "p_A"]].to_numpy(dtype=float)
+        return cls(teams=teams, points=tab["points"].to_numpy(), gd=tab["gd"].to_numpy(),
+                   gf=tab["gf"].to_numpy(),
+                   home=pos.get_indexer(fixtures[home_col].astype(str)),
+                   away=pos.get_indexer(fixtures[away_col].astype(str)),
+                   probs=probs / probs.sum(axis=1, keepdims=True))
+
+    @property
+    def n_teams(self) -> int:
+        return len(self.teams)
+
+    @property
+    def max_points(self) -> int:
+        left = np.bincount(np.concatenate([self.home, self.away]), minlength=self.n_teams)
+        return int((self.points + 3 * left).max())
+
+    def incidence(self) -> tuple[np.ndarray, np.ndarray]:
+        """Matrices partido × equipo (float32, 0/1) del local y del visitante."""
+        F, T = len(self.home), self.n_teams
+        H = np.zeros((F, T), dtype=np.float32)
+        A = np.zeros((F, T), dtype=np.float32)
+        H[np.arange(F), self.home] = 1
+        A[np.arange(F), self.away] = 1
+        return H, A
+
+
+def rank_positions(points: np.ndarray, gd: np.ndarray, gf: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Posición 0-based (n × T) por puntos, DG, GF y sorteo. La clave entera cabe de sobra en
+    float64 (puntos < 2^8, DG desplazada < 2^12, GF < 2^10) y el sorteo va en la parte decimal.
+    """
+    key = ((points.astype(np.float64) * 4096 + np.clip(gd + 2048, 0, 4095)) * 1024
+           + np.clip(gf, 0, 1023) + rng.random(points.shape))
+    order = np.argsort(-key, axis=1, kind="stable")
+    pos = np.empty_like(order)
+    np.put_along_axis(pos, order, np.arange(points.shape[1])[None, :], axis=1)
+    return pos
+
+
+def iter_chunks(setup: SeasonSetup, n_sims: int, chunk: int = DEFAULT_CHUNK, seed: int = 42):
+    """
+    Genera (points, gd, positions) por lotes de hasta `chunk` temporadas simuladas (n × T).
+    Un generador hijo (SeedSequence.spawn) por lote: mismo `seed` y `chunk` → mismo resultado.
+    """
+    H, A = setup.incidence()
+    D = H - A
+    cum = np.cumsum(setup.probs, axis=1)[:, :2].astype(np.float32)
+    n_chunks = -(-n_sims // chunk) if n_sims > 0 else 0
+    for i, ss in enumerate(np.random.SeedSequence(seed).spawn(n_chunks)):
+        rng = np.random.default_rng(ss)
+        n = min(chunk, n_sims - i * chunk)
+        u = rng.random((n, len(setup.home)), dtype=np.float32)
+        outcome = (u >= cum[:, 0]).astype(np.int8) + (u >= cum[:, 1])          # 0=H, 1=D, 2=A
+        pts = POINTS_HOME[outcome] @ H + POINTS_AWAY[outcome] @ A
+        sign = (1 - outcome).astype(np.float32)                                  # +1 / 0 / -1 del local
+        points = setup.points + np.rint(pts).astype(np.int32)
+        gd = setup.gd + np.rint(sign @ D).astype(np.int32)
+        yield points, gd, rank_positions(points, gd, np.broadcast_to(setup.gf, points.shape), rng)
+
+
+@dataclass
+class SimResult:
+    setup: SeasonSetup
+    n_sims: int
+    pos_counts: np.ndarray      # (T, T) equipo × posición
+    pts_counts: np.ndarray      # (T, max_points + 1) equipo × puntos finales
+
+    def _zone(self, first: int, last: int) -> np.ndarray:
+        T = self.setup.n_teams
+        lo = first - 1 if first > 0 else T + first
+        hi = last if last > 0 else T + last + 1
+        return self.pos_counts[:, lo:hi].sum(axis=1) / self.n_sims
+
+    def summary(self, zones: dict | None = None) -> pd.DataFrame:
+        """Una fila por equipo: puntos actuales/esperados, cuantiles, posición media y zonas."""
+        zones = ZONES if zones is None else zones
+        s = self.setup
+        pts = np.arange(self.pts_counts.shape[1])
+        cdf = np.cumsum(self.pts_counts, axis=1) / self.n_sims
+
+        def q(p):
+            return (cdf >= p).argmax(axis=1)
+
+        left = np.bincount(np.concatenate([s.home, s.away]), minlength=s.n_teams)
+        out = pd.DataFrame({
+            "Team": s.teams.astype(str),
+            "points_now": s.points, "gd_now": s.gd, "remaining": left,
+            "xPts": self.pts_counts @ pts / self.n_sims,
+            "pts_p05": q(0.05), "pts_p50": q(0.50), "pts_p95": q(0.95),
+            "xPos": self.pos_counts @ np.arange(1, s.n_teams + 1) / self.n_sims,
+        })
+        for name, (first, last) in zones.items():
+            out[f"p_{name}"] = self._zone(first, last)
+        return out.sort_values(["xPts", "points_now"], ascending=False, kind="mergesort").reset_index(drop=True)
+
+    def positions(self) -> pd.DataFrame:
+        """Matriz equipo × posición (probabilidades; columnas pos_1..pos_T)."""
+        T = self.setup.n_teams
+        out = pd.DataFrame(self.pos_counts / self.n_sims, columns=[f"pos_{k}" for k in range(1, T + 1)])
+        out.insert(0, "Team", self.setup.teams.astype(str))
+        return out
+
+    def points_distribution(self) -> pd.DataFrame:
+        """Formato largo (Team, points, prob) con las combinaciones de probabilidad > 0."""
+        team, pts = np.nonzero(self.pts_counts)
+        return pd.DataFrame({"Team": self.setup.teams.astype(str)[team], "points": pts,
+                             "prob": self.pts_counts[team, pts] / self.n_sims})
+
+
+@traced
+def simulate(setup: SeasonSetup, n_sims: int = 100_000, chunk: int = DEFAULT_CHUNK, seed: int = 42) -> SimResult:
+    """N temporadas por lotes; sólo se guardan los histogramas (memoria ∝ chunk, no ∝ N)."""
+    T, P = setup.n_teams, setup.max_points + 1
+    pos_counts = np.zeros(T * T, dtype=np.int64)
+    pts_counts = np.zeros(T * P, dtype=np.int64)
+    team = np.arange(T)[None, :]
+    for points, _, pos in iter_chunks(setup, n_sims, chunk, seed):
+        pos_counts += np.bincount((team * T + pos).ravel(), minlength=T * T)
+        pts_counts += np.bincount((team * P + points).ravel(), minlength=T * P)
+    return SimResult(setup, n_sims, pos_counts.reshape(T, T), pts_counts.reshape(T, P))
+
+
+# ============================================================
+# 4) Export junto al resto de outputs/
+# ============================================================
+def export_season_sim(result: SimResult, out_dir: str | Path, season: int, store=None,
+                      zones: dict | None = None) -> dict:
+    """
+    outputs/season_sim_<Season>.csv (resumen), season_sim_positions_<Season>.csv y
+    season_sim_points_<Season>.csv; con `store` (OutputsStore) también sus particiones.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    frames = {
+        "season_sim": result.summary(zones),
+        "season_sim_positions": result.positions(),
+        "season_sim_points": result.points_distribution(),
+    }
+    paths = {}
+    for name, frame in frames.items():
+        frame.insert(0, "Season", int(season))
+        if name == "season_sim":
+            frame.insert(1, "n_sims", int(result.n_sims))
+        path = out_dir / f"{name}_{int(season)}.csv"
+        frame.to_csv(path, index=False)
+        paths[name] = str(path)
+        if store is not None:
+            store.write(name, frame)
+    return paths
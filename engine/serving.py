@@ -0,0 +1,562 @@
+# engine/serving.py
+# ============================================================
+# MODELO PERSISTIDO POR RONDA + PREDICCIÓN AD HOC (scripts/serve_predictions.py)
+#  generate_future_predictions (MODELOS.ipynb) reentrena y escribe future_predictions_*.csv
+#  como efecto lateral: para puntuar un partido suelto (aplazado, cuotas que cambian) había
+#  que relanzar Stage 2. Ahora:
+#   - build_round_artifact(): pipeline de la ronda (mismas filas y pesos que la última fecha
+#     futura del exportador → mismas probabilidades) + snapshot del estado de features.
+#     El notebook lo guarda con save_model → data/04_models/logit_<RUN_DATE>.joblib
+#   - FeatureSnapshot: último valor pre-partido de cada feature por equipo (home_*/away_*,
+#     h_*/a_*), por pareja (h2h) y por partido pendiente; cuotas → pimp*, Elo → EloIndex
+#   - LinearScorer: mediana + escalado + softmax en numpy (mismo resultado que predict_proba
+#     sin la sobrecarga de Pipeline en cada petición)
+#   - ModelRegistry: carga perezosa de artefactos con caché LRU
+#   - PredictionServer: HTTP/1.1 mínimo sobre asyncio (keep-alive, JSON)
+#       GET  /health   · GET /models
+#       POST /predict  {"run_date": "YYYY-MM-DD" | "latest", "fixtures": [{"home", "away",
+#                       "date"?, "B365H"?, "B365D"?, "B365A"?}, ...]}
+# ============================================================
+from __future__ import annotations
+
+import asyncio, json, re, threading, time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from engine.walkforward import LABELS, make_pipeline
+from engine.trace import traced
+
+ARTIFACT_VERSION = 1
+ARTIFACT_RE = re.compile(r"^logit_(\d{4}-\d{2}-\d{2})\.joblib$")
+ODDS_COLS = ("B365H", "B365D", "B365A")
+ODDS_FEATURES = ("pimp1", "pimpx", "pimp2", "market_home_logit", "market_draw_logit")
+SIDES = (("home_", "away_"), ("h_", "a_"))
+# PREPROCESADO celdas 41-47: estas diferencias son away - home
+REVERSED_DIFF = {"prev_position", "final_position_prev_season", "dynamic_pos_change_prev_season"}
+
+
+def artifact_name(run_date: str) -> str:
+    return f"logit_{pd.to_datetime(run_date).strftime('%Y-%m-%d')}.joblib"
+
+
+def default_elo_name(team: str) -> str:
+    """Nombre ClubElo por defecto (como _clubelo_name de LIMPIEZA sin el mapa explícito)."""
+    return str(team).title().replace(" ", "")
+
+
+# ============================================================
+# 1) Snapshot del estado de features
+# ============================================================
+def _split_side(col: str) -> tuple[int, str, str] | None:
+    """'home_x' → (0, 'home_', 'x'); 'a_elo' → (1, 'h_', 'elo'); otra cosa → None."""
+    for home, away in SIDES:
+        for side, pre in enumerate((home, away)):
+            if col.startswith(pre):
+                return side, home, col[len(pre):]
+    return None
+
+
+class FeatureSnapshot:
+    """
+    Estado pre-partido para construir las features de un partido cualquiera:
+      - fixtures: partidos pendientes (sin FTR) de df → valores exactos de df_final
+      - team:     por equipo, el valor de su fila más reciente en el lado en que jugó
+      - pair:     por pareja (h2h_*), fila más reciente en cualquiera de los dos sentidos
+    Cada feature se resuelve con un plan fijo (ver _make_plan); lo que no se puede reconstruir
+    queda NaN y lo imputa la mediana del pipeline.
+    """
+
+    def __init__(self, features: list[str], fixtures: dict, team: dict, pair: dict,
+                 team_cols: list[str], pair_cols: list[str], as_of: str | None = None):
+        self.features = list(features)
+        self.fixtures = fixtures          # (home, away) → (date, np.ndarray[features])
+        self.team = team                  # team → np.ndarray[team_cols]
+        self.pair = pair                  # (home, away) → (np.ndarray[pair_cols], swapped: bool)
+        self.team_cols = list(team_cols)
+        self.pair_cols = list(pair_cols)
+        self.as_of = as_of
+        self._plan = self._make_plan()
+
+    # ---------- construcción ----------
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, features: list[str], date_col: str = "Date", label_col: str = "FTR",
+                   home_col: str = "HomeTeam_norm", away_col: str = "AwayTeam_norm") -> "FeatureSnapshot":
+        d = df.copy()
+        d[date_col] = pd.to_datetime(d[date_col], errors="coerce")
+        d = d.sort_values(date_col, kind="mergesort").reset_index(drop=True)
+        num = lambda c: pd.to_numeric(d[c], errors="coerce").to_numpy(dtype=float)
+        home, away = d[home_col].astype(str).to_numpy(), d[away_col].astype(str).to_numpy()
+
+        # Partidos pendientes: las features de df_final ya son el estado más reciente
+        pending = ~d[label_col].astype(str).str.upper().str.strip().isin(LABELS).to_numpy()
+        X = np.column_stack([num(f) if f in d.columns else np.full(len(d), np.nan) for f in features]) \
+            if features else np.zeros((len(d), 0))
+        fixtures = {}
+        for i in np.flatnonzero(pending):
+            fixtures[(home[i], away[i])] = (d[date_col].iloc[i], X[i])
+
+        # Bases por equipo (home_x/away_x, h_x/a_x presentes a ambos lados) y por pareja (h2h)
+        need = set()
+        for f in features:
+            sp = _split_side(f)
+            if sp is not None:
+                need.add(sp[1] + sp[2])
+            elif f.endswith("_diff"):
+                for h, _ in SIDES:
+                    need.add(h + f[:-5])          # elo_diff → h_elo
+        team_cols, pair_cols = [], []
+        for col in sorted(need):
+            if col in d.columns and _other(col) in d.columns:
+                if _split_side(col)[2].startswith("h2h_"):
+                    pair_cols += [col, _other(col)]
+                else:
+                    team_cols.append(col)
+        pair_cols += [f for f in features if f.startswith("h2h_") and f.endswith("_diff") and f in d.columns]
+
+        team = {}
+        if team_cols:
+            H = np.column_stack([num(c) for c in team_cols])
+            A = np.column_stack([num(_other(c)) for c in team_cols])
+            # última aparición de cada equipo (el orden por fecha es estable: gana la fila posterior)
+            for i in range(len(d)):
+                team[home[i]] = H[i]
+                team[away[i]] = A[i]
+        pair = {}
+        if pair_cols:
+            P = np.column_stack([num(c) for c in pair_cols])
+            for i in range(len(d)):
+                pair[(home[i], away[i])] = (P[i], False)
+                pair[(away[i], home[i])] = (P[i], True)
+
+        as_of = d[date_col].max()
+        return cls(features, fixtures, team, pair, team_cols, pair_cols,
+                   None if pd.isna(as_of) else as_of.strftime("%Y-%m-%d"))
+
+    def to_payload(self) -> dict:
+        """dict de tipos básicos + numpy (lo que se guarda dentro del artefacto)."""
+        return {"features": self.features, "fixtures": self.fixtures, "team": self.team, "pair": self.pair,
+                "team_cols": self.team_cols, "pair_cols": self.pair_cols, "as_of": self.as_of}
+
+    @classmethod
+    def from_payload(cls, p: dict) -> "FeatureSnapshot":
+        return cls(p["features"], p["fixtures"], p["team"], p["pair"], p["team_cols"], p["pair_cols"], p["as_of"])
+
+    # ---------- plan por feature ----------
+    def _make_plan(self) -> list[tuple]:
+        """
+        (kind, ...) por feature, en el orden de self.features:
+          odds                     → desde las cuotas del partido (pimp*, logits de mercado)
+          elo                      → h_elo - a_elo (EloIndex si hay fecha, si no el estado)
+          team (side, j)           → self.team[equipo][j]
+          teamdiff (j, sign)       → sign * (home - away)
+          pair (j, swap_j, sign)   → self.pair; si la pareja se vio al revés, el otro lado
+                                     (home_h2h ↔ away_h2h) o la diferencia cambiada de signo
+          none                     → sólo disponible para partidos pendientes
+        """
+        tpos = {c: j for j, c in enumerate(self.team_cols)}
+        ppos = {c: j for j, c in enumerate(self.pair_cols)}
+        plan = []
+        for f in self.features:
+            sp = _split_side(f)
+            if f in ODDS_FEATURES:
+                plan.append(("odds", f))
+            elif f == "elo_diff" and "h_elo" in tpos:
+                plan.append(("elo", tpos["h_elo"]))
+            elif sp is not None and sp[1] + sp[2] in tpos:
+                plan.append(("team", sp[0], tpos[sp[1] + sp[2]]))
+            elif f in ppos and sp is not None:
+                plan.append(("pair", ppos[f], ppos[_other(f)], 1.0))
+            elif f in ppos:
+                plan.append(("pair", ppos[f], ppos[f], -1.0))
+            elif f.endswith("_diff") and any(h + f[:-5] in tpos for h, _ in SIDES):
+                col = next(h + f[:-5] for h, _ in SIDES if h + f[:-5] in tpos)
+                plan.append(("teamdiff", tpos[col], -1.0 if f[:-5] in REVERSED_DIFF else 1.0))
+            else:
+                plan.append(("none",))
+        return plan
+
+    # ---------- features de un lote ----------
+    def build(self, fixtures: list[dict], elo=None, elo_name: Callable[[str], str] = default_elo_name
+              ) -> tuple[np.ndarray, list[str]]:
+        """
+        fixtures: [{"home", "away", "date"?, "B365H"?, "B365D"?, "B365A"?}] → (X, source)
+        source = "fixture" (partido pendiente de df_final) o "state" (compuesto del estado).
+        """
+        n, k = len(fixtures), len(self.features)
+        X = np.full((n, k), np.nan)
+        source = []
+        for i, fx in enumerate(fixtures):
+            h, a = str(fx["home"]), str(fx["away"])
+            known = self.fixtures.get((h, a))
+            if known is not None:
+                X[i] = known[1]
+                source.append("fixture")
+            else:
+                source.append("state")
+                th, ta = self.team.get(h), self.team.get(a)
+                pr = self.pair.get((h, a))
+                for j, step in enumerate(self._plan):
+                    kind = step[0]
+                    if kind == "team":
+                        t = th if step[1] == 0 else ta
+                        if t is not None:
+                            X[i, j] = t[step[2]]
+                    elif kind == "teamdiff" and th is not None and ta is not None:
+                        X[i, j] = step[2] * (th[step[1]] - ta[step[1]])
+                    elif kind == "elo" and th is not None and ta is not None:
+                        X[i, j] = th[step[1]] - ta[step[1]]
+                    elif kind == "pair" and pr is not None:
+                        vals, swapped = pr
+                        X[i, j] = step[3] * vals[step[2]] if swapped else vals[step[1]]
+        self._apply_odds(X, fixtures)
+        if elo is not None:
+            self._apply_elo(X, fixtures, elo, elo_name)
+        return X, source
+
+    def _cols(self, kind: str) -> list[tuple[int, tuple]]:
+        return [(j, step) for j, step in enumerate(self._plan) if step[0] == kind]
+
+    def _apply_odds(self, X: np.ndarray, fixtures: list[dict]):
+        """Cuotas B365H/D/A del lote → pimp* normalizados (celda 61) y logits de mercado (celda 6)."""
+        cols = self._cols("odds")
+        if not cols:
+            return
+        O = np.array([[_num(fx.get(c)) for c in ODDS_COLS] for fx in fixtures])
+        ok = np.isfinite(O).all(axis=1) & (O > 0).all(axis=1)
+        if not ok.any():
+            return                      # sin cuotas: se quedan las de df_final (o NaN → mediana)
+        inv = 1.0 / O[ok]
+        p1, px, p2 = (inv / inv.sum(axis=1, keepdims=True)).T
+        vals = {"pimp1": p1, "pimpx": px, "pimp2": p2,
+                "market_home_logit": np.log((p1 + 1e-9) / (p2 + 1e-9)),
+                "market_draw_logit": np.log((px + 1e-9) / ((p1 + p2) / 2 + 1e-9))}
+        for j, step in cols:
+            X[ok, j] = vals[step[1]]
+
+    def _apply_elo(self, X: np.ndarray, fixtures: list[dict], elo, elo_name):
+        """Elo pre-partido a la fecha pedida (EloIndex) para los partidos que traen 'date'."""
+        cols = self._cols("elo")
+        rows = [i for i, fx in enumerate(fixtures) if fx.get("date")]
+        if not cols or not rows:
+            return
+        when = pd.to_datetime([fixtures[i]["date"] for i in rows], errors="coerce")
+        h = elo.lookup([elo_name(fixtures[i]["home"]) for i in rows], when)
+        a = elo.lookup([elo_name(fixtures[i]["away"]) for i in rows], when)
+        ok = np.isfinite(h) & np.isfinite(a)
+        for j, _ in cols:
+            X[np.asarray(rows)[ok], j] = (h - a)[ok]
+
+
+def _num(v) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _other(col: str) -> str:
+    """'home_x' ↔ 'away_x', 'h_x' ↔ 'a_x'."""
+    side, home, base = _split_side(col)
+    return (dict(SIDES)[home] if side == 0 else home) + base
+
+
+# ============================================================
+# 2) Artefacto de la ronda
+# ============================================================
+def round_train_index(df: pd.DataFrame, date_col: str = "Date", label_col: str = "FTR",
+                      n_seasons_window: int = 4, season_size: int = 380) -> np.ndarray:
+    """
+    Filas de entrenamiento de la última fecha futura en generate_future_predictions:
+    las train_window últimas etiquetadas anteriores a esa fecha (df ya ordenado por fecha).
+    """
+    dates = pd.to_datetime(df[date_col], errors="coerce").to_numpy()
+    valid = df[label_col].astype(str).str.upper().str.strip().isin(LABELS).to_numpy()
+    future = dates[~valid]
+    cut = future.max() if len(future) and not pd.isna(future.max()) else None
+    idx = np.flatnonzero(valid & (dates < cut)) if cut is not None else np.flatnonzero(valid)
+    train_window = n_seasons_window * season_size
+    if idx.size < train_window:
+        raise RuntimeError(f"Histórico insuficiente para el modelo de la ronda: {idx.size} < {train_window}")
+    return idx[-train_window:]
+
+
+@traced
+def build_round_artifact(df: pd.DataFrame, feature_cols: list[str], run_date: str, date_col: str = "Date",
+                         label_col: str = "FTR", n_seasons_window: int = 4, season_size: int = 380,
+                         recent_weight: float = 3.0, older_weight: float = 1.0, C: float = 1.0,
+                         max_iter: int = 1000, random_state: int = 42) -> dict:
+    """
+    Ajusta el pipeline de la ronda (mismos datos, pesos y semilla que generate_future_predictions)
+    y le añade el snapshot de features. Devuelve el dict que se guarda con save_model.
+    """
+    from threadpoolctl import threadpool_limits
+
+    d = df.copy()
+    d[date_col] = pd.to_datetime(d[date_col], errors="coerce")
+    d = d.sort_values(date_col, kind="mergesort").reset_index(drop=True)
+    idx = round_train_index(d, date_col, label_col, n_seasons_window, season_size)
+    sw = np.full(len(idx), older_weight, dtype=float)
+    sw[-season_size:] = recent_weight
+    X = d[list(feature_cols)].to_numpy(dtype=float)
+    y = d[label_col].astype(str).str.upper().str.strip().to_numpy()
+
+    pipe = make_pipeline(C=C, max_iter=max_iter, random_state=random_state)
+    with threadpool_limits(limits=1):
+        pipe.fit(X[idx], y[idx], logit__sample_weight=sw)
+    return {
+        "version": ARTIFACT_VERSION,
+        "run_date": pd.to_datetime(run_date).strftime("%Y-%m-%d"),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "features": list(feature_cols),
+        "classes": [str(c) for c in pipe.named_steps["logit"].classes_],
+        "params": {"C": C, "max_iter": max_iter, "n_seasons_window": n_seasons_window,
+                   "season_size": season_size, "recent_weight": recent_weight, "older_weight": older_weight},
+        "train": {"n": int(len(idx)), "from": str(d[date_col].iloc[idx[0]].date()),
+                  "to": str(d[date_col].iloc[idx[-1]].date())},
+        "pipeline": pipe,
+        "snapshot": FeatureSnapshot.from_frame(d, list(feature_cols), date_col, label_col).to_payload(),
+    }
+
+
+class LinearScorer:
+    """predict_proba de make_pipeline() ajustado, en numpy y con columnas fijas H/D/A."""
+
+    def __init__(self, pipe):
+        imp, scaler, logit = (pipe.named_steps[k] for k in ("imp", "scaler", "logit"))
+        self.median = imp.statistics_.astype(float)
+        self.mean = scaler.mean_.astype(float)
+        self.scale = scaler.scale_.astype(float)
+        classes = [str(c) for c in logit.classes_]
+        self.cols = [classes.index(c) if c in classes else -1 for c in LABELS]
+        coef, b = logit.coef_.astype(float), logit.intercept_.astype(float)
+        if coef.shape[0] == 1:                      # binario: decision_function de una sola fila
+            coef, b = np.vstack([-coef, coef]) / 2, np.array([-b[0], b[0]]) / 2
+        self.W = (coef / self.scale).T              # escalado plegado en los coeficientes
+        self.b = b - (self.mean / self.scale) @ coef.T
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        X = np.where(np.isnan(X), self.median, X)
+        Z = X @ self.W + self.b
+        Z -= Z.max(axis=1, keepdims=True)
+        E = np.exp(Z)
+        P = E / E.sum(axis=1, keepdims=True)
+        out = np.full((len(X), 3), np.nan)
+        for j, c in enumerate(self.cols):
+            if c >= 0:
+                out[:, j] = P[:, c]
+        return out
+
+
+# ============================================================
+# 3) Registro de modelos (carga perezosa + LRU)
+# ============================================================
+class ServedModel:
+    def __init__(self, artifact: dict):
+        self.run_date = artifact["run_date"]
+        self.features = artifact["features"]
+        self.meta = {k: artifact[k] for k in ("run_date", "created_at", "features", "classes", "params", "train")}
+        self.scorer = LinearScorer(artifact["pipeline"])
+        self.snapshot = FeatureSnapshot.from_payload(artifact["snapshot"])
+
+    def predict(self, fixtures: list[dict], elo=None, elo_name=default_elo_name) -> list[dict]:
+        X, source = self.snapshot.build(fixtures, elo=elo, elo_name=elo_name)
+        P = self.scorer.predict_proba(X)
+        ok = np.isfinite(P)
+        pick = np.where(ok.any(axis=1), np.argmax(np.where(ok, P, -np.inf), axis=1), -1).tolist()
+        missing = np.isnan(X).sum(axis=1).tolist()
+        P = np.where(ok, P, None).tolist()
+        out = []
+        for fx, p, y, src, miss in zip(fixtures, P, pick, source, missing):
+            out.append({"home": fx["home"], "away": fx["away"], "date": fx.get("date"),
+                        "proba_H": p[0], "proba_D": p[1], "proba_A": p[2],
+                        "y_pred": LABELS[y] if y >= 0 else None, "source": src, "n_imputed": miss})
+        return out
+
+
+class ModelRegistry:
+    """data/04_models/logit_<RUN_DATE>.joblib → ServedModel, cargado al primer uso (LRU de `capacity`)."""
+
+    def __init__(self, models_dir: str | Path, capacity: int = 4):
+        self.models_dir = Path(models_dir)
+        self.capacity = capacity
+        self._cache: OrderedDict[str, ServedModel] = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def available(self) -> list[str]:
+        if not self.models_dir.exists():
+            return []
+        return sorted(m.group(1) for p in self.models_dir.iterdir() if (m := ARTIFACT_RE.match(p.name)))
+
+    def resolve(self, run_date: str | None) -> str:
+        avail = self.available()
+        if not avail:
+            raise FileNotFoundError(f"No hay artefactos logit_*.joblib en {self.models_dir}")
+        if run_date in (None, "", "latest"):
+            return avail[-1]
+        rd = pd.to_datetime(run_date, errors="coerce")
+        if pd.isna(rd) or rd.strftime("%Y-%m-%d") not in avail:
+            raise FileNotFoundError(f"No hay modelo para RUN_DATE={run_date} (disponibles: {', '.join(avail)})")
+        return rd.strftime("%Y-%m-%d")
+
+    def peek(self, run_date: str) -> ServedModel | None:
+        with self._lock:
+            m = self._cache.get(run_date)
+            if m is not None:
+                self._cache.move_to_end(run_date)
+            return m
+
+    def get(self, run_date: str | None = None) -> ServedModel:
+        from joblib import load
+
+        key = self.resolve(run_date)
+        m = self.peek(key)
+        if m is not None:
+            return m
+        m = ServedModel(load(self.models_dir / artifact_name(key)))
+        with self._lock:
+            self.loads += 1
+            self._cache[key] = m
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+        return m
+
+    def cached(self) -> list[str]:
+        with self._lock:
+            return list(self._cache)
+
+
+# ============================================================
+# 4) Servidor HTTP (asyncio)
+# ============================================================
+class PredictionServer:
+    """
+    server = PredictionServer(ModelRegistry("data/04_models"), elo=EloIndex.from_store(...))
+    await server.start(); ...; await server.stop()      (o run_forever())
+    Modelos ya en caché → se puntúa en el propio bucle (sub-milisegundo por lote);
+    cargas de disco en un hilo para no bloquear el resto de conexiones.
+    """
+
+    def __init__(self, registry: ModelRegistry, elo=None, elo_name: Callable[[str], str] = default_elo_name,
+                 host: str = "127.0.0.1", port: int = 8765, max_batch: int = 1000):
+        self.registry = registry
+        self.elo = elo
+        self.elo_name = elo_name
+        self.host, self.port = host, port
+        self.max_batch = max_batch
+        self.requests = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def run_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    @property
+    def base(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    # ---------- HTTP ----------
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, path, version = line.decode("latin-1").split()
+                except ValueError:
+                    await self._send(writer, 400, {"error": "petición mal formada"}, keep=False)
+                    break
+                headers = {}
+                while (h := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # sin una longitud válida no se sabe dónde acaba el cuerpo: se cierra la conexión
+                    await self._send(writer, 400, {"error": "content-length inválido"}, keep=False)
+                    break
+                body = await reader.readexactly(length)
+                keep = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                code, payload = await self._route(method, path.split("?")[0], body)
+                await self._send(writer, code, payload, keep)
+                if not keep:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send(self, writer: asyncio.StreamWriter, code: int, payload: dict, keep: bool):
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                  500: "Internal Server Error"}.get(code, "")
+        body = json.dumps(payload, ensure_ascii=False, allow_nan=False, default=_json_default).encode("utf-8")
+        writer.write(f"HTTP/1.1 {code} {reason}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep else 'close'}\r\n\r\n"
+                     .encode("latin-1") + body)
+        await writer.drain()
+
+    async def _route(self, method: str, path: str, body: bytes) -> tuple[int, dict]:
+        self.requests += 1
+        try:
+            if path == "/health":
+                return 200, {"status": "ok", "cached": self.registry.cached(), "requests": self.requests}
+            if path == "/models":
+                return 200, {"available": self.registry.available(), "cached": self.registry.cached()}
+            if path == "/predict":
+                if method != "POST":
+                    return 405, {"error": "usa POST /predict"}
+                return 200, await self.predict(json.loads(body or b"{}"))
+            return 404, {"error": f"ruta desconocida: {path}"}
+        except FileNotFoundError as e:
+            return 404, {"error": str(e)}
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {"error": f"{type(e).__name__}: {e}"}
+        except Exception as e:  # noqa: BLE001 — el servidor no se cae por una petición
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    async def predict(self, req: dict) -> dict:
+        t0 = time.perf_counter()
+        if not isinstance(req, dict):
+            raise ValueError("el cuerpo debe ser un objeto JSON {fixtures: [...], run_date?}")
+        fixtures = req.get("fixtures")
+        if not isinstance(fixtures, list) or not fixtures:
+            raise ValueError("'fixtures' debe ser una lista no vacía de {home, away, ...}")
+        if len(fixtures) > self.max_batch:
+            raise ValueError(f"lote de {len(fixtures)} partidos > max_batch={self.max_batch}")
+        for fx in fixtures:
+            if not isinstance(fx, dict) or not fx.get("home") or not fx.get("away"):
+                raise ValueError("cada partido necesita 'home' y 'away'")
+        key = self.registry.resolve(req.get("run_date"))
+        model = self.registry.peek(key) or await asyncio.to_thread(self.registry.get, key)
+        preds = model.predict(fixtures, elo=self.elo, elo_name=self.elo_name)
+        return {"run_date": model.run_date, "features": len(model.features), "n": len(preds),
+                "ms": round((time.perf_counter() - t0) * 1e3, 3), "predictions": preds}
+
+
+def _json_default(o):
+    if isinstance(o, (pd.Timestamp, datetime)):
+        return o.isoformat()
+    if isinstance(o, np.generic):
+        return o.item()
+    raise TypeError(f"no serializable: {type(o).__name__}")
@@ -0,0 +1,231 @@
+# engine/stage_cache.py
+# ============================================================
+# CACHÉ DE ETAPAS POR HUELLA DE CONTENIDO (run_stage1.py / run_stage2.py)
+#  Cada etapa (notebook) declara sus entradas y salidas (rutas o globs relativos a la
+#  raíz, con {RUN_DATE}), sus parámetros y las etapas de las que depende. La huella es
+#  el sha256 de:
+#    - el propio notebook y el código de engine/ que importa,
+#    - los parámetros de papermill,
+#    - el contenido de cada entrada,
+#    - el contenido de las salidas de las etapas de las que depende (DAG).
+#  Si la huella coincide con la del manifest y las salidas siguen intactas, la etapa se
+#  salta. Una etapa saltada deja sus salidas igual, así que todo lo que cuelga de ella se
+#  salta también salvo que cambien sus propias entradas/código; y si una etapa se re-ejecuta
+#  pero produce salidas idénticas, las siguientes tampoco se repiten.
+#
+# Manifest: .cache/stages/manifest.json
+#   {"version": 1, "stages": {name: {fingerprint, inputs, outputs, params, ran_at, elapsed_s}}}
+# ============================================================
+from __future__ import annotations
+
+import ast, glob, hashlib, json, os, time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+CACHE_VERSION = 1
+DEFAULT_MANIFEST = Path(".cache/stages/manifest.json")
+
+
+@dataclass(frozen=True)
+class Stage:
+    """Etapa del pipeline: un notebook con sus entradas/salidas declaradas."""
+    name: str
+    notebook: str
+    inputs: tuple[str, ...] = ()
+    outputs: tuple[str, ...] = ()
+    params: dict = field(default_factory=dict)
+    deps: tuple[str, ...] = ()
+    code: tuple[str, ...] = ()          # módulos de engine/ que usa el notebook (engine_code)
+
+    def expand(self, patterns: tuple[str, ...]) -> list[Path]:
+        """Resuelve {RUN_DATE} y los globs (orden estable)."""
+        run_date = str(self.params.get("RUN_DATE", ""))
+        paths: set[Path] = set()
+        for patt in patterns:
+            patt = patt.replace("{RUN_DATE}", run_date)
+            if glob.has_magic(patt):
+                paths.update(Path(p) for p in glob.glob(patt, recursive=True) if Path(p).is_file())
+            else:
+                paths.add(Path(patt))
+        return sorted(paths)
+
+
+# ============================================================
+# 1) Hash de ficheros
+# ============================================================
+_HASH_MEMO: dict[tuple[str, int, int], str] = {}
+
+
+def file_sha256(path: Path) -> str | None:
+    """sha256 del contenido (None si no existe). Memo por (ruta, tamaño, mtime) en el proceso."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (str(path), st.st_size, st.st_mtime_ns)
+    if key not in _HASH_MEMO:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        _HASH_MEMO[key] = h.hexdigest()
+    return _HASH_MEMO[key]
+
+
+def hash_paths(paths: list[Path]) -> dict[str, str | None]:
+    return {p.as_posix(): file_sha256(p) for p in paths}
+
+
+# ============================================================
+# 1b) Código de engine/ del que depende una etapa
+# ============================================================
+ENGINE_DIR = Path(__file__).resolve().parent
+
+
+def _source_of(path: Path) -> list[str]:
+    """Bloques de código de un .py o de las celdas de código de un .ipynb (sin magics/shell)."""
+    text = path.read_text(encoding="utf-8")
+    if path.suffix != ".ipynb":
+        return [text]
+    blocks = []
+    for cell in json.loads(text).get("cells", []):
+        if cell.get("cell_type") != "code":
+            continue
+        src = "".join(cell.get("source", []))
+        blocks.append("\n".join("" if ln.lstrip().startswith(("%", "!")) else ln for ln in src.splitlines()))
+    return blocks
+
+
+def engine_imports(path: Path) -> set[str]:
+    """Módulos engine.* importados (a cualquier nivel, también dentro de funciones) por path."""
+    mods: set[str] = set()
+    for block in _source_of(Path(path)):
+        try:
+            tree = ast.parse(block)
+        except SyntaxError:
+            continue
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+                if node.module == "engine":
+                    names += [f"engine.{a.name}" for a in node.names]
+            else:
+                continue
+            mods.update(n.split(".")[1] for n in names if n.startswith("engine."))
+    return {m for m in mods if (ENGINE_DIR / f"{m}.py").is_file()}
+
+
+def engine_code(*entry: str | Path) -> tuple[str, ...]:
+    """
+    Cierre transitivo de los imports engine.* de los ficheros de entrada (notebook de la
+    etapa y/o módulos que llama directamente), como rutas engine/<mod>.py. Así la huella de
+    la etapa cambia con cualquier módulo que ejecute, también los importados indirectamente.
+    """
+    seen: set[str] = set()
+    todo = set().union(*(engine_imports(Path(p)) for p in entry))
+    while todo:
+        mod = todo.pop()
+        if mod not in seen:
+            seen.add(mod)
+            todo |= engine_imports(ENGINE_DIR / f"{mod}.py") - seen
+    return tuple(f"engine/{m}.py" for m in sorted(seen))
+
+
+# ============================================================
+# 2) Manifest + decisión de ejecutar/saltar
+# ============================================================
+class StageCache:
+    def __init__(self, manifest_path: str | Path = DEFAULT_MANIFEST, notebooks_dir: str | Path = "notebooks"):
+        self.manifest_path = Path(manifest_path)
+        self.notebooks_dir = Path(notebooks_dir)
+        self.fingerprints: dict[str, str] = {}   # etapa → huella de sus salidas (esta ejecución)
+        data = None
+        if self.manifest_path.exists():
+            try:
+                data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = None
+        if not data or data.get("version") != CACHE_VERSION:
+            data = {"version": CACHE_VERSION, "stages": {}}
+        self.data = data
+
+    def fingerprint(self, stage: Stage) -> tuple[str, dict]:
+        """Huella de la etapa + detalle de entradas (para el manifest)."""
+        inputs = hash_paths([self.notebooks_dir / stage.notebook, *map(Path, stage.code), *stage.expand(stage.inputs)])
+        missing_deps = [d for d in stage.deps if d not in self.fingerprints]
+        if missing_deps:
+            raise KeyError(f"Etapa {stage.name}: dependencias sin resolver {missing_deps}")
+        payload = {
+            "notebook": stage.notebook,
+            "params": stage.params,
+            "inputs": inputs,
+            "deps": {d: self.fingerprints[d] for d in stage.deps},
+        }
+        blob = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(blob).hexdigest(), inputs
+
+    def is_fresh(self, stage: Stage, fp: str, inputs: dict) -> tuple[bool, str]:
+        entry = self.data["stages"].get(stage.name)
+        if entry is None:
+            return False, "sin entrada en el manifest"
+        if entry.get("fingerprint") != fp:
+            changed = [p for p, h in inputs.items() if entry.get("inputs", {}).get(p) != h]
+            return False, f"entradas cambiadas: {changed[:5]}" if changed else "parámetros/dependencias cambiadas"
+        recorded = entry.get("outputs", {})
+        if not recorded:
+            return False, "sin salidas registradas"
+        for p, h in recorded.items():
+            if file_sha256(Path(p)) != h:
+                return False, f"salida ausente o modificada: {p}"
+        return True, "huella idéntica"
+
+    def record(self, stage: Stage, fp: str, inputs: dict, elapsed_s: float):
+        outputs = {p: h for p, h in hash_paths(stage.expand(stage.outputs)).items() if h is not None}
+        self.data["stages"][stage.name] = {
+            "fingerprint": fp,
+            "notebook": stage.notebook,
+            "params": stage.params,
+            "inputs": inputs,
+            "outputs": outputs,
+            "ran_at": datetime.now().isoformat(timespec="seconds"),
+            "elapsed_s": round(elapsed_s, 2),
+        }
+        self.save()
+        return outputs
+
+    def invalidate(self, name: str):
+        if self.data["stages"].pop(name, None) is not None:
+            self.save()
+
+    def save(self):
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+
+    def run(self, stage: Stage, runner: Callable[[Stage], None], force: bool = False) -> bool:
+        """Ejecuta la etapa si su huella cambió. Devuelve True si se ejecutó."""
+        fp, inputs = self.fingerprint(stage)
+        fresh, reason = (False, "forzado") if force else self.is_fresh(stage, fp, inputs)
+        if fresh:
+            print(f"[CACHE] ⏭️  {stage.name} ({stage.notebook}) sin cambios → se salta.")
+            outputs = self.data["stages"][stage.name]["outputs"]
+            ran = False
+        else:
+            print(f"[CACHE] ▶️  {stage.name} ({stage.notebook}): {reason}.")
+            t0 = time.perf_counter()
+            runner(stage)
+            if set(stage.expand(stage.inputs)) & set(stage.expand(stage.outputs)):
+                # la etapa reescribe alguna de sus entradas (p.ej. alias de equipos): huella tras
+                # la ejecución, para que la siguiente no vea esa escritura como un cambio
+                fp, inputs = self.fingerprint(stage)
+            outputs = self.record(stage, fp, inputs, time.perf_counter() - t0)
+            ran = True
+        blob = json.dumps(outputs, sort_keys=True).encode("utf-8")
+        self.fingerprints[stage.name] = hashlib.sha256(blob).hexdigest()
+        return ran
+
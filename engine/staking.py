@@ -0,0 +1,373 @@
+# engine/staking.py
+# ============================================================
+# BACKTEST DE ESTRATEGIAS DE STAKE SOBRE LOS MATCHLOGS (outputs/matchlogs_{s}.csv)
+#  Antes el ROI salía de una única regla (1 unidad al pronóstico del modelo si la cuota es
+#  válida: compute_accuracy_roi en MODELOS y la columna profit de los matchlogs) y
+#  build_cumprofit_curves_from_matchlogs.py sólo podía repetir esa serie. Ahora:
+#   - BacktestData: proba_H/D/A, B365H/D/A y resultado de todas las temporadas como arrays
+#     (n, 3), ordenados por temporada y fecha
+#   - make_grid(): rejilla de estrategias (selección modelo/valor, stake plano o Kelly
+#     fraccional, umbral de ventaja, cuota máxima, probabilidad mínima)
+#   - backtest(): cada temporada es una matriz (estrategias × partidos): banca acumulada
+#     (cumsum para stake plano, cumprod para Kelly sobre la banca), drawdown
+#     (np.maximum.accumulate) y ROI en operaciones 2-D, sin bucles por partido ni estrategia
+#   - export_staking(): tabla por estrategia y temporada, leaderboard y las curvas de las
+#     mejores elegidas en walk-forward (sólo con temporadas anteriores) en el formato JSON de
+#     cumprofit (engine/cumprofit.payload) → <base>/staking/. Es opcional (--staking en
+#     build_cumprofit_curves_from_matchlogs.py): no forma parte de lo que se publica por defecto
+#  La estrategia "model|flat" sin filtros reproduce la columna profit de los matchlogs y
+#  "market|flat" la del mercado (matchlogs_market).
+# ============================================================
+from __future__ import annotations
+
+import itertools, json
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from engine.cumprofit import TXT2LABEL, detect_seasons, open_store, payload
+from engine.outputs_store import STORE_DIR
+from engine.trace import traced
+
+LABELS = np.array(["H", "D", "A"])
+WEB_LABELS = np.array([TXT2LABEL[l] for l in LABELS])     # textos de la serie web (Home/Draw/Away)
+PROBA_COLS = ["proba_H", "proba_D", "proba_A"]
+ODDS_COLS = ["B365H", "B365D", "B365A"]
+STAKING_COLS = ["Season", "Date", "HomeTeam_norm", "AwayTeam_norm", "y_true", "y_pred"] + PROBA_COLS + ODDS_COLS
+MIN_ODDS = 1.01                       # misma cuota mínima que compute_accuracy_roi
+PICKS = ("model", "value", "market")  # pronóstico del modelo · máxima EV · favorito de Bet365
+STAKES = ("flat", "kelly")
+BANKROLL = 100.0                      # banca inicial (unidades): base del Kelly y del drawdown %
+STAKING_DIR = "staking"
+
+# Rejilla por defecto del export: 2 selecciones × (plano + 4 Kelly) × 5 ventajas × 5 cuotas × 3 probs
+DEFAULT_GRID = dict(picks=("model", "value"), stakes=("flat", "kelly"), kelly_fractions=(0.1, 0.25, 0.5, 1.0),
+                    min_edges=(-np.inf, 0.0, 0.02, 0.05, 0.1), max_odds=(np.inf, 2.5, 4.0, 6.0, 10.0),
+                    min_probs=(0.0, 0.35, 0.45))
+
+
+# ============================================================
+# 1) Datos
+# ============================================================
+def load_matchlogs(base: str | Path = "outputs", source: str = "auto",
+                   store_dir: str | Path = STORE_DIR) -> pd.DataFrame:
+    """Columnas STAKING_COLS de todos los matchlogs del modelo (almacén de outputs o CSV de base/)."""
+    base = Path(base)
+    store = open_store(base, source, store_dir)
+    if store is not None:
+        return store.read("matchlogs", columns=STAKING_COLS)
+    frames = [pd.read_csv(base / f"matchlogs_{s}.csv", usecols=lambda c: c in STAKING_COLS)
+              for s in detect_seasons(base)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=STAKING_COLS)
+
+
+@dataclass
+class BacktestData:
+    """Partidos de todas las temporadas como arrays; `bounds[s]` = (inicio, fin) de la temporada s."""
+    season: np.ndarray
+    date: np.ndarray
+    home: np.ndarray
+    away: np.ndarray
+    probs: np.ndarray      # (n, 3) H/D/A
+    odds: np.ndarray       # (n, 3) B365H/D/A (NaN si falta)
+    outcome: np.ndarray    # (n,) 0/1/2 = H/D/A, -1 sin resultado
+    model_pick: np.ndarray # (n,) pronóstico del modelo (y_pred o argmax de probs)
+    bounds: dict
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "BacktestData":
+        df = df.assign(Date=pd.to_datetime(df["Date"], errors="coerce"))
+        df = df.sort_values(["Season", "Date"], kind="mergesort").reset_index(drop=True)
+        probs = df[PROBA_COLS].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+        odds = df[ODDS_COLS].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+        code = {l: i for i, l in enumerate(LABELS)}
+        outcome = df["y_true"].astype(str).str.upper().str.strip().map(code).fillna(-1).to_numpy(np.int8)
+        pick = np.nanargmax(np.where(np.isnan(probs), -np.inf, probs), axis=1).astype(np.int8)
+        if "y_pred" in df.columns:
+            y = df["y_pred"].astype(str).str.upper().str.strip().map(code)
+            pick = np.where(y.notna(), y.fillna(0).to_numpy(np.int8), pick).astype(np.int8)
+        season = df["Season"].astype(int).to_numpy()
+        cut = np.flatnonzero(np.diff(season)) + 1
+        starts, stops = np.r_[0, cut], np.r_[cut, len(season)]
+        bounds = {int(season[a]): (int(a), int(b)) for a, b in zip(starts, stops) if b > a}
+        return cls(season=season, date=df["Date"].dt.strftime("%Y-%m-%d").to_numpy(),
+                   home=df["HomeTeam_norm"].astype(str).to_numpy(), away=df["AwayTeam_norm"].astype(str).to_numpy(),
+                   probs=probs, odds=odds, outcome=outcome, model_pick=pick, bounds=bounds)
+
+    def selection(self, pick: str) -> dict[str, np.ndarray]:
+        """Resultado elegido por `pick` en cada partido: índice, prob, cuota, ventaja, retorno a 1 unidad."""
+        if pick == "model":
+            j = self.model_pick
+        elif pick == "value":
+            ev = np.where(np.isfinite(self.odds), self.probs * self.odds - 1.0, -np.inf)
+            j = ev.argmax(axis=1).astype(np.int8)
+        elif pick == "market":
+            j = np.where(np.isfinite(self.odds), self.odds, np.inf).argmin(axis=1).astype(np.int8)
+        else:
+            raise ValueError(f"pick desconocido: {pick!r} (usa {PICKS})")
+        rows = np.arange(len(j))
+        p, o = self.probs[rows, j], self.odds[rows, j]
+        valid = (self.outcome >= 0) & np.isfinite(o) & (o >= MIN_ODDS) & np.isfinite(p)
+        won = self.outcome == j
+        ret = np.where(valid, np.where(won, o - 1.0, -1.0), 0.0)
+        edge = np.where(valid, p * o - 1.0, -np.inf)
+        return {"j": j, "p": np.where(valid, p, 0.0), "o": np.where(valid, o, np.nan), "edge": edge,
+                "ret": ret, "valid": valid, "won": won & valid}
+
+
+# ============================================================
+# 2) Rejilla de estrategias
+# ============================================================
+def _fmt(x: float) -> str:
+    return f"{x:g}"
+
+
+def make_grid(picks=DEFAULT_GRID["picks"], stakes=DEFAULT_GRID["stakes"],
+              kelly_fractions=DEFAULT_GRID["kelly_fractions"], min_edges=DEFAULT_GRID["min_edges"],
+              max_odds=DEFAULT_GRID["max_odds"], min_probs=DEFAULT_GRID["min_probs"]) -> pd.DataFrame:
+    """
+    Una fila por estrategia: pick, stake, fraction (NaN en plano), min_edge, max_odds, min_prob
+    y strategy (id legible, p. ej. "value|kelly0.25|e0.02|o4|p0.35").
+    """
+    rows = []
+    for pick, stake in itertools.product(picks, stakes):
+        if stake not in STAKES:
+            raise ValueError(f"stake desconocido: {stake!r} (usa {STAKES})")
+        fractions = (np.nan,) if stake == "flat" else kelly_fractions
+        for f, e, o, p in itertools.product(fractions, min_edges, max_odds, min_probs):
+            rows.append((pick, stake, float(f), float(e), float(o), float(p)))
+    grid = pd.DataFrame(rows, columns=["pick", "stake", "fraction", "min_edge", "max_odds", "min_prob"])
+    grid["strategy"] = [
+        f"{r.pick}|{'flat' if r.stake == 'flat' else f'kelly{_fmt(r.fraction)}'}"
+        f"|e{_fmt(r.min_edge)}|o{_fmt(r.max_odds)}|p{_fmt(r.min_prob)}"
+        for r in grid.itertuples(index=False)
+    ]
+    return grid.drop_duplicates("strategy").reset_index(drop=True)
+
+
+def baseline_grid() -> pd.DataFrame:
+    """Las dos reglas de siempre: 1 unidad al pronóstico del modelo y al favorito del mercado."""
+    return make_grid(picks=("model", "market"), stakes=("flat",), min_edges=(-np.inf,), max_odds=(np.inf,),
+                     min_probs=(0.0,))
+
+
+# ============================================================
+# 3) Backtest
+# ============================================================
+def _season_paths(sel: dict, a: int, b: int, g: pd.DataFrame, bankroll: float) -> dict[str, np.ndarray]:
+    """Matrices (estrategias × partidos) de una temporada para estrategias con el mismo pick y stake."""
+    edge, o, p, ret = sel["edge"][a:b], sel["o"][a:b], sel["p"][a:b], sel["ret"][a:b]
+    bet = (sel["valid"][a:b][None, :]
+           & (edge[None, :] >= g["min_edge"].to_numpy()[:, None])
+           & (np.nan_to_num(o, nan=np.inf)[None, :] <= g["max_odds"].to_numpy()[:, None])
+           & (p[None, :] >= g["min_prob"].to_numpy()[:, None]))
+    if g["stake"].iat[0] == "flat":
+        stake = bet.astype(float)
+        pnl = np.where(bet, ret[None, :], 0.0)
+        bank = bankroll + np.cumsum(pnl, axis=1)
+    else:
+        ok = np.isfinite(o) & (o > 1.0)
+        kelly = np.clip(np.divide(edge, o - 1.0, out=np.zeros_like(edge), where=ok), 0.0, 1.0)
+        f = np.where(bet, kelly[None, :] * g["fraction"].to_numpy()[:, None], 0.0)
+        bank = bankroll * np.cumprod(1.0 + f * ret[None, :], axis=1)
+        prev = np.concatenate([np.full((len(g), 1), bankroll), bank[:, :-1]], axis=1)
+        stake = f * prev
+        bet = stake > 0
+    return {"bet": bet, "stake": stake, "bank": bank}
+
+
+def _season_metrics(paths: dict, won: np.ndarray, bankroll: float) -> dict[str, np.ndarray]:
+    bet, stake, bank = paths["bet"], paths["stake"], paths["bank"]
+    peak = np.maximum.accumulate(np.maximum(bank, bankroll), axis=1)
+    n_bets = bet.sum(axis=1)
+    staked = stake.sum(axis=1)
+    profit = bank[:, -1] - bankroll
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {"n_bets": n_bets, "staked": staked, "profit": profit,
+                "roi": np.where(staked > 0, profit / staked, np.nan),
+                "hit_rate": np.where(n_bets > 0, (bet & won[None, :]).sum(axis=1) / n_bets, np.nan),
+                "max_drawdown": (peak - bank).max(axis=1),
+                "max_drawdown_pct": ((peak - bank) / peak).max(axis=1),
+                "min_bank": bank.min(axis=1), "final_bank": bank[:, -1]}
+
+
+@dataclass
+class BacktestResult:
+    grid: pd.DataFrame
+    by_season: pd.DataFrame   # una fila por (estrategia, temporada)
+    data: BacktestData
+    bankroll: float
+
+    def leaderboard(self, sort_by: str = "roi", min_bets: int = 0, seasons=None) -> pd.DataFrame:
+        """
+        Agregado por estrategia (ROI sobre lo apostado) de todas las temporadas o sólo de
+        `seasons` (p.ej. las anteriores a la que se evalúa, ver walkforward).
+        """
+        by_season = self.by_season if seasons is None else self.by_season[self.by_season["Season"].isin(seasons)]
+        g = by_season.groupby("strategy", sort=False)
+        board = g.agg(seasons=("Season", "size"), n_bets=("n_bets", "sum"), staked=("staked", "sum"),
+                      profit=("profit", "sum"), seasons_positive=("profit", lambda s: int((s > 0).sum())),
+                      worst_season_profit=("profit", "min"), max_drawdown=("max_drawdown", "max"),
+                      max_drawdown_pct=("max_drawdown_pct", "max"))
+        board["roi"] = board["profit"] / board["staked"].where(board["staked"] > 0)
+        board = self.grid.set_index("strategy").join(board, how="inner").reset_index()
+        board = board[board["n_bets"] >= min_bets]
+        return board.sort_values([sort_by, "profit"], ascending=False, kind="mergesort").reset_index(drop=True)
+
+    def walkforward(self, top: int = 5, sort_by: str = "roi", min_bets: int = 50) -> pd.DataFrame:
+        """
+        Selección fuera de muestra: para cada temporada, las `top` mejores estrategias con el
+        leaderboard de las temporadas anteriores, y su resultado en esa temporada. La primera
+        temporada no tiene historia y no entra. Una fila por (temporada, puesto).
+        """
+        seasons = sorted(self.data.bounds)
+        met = self.by_season.set_index(["strategy", "Season"])
+        rows = []
+        for k, season in enumerate(seasons[1:], start=1):
+            board = self.leaderboard(sort_by=sort_by, min_bets=min_bets, seasons=seasons[:k]).head(top)
+            for rank, (strategy, train_roi) in enumerate(zip(board["strategy"], board["roi"]), start=1):
+                m = met.loc[(strategy, season)]
+                rows.append({"test_season": int(season), "rank": rank, "strategy": strategy,
+                             "train_seasons": k, "train_roi": float(train_roi), "n_bets": int(m["n_bets"]),
+                             "staked": float(m["staked"]), "profit": float(m["profit"]),
+                             "roi": float(m["profit"] / m["staked"]) if m["staked"] > 0 else np.nan})
+        return pd.DataFrame(rows, columns=["test_season", "rank", "strategy", "train_seasons", "train_roi",
+                                           "n_bets", "staked", "profit", "roi"])
+
+    def curve(self, strategy: str, season: int) -> pd.DataFrame:
+        """Serie de una estrategia en una temporada con las columnas de cumprofit (series_df)."""
+        row = self.grid[self.grid["strategy"] == strategy]
+        if row.empty:
+            raise KeyError(strategy)
+        a, b = self.data.bounds[int(season)]
+        sel = self.data.selection(row["pick"].iat[0])
+        paths = _season_paths(sel, a, b, row, self.bankroll)
+        mkt = self.data.selection("market")
+        m_ret = np.diff(np.r_[self.bankroll, paths["bank"][0]])
+        b_ret = np.where(mkt["valid"][a:b], mkt["ret"][a:b], 0.0)
+        n = b - a
+        true_txt = np.where(self.data.outcome[a:b] >= 0, WEB_LABELS[np.clip(self.data.outcome[a:b], 0, 2)], "")
+        return pd.DataFrame({
+            "match_num": np.arange(1, n + 1, dtype=int),
+            "date": self.data.date[a:b],
+            "model_cum": np.round(np.cumsum(m_ret), 3),
+            "bet365_cum": np.round(np.cumsum(b_ret), 3),
+            "model_ret": np.round(m_ret, 3),
+            "bet365_ret": np.round(b_ret, 3),
+            "home": self.data.home[a:b],
+            "away": self.data.away[a:b],
+            "true_txt": true_txt,
+            "model_txt": np.where(paths["bet"][0], WEB_LABELS[sel["j"][a:b]], ""),
+            "bet365_txt": WEB_LABELS[mkt["j"][a:b]],
+        })
+
+
+@traced
+def backtest(data: BacktestData, grid: pd.DataFrame | None = None, bankroll: float = BANKROLL,
+             chunk: int = 4096) -> BacktestResult:
+    """
+    Todas las estrategias de `grid` en todas las temporadas (la banca se reinicia cada temporada).
+    Las estrategias se agrupan por (pick, stake) y se procesan en bloques de `chunk` filas
+    para acotar la memoria de las matrices (estrategias × partidos).
+    Stake plano: 1 unidad por apuesta. Kelly: fracción × Kelly de la banca antes del partido
+    (los partidos del mismo día se liquidan en orden).
+    """
+    grid = make_grid() if grid is None else grid.reset_index(drop=True)
+    out = []
+    for (pick, _stake), g in grid.groupby(["pick", "stake"], sort=False):
+        sel = data.selection(pick)
+        for k0 in range(0, len(g), chunk):
+            gc = g.iloc[k0:k0 + chunk]
+            for season, (a, b) in data.bounds.items():
+                met = _season_metrics(_season_paths(sel, a, b, gc, bankroll), sel["won"][a:b], bankroll)
+                out.append(pd.DataFrame({"strategy": gc["strategy"].to_numpy(), "Season": season,
+                                         "n_matches": b - a, **met}))
+    by_season = pd.concat(out, ignore_index=True) if out else pd.DataFrame()
+    if not by_season.empty:
+        by_season = by_season.sort_values(["strategy", "Season"], kind="mergesort").reset_index(drop=True)
+    return BacktestResult(grid=grid, by_season=by_season, data=data, bankroll=bankroll)
+
+
+# ============================================================
+# 4) Export (formato JSON de cumprofit)
+# ============================================================
+def _slug(strategy: str) -> str:
+    return strategy.replace("|", "_").replace("-", "m")
+
+
+def export_staking(result: BacktestResult, base: str | Path = "outputs", top: int = 5, sort_by: str = "roi",
+                   min_bets: int = 50, layout: str = "rows") -> list[dict]:
+    """
+    <base>/staking/: staking_by_season.csv, staking_leaderboard.csv/.json (todas las
+    temporadas, descriptivo), staking_walkforward.csv (selección fuera de muestra, ver
+    BacktestResult.walkforward) y curves/cumprofit_<estrategia>_<s>.json con el mismo payload
+    que cumprofit_curves (model = estrategia, bet365 = 1 unidad al favorito). Las curvas de
+    cada temporada son las de las `top` elegidas con las temporadas anteriores (+ las reglas
+    base), nunca las mejores a posteriori. Devuelve las filas del índice de curvas.
+    """
+    out_dir = Path(base) / STAKING_DIR
+    curves_dir = out_dir / "curves"
+    curves_dir.mkdir(parents=True, exist_ok=True)
+
+    result.by_season.to_csv(out_dir / "staking_by_season.csv", index=False)
+    board = result.leaderboard(sort_by=sort_by, min_bets=min_bets)
+    board.to_csv(out_dir / "staking_leaderboard.csv", index=False)
+    (out_dir / "staking_leaderboard.json").write_text(
+        board.head(100).replace({np.inf: None, -np.inf: None}).to_json(orient="records", force_ascii=False),
+        encoding="utf-8")
+    wf = result.walkforward(top=top, sort_by=sort_by, min_bets=min_bets)
+    wf.to_csv(out_dir / "staking_walkforward.csv", index=False)
+
+    baselines = [s for s in baseline_grid()["strategy"] if s in set(result.grid["strategy"])]
+    chosen = {season: [(s, "baseline") for s in baselines] for season in result.data.bounds}
+    for season, strategy in zip(wf["test_season"], wf["strategy"]):
+        if strategy not in baselines:
+            chosen[season].append((strategy, "walkforward"))
+    grid = result.grid.set_index("strategy")
+    mkt_valid = result.data.selection("market")["valid"]
+    index_rows = []
+    for season, strategies in chosen.items():
+        for strategy, selected_by in strategies:
+            params = grid.loc[strategy].replace({np.inf: None, -np.inf: None})
+            series_df = result.curve(strategy, season)
+            met = result.by_season[(result.by_season["strategy"] == strategy) & (result.by_season["Season"] == season)]
+            staked = float(met["staked"].iat[0]) if len(met) else 0.0
+            final_m, final_b = float(series_df["model_cum"].iloc[-1]), float(series_df["bet365_cum"].iloc[-1])
+            a, b = result.data.bounds[season]
+            n_mkt = int(mkt_valid[a:b].sum())
+            summary = {"train_until": int(season - 1), "test_season": int(season), "n_matches": int(len(series_df)),
+                       "profit_model": final_m, "profit_bet365": final_b,
+                       "roi_model": final_m / staked if staked > 0 else 0.0,
+                       "roi_bet365": final_b / n_mkt if n_mkt else 0.0}
+            body = payload(series_df, summary, layout)
+            body["strategy"] = {"id": strategy, "selected_by": selected_by,
+                                **{k: (None if pd.isna(v) else v) for k, v in params.items()}}
+            name = f"cumprofit_{_slug(strategy)}_{season}.json"
+            (curves_dir / name).write_text(json.dumps(body, ensure_ascii=False), encoding="utf-8")
+            index_rows.append({"strategy": strategy, "selected_by": selected_by, "test_season": int(season),
+                               "n_bets": int(met["n_bets"].iat[0]), "profit_model": final_m,
+                               "roi_model": summary["roi_model"], "json_file": name})
+    (out_dir / "staking_curves_index.json").write_text(json.dumps(index_rows, ensure_ascii=False, indent=2),
+                                                       encoding="utf-8")
+    print(f"[STAKING] {len(result.grid)} estrategias × {len(result.data.bounds)} temporadas → {out_dir} "
+          f"({len(index_rows)} curvas, selección walk-forward top-{top})")
+    return index_rows
+
+
+@traced
+def build_staking(base: str | Path = "outputs", source: str = "auto", grid: pd.DataFrame | None = None,
+                  top: int = 5, layout: str = "rows", out: str | Path | None = None,
+                  store_dir: str | Path = STORE_DIR) -> list[dict]:
+    """
+    Matchlogs de base/ → backtest de la rejilla → export_staking en out/staking (por defecto
+    base/). [] si no hay matchlogs con probas y cuotas.
+    """
+    df = load_matchlogs(base, source, store_dir)
+    missing = [c for c in STAKING_COLS if c not in df.columns and c != "y_pred"]
+    if df.empty or missing:
+        print(f"[STAKING] Sin matchlogs utilizables en {base} (faltan {missing or 'filas'}); se omite.")
+        return []
+    return export_staking(backtest(BacktestData.from_frame(df), grid), base if out is None else out,
+                          top=top, layout=layout)
@@ -0,0 +1,437 @@
+# engine/sweep.py
+# ============================================================
+# BARRIDO DE HIPERPARÁMETROS Y SETS DE FEATURES DEL WALK-FORWARD (MODELOS.ipynb, celdas 10 y 14)
+#  Antes: cada combinación (FEATURES_*, C, recent_weight, n_seasons_window) = editar la celda
+#  y relanzar el walk-forward completo. Ahora una pasada por las fechas evalúa toda la rejilla:
+#   - ventanas train/test por fecha calculadas una vez (por n_seasons_window)
+#   - mediana + media/escala una vez por fecha sobre la UNIÓN de features (SlidingImputeScale
+#     de engine/walkforward.py): son por columna y no dependen de C ni de los pesos, así que
+#     cada set de features es una selección de columnas de la misma matriz
+#   - todas las configuraciones (set × C × pesos) en un único L-BFGS por fecha: la función
+#     objetivo es la suma de las de cada configuración (la misma que LogisticRegression
+#     multinomial lbfgs de sklearn), con las columnas fuera de su set fijadas a 0
+#   - arranque en caliente desde la solución del día anterior; sin solución previa (primera
+#     fecha de cada bloque) se recorre el camino de regularización: cada C arranca de la
+#     solución de la C anterior
+#   - bloques contiguos de fechas en paralelo (joblib), como run_fit_predict_tasks
+#   - leaderboard: accuracy, log-loss, Brier y ROI (Bet365, entre apuestas) por temporada
+# ============================================================
+from __future__ import annotations
+
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import optimize
+
+from engine.walkforward import (
+    LABELS, SlidingImputeScale, _assemble_preds, _finalize_preds, _prepare_frame, _transform,
+)
+from engine.trace import traced
+
+EPS = 1e-15
+ODDS_COLS = ("B365H", "B365D", "B365A")
+GRID_COLS = ["config", "features", "C", "weights", "n_seasons_window"]
+
+
+# ============================================================
+# 1) Rejilla de configuraciones
+# ============================================================
+def make_grid(feature_sets: dict[str, list[str]], Cs=(1.0,), weight_schemes: dict[str, tuple[float, float]] | None = None,
+              windows=(4,)) -> pd.DataFrame:
+    """
+    Producto cartesiano sets × C × esquemas de peso × ventanas (una fila por configuración).
+    weight_schemes: nombre → (recent_weight, older_weight); por defecto el de WF_KWARGS (3/1).
+    """
+    weight_schemes = weight_schemes or {"r3": (3.0, 1.0)}
+    rows = [
+        {"features": fs, "C": float(C), "weights": ws, "n_seasons_window": int(win)}
+        for win, fs, ws, C in itertools.product(windows, feature_sets, weight_schemes, sorted(Cs))
+    ]
+    grid = pd.DataFrame(rows)
+    grid.insert(0, "config", [f"{r.features}|C={r.C:g}|w={r.weights}|win={r.n_seasons_window}"
+                              for r in grid.itertuples()])
+    return grid
+
+
+# ============================================================
+# 2) Ajuste por lotes: K regresiones multinomiales sobre la misma matriz
+# ============================================================
+def _loss_grad_k(W, Z1, Y, SW, l2, mask):
+    """
+    Por configuración k: Σ_i sw_ki·CE_i / Σ_i sw_ki + ½·l2_k·‖W_k‖² (sin penalizar el
+    intercepto), igual que LinearModelLoss de sklearn con l2 = 1/(C·Σ sw).
+    Devuelve pérdidas (K,) y gradiente (K, clases, q) enmascarado.
+    Disposición (K, clases, filas): las reducciones por clase recorren memoria contigua.
+    """
+    K, c, q = W.shape
+    n = Z1.shape[0]
+    R = (W.reshape(K * c, q) @ Z1.T).reshape(K, c, n)
+    R -= R.max(axis=1, keepdims=True)
+    E = np.exp(R)
+    s = E.sum(axis=1)
+    coef = W[:, :, :-1]
+    loss = ((np.log(s) - (R * Y).sum(axis=1)) * SW).sum(axis=1) + 0.5 * l2 * (coef * coef).sum(axis=(1, 2))
+    E /= s[:, None, :]
+    E -= Y
+    E *= SW[:, None, :]
+    grad = (E.reshape(K * c, n) @ Z1).reshape(K, c, q)
+    grad[:, :, :-1] += l2[:, None, None] * coef
+    grad *= mask[:, None, :]
+    return loss, grad
+
+
+def _loss_grad(w, Z1, Y, SW, l2, mask, shape):
+    loss, grad = _loss_grad_k(w.reshape(shape), Z1, Y, SW, l2, mask)
+    return float(loss.sum()), grad.ravel()
+
+
+def _fit_batch(Z1, Y, SW, l2, mask, W0, max_iter, tol):
+    """
+    Un L-BFGS sobre la suma de las K pérdidas (mismas opciones que sklearn; el gradiente de cada
+    configuración sólo depende de sus coeficientes). Devuelve (W, iteraciones).
+    """
+    shape = W0.shape
+    res = optimize.minimize(
+        _loss_grad, (W0 * mask[:, None, :]).ravel(), method="L-BFGS-B", jac=True,
+        args=(Z1, Y, SW, l2, mask, shape),
+        options={"maxiter": max_iter, "maxls": 50, "gtol": tol, "ftol": 64 * np.finfo(float).eps},
+    )
+    return res.x.reshape(shape), int(res.nit)
+
+
+def _hessian_inv(W, Z1, SW, l2, mask, ridge=1e-8):
+    """
+    Inversa del hessiano de cada configuración en W, (K, clases·q, clases·q). Las coordenadas
+    enmascaradas quedan como identidad (paso nulo); `ridge` cubre la dirección libre de los
+    interceptos (sumar lo mismo a todas las clases no cambia la pérdida).
+    """
+    K, c, q = W.shape
+    n = Z1.shape[0]
+    R = (W.reshape(K * c, q) @ Z1.T).reshape(K, c, n)
+    R -= R.max(axis=1, keepdims=True)
+    P = np.exp(R)
+    P /= P.sum(axis=1, keepdims=True)
+    ZZ = (Z1[:, :, None] * Z1[:, None, :]).reshape(n, q * q)
+    H = np.empty((K, c, q, c, q))
+    for a in range(c):
+        for b in range(a, c):
+            Hab = ((SW * P[:, a] * (float(a == b) - P[:, b])) @ ZZ).reshape(K, q, q)
+            H[:, a, :, b, :] = Hab
+            H[:, b, :, a, :] = Hab
+    H = H.reshape(K, c * q, c * q)
+    diag = np.arange(c * q)
+    H[:, diag, diag] += np.tile(np.append(np.ones(q - 1), 0.0), c) * l2[:, None]
+    m = np.tile(mask, (1, c))
+    H *= m[:, :, None] * m[:, None, :]
+    H[:, diag, diag] += (1.0 - m) + ridge
+    return np.linalg.inv(H)
+
+
+def _newton_batch(W, Z1, Y, SW, l2, mask, Hinv, tol, max_steps=6):
+    """
+    Pasos de Newton con un hessiano de una fecha anterior: al deslizar la ventana unas pocas
+    filas apenas cambia, así que desde la solución del día anterior bastan 1-2 pasos.
+    Backtracking por configuración si un paso no baja la pérdida. Sólo se evalúan las que
+    aún no cumplen max|grad| <= tol (criterio de parada del lbfgs de sklearn).
+    Devuelve (W, pasos, convergida por configuración).
+    """
+    K, c, q = W.shape
+    loss, G = _loss_grad_k(W, Z1, Y, SW, l2, mask)
+    todo = np.abs(G).reshape(K, -1).max(axis=1) > tol
+    steps = 0
+    while todo.any() and steps < max_steps:
+        idx = np.flatnonzero(todo)
+        d = np.einsum("kij,kj->ki", Hinv[idx], G[idx].reshape(idx.size, -1)).reshape(idx.size, c, q)
+        slope = (G[idx] * d).sum(axis=(1, 2))
+        t = np.ones(idx.size)
+        for _ in range(10):
+            Wn = W[idx] - t[:, None, None] * d
+            ln, Gn = _loss_grad_k(Wn, Z1, Y, SW[idx], l2[idx], mask[idx])
+            ok = ln <= loss[idx] - 1e-4 * t * slope + 1e-12
+            if ok.all():
+                break
+            t = np.where(ok, t, t / 2)
+        W[idx], loss[idx], G[idx] = Wn, ln, Gn
+        steps += 1
+        todo = np.abs(G).reshape(K, -1).max(axis=1) > tol
+    return W, steps, ~todo
+
+
+def _predict(Z1, W):
+    raw = np.einsum("nq,kcq->knc", Z1, W)
+    raw -= raw.max(axis=2, keepdims=True)
+    ex = np.exp(raw)
+    return ex / ex.sum(axis=2, keepdims=True)
+
+
+# ============================================================
+# 3) Un bloque contiguo de fechas (unidad de trabajo en paralelo)
+# ============================================================
+def sweep_tasks(X, y_idx, tasks, feat_mask, recent_weight, older_weight, C, season_size,
+                max_iter=1000, tol=1e-4, refresh_every=64, hessian_every=16):
+    """
+    Ajusta las K configuraciones (misma ventana) para cada (lo, hi, stop) de `tasks`:
+    train = X[lo:hi], test = X[hi:stop]. y_idx = índice en LABELS de la etiqueta.
+    feat_mask (K, p) marca las columnas de X de cada configuración.
+
+    Primera fecha: camino de regularización con L-BFGS. Después: Newton desde la solución del
+    día anterior con el hessiano recalculado cada `hessian_every` fechas (o si cambian columnas
+    activas / clases, o el paso deja de converger rápido); L-BFGS para las que no converjan.
+    Devuelve (proba (K, n_test_total, 3) en orden H/D/A, nº de iteraciones por fecha).
+    """
+    from threadpoolctl import threadpool_limits
+
+    K, p = feat_mask.shape
+    C = np.asarray(C, dtype=float)
+    ranks = np.unique(C, return_inverse=True)[1]
+    # vecina en el camino de regularización: misma configuración con la C anterior
+    key = [tuple(row) for row in np.column_stack([feat_mask, recent_weight, older_weight])]
+    prev_on_path = np.full(K, -1)
+    for k in range(K):
+        cands = [j for j in range(K) if key[j] == key[k] and ranks[j] == ranks[k] - 1]
+        if cands:
+            prev_on_path[k] = cands[0]
+
+    W_store = np.zeros((K, len(LABELS), p + 1))       # coeficientes en coordenadas de la unión
+    state = SlidingImputeScale(X, refresh_every=refresh_every)
+    Hinv, h_sig, h_age = None, None, 0
+    probas, iters = [], []
+    with threadpool_limits(limits=1):
+        for t, (lo, hi, stop) in enumerate(tasks):
+            if t == 0:
+                state.reset(lo, hi)
+            else:
+                state.slide(lo, hi)
+            active, median, mean, scale = state.params()
+            n = hi - lo
+            Z1 = np.column_stack([_transform(X[lo:hi], active, median, mean, scale), np.ones(n)])
+            Zt = np.column_stack([_transform(X[hi:stop], active, median, mean, scale), np.ones(stop - hi)])
+
+            yt = y_idx[lo:hi]
+            cls = np.unique(yt)
+            Y = (cls[:, None] == yt[None, :]).astype(float)          # (clases, filas)
+            cols = np.append(np.flatnonzero(active), p)
+            mask = np.column_stack([feat_mask[:, active], np.ones(K, dtype=bool)]).astype(float)
+
+            sw = np.where(np.arange(n) >= n - season_size, recent_weight[:, None], older_weight[:, None])
+            sw_sum = sw.sum(axis=1)
+            SWn = sw / sw_sum[:, None]
+            l2 = 1.0 / (C * sw_sum)
+
+            W0 = W_store[:, cls][:, :, cols]
+            if t == 0:
+                # camino de regularización: C de menor a mayor, cada una desde la anterior
+                W, n_it = np.zeros_like(W0), 0
+                for r in range(ranks.max() + 1):
+                    sel = np.flatnonzero(ranks == r)
+                    start = np.where((prev_on_path[sel] >= 0)[:, None, None], W[np.maximum(prev_on_path[sel], 0)], 0.0)
+                    W[sel], it = _fit_batch(Z1, Y, SWn[sel], l2[sel], mask[sel], start, max_iter, tol)
+                    n_it += it
+            else:
+                sig = (cls.tobytes(), cols.tobytes())
+                if Hinv is None or sig != h_sig or h_age >= hessian_every:
+                    Hinv, h_sig, h_age = _hessian_inv(W0, Z1, SWn, l2, mask), sig, 0
+                W, n_it, conv = _newton_batch(W0.copy(), Z1, Y, SWn, l2, mask, Hinv, tol)
+                if not conv.all():
+                    sel = np.flatnonzero(~conv)
+                    W[sel], it = _fit_batch(Z1, Y, SWn[sel], l2[sel], mask[sel], W[sel], max_iter, tol)
+                    n_it += it
+                h_age = hessian_every if n_it > 2 else h_age + 1
+            W_store[np.ix_(np.arange(K), cls, cols)] = W
+            iters.append(n_it)
+
+            P = _predict(Zt, W)
+            out = np.full((K, stop - hi, len(LABELS)), np.nan)
+            out[:, :, cls] = P
+            probas.append(out)
+    return np.concatenate(probas, axis=1), iters
+
+
+# ============================================================
+# 4) Métricas por temporada
+# ============================================================
+def season_metrics(y_true, proba, season, odds=None) -> pd.DataFrame:
+    """
+    accuracy / logloss / brier (filas con etiqueta H/D/A, como la celda 24) y ROI entre
+    apuestas a 1 unidad sobre el pronóstico (cuota válida >= 1.01, como compute_accuracy_roi).
+    """
+    y = pd.Series(y_true).astype(str).str.upper().str.strip().to_numpy()
+    has_label = np.isin(y, LABELS)
+    y_i = np.array([LABELS.index(v) if ok else 0 for v, ok in zip(y, has_label)])
+    pred_i = np.argmax(np.nan_to_num(proba, nan=-1.0), axis=1)
+    rows = np.arange(len(y))
+
+    P_ll = np.clip(proba, EPS, 1.0 - EPS)
+    ll = -np.log(P_ll[rows, y_i])
+    Yoh = np.zeros_like(proba)
+    Yoh[rows, y_i] = 1.0
+    brier = np.sum((np.clip(np.nan_to_num(proba), 0.0, 1.0) - Yoh) ** 2, axis=1)
+    correct = pred_i == y_i
+
+    if odds is not None:
+        o = np.asarray(odds, dtype=float)[rows, pred_i]
+        bet = has_label & np.isfinite(o) & (o >= 1.01)
+        profit = np.where(bet, np.where(correct, o - 1.0, -1.0), np.nan)
+    else:
+        bet = np.zeros(len(y), dtype=bool)
+        profit = np.full(len(y), np.nan)
+
+    d = pd.DataFrame({"Season": pd.to_numeric(pd.Series(season), errors="coerce").to_numpy(),
+                      "scored": has_label, "correct": correct & has_label,
+                      "ll": np.where(has_label, ll, np.nan), "brier": np.where(has_label, brier, np.nan),
+                      "bet": bet, "profit": profit})
+    g = d.groupby("Season", dropna=True)
+    out = pd.DataFrame({
+        "n": g["scored"].sum(),
+        "accuracy": g["correct"].sum() / g["scored"].sum().replace(0, np.nan),
+        "logloss": g["ll"].mean(),
+        "brier": g["brier"].mean(),
+        "n_bets": g["bet"].sum(),
+        "profit": g["profit"].sum(),
+    })
+    out["roi"] = out["profit"] / out["n_bets"].replace(0, np.nan)
+    out = out.reset_index()
+    out["Season"] = out["Season"].astype(int)
+    return out
+
+
+def summarize(board: pd.DataFrame, sort_by: str = "logloss") -> pd.DataFrame:
+    """Una fila por configuración: métricas globales (ponderadas por partidos / apuestas), ordenadas."""
+    b = board.assign(_acc=board["accuracy"] * board["n"], _ll=board["logloss"] * board["n"],
+                     _br=board["brier"] * board["n"])
+    g = b.groupby(GRID_COLS, sort=False)
+    out = g[["n", "n_bets", "profit", "_acc", "_ll", "_br"]].sum()
+    out = pd.DataFrame({
+        "seasons": g["Season"].nunique(),
+        "n": out["n"],
+        "accuracy": out["_acc"] / out["n"],
+        "logloss": out["_ll"] / out["n"],
+        "brier": out["_br"] / out["n"],
+        "n_bets": out["n_bets"],
+        "roi": out["profit"] / out["n_bets"].replace(0, np.nan),
+    }).reset_index()
+    return out.sort_values(sort_by, ascending=sort_by in ("logloss", "brier"), kind="mergesort")\
+              .reset_index(drop=True)
+
+
+# ============================================================
+# 5) Barrido completo
+# ============================================================
+@traced
+def sweep_walkforward(
+    df,
+    feature_sets: dict[str, list[str]],
+    Cs=(1.0,),
+    weight_schemes: dict[str, tuple[float, float]] | None = None,
+    windows=(4,),
+    date_col='Date',
+    label_col='FTR',
+    season_size=380,
+    max_iter=1000,
+    tol=1e-4,
+    refresh_every=64,
+    hessian_every=16,
+    n_jobs=1,
+    chunk_size=None,
+    backend="loky",
+    return_preds=False,
+):
+    """
+    Walk-forward multinomial (mismo contrato por configuración que
+    walkforward_multinomial_incremental) para toda la rejilla de make_grid.
+
+    Devuelve (board, grid, stats):
+      - board: una fila por (configuración, temporada) con n, accuracy, logloss, brier,
+        n_bets, profit y roi (ver summarize para el ranking global)
+      - grid: las configuraciones
+      - stats: fechas, iteraciones L-BFGS y tiempos por ventana
+    Con return_preds=True añade un dict config → preds_all (esquema de la celda 9).
+
+    Con n_jobs != 1 las fechas se reparten en bloques contiguos; cada bloque arranca en frío
+    (camino de regularización) en su primera fecha, así que las probabilidades coinciden con
+    la ejecución en serie dentro de la tolerancia del solver, no byte a byte.
+    """
+    t0 = time.perf_counter()
+    grid = make_grid(feature_sets, Cs, weight_schemes, windows)
+    weight_schemes = weight_schemes or {"r3": (3.0, 1.0)}
+    union = list(dict.fromkeys(c for cols in feature_sets.values() for c in cols))
+
+    df = _prepare_frame(df, union, date_col)
+    X_all = df[union].to_numpy(dtype=float)
+    y_all = df[label_col].to_numpy()
+    y_clean = pd.Series(y_all).astype(str).str.upper().str.strip().to_numpy()
+    y_idx = np.array([LABELS.index(v) if v in LABELS else -1 for v in y_clean])
+    dates = df[date_col].to_numpy()
+    n_valid = np.count_nonzero(~pd.isna(dates))
+    uniq_dates = df[date_col].sort_values().unique()
+    valid_dates = uniq_dates[~pd.isna(uniq_dates)]
+    first_idx = np.searchsorted(dates[:n_valid], valid_dates, side='left')
+    last_idx = np.searchsorted(dates[:n_valid], valid_dates, side='right')
+    odds = df[list(ODDS_COLS)].apply(pd.to_numeric, errors='coerce').to_numpy() \
+        if set(ODDS_COLS).issubset(df.columns) else None
+
+    col_pos = {c: i for i, c in enumerate(union)}
+    boards, preds, stats = [], {}, {"windows": {}}
+    for win, g in grid.groupby("n_seasons_window", sort=True):
+        train_window = int(win) * season_size
+        tasks = [(start - train_window, start, stop) for start, stop in zip(first_idx, last_idx)
+                 if start >= train_window]
+        if not tasks:
+            raise RuntimeError("No se generaron predicciones; ¿hay suficientes datos previos para armar ventanas?")
+        # el train sólo admite etiquetas H/D/A (como las filas pasadas de df_final)
+        lo_min = tasks[0][0]
+        if (y_idx[lo_min:tasks[-1][1]] < 0).any():
+            raise ValueError(f"{label_col} con valores fuera de H/D/A en las ventanas de entrenamiento.")
+
+        feat_mask = np.zeros((len(g), len(union)), dtype=bool)
+        for k, fs in enumerate(g["features"]):
+            feat_mask[k, [col_pos[c] for c in feature_sets[fs]]] = True
+        rw = np.array([weight_schemes[w][0] for w in g["weights"]], dtype=float)
+        ow = np.array([weight_schemes[w][1] for w in g["weights"]], dtype=float)
+        kw = dict(feat_mask=feat_mask, recent_weight=rw, older_weight=ow, C=g["C"].to_numpy(),
+                  season_size=season_size, max_iter=max_iter, tol=tol, refresh_every=refresh_every,
+                  hessian_every=hessian_every)
+
+        tw = time.perf_counter()
+        if n_jobs == 1 or len(tasks) <= 1:
+            proba, iters = sweep_tasks(X_all, y_idx, tasks, **kw)
+        else:
+            from joblib import Parallel, delayed, effective_n_jobs
+
+            workers = effective_n_jobs(n_jobs)
+            size = chunk_size or max(1, int(np.ceil(len(tasks) / workers)))
+            chunks = [tasks[i:i + size] for i in range(0, len(tasks), size)]
+            res = Parallel(n_jobs=workers, backend=backend)(
+                delayed(sweep_tasks)(X_all, y_idx, chunk, **kw) for chunk in chunks
+            )
+            proba = np.concatenate([r[0] for r in res], axis=1)
+            iters = [i for r in res for i in r[1]]
+        elapsed = time.perf_counter() - tw
+
+        rows = np.concatenate([np.arange(hi, stop) for _, hi, stop in tasks])
+        for k, cfg in enumerate(g.itertuples(index=False)):
+            m = season_metrics(y_all[rows], proba[k], df['Season'].to_numpy()[rows],
+                               None if odds is None else odds[rows])
+            for col in reversed(GRID_COLS):
+                m.insert(0, col, getattr(cfg, col))
+            boards.append(m)
+            if return_preds:
+                P = proba[k]
+                y_pred = np.array(LABELS, dtype=object)[np.argmax(np.nan_to_num(P, nan=-1.0), axis=1)]
+                preds[cfg.config] = _finalize_preds(_assemble_preds(df, rows, y_all[rows], y_pred, P))[1]
+
+        stats["windows"][int(win)] = {
+            "configs": int(len(g)), "dates": len(tasks), "elapsed_s": round(elapsed, 3),
+            "mean_iter": round(float(np.mean(iters)), 2),
+        }
+        print(f"[SWEEP] ventana={int(win)} temporadas · {len(g)} configuraciones · {len(tasks)} fechas · "
+              f"iteraciones medias={stats['windows'][int(win)]['mean_iter']} · {elapsed:.1f}s")
+
+    board = pd.concat(boards, ignore_index=True)
+    stats["configs"] = int(len(grid))
+    stats["elapsed_s"] = round(time.perf_counter() - t0, 3)
+    if return_preds:
+        return board, grid, stats, preds
+    return board, grid, stats
@@ -0,0 +1,238 @@
+# engine/synthetic.py
+# ============================================================
+# FIXTURES SINTÉTICOS TAMAÑO LALIGA (benchmarks / comprobaciones)
+#  - 20 equipos, 38 jornadas, 380 partidos por temporada
+#  - Fechas repartidas en sáb/dom/lun como en el calendario real
+#  - Columnas con los mismos nombres que df_final.parquet
+# ============================================================
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+TEAMS = [
+    "Real Madrid", "Barcelona", "Atletico Madrid", "Sevilla", "Valencia", "Villarreal",
+    "Real Sociedad", "Athletic Club", "Betis", "Celta Vigo", "Espanyol", "Getafe",
+    "Osasuna", "Mallorca", "Rayo Vallecano", "Alaves", "Girona", "Las Palmas",
+    "Valladolid", "Leganes",
+]
+
+
+def round_robin(n_teams: int = 20) -> list[list[tuple[int, int]]]:
+    """Calendario a doble vuelta (método del círculo): lista de jornadas con (home, away)."""
+    idx = list(range(n_teams))
+    first = []
+    for r in range(n_teams - 1):
+        pairs = []
+        for i in range(n_teams // 2):
+            a, b = idx[i], idx[n_teams - 1 - i]
+            pairs.append((a, b) if r % 2 == 0 else (b, a))
+        first.append(pairs)
+        idx = [idx[0]] + [idx[-1]] + idx[1:-1]
+    second = [[(b, a) for a, b in md] for md in first]
+    return first + second
+
+
+def make_matches(n_seasons: int = 20, first_season: int = 2005, seed: int = 42) -> pd.DataFrame:
+    """
+    Partidos con resultado y estadísticas brutas (estilo football-data):
+    Season, Matchweek, Date, HomeTeam_norm, AwayTeam_norm, FTHG, FTAG, FTR,
+    HS/AS, HST/AST, HF/AF, HC/AC, HY/AY, HR/AR, h_xg/a_xg, B365H/D/A.
+    """
+    rng = np.random.default_rng(seed)
+    n_teams = len(TEAMS)
+    schedule = round_robin(n_teams)
+    rows = []
+    for k in range(n_seasons):
+        season = first_season + k
+        strength = rng.normal(0, 0.45, n_teams)
+        start = pd.Timestamp(f"{season}-08-16")
+        start = start + pd.Timedelta(days=(5 - start.weekday()) % 7)  # primer sábado
+        order = rng.permutation(len(schedule))  # orden de jornadas aleatorio por temporada
+        for md_i, md in enumerate(order):
+            sat = start + pd.Timedelta(days=7 * md_i)
+            for g_i, (h, a) in enumerate(schedule[md]):
+                day_off = (0, 0, 0, 0, 1, 1, 1, 1, 2, 2)[g_i]
+                rows.append((season, md_i + 1, sat + pd.Timedelta(days=day_off),
+                             TEAMS[h], TEAMS[a], strength[h] + 0.25, strength[a]))
+    df = pd.DataFrame(rows, columns=["Season", "Matchweek", "Date", "HomeTeam_norm", "AwayTeam_norm",
+                                     "_sh", "_sa"])
+    n = len(df)
+    lam_h = np.exp(0.25 + 0.6 * (df["_sh"] - df["_sa"]).to_numpy() / 2)
+    lam_a = np.exp(0.05 + 0.6 * (df["_sa"] - df["_sh"]).to_numpy() / 2)
+    df["FTHG"] = rng.poisson(lam_h)
+    df["FTAG"] = rng.poisson(lam_a)
+    df["FTR"] = np.where(df["FTHG"] > df["FTAG"], "H", np.where(df["FTHG"] < df["FTAG"], "A", "D"))
+    for side, lam in (("H", lam_h), ("A", lam_a)):
+        df[f"{side}S"] = rng.poisson(8 + 4 * lam)
+        df[f"{side}ST"] = np.minimum(df[f"{side}S"], rng.poisson(2 + 2 * lam))
+        df[f"{side}F"] = rng.poisson(13, n)
+        df[f"{side}C"] = rng.poisson(3 + 2 * lam)
+        df[f"{side}Y"] = rng.poisson(2.3, n)
+        df[f"{side}R"] = rng.binomial(1, 0.08, n)
+    df["h_xg"] = np.round(lam_h * rng.gamma(8, 1 / 8, n), 2)
+    df["a_xg"] = np.round(lam_a * rng.gamma(8, 1 / 8, n), 2)
+    # xG sólo desde 2014 (como understat)
+    df.loc[df["Season"] < 2014, ["h_xg", "a_xg"]] = np.nan
+
+    p_h = 1 / (1 + np.exp(-(0.35 + 1.2 * (df["_sh"] - df["_sa"]))))
+    p_d = 0.27 * (1 - np.abs(p_h - 0.5))
+    p_a = np.clip(1 - p_h - p_d, 0.03, None)
+    tot = (p_h + p_d + p_a) * rng.uniform(1.04, 1.08, n)  # overround
+    df["B365H"] = np.round(tot / p_h, 2)
+    df["B365D"] = np.round(tot / p_d, 2)
+    df["B365A"] = np.round(tot / p_a, 2)
+    return df.drop(columns=["_sh", "_sa"]).reset_index(drop=True)
+
+
+def make_df_final(n_seasons: int = 20, first_season: int = 2005, seed: int = 42) -> pd.DataFrame:
+    """
+    Frame con la forma de df_final.parquet: claves, FTR, cuotas/pimp y las columnas de
+    FEATURES_S0..S14 (ruido correlado con el resultado, con algún NaN).
+    """
+    rng = np.random.default_rng(seed + 1)
+    df = make_matches(n_seasons, first_season, seed)
+    n = len(df)
+    inv = 1 / df[["B365H", "B365D", "B365A"]].to_numpy()
+    pimp = inv / inv.sum(axis=1, keepdims=True)
+    df["pimp1"], df["pimpx"], df["pimp2"] = pimp[:, 0], pimp[:, 1], pimp[:, 2]
+    edge = np.log(pimp[:, 0] / pimp[:, 2])
+
+    def noisy(scale, loc=0.0, nan_frac=0.0):
+        v = loc + scale * (edge + rng.normal(0, 1.0, n))
+        if nan_frac:
+            v[rng.random(n) < nan_frac] = np.nan
+        return v
+
+    df["h_elo"] = 1750 + 60 * noisy(1.0)
+    df["a_elo"] = 1750 - 60 * noisy(1.0)
+    df["relative_perf_diff"] = noisy(0.3)
+    df["avg_xg_last7_diff"] = noisy(0.4, nan_frac=0.05)
+    df["avg_shots_last7_diff"] = noisy(2.0)
+    df["form_points_6_diff"] = np.round(noisy(3.0))
+    df["prev_position_diff"] = np.round(-noisy(4.0))
+    df["total_gd_cum_diff"] = np.round(noisy(8.0))
+    for side, sign in (("home", 1), ("away", -1)):
+        df[f"{side}_total_gd_cum"] = np.round(sign * noisy(5.0))
+        df[f"{side}_gd_cum"] = np.round(sign * noisy(3.0))
+        df[f"{side}_total_matches_prev"] = rng.integers(0, 400, n).astype(float)
+        df[f"{side}_prev_position"] = rng.integers(1, 21, n).astype(float)
+        df[f"{side}_avg_shotsontarget_last7"] = np.clip(4 + sign * noisy(0.8), 0, None)
+        df[f"{side}_avg_xg_last7"] = np.clip(1.3 + sign * noisy(0.3, nan_frac=0.05), 0, None)
+        df[f"{side}_prev_big_odds_win_any"] = rng.binomial(1, 0.1, n)
+        styles = rng.choice(["defensivo", "equilibrado", "ofensivo"], n)
+        for style in ("defensivo", "equilibrado", "ofensivo"):
+            df[f"{side}_playstyle_{style}"] = styles == style
+    for kind in ("win", "draw", "loss"):
+        df[f"h2h_{kind}_rate_ewm_diff"] = noisy(0.2)
+        df[f"h2h_{kind}_rate_roll8_diff"] = noisy(0.2)
+    df["has_xg_data"] = df["avg_xg_last7_diff"].notna().astype(int)
+    return df
+
+
+def make_clean_vars(n_seasons: int = 20, first_season: int = 2005, seed: int = 42,
+                    played_matchdays: int | None = None) -> pd.DataFrame:
+    """
+    Frame con la forma de `df` en LIMPIEZA tras la celda 18 (consume): partidos con
+    resultado + la siguiente jornada sin resultado (cuotas ya rellenadas), Elo y Transfermarkt.
+      played_matchdays: jornadas jugadas de la última temporada (None = todas menos la última).
+    """
+    from engine.match_features import TM_VARS
+
+    rng = np.random.default_rng(seed + 2)
+    df = make_matches(n_seasons, first_season, seed)
+    md_played = 37 if played_matchdays is None else played_matchdays
+
+    df['HTHG'] = np.minimum(df['FTHG'], rng.poisson(0.6, len(df)))
+    df['HTAG'] = np.minimum(df['FTAG'], rng.poisson(0.5, len(df)))
+    df['HTR'] = np.where(df['HTHG'] > df['HTAG'], 'H', np.where(df['HTHG'] < df['HTAG'], 'A', 'D'))
+    df['h_elo'] = np.round(1650 + rng.normal(0, 120, len(df)), 1)
+    df['a_elo'] = np.round(1650 + rng.normal(0, 120, len(df)), 1)
+
+    # Transfermarkt: un valor por (temporada, equipo)
+    tm = {}
+    for season in df['Season'].unique():
+        for team in TEAMS:
+            tm[(season, team)] = (round(rng.uniform(23, 29), 1), round(rng.uniform(40, 1100), 2),
+                                  round(rng.uniform(1.5, 40), 2), int(rng.integers(22, 35)),
+                                  round(rng.uniform(10, 70), 1))
+    for side, team_col in (('h', 'HomeTeam_norm'), ('a', 'AwayTeam_norm')):
+        vals = np.array([tm[k] for k in zip(df['Season'], df[team_col])], dtype=float)
+        for j, var in enumerate(TM_VARS):
+            df[f'{side}_{var}'] = vals[:, j]
+
+    res_cols = ['FTHG', 'FTAG', 'FTR', 'HTHG', 'HTAG', 'HTR', 'HS', 'AS', 'HST', 'AST', 'HF', 'AF',
+                'HC', 'AC', 'HY', 'AY', 'HR', 'AR', 'h_xg', 'a_xg']
+    for c in res_cols:
+        if df[c].dtype != object:
+            df[c] = df[c].astype(float)
+    # Sólo hasta la jornada siguiente a la última jugada (como tras append_next_matchday_with_elo);
+    # se recorta al final para que dos rondas consecutivas compartan el histórico.
+    last = df['Season'] == df['Season'].max()
+    df = df[~last | (df['Matchweek'] <= md_played + 1)].copy()
+    future = (df['Season'] == df['Season'].max()) & (df['Matchweek'] == md_played + 1)
+    df.loc[future, res_cols] = np.nan
+
+    df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
+    df['Matchweek'] = df['Matchweek'].astype('Int64')
+    cols = (['Season', 'Date', 'HomeTeam_norm', 'AwayTeam_norm'] + res_cols[:18] + ['B365H', 'B365D', 'B365A']
+            + ['h_xg', 'a_xg', 'h_elo', 'a_elo'] + [f'{s}_{v}' for s in 'ha' for v in TM_VARS] + ['Matchweek'])
+    return df[cols].reset_index(drop=True)
+
+
+def make_matchlogs(n_seasons: int = 50, first_season: int = 1975, seed: int = 42
+                   ) -> dict[int, tuple[pd.DataFrame, pd.DataFrame]]:
+    """
+    {temporada: (matchlogs_{s}, matchlogs_market_{s})} con las columnas que escribe MODELOS
+    (celdas de matchlogs del modelo y del modelo de mercado), stake 1 por partido.
+    """
+    rng = np.random.default_rng(seed + 3)
+    df = make_matches(n_seasons, first_season, seed).rename(columns={"Matchweek": "Matchday"})
+    n = len(df)
+    odds = df[["B365H", "B365D", "B365A"]].to_numpy()
+    inv = 1 / odds
+    df["overround"] = inv.sum(axis=1)
+    p_mkt = inv / inv.sum(axis=1, keepdims=True)
+    df["pred_key"] = (df["Date"].dt.strftime("%Y-%m-%d") + "|" + df["HomeTeam_norm"] + "|"
+                      + df["AwayTeam_norm"])
+    df["y_true"] = df["FTR"]
+    labels = np.array(["H", "D", "A"])
+
+    def pick_cols(probs: np.ndarray, pred_col: str) -> pd.DataFrame:
+        k = probs.argmax(axis=1)
+        sp = np.sort(probs, axis=1)
+        out = pd.DataFrame({pred_col: labels[k]}, index=df.index)
+        out["conf_maxprob"] = sp[:, -1]
+        out["entropy"] = -(probs * np.log(np.clip(probs, 1e-15, 1.0))).sum(axis=1)
+        out["margin_top12"] = sp[:, -1] - sp[:, -2]
+        out["odds_pick"] = odds[np.arange(n), k]
+        out["p_pick"] = probs[np.arange(n), k]
+        b = out["odds_pick"] - 1.0
+        out["ev_pick"] = out["p_pick"] * b - (1 - out["p_pick"])
+        out["kelly_pick"] = np.clip(out["ev_pick"] / b, 0.0, 1.0)
+        out["bet_placed"] = 1
+        out["correct"] = (out[pred_col] == df["y_true"]).astype(int)
+        out["profit"] = np.where(out["correct"] == 1, out["odds_pick"] - 1.0, -1.0)
+        out["cum_profit_season"] = out["profit"].groupby(df["Season"]).cumsum()
+        return out
+
+    noise = rng.dirichlet(np.ones(3), n)
+    p_model = 0.7 * p_mkt + 0.3 * noise
+    model = pd.concat([df, pick_cols(p_model, "y_pred")], axis=1)
+    model["pred_key_match"] = model["pred_key"]
+    model[["proba_H", "proba_D", "proba_A"]] = p_model
+    model[["pH_mkt", "pD_mkt", "pA_mkt"]] = p_mkt
+    market = pd.concat([df, pick_cols(p_mkt, "y_pred_market")], axis=1)
+    market[["pH_mkt_pred", "pD_mkt_pred", "pA_mkt_pred"]] = p_mkt
+
+    tail = ["odds_pick", "p_pick", "ev_pick", "kelly_pick", "bet_placed", "correct", "profit", "cum_profit_season"]
+    head = ["Season", "Matchday", "Date", "HomeTeam_norm", "AwayTeam_norm", "pred_key"]
+    model = model[head + ["pred_key_match", "y_true", "y_pred", "proba_H", "proba_D", "proba_A",
+                          "conf_maxprob", "entropy", "margin_top12", "B365H", "B365D", "B365A", "overround",
+                          "pH_mkt", "pD_mkt", "pA_mkt"] + tail]
+    market = market[head + ["y_true", "y_pred_market", "pH_mkt_pred", "pD_mkt_pred", "pA_mkt_pred",
+                            "conf_maxprob", "entropy", "margin_top12", "B365H", "B365D", "B365A",
+                            "overround"] + tail]
+    return {int(s): (model[model["Season"] == s].reset_index(drop=True),
+                     market[market["Season"] == s].reset_index(drop=True))
+            for s in df["Season"].unique()}
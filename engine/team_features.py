@@ -0,0 +1,338 @@
+# engine/team_features.py
+# ============================================================
+# FEATURES DE FORMA POR EQUIPO (formato largo, una pasada agrupada)
+#  Sustituye los bucles iterrows / groupby.apply(lambda ...) de
+#  LIMPIEZA_Y_CREACION_DE_VARS.ipynb con los mismos valores:
+#   - celda 22: home/away_avg_{stat}_last7   (shift(1).rolling(7, min_periods=1).mean() por equipo)
+#   - celda 32: home/away_playstyle          (media híbrida ponderada de GD con ascendidos)
+#   - celda 37: home/away_form_points_6      (shift().rolling(6, min_periods=1).sum() por temporada-equipo)
+#   - celda 38: home/away_form_gd_6
+#   - celda 51: home/away_h2h_*  y h2h_*_diff (EWM / rolling por pareja equipo-rival)
+#   - celda 58: home/away_relative_perf      (EWM de victorias reales / esperadas)
+#
+# Todas las ventanas usan los kernels de pandas (rolling con límites por grupo,
+# groupby().ewm) sobre un único frame largo ordenado, así que los resultados
+# son bit a bit los del cálculo por grupo. Requiere (equipo, fecha) único, como asumen los merges
+# del notebook.
+# ============================================================
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import BaseIndexer
+
+from engine.trace import traced
+
+# stat → (columna local, columna visitante)
+STATS_LAST7 = {
+    'Shots': ('HS', 'AS'),
+    'ShotsOnTarget': ('HST', 'AST'),
+    'Fouls': ('HF', 'AF'),
+    'Corners': ('HC', 'AC'),
+    'Yellows': ('HY', 'AY'),
+    'Reds': ('HR', 'AR'),
+    'xG': ('h_xg', 'a_xg'),
+}
+
+# Parámetros por defecto (idénticos a los de las celdas del notebook)
+HYBRID_PARAMS = dict(
+    window=6,                 # nº máximo de partidos previos a considerar
+    prev_weight=0.7,          # peso para partidos de la temporada PREVIA
+    min_total_periods=3,      # mínimo de previos si NO es ascendido
+    min_periods_promoted=1,   # mínimo de previos si ES ascendido (solo actual)
+    thr_off=0.75,             # umbral estilo ofensivo
+    thr_def=-0.75,            # umbral estilo defensivo
+    fill_neutral_on_nan=False,
+)
+H2H_PARAMS = dict(halflife=6, roll_n=8, minp=2, fill_neutral=True)
+RELPERF_HALFLIFE = 6
+
+
+# ============================================================
+# 1) Frame largo: dos filas por partido (local y visitante)
+# ============================================================
+@traced
+def team_match_long(df: pd.DataFrame, dates: pd.Series | None = None) -> pd.DataFrame:
+    """
+    Una fila por (partido, lado). `_row` = posición del partido en df, `is_home` = lado.
+    Orden: todas las filas locales y después todas las visitantes (como los pd.concat del notebook).
+    """
+    n = len(df)
+    dates = pd.to_datetime(df['Date']) if dates is None else dates
+    ftr = df['FTR']
+    fthg = df['FTHG'] if 'FTHG' in df.columns else pd.Series(np.nan, index=df.index)
+    ftag = df['FTAG'] if 'FTAG' in df.columns else pd.Series(np.nan, index=df.index)
+
+    # Probabilidades ajustadas (quita margen de la casa) — celda 58
+    def inv(s):
+        return 1.0 / pd.to_numeric(s, errors='coerce')
+    p = pd.DataFrame({
+        'H': inv(df['B365H']) if 'B365H' in df.columns else np.nan,
+        'D': inv(df['B365D']) if 'B365D' in df.columns else np.nan,
+        'A': inv(df['B365A']) if 'B365A' in df.columns else np.nan,
+    }, index=df.index)
+    s = p.sum(axis=1, skipna=True)
+    p_adj = p.div(s, axis=0)
+
+    sides = []
+    for is_home in (True, False):
+        team, opp = ('HomeTeam_norm', 'AwayTeam_norm') if is_home else ('AwayTeam_norm', 'HomeTeam_norm')
+        win, loss = ('H', 'A') if is_home else ('A', 'H')
+        side = pd.DataFrame({
+            '_row': np.arange(n),
+            'is_home': is_home,
+            'Season': df['Season'].to_numpy(),
+            'Date': dates.to_numpy(),
+            'Team': df[team].to_numpy(),
+            'Opp': df[opp].to_numpy(),
+        })
+        for stat, (h_col, a_col) in STATS_LAST7.items():
+            col = h_col if is_home else a_col
+            side[stat] = pd.to_numeric(df[col], errors='coerce').to_numpy() if col in df.columns else np.nan
+        side['Points'] = ftr.map({win: 3, 'D': 1, loss: 0}).to_numpy()
+        side['GD'] = ((fthg - ftag) if is_home else (ftag - fthg)).to_numpy()
+        side['win'] = (ftr == win).astype(int).to_numpy()
+        side['draw'] = (ftr == 'D').astype(int).to_numpy()
+        side['loss'] = (ftr == loss).astype(int).to_numpy()
+        side['p_win_adj'] = p_adj['H' if is_home else 'A'].to_numpy()
+        sides.append(side)
+    return pd.concat(sides, ignore_index=True)
+
+
+def _group_codes(order: pd.DataFrame, keys: list[str]) -> np.ndarray:
+    """Código de grupo por fila (frame ya ordenado por `keys`, grupos contiguos)."""
+    return order.groupby(keys, sort=False).ngroup().to_numpy()
+
+
+def _lagged(order: pd.DataFrame, codes: np.ndarray, cols: list[str]) -> pd.DataFrame:
+    """shift(1) dentro de cada grupo (frame ya ordenado por grupo y fecha)."""
+    vals = order[cols].to_numpy(dtype=float)
+    out = np.full_like(vals, np.nan)
+    out[1:] = vals[:-1]
+    out[np.r_[True, codes[1:] != codes[:-1]]] = np.nan
+    return pd.DataFrame(out, index=order.index, columns=cols)
+
+
+class _GroupWindowIndexer(BaseIndexer):
+    """
+    Ventana fija que no cruza grupos (frame ordenado por grupo): mismos límites que
+    GroupbyIndexer, pero calculados con numpy en vez de un bucle por grupo.
+    """
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        end = np.arange(1, num_values + 1, dtype=np.int64)
+        start = np.maximum(end - self.window_size, self.group_start).astype(np.int64)
+        return start, end
+
+
+def _group_start(codes: np.ndarray) -> np.ndarray:
+    """Posición de inicio del grupo de cada fila (códigos contiguos)."""
+    new = np.r_[True, codes[1:] != codes[:-1]]
+    return np.maximum.accumulate(np.where(new, np.arange(len(codes)), 0))
+
+
+def _rolling(lagged: pd.DataFrame, codes: np.ndarray, agg: str, window: int, min_periods: int) -> pd.DataFrame:
+    """rolling(window) agrupado de todas las columnas a la vez (se reinicia en cada grupo)."""
+    indexer = _GroupWindowIndexer(window_size=window, group_start=_group_start(codes))
+    return getattr(lagged.rolling(indexer, min_periods=min_periods), agg)()
+
+
+def _ewm_mean(lagged: pd.DataFrame, codes: np.ndarray, **ewm_kw) -> pd.DataFrame:
+    """ewm(...).mean() agrupado; devuelve alineado al índice de `lagged`."""
+    res = lagged.groupby(codes, sort=False).ewm(**ewm_kw).mean()
+    return res.droplevel(0).reindex(lagged.index)
+
+
+# ============================================================
+# 2) Bloques de features (sobre el frame largo)
+# ============================================================
+def _last7_block(long: pd.DataFrame, window_size: int) -> pd.DataFrame:
+    order = long.sort_values(['Team', 'Date'], kind='mergesort')
+    codes = _group_codes(order, ['Team'])
+    stats = list(STATS_LAST7)
+    out = _rolling(_lagged(order, codes, stats), codes, 'mean', window_size, min_periods=1)
+    return out.rename(columns={s: f'{s}_avg_last{window_size}' for s in stats}).reindex(long.index)
+
+
+def _form_block(long: pd.DataFrame, form_window: int) -> pd.DataFrame:
+    order = long.sort_values(['Season', 'Team', 'Date'], kind='mergesort')
+    codes = _group_codes(order, ['Season', 'Team'])
+    out = _rolling(_lagged(order, codes, ['Points', 'GD']), codes, 'sum', form_window, min_periods=1)
+    out = out.rename(columns={'Points': f'form_points_{form_window}', 'GD': f'form_gd_{form_window}'})
+    return out.reindex(long.index)
+
+
+def weighted_hybrid_gd_mean(long: pd.DataFrame, window=6, prev_weight=0.7, min_total_periods=3,
+                            min_periods_promoted=1, **_) -> pd.Series:
+    """
+    Versión vectorizada de `weighted_hybrid_gd_mean_with_promoted` (celda 32):
+    matriz de retardos (n, window) por equipo en lugar del bucle fila a fila.
+    La suma ponderada se acumula en el mismo orden (del más antiguo al más reciente).
+    """
+    order = long.sort_values(['Team', 'Date'], kind='mergesort')
+    seasons = order['Season'].to_numpy()
+    gds = order['GD'].to_numpy(dtype=float)
+    n = len(order)
+
+    first_season = order.groupby('Team', sort=False)['Season'].transform('min').to_numpy()
+    is_promoted = seasons == first_season
+    # posición dentro del equipo = nº de partidos previos disponibles
+    pos = order.groupby('Team', sort=False).cumcount().to_numpy()
+    n_prev = np.minimum(pos, window)
+
+    num = np.zeros(n)
+    wsum = np.zeros(n)
+    num_prom = np.zeros(n)
+    cnt_prom = np.zeros(n, dtype=int)
+    idx = np.arange(n)
+    # k = window..1 → j = i-k recorre los previos del más antiguo al más reciente
+    for k in range(window, 0, -1):
+        valid = n_prev >= k
+        j = np.where(valid, idx - k, 0)
+        same = valid & (seasons[j] == seasons)
+        w = np.where(same, 1.0, prev_weight)
+        num = np.where(valid, num + gds[j] * w, num)
+        wsum = np.where(valid, wsum + w, wsum)
+        num_prom = np.where(same, num_prom + gds[j], num_prom)
+        cnt_prom = cnt_prom + same
+
+    out = np.full(n, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ok = ~is_promoted & (n_prev >= min_total_periods) & (n_prev > 0) & (wsum > 0)
+        out[ok] = num[ok] / wsum[ok]
+        ok_p = is_promoted & (pos > 0) & (cnt_prom >= min_periods_promoted) & (cnt_prom > 0)
+        out[ok_p] = num_prom[ok_p] / cnt_prom[ok_p]
+    return pd.Series(out, index=order.index).reindex(long.index)
+
+
+def classify_playstyle(gd_mean: pd.Series, thr_off=0.75, thr_def=-0.75, fill_neutral_on_nan=False, **_) -> pd.Series:
+    g = gd_mean.to_numpy()
+    style = np.select([g >= thr_off, g <= thr_def], ['ofensivo', 'defensivo'], 'equilibrado').astype(object)
+    style[np.isnan(g)] = 'equilibrado' if fill_neutral_on_nan else np.nan
+    return pd.Series(style, index=gd_mean.index, dtype=object)
+
+
+def _h2h_block(long: pd.DataFrame, halflife=6, roll_n=8, minp=2, fill_neutral=True) -> pd.DataFrame:
+    order = long.sort_values(['Team', 'Opp', 'Date'], kind='mergesort')
+    codes = _group_codes(order, ['Team', 'Opp'])
+    lag = _lagged(order, codes, ['win', 'draw', 'loss', 'GD'])
+
+    ewm = _ewm_mean(lag, codes, halflife=halflife, adjust=False, min_periods=1)
+    roll = _rolling(lag[['win', 'draw', 'loss']], codes, 'mean', roll_n, min_periods=minp)
+
+    out = pd.DataFrame(index=order.index)
+    for col in ['win', 'draw', 'loss']:
+        out[f'{col}_rate_ewm'] = ewm[col]
+    for col in ['win', 'draw', 'loss']:
+        out[f'{col}_rate_roll{roll_n}'] = roll[col]
+    out['gd_h2h_ewm'] = ewm['GD']
+
+    # Relleno neutral si no hay historial previo
+    if fill_neutral:
+        for k in ['win_rate_ewm', 'draw_rate_ewm', 'loss_rate_ewm',
+                  f'win_rate_roll{roll_n}', f'draw_rate_roll{roll_n}', f'loss_rate_roll{roll_n}']:
+            out[k] = out[k].fillna(1/3)
+    return out.reindex(long.index)
+
+
+def _relperf_block(long: pd.DataFrame, halflife=6) -> pd.Series:
+    order = long.assign(RealWin=long['win']).sort_values(['Team', 'Date'], kind='mergesort')
+    codes = _group_codes(order, ['Team'])
+    lag = _lagged(order, codes, ['RealWin', 'p_win_adj'])
+    ewm = _ewm_mean(lag, codes, halflife=halflife, adjust=False, min_periods=3)
+    return (ewm['RealWin'] / ewm['p_win_adj']).reindex(long.index)
+
+
+# ============================================================
+# 3) API: todas las features home_/away_ alineadas con df
+# ============================================================
+def _split_sides(long: pd.DataFrame, values: pd.DataFrame, n: int) -> tuple[pd.DataFrame, pd.DataFrame]:
+    home = values[long['is_home'].to_numpy()]
+    away = values[~long['is_home'].to_numpy()]
+    home.index = long.loc[long['is_home'], '_row'].to_numpy()
+    away.index = long.loc[~long['is_home'], '_row'].to_numpy()
+    return home.sort_index(), away.sort_index()
+
+
+@traced
+def build_team_features(
+    df: pd.DataFrame,
+    window_size: int = 7,
+    form_window: int = 6,
+    hybrid: dict | None = None,
+    h2h: dict | None = None,
+    relperf_halflife: int = RELPERF_HALFLIFE,
+) -> pd.DataFrame:
+    """
+    Calcula todas las features de forma de equipo de LIMPIEZA en una pasada.
+    Devuelve un DataFrame con el mismo índice que df y las columnas finales del notebook:
+      home/away_avg_{stat}_last{window_size}, home/away_playstyle,
+      home/away_form_points_{form_window}, home/away_form_gd_{form_window},
+      home/away_h2h_*, h2h_*_diff, home/away_relative_perf
+    """
+    hybrid = {**HYBRID_PARAMS, **(hybrid or {})}
+    h2h = {**H2H_PARAMS, **(h2h or {})}
+    roll_n = h2h['roll_n']
+
+    dates = pd.to_datetime(df['Date'])
+    long = team_match_long(df, dates)
+    if long.duplicated(['Team', 'Date']).any():
+        raise ValueError("build_team_features requiere (equipo, Date) único; hay partidos duplicados.")
+
+    blocks = {}
+    last7 = _last7_block(long, window_size)
+    blocks['last7'] = last7
+    gd_mean = weighted_hybrid_gd_mean(long, **hybrid)
+    blocks['playstyle'] = pd.DataFrame({'playstyle': classify_playstyle(gd_mean, **hybrid)})
+    blocks['form'] = _form_block(long, form_window)
+    blocks['h2h'] = _h2h_block(long, **h2h)
+    blocks['relperf'] = pd.DataFrame({'relative_perf': _relperf_block(long, relperf_halflife)})
+    out = assemble_team_features(long, blocks, len(df), window_size, form_window, roll_n)
+    out.index = df.index
+    return out
+
+
+def assemble_team_features(long: pd.DataFrame, blocks: dict, n: int, window_size: int = 7,
+                           form_window: int = 6, roll_n: int = H2H_PARAMS['roll_n']) -> pd.DataFrame:
+    """
+    Columnas home_/away_ (orden del notebook) a partir de los bloques por fila de `long`
+    (last7, playstyle, form, h2h, relperf); índice 0..n-1 = `_row`.
+    """
+    out = pd.DataFrame(index=pd.RangeIndex(n))
+    last7 = blocks['last7']
+
+    # celda 22
+    home, away = _split_sides(long, last7, n)
+    for stat in STATS_LAST7:
+        out[f'home_avg_{stat.lower()}_last{window_size}'] = home[f'{stat}_avg_last{window_size}'].to_numpy()
+    for stat in STATS_LAST7:
+        out[f'away_avg_{stat.lower()}_last{window_size}'] = away[f'{stat}_avg_last{window_size}'].to_numpy()
+
+    # celda 32
+    home, away = _split_sides(long, blocks['playstyle'], n)
+    out['home_playstyle'] = home['playstyle'].to_numpy()
+    out['away_playstyle'] = away['playstyle'].to_numpy()
+
+    # celdas 37 / 38
+    home, away = _split_sides(long, blocks['form'], n)
+    for c in [f'form_points_{form_window}', f'form_gd_{form_window}']:
+        out[f'home_{c}'] = home[c].to_numpy()
+        out[f'away_{c}'] = away[c].to_numpy()
+
+    # celda 51
+    h2h_cols = ['win_rate_ewm', 'draw_rate_ewm', 'loss_rate_ewm',
+                f'win_rate_roll{roll_n}', f'draw_rate_roll{roll_n}', f'loss_rate_roll{roll_n}',
+                'gd_h2h_ewm']
+    home, away = _split_sides(long, blocks['h2h'], n)
+    for c in h2h_cols:
+        out[f'home_h2h_{c}'] = home[c].to_numpy()
+    for c in h2h_cols:
+        out[f'away_h2h_{c}'] = away[c].to_numpy()
+    for base in ['win_rate_ewm', 'draw_rate_ewm', 'loss_rate_ewm', 'gd_h2h_ewm',
+                 f'win_rate_roll{roll_n}', f'draw_rate_roll{roll_n}', f'loss_rate_roll{roll_n}']:
+        out[f'h2h_{base}_diff'] = out[f'home_h2h_{base}'] - out[f'away_h2h_{base}']
+
+    # celda 58
+    home, away = _split_sides(long, blocks['relperf'], n)
+    out['home_relative_perf'] = home['relative_perf'].to_numpy()
+    out['away_relative_perf'] = away['relative_perf'].to_numpy()
+    return out
@@ -0,0 +1,104 @@
+# engine/team_join.py
+# ============================================================
+# PLANIFICADOR DE UNIONES EQUIPO → PARTIDO (local / visitante)
+#  Antes, cada bloque de features por equipo se pegaba al frame de partidos con dos
+#  df.merge(how='left') (uno por lado) + rename + drop('Team'): PREPROCESADO celda 11 hacía
+#  10 merges (5 variables Transfermarkt × 2 lados) y LIMPIEZA repetía el patrón en cada
+#  bloque (acumulados, partidos previos, posición, posición final, efectividad, rachas de
+#  cuotas). Cada merge copia el frame entero, y el rename/drop otra vez. Ahora:
+#   - TeamJoin.add(tabla, cols, on): registra tablas (clave `on` + equipo → columnas)
+#   - attach(df): codifica una sola vez las claves (Season, Date, …, team_id) del frame y de
+#     todas las tablas con la misma clave, y cuelga home_/away_ con dos tomas indexadas por
+#     tabla (posiciones de la clave local y de la visitante), sin copiar el frame
+#  Mismo resultado que la cadena de merges: columnas en el mismo orden (todas las locales y
+#  después las visitantes), mismos valores y dtypes (int → float / bool → object sólo si hay
+#  partidos sin fila en la tabla), claves nulas casan entre sí, índice 0..n-1 como el merge.
+#  A diferencia del merge, una clave repetida en la tabla es un error (el merge duplicaría
+#  partidos).
+# ============================================================
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from engine.trace import traced
+
+
+def _key_codes(parts: list[list[pd.Series]]) -> list[np.ndarray]:
+    """
+    parts[j] = columnas de clave del trozo j (mismo orden en todos). Devuelve un código entero
+    por fila y trozo, igual ⇔ todas las columnas de clave iguales (NaN casa con NaN, como merge).
+    """
+    sizes = [len(p[0]) for p in parts]
+    key = None
+    for i in range(len(parts[0])):
+        col = pd.concat([p[i].reset_index(drop=True) for p in parts], ignore_index=True)
+        codes, uniq = pd.factorize(col, use_na_sentinel=False)
+        codes = codes.astype(np.int64)
+        key = codes if key is None else pd.factorize(key * len(uniq) + codes)[0].astype(np.int64)
+    return np.split(key, np.cumsum(sizes)[:-1])
+
+
+def _take(s: pd.Series, pos: np.ndarray):
+    """s[pos] con NaN donde pos == -1 (misma promoción de dtype que un merge left)."""
+    values = s.array if isinstance(s.dtype, pd.api.extensions.ExtensionDtype) else s.to_numpy()
+    if (pos >= 0).all():
+        return values.take(pos)
+    return pd.api.extensions.take(values, pos, allow_fill=True)
+
+
+class TeamJoin:
+    """
+    Tablas de features por equipo a colgar de un frame de partidos por local y visitante.
+    Cada tabla lleva las columnas `on` (p. ej. Season, Date), la de equipo (`team_col`) y las
+    de valor; `home` / `away` dan los nombres de salida (lista o patrón con {}).
+    """
+
+    def __init__(self, home_col: str = 'HomeTeam_norm', away_col: str = 'AwayTeam_norm', team_col: str = 'Team'):
+        self.home_col = home_col
+        self.away_col = away_col
+        self.team_col = team_col
+        self.blocks: list[dict] = []
+
+    def add(self, table: pd.DataFrame, cols, on=('Season', 'Date'), home='home_{}', away='away_{}') -> "TeamJoin":
+        cols = [cols] if isinstance(cols, str) else list(cols)
+        names = lambda spec: [spec.format(c) for c in cols] if isinstance(spec, str) else list(spec)
+        home, away = names(home), names(away)
+        if not (len(home) == len(away) == len(cols)):
+            raise ValueError("home/away deben tener un nombre por columna de valor")
+        self.blocks.append({'table': table, 'cols': cols, 'on': tuple(on), 'home': home, 'away': away})
+        return self
+
+    @traced
+    def attach(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Añade (en sitio) las columnas de todas las tablas registradas y devuelve df."""
+        taken = []                                     # (bloque, pos_local, pos_visitante)
+        for on in dict.fromkeys(b['on'] for b in self.blocks):
+            group = [b for b in self.blocks if b['on'] == on]
+            parts = [[df[c] for c in on] + [df[self.home_col]],
+                     [df[c] for c in on] + [df[self.away_col]]]
+            parts += [[b['table'][c] for c in on] + [b['table'][self.team_col]] for b in group]
+            codes = _key_codes(parts)
+            n_keys = int(max((c.max() for c in codes if c.size), default=-1)) + 1
+            for b, tk in zip(group, codes[2:]):
+                if np.unique(tk).size != tk.size:
+                    raise ValueError(f"Clave repetida en la tabla de {b['cols']} "
+                                     f"({', '.join(on + (self.team_col,))}): el merge duplicaría partidos")
+                lut = np.full(n_keys, -1, dtype=np.int64)
+                lut[tk] = np.arange(tk.size)
+                taken.append((b, lut[codes[0]], lut[codes[1]]))
+
+        df.index = pd.RangeIndex(len(df))
+        for side in ('home', 'away'):
+            for b, pos_h, pos_a in taken:
+                pos = pos_h if side == 'home' else pos_a
+                for c, name in zip(b['cols'], b[side]):
+                    df[name] = _take(b['table'][c], pos)
+        return df
+
+
+def attach_team_tables(df: pd.DataFrame, table: pd.DataFrame, cols, on=('Season', 'Date'), home='home_{}',
+                       away='away_{}', home_col: str = 'HomeTeam_norm', away_col: str = 'AwayTeam_norm',
+                       team_col: str = 'Team') -> pd.DataFrame:
+    """Atajo para una sola tabla: TeamJoin(...).add(table, cols, on, home, away).attach(df)."""
+    return TeamJoin(home_col, away_col, team_col).add(table, cols, on, home, away).attach(df)
@@ -0,0 +1,325 @@
+# engine/team_state.py
+# ============================================================
+# ESTADO POR EQUIPO DE LAS FEATURES DE FORMA (materialización incremental)
+#  build_team_features recorre todo el histórico con los kernels de pandas
+#  (rolling / ewm agrupados). Aquí los mismos kernels se escriben como
+#  recurrencias que avanzan una fila por grupo y paso, a la vez sobre todos los
+#  grupos (numpy), guardando su estado interno completo:
+#    - rolling mean / sum: suma de Kahan con compensación de altas y de bajas,
+#      nobs, nº de negativos y de valores repetidos (roll_mean / roll_sum de
+#      pandas/_libs/window/aggregations.pyx) y los últimos `window` valores;
+#    - ewm(adjust=False): media ponderada, peso acumulado y nobs;
+#    - media híbrida de GD (celda 32): últimos `window` (GD, Season) y primera
+#      temporada del equipo;
+#    - flags del partido anterior (celdas 54 / 55).
+#  Con el estado guardado en una fecha de corte, las filas posteriores se calculan
+#  sin recorrer la historia y con los mismos bits que el cálculo completo
+#  (`bench.py incremental` lo comprueba contra build_new_features).
+# ============================================================
+from __future__ import annotations
+
+import copy, json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.core.window.ewm import get_center_of_mass
+
+from engine.match_features import match_flags
+from engine.team_features import (H2H_PARAMS, HYBRID_PARAMS, RELPERF_HALFLIFE, STATS_LAST7,
+                                  assemble_team_features, classify_playstyle, team_match_long)
+
+
+# ============================================================
+# 1) Kernels por grupo
+# ============================================================
+class _GroupKernel:
+    """
+    Estado por grupo (claves `keys`) de un kernel precedido de shift(1) dentro del grupo:
+    `pending` guarda el último valor crudo, que es el valor retardado de la fila siguiente.
+    """
+
+    def __init__(self, keys: list[str], cols: list[str], out_cols: list[str]):
+        self.keys, self.cols, self.out_cols = list(keys), list(cols), list(out_cols)
+        self.index: dict[tuple, int] = {}
+        self.state = {name: np.full((0, *shape), fill, dtype=dtype)
+                      for name, (shape, fill, dtype) in self._fields().items()}
+
+    def _fields(self) -> dict:
+        return {'pending': ((len(self.cols),), np.nan, float)}
+
+    def ids(self, keys: list[tuple]) -> np.ndarray:
+        """Fila de estado de cada clave; los grupos nuevos empiezan con el estado inicial."""
+        new = [k for k in dict.fromkeys(keys) if k not in self.index]
+        if new:
+            for k in new:
+                self.index[k] = len(self.index)
+            for name, (shape, fill, dtype) in self._fields().items():
+                self.state[name] = np.concatenate([self.state[name], np.full((len(new), *shape), fill, dtype)])
+        return np.fromiter((self.index[k] for k in keys), dtype=np.int64, count=len(keys))
+
+    def group_ids(self, frame: pd.DataFrame) -> np.ndarray:
+        return self.ids(list(zip(*(frame[k].tolist() for k in self.keys))))
+
+    def run(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Avanza el estado con las filas de `frame` (posteriores a lo ya absorbido); salida alineada."""
+        if frame.empty:
+            return pd.DataFrame(index=frame.index, columns=self.out_cols, dtype=float)
+        order = frame.sort_values(self.keys + ['Date'], kind='mergesort')
+        g = self.group_ids(order)
+        raw = order[self.cols].to_numpy(dtype=float)
+        pos = pd.Series(g).groupby(g).cumcount().to_numpy()
+        by_pos = np.argsort(pos, kind='stable')
+        bounds = np.searchsorted(pos[by_pos], np.arange(pos.max() + 2))
+        out = np.empty((len(order), len(self.out_cols)))
+        # paso p: la p-ésima fila de cada grupo (un grupo aparece como mucho una vez por paso)
+        for p in range(pos.max() + 1):
+            sel = by_pos[bounds[p]:bounds[p + 1]]
+            out[sel] = self.step(g[sel], raw[sel])
+        return pd.DataFrame(out, index=order.index, columns=self.out_cols).reindex(frame.index)
+
+    def step(self, g: np.ndarray, raw: np.ndarray) -> np.ndarray:
+        pending = self.state['pending']
+        out = self._advance(g, pending[g])
+        pending[g] = raw
+        return out
+
+    def _advance(self, g: np.ndarray, lag: np.ndarray) -> np.ndarray:
+        return lag
+
+    def to_arrays(self, prefix: str) -> dict:
+        arrays = {f'{prefix}.{name}': a for name, a in self.state.items()}
+        arrays[f'{prefix}.keys'] = np.array(json.dumps(list(self.index)))
+        return arrays
+
+    def from_arrays(self, prefix: str, arrays) -> None:
+        self.index = {tuple(k): i for i, k in enumerate(json.loads(str(arrays[f'{prefix}.keys'])))}
+        self.state = {name: arrays[f'{prefix}.{name}'].copy() for name in self._fields()}
+
+
+class _Rolling(_GroupKernel):
+    """shift(1).rolling(window, min_periods).mean()/sum() por grupo (roll_mean / roll_sum de pandas)."""
+
+    def __init__(self, keys, cols, out_cols, window: int, min_periods: int, agg: str):
+        self.window, self.min_periods, self.agg = window, min_periods, agg
+        super().__init__(keys, cols, out_cols)
+
+    def _fields(self) -> dict:
+        c = len(self.cols)
+        return {**super()._fields(),
+                'n': ((), 0, np.int64),                 # valores retardados absorbidos (NaN incluidos)
+                'buf': ((self.window, c), np.nan, float),
+                'nobs': ((c,), 0, np.int64),
+                'sum_x': ((c,), 0.0, float),
+                'comp_add': ((c,), 0.0, float),
+                'comp_rem': ((c,), 0.0, float),
+                'neg_ct': ((c,), 0, np.int64),
+                'n_same': ((c,), 0, np.int64),
+                'prev_value': ((c,), np.nan, float)}
+
+    def _advance(self, g, lag):
+        S, w = self.state, self.window
+        rows = np.arange(len(g))
+        n = S['n'][g]
+        slot = n % w
+        buf = S['buf'][g]
+        nobs, sum_x, comp_add, comp_rem = S['nobs'][g], S['sum_x'][g], S['comp_add'][g], S['comp_rem'][g]
+        neg_ct, n_same, prev_value = S['neg_ct'][g], S['n_same'][g], S['prev_value'][g]
+
+        # baja del valor que sale de la ventana (remove_mean / remove_sum)
+        old = buf[rows, slot]
+        rm = (n >= w)[:, None] & (old == old)
+        y = -old - comp_rem
+        t = sum_x + y
+        comp_rem = np.where(rm, t - sum_x - y, comp_rem)
+        sum_x = np.where(rm, t, sum_x)
+        nobs = nobs - rm
+        neg_ct = neg_ct - (rm & np.signbit(old))
+
+        # alta del valor retardado (add_mean / add_sum)
+        ad = lag == lag
+        y = lag - comp_add
+        t = sum_x + y
+        comp_add = np.where(ad, t - sum_x - y, comp_add)
+        sum_x = np.where(ad, t, sum_x)
+        nobs = nobs + ad
+        neg_ct = neg_ct + (ad & np.signbit(lag))
+        n_same = np.where(ad, np.where(lag == prev_value, n_same + 1, 1), n_same)
+        prev_value = np.where(ad, lag, prev_value)
+
+        buf[rows, slot] = lag
+        S['buf'][g], S['n'][g] = buf, n + 1
+        S['nobs'][g], S['sum_x'][g], S['comp_add'][g], S['comp_rem'][g] = nobs, sum_x, comp_add, comp_rem
+        S['neg_ct'][g], S['n_same'][g], S['prev_value'][g] = neg_ct, n_same, prev_value
+
+        if self.agg == 'mean':  # calc_mean
+            with np.errstate(invalid='ignore', divide='ignore'):
+                res = sum_x / nobs
+            res = np.where(n_same >= nobs, prev_value,
+                           np.where((neg_ct == 0) & (res < 0), 0.0,
+                                    np.where((neg_ct == nobs) & (res > 0), 0.0, res)))
+            return np.where((nobs >= self.min_periods) & (nobs > 0), res, np.nan)
+        # calc_sum
+        res = np.where(nobs >= self.min_periods, np.where(n_same >= nobs, prev_value * nobs, sum_x), np.nan)
+        return np.where((nobs == 0) & (self.min_periods == 0), 0.0, res)
+
+
+class _Ewm(_GroupKernel):
+    """shift(1) + groupby().ewm(halflife, adjust=False, min_periods).mean() (ewm de pandas)."""
+
+    def __init__(self, keys, cols, out_cols, halflife: float, min_periods: int):
+        alpha = 1.0 / (1.0 + get_center_of_mass(None, None, halflife, None))
+        self.old_wt_factor, self.new_wt, self.min_periods = 1.0 - alpha, alpha, min_periods
+        super().__init__(keys, cols, out_cols)
+
+    def _fields(self) -> dict:
+        c = len(self.cols)
+        return {**super()._fields(),
+                'weighted': ((c,), np.nan, float),
+                'old_wt': ((c,), 1.0, float),
+                'nobs': ((c,), 0, np.int64)}
+
+    def _advance(self, g, cur):
+        S = self.state
+        weighted, old_wt = S['weighted'][g], S['old_wt'][g]
+        obs = cur == cur
+        nobs = S['nobs'][g] + obs
+        valid = weighted == weighted
+        old_wt = np.where(valid, old_wt * self.old_wt_factor, old_wt)
+        upd = valid & obs & (weighted != cur)
+        with np.errstate(invalid='ignore'):
+            new = (old_wt * weighted + self.new_wt * cur) / (old_wt + self.new_wt)
+        weighted = np.where(upd, new, np.where(~valid & obs, cur, weighted))
+        old_wt = np.where(valid & obs, 1.0, old_wt)
+        S['weighted'][g], S['old_wt'][g], S['nobs'][g] = weighted, old_wt, nobs
+        return np.where(nobs >= self.min_periods, weighted, np.nan)
+
+
+class _HybridGd(_GroupKernel):
+    """Media híbrida de GD de los últimos `window` partidos del equipo (weighted_hybrid_gd_mean)."""
+
+    def __init__(self, keys, window=6, prev_weight=0.7, min_total_periods=3, min_periods_promoted=1, **_):
+        self.window, self.prev_weight = window, prev_weight
+        self.min_total_periods, self.min_periods_promoted = min_total_periods, min_periods_promoted
+        super().__init__(keys, ['GD', 'Season'], ['gd_mean'])
+
+    def _fields(self) -> dict:
+        return {'n': ((), 0, np.int64),
+                'buf': ((self.window, 2), np.nan, float),
+                'first_season': ((), np.nan, float)}
+
+    def set_first_season(self, frame: pd.DataFrame) -> None:
+        """Primera temporada del equipo sobre todas sus filas (también las posteriores al corte)."""
+        first = frame.groupby('Team', sort=False)['Season'].min()
+        g = self.ids([(t,) for t in first.index.tolist()])
+        self.state['first_season'][g] = np.fmin(self.state['first_season'][g], first.to_numpy(dtype=float))
+
+    def step(self, g, raw):
+        S, w = self.state, self.window
+        rows = np.arange(len(g))
+        n, buf = S['n'][g], S['buf'][g]
+        seasons = raw[:, 1]
+        n_prev = np.minimum(n, w)
+        num = np.zeros(len(g))
+        wsum = np.zeros(len(g))
+        num_prom = np.zeros(len(g))
+        cnt_prom = np.zeros(len(g), dtype=int)
+        for k in range(w, 0, -1):
+            valid = n_prev >= k
+            prev = buf[rows, (n - k) % w]
+            same = valid & (prev[:, 1] == seasons)
+            wk = np.where(same, 1.0, self.prev_weight)
+            num = np.where(valid, num + prev[:, 0] * wk, num)
+            wsum = np.where(valid, wsum + wk, wsum)
+            num_prom = np.where(same, num_prom + prev[:, 0], num_prom)
+            cnt_prom = cnt_prom + same
+
+        out = np.full(len(g), np.nan)
+        is_promoted = seasons == S['first_season'][g]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ok = ~is_promoted & (n_prev >= self.min_total_periods) & (n_prev > 0) & (wsum > 0)
+            out[ok] = num[ok] / wsum[ok]
+            ok_p = is_promoted & (n > 0) & (cnt_prom >= self.min_periods_promoted) & (cnt_prom > 0)
+            out[ok_p] = num_prom[ok_p] / cnt_prom[ok_p]
+        buf[rows, n % w] = raw
+        S['buf'][g], S['n'][g] = buf, n + 1
+        return out[:, None]
+
+
+# ============================================================
+# 2) Estado completo de build_team_features + flags de partido previo
+# ============================================================
+def kernel_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Frame largo de team_match_long con los flags de las celdas 54 / 55."""
+    long = team_match_long(df, pd.to_datetime(df['Date']))
+    long[['big_win', 'big_fav_loss']] = match_flags(df, long)
+    return long
+
+
+class TeamState:
+    """Kernels de build_team_features (parámetros por defecto) y de los flags del partido previo."""
+
+    def __init__(self):
+        stats = list(STATS_LAST7)
+        roll_n, self.roll_n = H2H_PARAMS['roll_n'], H2H_PARAMS['roll_n']
+        self.kernels = {
+            'last7': _Rolling(['Team'], stats, [f'{s}_avg_last7' for s in stats], 7, 1, 'mean'),
+            'hybrid': _HybridGd(['Team'], **HYBRID_PARAMS),
+            'form': _Rolling(['Season', 'Team'], ['Points', 'GD'], ['form_points_6', 'form_gd_6'], 6, 1, 'sum'),
+            'h2h_ewm': _Ewm(['Team', 'Opp'], ['win', 'draw', 'loss', 'GD'],
+                            ['win_rate_ewm', 'draw_rate_ewm', 'loss_rate_ewm', 'gd_h2h_ewm'],
+                            H2H_PARAMS['halflife'], 1),
+            'h2h_roll': _Rolling(['Team', 'Opp'], ['win', 'draw', 'loss'],
+                                 [f'{c}_rate_roll{roll_n}' for c in ('win', 'draw', 'loss')],
+                                 roll_n, H2H_PARAMS['minp'], 'mean'),
+            'relperf': _Ewm(['Team'], ['win', 'p_win_adj'], ['real_ewm', 'p_win_ewm'], RELPERF_HALFLIFE, 3),
+            'flags': _GroupKernel(['Team'], ['big_win', 'big_fav_loss'],
+                                  ['prev_big_win_any', 'prev_big_fav_loss_any']),
+        }
+
+    def advance(self, long: pd.DataFrame, cut) -> tuple[dict, 'TeamState']:
+        """
+        Absorbe las filas de `long` (todas posteriores al estado actual). Devuelve las salidas de
+        cada kernel por fila de `long` y una copia del estado tras las filas con Date < cut.
+        """
+        if long.duplicated(['Team', 'Date']).any():
+            raise ValueError("TeamState requiere (equipo, Date) único; hay partidos duplicados.")
+        self.kernels['hybrid'].set_first_season(long)
+        before = (long['Date'] < pd.Timestamp(cut)).to_numpy()
+        outs = {name: [k.run(long[before])] for name, k in self.kernels.items()}
+        snapshot = copy.deepcopy(self)
+        for name, k in self.kernels.items():
+            outs[name] = pd.concat(outs[name] + [k.run(long[~before])]).reindex(long.index)
+        return outs, snapshot
+
+    def team_features(self, long: pd.DataFrame, outs: dict, n: int) -> pd.DataFrame:
+        """Salidas de advance() → columnas de build_team_features (índice 0..n-1 = `_row`)."""
+        h2h = pd.concat([outs['h2h_ewm'][['win_rate_ewm', 'draw_rate_ewm', 'loss_rate_ewm']],
+                         outs['h2h_roll'], outs['h2h_ewm'][['gd_h2h_ewm']]], axis=1)
+        fill = [c for c in h2h.columns if c != 'gd_h2h_ewm']
+        h2h[fill] = h2h[fill].fillna(1/3)
+        rel = outs['relperf']
+        blocks = {
+            'last7': outs['last7'],
+            'playstyle': pd.DataFrame({'playstyle': classify_playstyle(outs['hybrid']['gd_mean'], **HYBRID_PARAMS)}),
+            'form': outs['form'],
+            'h2h': h2h,
+            'relperf': pd.DataFrame({'relative_perf': rel['real_ewm'] / rel['p_win_ewm']}),
+        }
+        return assemble_team_features(long, blocks, n, 7, 6, self.roll_n)
+
+    def save(self, path: str | Path) -> None:
+        arrays = {}
+        for name, k in self.kernels.items():
+            arrays.update(k.to_arrays(name))
+        tmp = Path(path).with_suffix('.tmp.npz')
+        np.savez(tmp, **arrays)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> 'TeamState':
+        state = cls()
+        with np.load(path, allow_pickle=False) as arrays:
+            for name, k in state.kernels.items():
+                k.from_arrays(name, arrays)
+        return state
@@ -0,0 +1,335 @@
+# engine/teams.py
+# ============================================================
+# CANONIZACIÓN DE NOMBRES DE EQUIPO (alias + team_id + caché)
+#  Cada notebook tenía su normalizador y lo aplicaba fila a fila (.map / apply):
+#   - MODELOS: _norm_name (pred_key_match), celdas de walk-forward, alineado y matchlogs
+#   - EXTRACCIÓN (FD): norm_str/_deaccent (apply de unicodedata por fila) + canon_team_name
+#   - EXTRACCIÓN (WK FD.org) / LIMPIEZA (próxima jornada): _strip_accents/_canon + MAP_WK_TO_NORM
+#   - EXTRACCIÓN (jornadas): _norm_text + FBREF_TO_NORM + _canon_team
+#  Ahora:
+#   - normalizadores puros con caché (compact_key, text_key, fd_key, fd_team_key), idénticos
+#     a los de los notebooks
+#   - map_unique(values, fn): factorize → fn una vez por valor distinto → take
+#   - TeamCanon: nombre → *_norm canónico (TEAM_ALIASES → limpieza de frases/tokens → alias).
+#     Si hay registro de equipos (TeamIndex de engine/schema.py) y el resultado no es ningún
+#     equipo conocido, se busca el más parecido (difflib); el alias aprendido se guarda en
+#     data/02_processed/team_aliases.json y no se vuelve a calcular.
+#   - match_key_ids(frames): clave entera equivalente a pred_key_match
+#     (Season|día|compact(local)|compact(visitante)) con códigos de equipo compartidos
+#     entre frames → los merges por clave van sobre int64 en vez de texto.
+# ============================================================
+from __future__ import annotations
+
+import difflib, functools, json, os, re, unicodedata
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from engine.schema import TEAM_IDS_PATH, TeamIndex, day_numbers, pack_match_keys
+
+TEAM_ALIASES_PATH = TEAM_IDS_PATH.with_name("team_aliases.json")
+FUZZY_CUTOFF = 0.88
+
+# Variantes (text_key) → *_norm canónico (incluye Espanyol y Oviedo ampliados)
+TEAM_ALIASES = {
+    # Alavés
+    "alaves": "alaves", "deportivo alaves": "alaves", "deportivo de alaves": "alaves", "alaves cf": "alaves",
+    "alaves club": "alaves", "alaves s a d": "alaves", "alavés": "alaves", "deportivo alavés": "alaves",
+    # Athletic Club
+    "athletic club": "ath bilbao", "athletic bilbao": "ath bilbao", "ath bilbao": "ath bilbao", "bilbao": "ath bilbao",
+    # Valencia
+    "valencia": "valencia", "valencia cf": "valencia",
+    # Atlético de Madrid
+    "atletico madrid": "ath madrid", "atlético madrid": "ath madrid", "atletico de madrid": "ath madrid",
+    "club atletico de madrid": "ath madrid", "atl madrid": "ath madrid",
+    # Cádiz
+    "cadiz": "cadiz", "cádiz": "cadiz", "cadiz cf": "cadiz", "cádiz cf": "cadiz",
+    # Celta
+    "celta": "celta", "celta vigo": "celta", "rc celta de vigo": "celta", "rc celta vigo": "celta",
+    "celta de vigo": "celta",
+    # Espanyol (todas las variantes habituales)
+    "espanyol": "espanol", "rcd espanyol": "espanol", "r c d espanyol": "espanol",
+    "espanyol barcelona": "espanol", "espanyol de barcelona": "espanol", "rcd espanyol de barcelona": "espanol",
+    # Mallorca
+    "mallorca": "mallorca", "rcd mallorca": "mallorca",
+    # Osasuna
+    "osasuna": "osasuna", "ca osasuna": "osasuna",
+    # Sevilla
+    "sevilla": "sevilla", "sevilla fc": "sevilla",
+    # Real Madrid
+    "real madrid": "real madrid", "real madrid cf": "real madrid",
+    # Betis
+    "betis": "betis", "real betis": "betis", "real betis balompie": "betis", "real betis balompié": "betis",
+    # Deportivo La Coruña
+    "deportivo la coruna": "la coruna", "deportivo la coruña": "la coruna", "rc deportivo la coruna": "la coruna",
+    "rc deportivo la coruña": "la coruna", "deportivo": "la coruna",
+    # Barcelona
+    "barcelona": "barcelona", "fc barcelona": "barcelona", "barça": "barcelona",
+    # Getafe
+    "getafe": "getafe", "getafe cf": "getafe",
+    # Málaga
+    "malaga": "malaga", "málaga": "malaga", "malaga cf": "malaga", "málaga cf": "malaga",
+    # Racing Santander
+    "racing sant": "santander", "santander": "santander", "real racing club": "santander",
+    # Real Sociedad
+    "real sociedad": "sociedad", "sociedad": "sociedad", "real sociedad de futbol": "sociedad",
+    "real sociedad de fútbol": "sociedad",
+    # Villarreal
+    "villarreal": "villarreal", "villarreal cf": "villarreal",
+    # Zaragoza
+    "zaragoza": "zaragoza", "real zaragoza": "zaragoza",
+    # Recreativo
+    "recreativo": "recreativo", "recreativo huelva": "recreativo",
+    # Levante
+    "levante": "levante", "levante ud": "levante",
+    # Gimnàstic Tarragona
+    "gimnastic": "gimnastic", "gimnastic tarragona": "gimnastic", "gimnàstic tarragona": "gimnastic",
+    "gimnàstic": "gimnastic",
+    # Murcia
+    "murcia": "murcia", "real murcia": "murcia",
+    # Almería
+    "almeria": "almeria", "almería": "almeria", "ud almeria": "almeria",
+    # Valladolid
+    "valladolid": "valladolid", "real valladolid": "valladolid",
+    # Numancia
+    "numancia": "numancia", "cd numancia": "numancia",
+    # Sporting Gijón
+    "sporting gijon": "sp gijon", "sporting de gijon": "sp gijon", "real sporting de gijon": "sp gijon",
+    "sp gijon": "sp gijon", "real sporting": "sp gijon",
+    # Tenerife
+    "tenerife": "tenerife", "cd tenerife": "tenerife",
+    # Xerez
+    "xerez": "xerez", "xerez cd": "xerez",
+    # Hércules
+    "hercules": "hercules", "hércules": "hercules", "hercules cf": "hercules",
+    # Granada
+    "granada": "granada", "granada cf": "granada",
+    # Rayo Vallecano
+    "rayo vallecano": "vallecano", "vallecano": "vallecano", "rayo vallecano de madrid": "vallecano",
+    # Elche
+    "elche": "elche", "elche cf": "elche",
+    # Eibar
+    "eibar": "eibar", "sd eibar": "eibar",
+    # Córdoba
+    "cordoba": "cordoba", "córdoba": "cordoba", "cordoba cf": "cordoba", "córdoba cf": "cordoba",
+    # Las Palmas
+    "las palmas": "las palmas", "ud las palmas": "las palmas",
+    # Leganés
+    "leganes": "leganes", "leganés": "leganes", "cd leganes": "leganes",
+    # Girona
+    "girona": "girona", "girona fc": "girona",
+    # Huesca
+    "huesca": "huesca", "sd huesca": "huesca",
+    # Oviedo (FD.org/otros)
+    "real oviedo": "real oviedo", "oviedo": "real oviedo", "real oviedo cf": "real oviedo",
+}
+
+# Limpieza genérica para FD.org (sufijos/tokens)
+STOP_TOKENS = {"cf", "fc", "ud", "sd", "cd", "rcd", "rc", "s", "sad"}
+PHRASE_PATTERNS = [
+    (re.compile(r"\bde madrid\b$"), ""),
+    (re.compile(r"\bde barcelona\b$"), ""),
+    (re.compile(r"\bde futbol\b$"), ""),
+    (re.compile(r"\bde f[úu]tbol\b$"), ""),
+    (re.compile(r"\bs\.?a\.?d\.?\b"), ""),
+]
+
+# Clave temporal de football-data.co.uk (EXTRACCIÓN): nombres FD en mayúsculas, no *_norm
+FD_ALIASES = {
+    "ATL MADRID": "ATH MADRID",
+    "ATLETICO MADRID": "ATH MADRID",
+    "ATHLETIC BILBAO": "ATH BILBAO",
+    "DEPORTIVO ALAVES": "ALAVES",
+    "REAL SOCIEDAD": "SOCIEDAD",
+    "REAL BETIS": "BETIS",
+    "REAL VALLADOLID": "VALLADOLID",
+    "CELTA VIGO": "CELTA",
+    "ESPANOL": "ESPANYOL",
+    "RCD ESPANYOL": "ESPANYOL",
+    "RCD MALLORCA": "MALLORCA",
+    "UD LAS PALMAS": "LAS PALMAS",
+    "RAYO VALLECANO": "VALLECANO", "VALLECANO": "VALLECANO",
+    "REAL OVIEDO": "OVIEDO", "SPORTING GIJON": "GIJON", "REAL SPORTING": "GIJON",
+    "DEPORTIVO LA CORUNA": "DEPORTIVO", "REAL ZARAGOZA": "ZARAGOZA",
+}
+_FD_CLUB_TOKENS = re.compile(r"\b(CF|FC|SAD|CD|UD|RCDE|RCD|REAL CLUB DEPORTIVO|REAL CLUB)\b")
+_SPACES = re.compile(r"\s+")
+_NON_ALNUM = re.compile(r"[^A-Za-z0-9]+")
+_NON_ALNUM_LOWER = re.compile(r"[^a-z0-9]+")
+
+
+# ============================================================
+# 1) Normalizadores (str → str, con caché entre llamadas)
+# ============================================================
+def strip_accents(s: str) -> str:
+    t = unicodedata.normalize("NFKD", s)
+    return "".join(c for c in t if not unicodedata.combining(c))
+
+
+@functools.lru_cache(maxsize=65536)
+def compact_key(s) -> str:
+    """Minúsculas y sólo a-z0-9 (sin quitar acentos): la parte de equipo de pred_key_match."""
+    return _NON_ALNUM_LOWER.sub("", str(s).strip().lower())
+
+
+@functools.lru_cache(maxsize=65536)
+def text_key(s) -> str:
+    """Sin acentos, minúsculas, separadores → un espacio (None → "")."""
+    s = "" if s is None else str(s)
+    return _NON_ALNUM.sub(" ", strip_accents(s)).strip().lower()
+
+
+@functools.lru_cache(maxsize=65536)
+def fd_key(s) -> str:
+    """Sin acentos, mayúsculas y espacios colapsados (clave temporal de football-data.co.uk)."""
+    return _SPACES.sub(" ", strip_accents(str(s)).strip().upper())
+
+
+@functools.lru_cache(maxsize=65536)
+def fd_team_key(s) -> str:
+    """fd_key sin sufijos de club (CF, FC, RCD…) + FD_ALIASES."""
+    t = _SPACES.sub(" ", _FD_CLUB_TOKENS.sub("", fd_key(s))).strip()
+    return FD_ALIASES.get(t, t)
+
+
+def map_unique(values, fn) -> pd.Series:
+    """
+    Igual que pd.Series(values).map(fn), pero fn se evalúa una vez por valor distinto
+    (factorize + take). Los nulos pasan a fn tal cual (None y NaN por separado, como en .map).
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    codes, uniq = pd.factorize(s, use_na_sentinel=True)
+    lut = np.empty(len(uniq) + 1, dtype=object)
+    lut[:-1] = [fn(u) for u in uniq]
+    out = pd.Series(lut[codes], index=s.index, name=s.name, dtype=object)
+    na = codes < 0
+    if na.any():
+        out[na] = [fn(v) for v in s[na]]
+    return out
+
+
+# ============================================================
+# 2) Nombre → *_norm canónico + team_id
+# ============================================================
+def _cleanup(base: str) -> str:
+    s = base
+    for pat, repl in PHRASE_PATTERNS:
+        s = pat.sub(repl, s).strip()
+    return " ".join(t for t in s.split() if t not in STOP_TOKENS).strip()
+
+
+class TeamCanon:
+    """
+    Nombre de cualquier fuente → *_norm canónico (el de df_final). Caché por nombre crudo;
+    `teams` (opcional) es el registro de equipos conocidos: activa la búsqueda por similitud
+    para nombres nuevos y da los team_id (ids()).
+    """
+
+    def __init__(self, teams: TeamIndex | None = None, aliases: dict | None = None,
+                 learned_path: str | Path | None = TEAM_ALIASES_PATH, cutoff: float | None = FUZZY_CUTOFF):
+        self.teams = teams
+        self.aliases = TEAM_ALIASES if aliases is None else aliases
+        self.cutoff = cutoff
+        self.learned_path = Path(learned_path) if learned_path is not None else None
+        self.learned: dict[str, str] = {}
+        if self.learned_path is not None and self.learned_path.exists():
+            self.learned = json.loads(self.learned_path.read_text(encoding="utf-8")).get("aliases", {})
+        self.dirty = False
+        self._cache: dict = {}
+
+    @classmethod
+    def load(cls, proc_dir: str | Path | None = None, **kwargs) -> "TeamCanon":
+        """Registro de equipos + alias aprendidos de `proc_dir` (por defecto data/02_processed)."""
+        if proc_dir is None:
+            return cls(TeamIndex.load(), **kwargs)
+        proc_dir = Path(proc_dir)
+        return cls(TeamIndex.load(proc_dir / TEAM_IDS_PATH.name),
+                   learned_path=proc_dir / TEAM_ALIASES_PATH.name, **kwargs)
+
+    def _fuzzy(self, base: str, name: str) -> str | None:
+        if self.teams is None or not len(self.teams) or not self.cutoff:
+            return None
+        pool = list(self.aliases) + [n for n in self.teams.names if n not in self.aliases]
+        hit = difflib.get_close_matches(name, pool, n=1, cutoff=self.cutoff)
+        if not hit:
+            return None
+        out = self.aliases.get(hit[0], hit[0])
+        self.learned[base] = out
+        self.dirty = True
+        ratio = difflib.SequenceMatcher(None, name, hit[0]).ratio()
+        print(f"[TEAMS] alias aprendido: '{base}' → '{out}' (similitud {ratio:.2f} con '{hit[0]}')")
+        return out
+
+    def resolve(self, name) -> str:
+        """Un nombre → *_norm (mismas reglas que _canon_team de EXTRACCIÓN)."""
+        try:
+            return self._cache[name]
+        except (KeyError, TypeError):
+            pass
+        base = text_key(name)
+        out = self.aliases.get(base) or self.learned.get(base)
+        if out is None:
+            s2 = _cleanup(base)
+            out = self.aliases.get(s2, s2)
+            if self.teams is not None and out not in self.teams:
+                out = self._fuzzy(base, out) or out
+        try:
+            self._cache[name] = out
+        except TypeError:
+            pass
+        return out
+
+    def __call__(self, values) -> pd.Series:
+        """Serie de nombres → Serie de *_norm (un resolve por nombre distinto)."""
+        return map_unique(values, self.resolve)
+
+    def ids(self, values) -> np.ndarray:
+        """Nombres (de cualquier fuente) → team_id del registro (registra los equipos nuevos)."""
+        if self.teams is None:
+            self.teams = TeamIndex()
+        return self.teams.ids(self(values))
+
+    def save(self) -> list[Path]:
+        """Guarda alias aprendidos y registro de equipos si han cambiado."""
+        out = []
+        if self.dirty and self.learned_path is not None:
+            self.learned_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.learned_path.with_suffix(".json.tmp")
+            doc = {"version": 1, "aliases": dict(sorted(self.learned.items()))}
+            tmp.write_text(json.dumps(doc, ensure_ascii=False, indent=1), encoding="utf-8")
+            os.replace(tmp, self.learned_path)
+            self.dirty = False
+            out.append(self.learned_path)
+        if self.teams is not None and (p := self.teams.save()) is not None:
+            out.append(p)
+        return out
+
+
+# ============================================================
+# 3) Claves enteras para merges
+# ============================================================
+def shared_codes(*cols) -> list[np.ndarray]:
+    """Códigos enteros comunes (factorize de la concatenación) para varias columnas de texto."""
+    arrs = [np.asarray(c, dtype=object) for c in cols]
+    codes, _ = pd.factorize(np.concatenate(arrs) if arrs else np.array([], dtype=object))
+    return np.split(codes, np.cumsum([len(a) for a in arrs])[:-1])
+
+
+def match_key_ids(frames, home_cols, away_cols, season_col: str = "Season", date_col: str = "Date",
+                  key=compact_key) -> list[np.ndarray]:
+    """
+    Clave entera por fila, igual para dos filas (de cualquiera de los frames) ⇔ mismo
+    pred_key_match: Season (nula → 0), día (tz-naive; NaT → clave -1) y key(str(equipo)).
+    `home_cols` / `away_cols`: columna de equipos de cada frame.
+    """
+    teams = []
+    for f, h, a in zip(frames, home_cols, away_cols):
+        teams += [map_unique(f[h].astype(str), key), map_unique(f[a].astype(str), key)]
+    codes = shared_codes(*teams)
+    out = []
+    for i, f in enumerate(frames):
+        season = pd.to_numeric(f[season_col], errors="coerce").fillna(0).to_numpy(dtype=float)
+        day = day_numbers(f[date_col])
+        out.append(pack_match_keys(season, day, codes[2 * i], codes[2 * i + 1]))
+    return out
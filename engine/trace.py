@@ -0,0 +1,219 @@
+# engine/trace.py
+# ============================================================
+# INSTRUMENTACIÓN (tiempos, CPU, memoria y filas por etapa / celda / función)
+#  - tracing(label): activa un Tracer para la ejecución y al salir escribe
+#    artifacts/trace/{label}_{YYYYmmdd-HHMMSS}.json en formato Chrome trace
+#    (chrome://tracing, https://ui.perfetto.dev) con un resumen por nombre en "otherData".
+#  - span(name, **attrs): context manager para un bloque (etapa, celda de notebook, merge...).
+#  - @traced: decorador para funciones calientes del motor; si la función devuelve un
+#    DataFrame/array (o una tupla que empieza por uno) se anotan sus filas.
+#  Por span: wall (perf_counter), CPU del proceso (process_time), RSS actual y pico de RSS
+#  del proceso (ru_maxrss) al cerrar, y cuánto subió ese pico dentro del span.
+#  Sin tracer activo, span()/traced cuestan una comprobación de variable global.
+#  Los workers de joblib (procesos) no se trazan: su tiempo cae en el span que los lanza.
+# ============================================================
+from __future__ import annotations
+
+import functools, json, os, sys, threading, time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:                 # Windows: sin ru_maxrss
+    resource = None
+
+TRACE_DIR = Path("artifacts/trace")
+
+
+def _peak_rss_mb() -> float | None:
+    """Pico de RSS del proceso (MB) desde que arrancó."""
+    if resource is None:
+        return None
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return kb / 1024 / (1024 if sys.platform == "darwin" else 1)      # macOS da bytes
+
+
+def _rss_mb() -> float | None:
+    """RSS actual (MB), de /proc en Linux."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, AttributeError, IndexError):
+        return None
+
+
+def _rows(obj) -> int | None:
+    if isinstance(obj, tuple) and obj:
+        obj = obj[0]
+    shape = getattr(obj, "shape", None)
+    if shape:
+        return int(shape[0])
+    return None
+
+
+class Span:
+    """Un bloque medido; `rows` y `attrs` se pueden completar dentro del with."""
+
+    __slots__ = ("name", "cat", "attrs", "rows", "t0", "cpu0", "peak0")
+
+    def __init__(self, name: str, cat: str, attrs: dict):
+        self.name, self.cat, self.attrs, self.rows = name, cat, attrs, None
+        self.t0 = self.cpu0 = 0.0
+        self.peak0 = None
+
+    def set(self, rows: int | None = None, **attrs):
+        if rows is not None:
+            self.rows = int(rows)
+        self.attrs.update(attrs)
+        return self
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, rows=None, **attrs):
+        return self
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Acumula spans (eventos "X" de Chrome trace) de todos los hilos del proceso."""
+
+    def __init__(self, label: str, **meta):
+        self.label, self.meta = label, meta
+        self.events: list[dict] = []
+        self.origin = time.perf_counter()
+        self.started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.pid = os.getpid()
+        self._tids: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _tid(self) -> int:
+        ident = threading.get_ident()
+        with self._lock:
+            return self._tids.setdefault(ident, len(self._tids))
+
+    @contextmanager
+    def span(self, name: str, cat: str = "func", **attrs):
+        sp = Span(name, cat, attrs)
+        sp.peak0 = _peak_rss_mb()
+        sp.cpu0, sp.t0 = time.process_time(), time.perf_counter()
+        error = None
+        try:
+            yield sp
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            t1, cpu1 = time.perf_counter(), time.process_time()
+            peak1, rss = _peak_rss_mb(), _rss_mb()
+            args = {"cpu_ms": round((cpu1 - sp.cpu0) * 1e3, 3), **sp.attrs}
+            if sp.rows is not None:
+                args["rows"] = sp.rows
+            if rss is not None:
+                args["rss_mb"] = round(rss, 1)
+            if peak1 is not None:
+                args["peak_rss_mb"] = round(peak1, 1)
+                args["peak_rss_delta_mb"] = round(peak1 - sp.peak0, 1)
+            if error:
+                args["error"] = error
+            ev = {"name": name, "cat": cat, "ph": "X", "pid": self.pid, "tid": self._tid(),
+                  "ts": round((sp.t0 - self.origin) * 1e6, 1), "dur": round((t1 - sp.t0) * 1e6, 1),
+                  "args": args}
+            with self._lock:
+                self.events.append(ev)
+                if rss is not None:
+                    self.events.append({"name": "rss_mb", "ph": "C", "pid": self.pid,
+                                        "ts": ev["ts"] + ev["dur"], "args": {"rss_mb": args["rss_mb"]}})
+
+    def summary(self) -> list[dict]:
+        """Por nombre: llamadas, wall/CPU totales, filas y el mayor salto de pico de RSS."""
+        agg: dict[str, dict] = {}
+        for ev in self.events:
+            if ev["ph"] != "X":
+                continue
+            a = agg.setdefault(ev["name"], {"name": ev["name"], "cat": ev["cat"], "calls": 0, "wall_s": 0.0,
+                                            "cpu_s": 0.0, "rows": 0, "peak_rss_delta_mb": 0.0})
+            a["calls"] += 1
+            a["wall_s"] += ev["dur"] / 1e6
+            a["cpu_s"] += ev["args"]["cpu_ms"] / 1e3
+            a["rows"] += ev["args"].get("rows", 0)
+            a["peak_rss_delta_mb"] = max(a["peak_rss_delta_mb"], ev["args"].get("peak_rss_delta_mb", 0.0))
+        out = sorted(agg.values(), key=lambda a: -a["wall_s"])
+        for a in out:
+            a["wall_s"], a["cpu_s"] = round(a["wall_s"], 4), round(a["cpu_s"], 4)
+        return out
+
+    def write(self, path: str | Path | None = None, out_dir: str | Path = TRACE_DIR) -> Path:
+        if path is None:
+            stamp = self.started_at.replace("-", "").replace(":", "").replace("T", "-")
+            path = Path(out_dir) / f"{self.label}_{stamp}.json"
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        doc = {
+            "traceEvents": [{"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": self.label}},
+                            *self.events],
+            "displayTimeUnit": "ms",
+            "otherData": {"label": self.label, "started_at": self.started_at, **self.meta,
+                          "peak_rss_mb": _peak_rss_mb(), "summary": self.summary()},
+        }
+        path.write_text(json.dumps(doc, ensure_ascii=False, default=str), encoding="utf-8")
+        return path
+
+
+_ACTIVE: Tracer | None = None
+
+
+def current() -> Tracer | None:
+    return _ACTIVE
+
+
+@contextmanager
+def tracing(label: str, out_dir: str | Path = TRACE_DIR, enabled: bool = True, **meta):
+    """
+    Activa un Tracer durante el with y escribe su traza al salir (también si hay error).
+    El Tracer queda en `tracer.path`. Con enabled=False no se registra nada (devuelve None).
+    """
+    global _ACTIVE
+    if not enabled:
+        yield None
+        return
+    prev, tracer = _ACTIVE, Tracer(label, **meta)
+    _ACTIVE = tracer
+    try:
+        yield tracer
+    finally:
+        _ACTIVE = prev
+        tracer.path = tracer.write(out_dir=out_dir)
+
+
+@contextmanager
+def span(name: str, cat: str = "stage", **attrs):
+    """Span en el tracer activo (o nada si no hay)."""
+    tracer = _ACTIVE
+    if tracer is None:
+        yield NULL_SPAN
+        return
+    with tracer.span(name, cat, **attrs) as sp:
+        yield sp
+
+
+def traced(fn=None, *, name: str | None = None, cat: str = "func"):
+    """@traced / @traced(name=...): un span por llamada, con las filas del resultado."""
+    def deco(f):
+        label = name or f"{f.__module__.rsplit('.', 1)[-1]}.{f.__qualname__}"
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            tracer = _ACTIVE
+            if tracer is None:
+                return f(*args, **kwargs)
+            with tracer.span(label, cat) as sp:
+                out = f(*args, **kwargs)
+                sp.rows = _rows(out)
+                return out
+        return wrapper
+    return deco(fn) if fn is not None else deco
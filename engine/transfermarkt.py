@@ -0,0 +1,440 @@
+# engine/transfermarkt.py
+# ============================================================
+# TRANSFERMARKT · PLANTILLA Y MERCADO POR CLUB-TEMPORADA (EXTRACCIÓN_DATOS celdas 29-32)
+#  Antes: bucle secuencial por club y temporada (fetch_html + BeautifulSoup) con esperas de
+#  5-35 s y los resultados sólo en memoria hasta un único to_parquet final: un fallo a mitad
+#  perdía horas de descarga, así que transfermarkt_eur_2005_2025.parquet no se refrescaba.
+#  Ahora:
+#   - TMStore: checkpoint por club-temporada en data/02_processed/transfermarkt/checkpoint.jsonl
+#     (una línea JSON por intento, append + fsync; la última de cada clave manda). Los ya
+#     descargados se saltan; los fallidos quedan pendientes para la siguiente ejecución.
+#     seed() importa el parquet existente para que el refresco anual sólo pida lo nuevo
+#   - scrape_transfermarkt: pool de hilos sobre FetchClient (engine/fetch.py), con el límite
+#     de cortesía de www.transfermarkt.com en HOST_LIMITS (peticiones simultáneas + intervalo
+#     mínimo), reintentos con backoff y caché HTTP en disco. Cada resultado se guarda al llegar
+#   - parse_squad_page: lxml.html directamente (mismas reglas que parse_squad_table /
+#     parse_tm_row_summary con BeautifulSoup)
+#  Sin red: LALIGA_HTTP_STUB + engine/http_stub.py (páginas sintéticas o HTML guardado).
+# ============================================================
+from __future__ import annotations
+
+import json, os, re, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from lxml import html as lxml_html
+
+from engine.fetch import FetchClient
+from engine.trace import traced
+
+TM_BASE = "https://www.transfermarkt.com"
+TM_DIR = Path("data/02_processed/transfermarkt")
+TM_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/124.0 Safari/537.36",
+    "Accept-Language": "es-ES,es;q=0.9,en;q=0.8",
+    "Referer": "https://www.transfermarkt.com/",
+}
+VALUE_COLS = ["avg_age", "value_mio", "value_avg_mio", "squad_size", "pct_foreigners"]
+TM_COLS = ["Season", "team_slug"] + VALUE_COLS + ["team_n"]
+
+# club (team_n) → (slug de Transfermarkt, id de club)
+SLUG_MAP = {
+    "real-madrid":         ("real-madrid", 418),
+    "fc-barcelona":        ("fc-barcelona", 131),
+    "atletico-madrid":     ("atletico-madrid", 13),
+    "athletic-bilbao":     ("athletic-club", 621),
+    "sevilla-fc":          ("sevilla-fc", 368),
+    "valencia-cf":         ("valencia-cf", 1049),
+    "villarreal-cf":       ("villarreal-cf", 1050),
+    "real-sociedad":       ("real-sociedad", 681),
+    "real-betis":          ("real-betis", 150),
+    "ca-osasuna":          ("ca-osasuna", 331),
+    "espanyol-barcelona":  ("rcd-espanyol", 714),
+    "getafe-cf":           ("getafe-cf", 3709),
+    "rc-celta-de-vigo":    ("rc-celta-de-vigo", 940),
+    "rcd-mallorca":        ("rcd-mallorca", 237),
+    "ud-las-palmas":       ("ud-las-palmas", 472),
+    "cadiz-cf":            ("cadiz-cf", 2687),
+    "ud-almeria":          ("ud-almeria", 3302),
+    "granada-cf":          ("granada-cf", 16795),
+    "deportivo-alaves":    ("deportivo-alaves", 1108),
+    "levante-ud":          ("levante-ud", 3368),
+    "rayo-vallecano":      ("rayo-vallecano", 367),
+    "sd-eibar":            ("sd-eibar", 1533),
+    "girona-fc":           ("girona-fc", 12321),
+    "cd-leganes":          ("cd-leganes", 1244),
+    "sd-huesca":           ("sd-huesca", 5358),
+    "real-valladolid":     ("real-valladolid", 366),
+    "elche-cf":            ("elche-cf", 1531),
+    "cordoba-cf":          ("cordoba-cf", 993),
+    "real-sporting":       ("sporting-gijon", 2448),
+    "deportivo-la-coruna": ("deportivo-la-coruna", 897),
+    "real-zaragoza":       ("real-zaragoza", 142),
+    "xerez-cd":            ("xerez-cd", 134),
+    "cd-tenerife":         ("cd-tenerife", 648),
+    "recreativo-huelva":   ("recreativo-huelva", 2867),
+    "cd-numancia":         ("cd-numancia", 2296),
+    "real-murcia-cf":      ("real-murcia", 171),
+    "gimnastic-de-tarragona": ("gimnastic-tarragona", 5648),
+    "racing-santander":    ("racing-santander", 630),
+    "hercules-alicante":   ("hercules-cf", 7971),
+    "malaga-cf":           ("malaga-cf", 1084),
+}
+
+# Temporadas (año de inicio) de cada club en Primera hasta 2024-25
+SEASONS_MAP = {
+    "real-madrid": list(range(2005, 2025)),
+    "fc-barcelona": list(range(2005, 2025)),
+    "atletico-madrid": list(range(2005, 2025)),
+    "athletic-bilbao": list(range(2005, 2025)),
+    "sevilla-fc": list(range(2005, 2025)),
+    "valencia-cf": list(range(2005, 2025)),
+    "villarreal-cf": list(range(2005, 2025)),
+    "real-sociedad": [2005, 2006, 2010, 2011, 2012, 2013, 2014, 2015, 2016, 2017, 2018, 2019, 2020, 2021, 2022, 2023, 2024],
+    "real-betis": [2005, 2006, 2007, 2008, 2011, 2012, 2013, 2015, 2016, 2017, 2018, 2019, 2020, 2021, 2022, 2023, 2024],
+    "ca-osasuna": [2005, 2006, 2007, 2008, 2009, 2010, 2011, 2012, 2013, 2016, 2019, 2020, 2021, 2022, 2023, 2024],
+    "espanyol-barcelona": [2005, 2006, 2007, 2008, 2009, 2010, 2011, 2012, 2013, 2014, 2015, 2016, 2017, 2018, 2019,
+                           2021, 2022, 2024],
+    "getafe-cf": [2005, 2006, 2007, 2008, 2009, 2010, 2011, 2012, 2013, 2014, 2015, 2017, 2018, 2019, 2020, 2021, 2022,
+                  2023, 2024],
+    "rc-celta-de-vigo": [2005, 2006, 2012, 2013, 2014, 2015, 2016, 2017, 2018, 2019, 2020, 2021, 2022, 2023, 2024],
+    "rcd-mallorca": [2005, 2006, 2007, 2008, 2009, 2010, 2011, 2012, 2019, 2020, 2021, 2022, 2023, 2024],
+    "ud-las-palmas": [2015, 2016, 2017, 2023, 2024],
+    "cadiz-cf": [2005, 2020, 2021, 2022, 2023],
+    "ud-almeria": [2007, 2008, 2009, 2010, 2013, 2014, 2022, 2023],
+    "granada-cf": [2011, 2012, 2013, 2014, 2015, 2016, 2019, 2020, 2021, 2023],
+    "deportivo-alaves": [2005, 2016, 2017, 2018, 2019, 2020, 2021, 2023, 2024],
+    "levante-ud": [2006, 2007, 2010, 2011, 2012, 2013, 2014, 2015, 2017, 2018, 2019, 2020, 2021],
+    "rayo-vallecano": [2011, 2012, 2013, 2014, 2015, 2018, 2021, 2022, 2023, 2024],
+    "sd-eibar": [2014, 2015, 2016, 2017, 2018, 2019, 2020],
+    "girona-fc": [2017, 2018, 2022, 2023, 2024],
+    "cd-leganes": [2016, 2017, 2018, 2019, 2024],
+    "sd-huesca": [2018, 2020],
+    "real-valladolid": [2007, 2008, 2009, 2012, 2013, 2018, 2019, 2020, 2022, 2024],
+    "elche-cf": [2013, 2014, 2020, 2021, 2022],
+    "cordoba-cf": [2014],
+    "real-sporting": [2008, 2009, 2010, 2011, 2015, 2016],
+    "deportivo-la-coruna": [2005, 2006, 2007, 2008, 2009, 2010, 2012, 2014, 2015, 2016, 2017],
+    "real-zaragoza": [2005, 2006, 2007, 2009, 2010, 2011, 2012],
+    "xerez-cd": [2009],
+    "cd-tenerife": [2009],
+    "recreativo-huelva": [2006, 2007, 2008],
+    "cd-numancia": [2008],
+    "real-murcia-cf": [2007],
+    "gimnastic-de-tarragona": [2006],
+    "racing-santander": [2005, 2006, 2007, 2008, 2009, 2010, 2011],
+    "hercules-alicante": [2010],
+    "malaga-cf": [2005, 2008, 2009, 2010, 2011, 2012, 2013, 2014, 2015, 2016, 2017],
+}
+
+# *_norm de football-data → slug de Transfermarkt (EXTRACCIÓN celda 40)
+TEAM_NORM_TO_SLUG = {
+    'alaves':        'deportivo-alaves',
+    'ath bilbao':    'athletic-club',
+    'valencia':      'valencia-cf',
+    'ath madrid':    'atletico-madrid',
+    'cadiz':         'cadiz-cf',
+    'celta':         'rc-celta-de-vigo',
+    'espanol':       'rcd-espanyol',
+    'mallorca':      'rcd-mallorca',
+    'osasuna':       'ca-osasuna',
+    'sevilla':       'sevilla-fc',
+    'real madrid':   'real-madrid',
+    'betis':         'real-betis',
+    'la coruna':     'deportivo-la-coruna',
+    'barcelona':     'fc-barcelona',
+    'getafe':        'getafe-cf',
+    'malaga':        'malaga-cf',
+    'santander':     'racing-santander',
+    'sociedad':      'real-sociedad',
+    'villarreal':    'villarreal-cf',
+    'zaragoza':      'real-zaragoza',
+    'recreativo':    'recreativo-huelva',
+    'levante':       'levante-ud',
+    'gimnastic':     'gimnastic-tarragona',
+    'murcia':        'real-murcia',
+    'almeria':       'ud-almeria',
+    'valladolid':    'real-valladolid',
+    'numancia':      'cd-numancia',
+    'sp gijon':      'sporting-gijon',
+    'tenerife':      'cd-tenerife',
+    'xerez':         'xerez-cd',
+    'hercules':      'hercules-cf',
+    'granada':       'granada-cf',
+    'vallecano':     'rayo-vallecano',
+    'elche':         'elche-cf',
+    'eibar':         'sd-eibar',
+    'cordoba':       'cordoba-cf',
+    'las palmas':    'ud-las-palmas',
+    'leganes':       'cd-leganes',
+    'girona':        'girona-fc',
+    'huesca':        'sd-huesca'
+}
+
+
+# ============================================================
+# 1) Trabajos: un club-temporada = una página de plantilla
+# ============================================================
+@dataclass(frozen=True)
+class ClubSeason:
+    club: str            # team_n (clave de SLUG_MAP)
+    team_slug: str
+    team_id: int
+    season: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.season}|{self.club}"
+
+    @property
+    def url(self) -> str:
+        return f"{TM_BASE}/{self.team_slug}/kader/verein/{self.team_id}/plus/0/galerie/0?saison_id={self.season}"
+
+
+def club_seasons(seasons_map: dict = SEASONS_MAP, slug_map: dict = SLUG_MAP) -> list[ClubSeason]:
+    """Trabajos de seasons_map en el orden de slug_map (el del bucle original)."""
+    return [ClubSeason(club, *slug_map[club], int(s)) for club in slug_map for s in seasons_map.get(club, [])]
+
+
+def club_seasons_from_matches(matches: pd.DataFrame, seasons=None, slug_map: dict = SLUG_MAP,
+                              team_norm_to_slug: dict = TEAM_NORM_TO_SLUG) -> tuple[list[ClubSeason], list]:
+    """
+    Trabajos de las temporadas `seasons` (todas si None) a partir de los equipos de los
+    partidos (HomeTeam_norm / AwayTeam_norm de football-data; temporada = año de inicio,
+    agosto → julio como en la celda 39). Devuelve (trabajos, [(season, team_norm)] sin club
+    en slug_map/team_norm_to_slug: ascendidos nuevos que hay que añadir a los mapas).
+    """
+    dates = pd.to_datetime(matches["Date"])
+    season = dates.dt.year.where(dates.dt.month > 7, dates.dt.year - 1)
+    by_slug = {slug: (club, slug, tid) for club, (slug, tid) in slug_map.items()}
+    teams = pd.concat([pd.DataFrame({"Season": season, "team": matches[c].astype(str)})
+                       for c in ("HomeTeam_norm", "AwayTeam_norm")]).dropna().drop_duplicates()
+    if seasons is not None:
+        teams = teams[teams["Season"].isin(list(seasons))]
+    jobs, unmapped = [], []
+    for s, team in teams.sort_values(["Season", "team"]).itertuples(index=False):
+        hit = by_slug.get(team_norm_to_slug.get(team))
+        if hit is None:
+            unmapped.append((int(s), team))
+        else:
+            jobs.append(ClubSeason(hit[0], hit[1], int(hit[2]), int(s)))
+    return jobs, unmapped
+
+
+# ============================================================
+# 2) Parseo (lxml)
+# ============================================================
+def parse_euro_value(text):
+    """
+    Devuelve el valor en millones de euros (M€) desde el formato Transfermarkt (.es y .com).
+    """
+    text = text.strip().replace('\xa0', '').replace(' ', '').lower()
+    num_match = re.search(r"([\d.,]+)", text)
+    if not num_match:
+        return None
+
+    value_str = num_match.group(1)
+    if "." in value_str and "," in value_str:
+        value_str = value_str.replace(".", "").replace(",", ".")
+    elif "." in value_str:
+        value_str = value_str.replace(".", "")
+    elif "," in value_str:
+        value_str = value_str.replace(",", ".")
+    try:
+        value = float(value_str)
+    except ValueError:
+        return None
+
+    if "mill" in text or "million" in text or "mio" in text or re.search(r"\bm\b", text):
+        return value
+    elif value >= 1000:
+        return value / 1000
+    else:
+        return value / 1_000_000
+
+
+def _cls(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _first(nodes):
+    return nodes[0] if nodes else None
+
+
+def parse_squad_page(content) -> dict:
+    """
+    avg_age / value_mio / value_avg_mio (fila de totales del tfoot) y squad_size /
+    pct_foreigners (filas de table.items; extranjero = primera bandera ≠ España o sin bandera).
+    """
+    if isinstance(content, bytes):                 # sin <meta charset> lxml asume latin-1 ("EspaÃ±a")
+        content = content.decode("utf-8", errors="replace")
+    doc = lxml_html.fromstring(content)
+    out = dict.fromkeys(VALUE_COLS)
+
+    row = _first(doc.xpath("(//tfoot)[1]//tr[1]"))
+    if row is not None:
+        age_td = _first(row.xpath(f".//td[{_cls('zentriert')}]"))
+        if age_td is not None:
+            try:
+                out["avg_age"] = float(age_td.text_content().strip().replace(",", "."))
+            except ValueError:
+                pass
+        rechts = row.xpath(f".//td[{_cls('rechts')}]")
+        if len(rechts) >= 3:
+            out["value_mio"] = parse_euro_value(rechts[1].text_content())
+            out["value_avg_mio"] = parse_euro_value(rechts[2].text_content())
+
+    table = _first(doc.xpath(f"//table[{_cls('items')}]"))
+    tbody = _first(table.xpath("./tbody")) if table is not None else None
+    if tbody is not None:
+        squad_size = n_foreign = 0
+        for tr in tbody.xpath("./tr"):
+            cells = tr.xpath("./td")
+            if len(cells) < 4:
+                continue
+            flag = _first(cells[3].xpath(f".//img[{_cls('flaggenrahmen')}]"))
+            if flag is None or flag.get("title", "").strip() not in ("España", "Spain"):
+                n_foreign += 1
+            squad_size += 1
+        if squad_size:
+            out["squad_size"] = squad_size
+            out["pct_foreigners"] = round(100 * n_foreign / squad_size, 2)
+    return out
+
+
+# ============================================================
+# 3) Checkpoint por club-temporada
+# ============================================================
+class TMStore:
+    """
+    checkpoint.jsonl: {"key", "status": "ok"|"failed", Season, team_slug, team_n, valores,
+    "error", "at"} por intento. Escritura con lock + flush + fsync: tras una caída se pierde
+    como mucho la línea a medias (se ignora al leer).
+    """
+
+    def __init__(self, root: str | Path = TM_DIR):
+        self.root = Path(root)
+        self.path = self.root / "checkpoint.jsonl"
+        self._lock = threading.Lock()
+        self.records: dict[str, dict] = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.records[rec["key"]] = rec
+
+    def done(self, key: str) -> bool:
+        return self.records.get(key, {}).get("status") == "ok"
+
+    def _append(self, recs: list[dict]):
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                for rec in recs:
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            for rec in recs:
+                self.records[rec["key"]] = rec
+
+    def put(self, job: ClubSeason, values: dict | None, error: str | None = None):
+        ok = error is None and values is not None and all(values.get(c) is not None for c in VALUE_COLS)
+        rec = {"key": job.key, "status": "ok" if ok else "failed", "Season": job.season,
+               "team_slug": job.team_slug, "team_n": job.club, **(values or dict.fromkeys(VALUE_COLS)),
+               "error": None if ok else (error or "valores incompletos"),
+               "at": datetime.now().isoformat(timespec="seconds")}
+        self._append([rec])
+
+    def seed(self, frame: pd.DataFrame) -> int:
+        """Importa un parquet ya descargado (TM_COLS); sólo claves aún no guardadas."""
+        now = datetime.now().isoformat(timespec="seconds")
+        recs = []
+        for r in frame[TM_COLS].to_dict("records"):
+            key = f"{int(r['Season'])}|{r['team_n']}"
+            if not self.done(key):
+                vals = {c: (None if pd.isna(r[c]) else float(r[c])) for c in VALUE_COLS}
+                if vals["squad_size"] is not None:
+                    vals["squad_size"] = int(vals["squad_size"])
+                recs.append({"key": key, "status": "ok", "Season": int(r["Season"]), "team_slug": r["team_slug"],
+                             "team_n": r["team_n"], **vals, "error": None, "at": now, "source": "seed"})
+        if recs:
+            self._append(recs)
+        return len(recs)
+
+    def frame(self) -> pd.DataFrame:
+        """Registros OK con el esquema de transfermarkt_eur_2005_2025.parquet (orden club de SLUG_MAP, temporada)."""
+        ok = [r for r in self.records.values() if r["status"] == "ok"]
+        out = pd.DataFrame(ok, columns=list(dict.fromkeys(TM_COLS + ["key"])))[TM_COLS]
+        order = {c: i for i, c in enumerate(SLUG_MAP)}
+        out["_o"] = out["team_n"].map(order).fillna(len(order))
+        out = out.sort_values(["_o", "team_n", "Season"], kind="mergesort").drop(columns="_o")
+        out["Season"] = out["Season"].astype("int64")
+        out["squad_size"] = out["squad_size"].astype("int64")
+        return out.reset_index(drop=True)
+
+    def failures(self) -> pd.DataFrame:
+        bad = [r for r in self.records.values() if r["status"] != "ok"]
+        return pd.DataFrame(bad, columns=["Season", "team_n", "team_slug", "error", "at"])
+
+    def export(self, path: str | Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".parquet.tmp")
+        self.frame().to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        return path
+
+
+# ============================================================
+# 4) Descarga reanudable
+# ============================================================
+@traced
+def scrape_transfermarkt(jobs: list[ClubSeason], store: TMStore, client: FetchClient | None = None,
+                         max_workers: int = 4, refresh: bool = False, verbose: bool = True) -> dict:
+    """
+    Descarga y parsea los club-temporada de `jobs` que no estén ya en `store` (todos con
+    refresh=True) y guarda cada uno al terminar. La cadencia la marca el límite por host de
+    FetchClient (HOST_LIMITS["www.transfermarkt.com"]); la caché HTTP en disco evita repetir
+    descargas de páginas ya bajadas (frozen salvo refresh o fallo previo, que se revalidan).
+    Devuelve {"jobs", "skipped", "ok", "failed", "failures"}.
+    """
+    pending = [j for j in dict.fromkeys(jobs) if refresh or not store.done(j.key)]
+    report = {"jobs": len(jobs), "skipped": len(jobs) - len(pending), "ok": 0, "failed": 0, "failures": []}
+    if not pending:
+        return report
+    own = client is None
+    client = client or FetchClient()
+
+    def one(job: ClubSeason) -> dict:
+        # un fallido previo se revalida (ETag) en vez de reparsear la misma copia de caché
+        res = client.get(job.url, headers=TM_HEADERS, frozen=not refresh and job.key not in store.records)
+        return parse_squad_page(res.content)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as ex:
+            futures = {ex.submit(one, j): j for j in pending}
+            for fut in as_completed(futures):
+                job = futures[fut]
+                try:
+                    values, error = fut.result(), None
+                except Exception as e:           # HTTP/parseo: queda como pendiente para la próxima
+                    values, error = None, f"{type(e).__name__}: {e}"
+                store.put(job, values, error)
+                if store.done(job.key):
+                    report["ok"] += 1
+                else:
+                    report["failed"] += 1
+                    report["failures"].append((job.club, job.season, store.records[job.key]["error"]))
+                    if verbose:
+                        print(f"⚠️  FAILED {job.club} {job.season}: {store.records[job.key]['error']}")
+    finally:
+        if own:
+            client.close()
+    return report
@@ -0,0 +1,198 @@
+# engine/verify.py
+# ============================================================
+# VALIDACIÓN DE outputs/ EN STREAMING (scripts/verify_outputs.py)
+#  Antes cada CSV se abría dos veces (cabecera + lista completa de dicts sólo para ver si
+#  había filas) y de future_predictions_*.csv se cargaba todo para sacar las temporadas.
+#  Ahora:
+#   - scan_csv: una sola pasada → cabecera (csv.reader) + nº de filas y temporadas distintas
+#     (sólo la columna Season/season, por bloques con el parser C de pandas); memoria
+#     constante. Con max_rows se para en cuanto sabe que no está vacío (radares).
+#   - scan_many: varios ficheros a la vez (hilos), mismo orden que la entrada
+#   - si MODELOS escribió el almacén de outputs (engine/outputs_store.py), cabeceras, filas y
+#     temporadas salen de su manifest sin abrir los CSV (sólo se comprueba que la vista existe)
+#   - Report: resultado de cada check (ok/warn/fail) + tiempos por fichero → JSON
+# ============================================================
+from __future__ import annotations
+
+import csv, itertools, json, re, time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from engine.outputs_store import OutputsStore
+from engine.trace import traced
+
+_BOM = "\ufeff"
+SEASON_COLS = ("Season", "season")
+
+
+def norm_header(x: str | None) -> str:
+    if x is None:
+        return ""
+    return x.replace("\r", "").replace("\n", "").strip().lstrip(_BOM)
+
+
+@dataclass
+class CsvScan:
+    path: str
+    exists: bool = True
+    header: list[str] = field(default_factory=list)
+    rows: int = 0
+    seasons: list[int] = field(default_factory=list)
+    bytes: int = 0
+    seconds: float = 0.0
+    error: str | None = None
+    source: str = "csv"          # "csv" (escaneado) | "manifest" (metadatos del almacén de outputs)
+
+    @property
+    def name(self) -> str:
+        return Path(self.path).name
+
+    @property
+    def header_lower(self) -> set[str]:
+        return {h.lower() for h in self.header}
+
+
+def _seasons_from_chunk(chunk) -> set[int]:
+    """Temporadas de un bloque: primera columna no vacía (r.get("Season") or r.get("season"))."""
+    col = chunk.iloc[:, 0]
+    for i in range(1, chunk.shape[1]):
+        col = col.where(col != "", chunk.iloc[:, i])
+    vals = pd.to_numeric(col[col != ""], errors="coerce")
+    vals = vals[vals.abs() < float("inf")]      # sin NaN/inf: int(float(s)) fallaba y se ignoraba
+    return set(vals.astype("int64").tolist())
+
+
+def scan_csv(path: str | Path, season_cols: tuple[str, ...] = SEASON_COLS, max_rows: int | None = None,
+             chunksize: int = 100_000) -> CsvScan:
+    """
+    Cabecera, nº de filas y temporadas de un CSV en una sola pasada, por bloques (memoria
+    constante). Con `max_rows` sólo se leen esas filas (basta para saber si está vacío).
+    """
+    path = Path(path)
+    out = CsvScan(str(path))
+    t0 = time.perf_counter()
+    if not path.exists():
+        out.exists = False
+        return out
+    try:
+        out.bytes = path.stat().st_size
+        with path.open(encoding="utf-8", newline="") as f:
+            r = csv.reader(f)
+            out.header = [norm_header(h) for h in next(r, [])]
+            if max_rows is not None:
+                out.rows = sum(1 for _ in itertools.islice((row for row in r if row), max_rows))
+        if max_rows is None and out.header:
+            idx = [out.header.index(c) for c in season_cols if c in out.header]
+            seasons: set[int] = set()
+            # sólo las columnas de temporada (o la primera, para contar filas) con el parser C de pandas
+            for chunk in pd.read_csv(path, usecols=idx or [0], dtype=str, keep_default_na=False,
+                                     encoding="utf-8", chunksize=chunksize):
+                out.rows += len(chunk)
+                if idx:   # usecols devuelve el orden del fichero; se restaura Season → season
+                    seasons |= _seasons_from_chunk(chunk.iloc[:, [sorted(idx).index(i) for i in idx]])
+            out.seasons = sorted(seasons)
+    except (OSError, UnicodeDecodeError, csv.Error, ValueError) as e:
+        out.error = f"{type(e).__name__}: {e}"
+    out.seconds = round(time.perf_counter() - t0, 6)
+    return out
+
+
+@traced
+def scan_many(jobs: list[str | Path | tuple[str | Path, int | None]], max_workers: int = 8) -> list[CsvScan]:
+    """
+    scan_csv de todos los ficheros en paralelo (resultado en el orden de `jobs`).
+    Cada job es una ruta o (ruta, max_rows).
+    """
+    jobs = [j if isinstance(j, tuple) else (j, None) for j in jobs]
+    fn = lambda job: scan_csv(job[0], max_rows=job[1])
+    if len(jobs) <= 1 or max_workers <= 1:
+        return [fn(j) for j in jobs]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as ex:
+        return list(ex.map(fn, jobs))
+
+
+# ============================================================
+# Desde el manifest del almacén de outputs (sin abrir ficheros de datos)
+# ============================================================
+def _season_of_name(path: str | Path) -> int | None:
+    m = re.search(r"(\d{4})", Path(path).stem)
+    return int(m.group(1)) if m else None
+
+
+def manifest_scan(store: OutputsStore, artifact: str, view: str | Path) -> CsvScan:
+    """Un CSV con todas las temporadas (p.ej. metrics_*_by_season.csv) descrito por sus particiones."""
+    parts = store.partitions(artifact)
+    view = Path(view)
+    header = [c for c, _ in parts[0]["schema"]] if parts else []
+    return CsvScan(str(view), exists=view.exists(), header=header, rows=sum(p["rows"] for p in parts),
+                   seasons=[p["season"] for p in parts], bytes=sum(p["bytes"] for p in parts),
+                   source="manifest")
+
+
+def split_by_manifest(store: OutputsStore, artifact: str, paths: list[str], view_dir: Path,
+                      view_name: str) -> tuple[list[CsvScan], list[str]]:
+    """
+    CSV por temporada (radar_prematch_{s}.csv, future_predictions_{s}.csv): las temporadas que
+    están en el almacén salen del manifest (una CsvScan por partición, con su vista CSV); el
+    resto de rutas se devuelven para escanearlas.
+    """
+    scans = []
+    for p in store.partitions(artifact):
+        view = view_dir / view_name.format(season=p["season"])
+        scans.append(CsvScan(str(view), exists=view.exists(), header=[c for c, _ in p["schema"]],
+                             rows=p["rows"], seasons=[p["season"]], bytes=p["bytes"], source="manifest"))
+    covered = {s.seasons[0] for s in scans}
+    return scans, [p for p in paths if _season_of_name(p) not in covered]
+
+
+# ============================================================
+# Informe
+# ============================================================
+class Report:
+    """Checks (ok / warn / fail) + escaneos por fichero; se imprime a la vez que se registra."""
+
+    def __init__(self):
+        self.checks: list[dict] = []
+        self.files: dict[str, CsvScan] = {}
+        self.info: dict = {}
+        self.t0 = time.perf_counter()
+
+    def _add(self, status: str, check: str, msg: str, prefix: str):
+        self.checks.append({"check": check, "status": status, "msg": msg})
+        print(f"{prefix} {msg}")
+
+    def ok(self, check: str, msg: str):
+        self._add("ok", check, msg, "OK")
+
+    def warn(self, check: str, msg: str):
+        self._add("warn", check, msg, "⚠️ ")
+
+    def fail(self, check: str, msg: str):
+        self._add("fail", check, msg, "❌")
+
+    def add_scans(self, scans: list[CsvScan]):
+        self.files.update({s.path: s for s in scans})
+
+    @property
+    def failed(self) -> bool:
+        return any(c["status"] == "fail" for c in self.checks)
+
+    def to_dict(self) -> dict:
+        return {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "passed": not self.failed,
+            "total_s": round(time.perf_counter() - self.t0, 4),
+            "checks": self.checks,
+            "info": self.info,
+            "files": [asdict(s) for s in self.files.values()],
+        }
+
+    def save(self, path: str | Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), ensure_ascii=False, indent=2), encoding="utf-8")
+        return path
@@ -0,0 +1,548 @@
+# engine/walkforward.py
+# ============================================================
+# WALK-FORWARD MULTINOMIAL (H/D/A)
+#  - walkforward_multinomial_accuracy: versión de referencia (idéntica a MODELOS.ipynb)
+#  - walkforward_multinomial_incremental: ventana deslizante con estado
+#      · mediana por columna mantenida sobre arrays ordenados (insert/delete)
+#      · media/varianza del StandardScaler con sumas acumuladas (desplazadas)
+#      · LogisticRegression lbfgs con warm start desde los coeficientes del día anterior
+#  - fit_predict_tasks / run_fit_predict_tasks: ajustes por fecha en serie o en un pool
+#    de procesos joblib (salida idéntica a la serie)
+#  - compare_walkforward_preds: comprobación de equivalencia con tolerancia
+#  Con la tol por defecto de sklearn (1e-4) la referencia queda a ~2e-3 de su propio óptimo;
+#  la equivalencia del incremental (tol=1e-6) se mide contra la referencia convergida
+#  (tol=1e-8), no contra ese error de parada.
+# ============================================================
+from __future__ import annotations
+
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from engine.teams import compact_key, map_unique
+from engine.trace import traced
+
+LABELS = ("H", "D", "A")
+
+
+# ============================================================
+# 1) Claves de predicción
+# ============================================================
+def enforce_unique_pred_key(df_in, key_col="pred_key"):
+    """
+    Si hay claves duplicadas en `key_col`, añade '#k' (k=0,1,2,...) por orden estable
+    dentro de cada grupo duplicado. Devuelve df modificado y nº de filas afectadas.
+    """
+    d = df_in.copy()
+    base = d[key_col].astype(str)
+    grp_sizes = base.map(base.value_counts())
+    pos = base.groupby(base).cumcount()
+    suffix = np.where(grp_sizes > 1, "#" + pos.astype(str), "")
+    d[key_col] = base + suffix
+    affected = int((grp_sizes > 1).sum())
+    return d, affected
+
+
+def build_pred_keys(meta: pd.DataFrame) -> tuple[pd.Series, pd.Series]:
+    """
+    pred_key / pred_key_match para todas las filas de una vez.
+    `compact_key` se evalúa una vez por nombre único (no por fila).
+    """
+    date_key = pd.to_datetime(meta['Date'], errors='coerce')\
+                 .dt.tz_localize(None, nonexistent='NaT', ambiguous='NaT')\
+                 .dt.floor('D')
+    prefix = meta['Season'].astype('Int64').astype(str) + "|" + date_key.dt.strftime("%Y-%m-%d") + "|"
+
+    home_raw = meta['HomeTeam_norm'].astype(str)
+    away_raw = meta['AwayTeam_norm'].astype(str)
+
+    pred_key = prefix + home_raw + "|" + away_raw
+    pred_key_match = prefix + map_unique(home_raw, compact_key) + "|" + map_unique(away_raw, compact_key)
+    return pred_key, pred_key_match
+
+
+def _prepare_frame(df, feature_cols, date_col):
+    df = df.copy()
+    df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+
+    # Feature derivada opcional
+    if 'market_home_logit' in feature_cols and 'market_home_logit' not in df.columns:
+        if {'pimp1', 'pimp2'}.issubset(df.columns):
+            df['market_home_logit'] = np.log(
+                (pd.to_numeric(df['pimp1'], errors='coerce') + 1e-9) /
+                (pd.to_numeric(df['pimp2'], errors='coerce') + 1e-9)
+            )
+        else:
+            raise ValueError("market_home_logit pedido en feature_cols pero faltan pimp1/pimp2 en df.")
+
+    return df.sort_values(date_col).reset_index(drop=True)
+
+
+def _finalize_preds(preds_all: pd.DataFrame):
+    # Unicidad de la clave legible (NO tocar pred_key_match)
+    if 'pred_key' in preds_all.columns:
+        preds_all, _ = enforce_unique_pred_key(preds_all, key_col='pred_key')
+
+    # Accuracy oficial (sin cuotas)
+    scored_mask = preds_all['has_label'] == 1
+    if scored_mask.any():
+        accuracy = (preds_all.loc[scored_mask, 'y_true'] == preds_all.loc[scored_mask, 'y_pred']).mean()
+    else:
+        raise RuntimeError("No hay partidos con etiqueta válida para calcular accuracy.")
+    return float(accuracy), preds_all
+
+
+def _assemble_preds(df, rows, y_true, y_pred, proba):
+    """DataFrame de salida (mismo esquema que la celda 9) para las filas `rows` de df."""
+    meta = df.iloc[rows][['Season','Date','HomeTeam_norm','AwayTeam_norm']].copy()
+    meta['pred_key'], meta['pred_key_match'] = build_pred_keys(meta)
+
+    preds_all = pd.DataFrame({
+        'Date': meta['Date'].values,
+        'y_true': y_true,
+        'y_pred': y_pred,
+        'proba_H': proba[:, 0],
+        'proba_D': proba[:, 1],
+        'proba_A': proba[:, 2],
+    })
+    # etiqueta válida (para accuracy)
+    y_true_clean = preds_all['y_true'].astype(str).str.upper().str.strip()
+    preds_all['has_label'] = y_true_clean.isin(['H', 'D', 'A']).astype(int)
+
+    # anexamos Season/Home/Away/pred_keys
+    preds_all[['Season','HomeTeam_norm','AwayTeam_norm','pred_key']] = \
+        meta[['Season','HomeTeam_norm','AwayTeam_norm','pred_key']].values
+    preds_all['pred_key_match'] = meta['pred_key_match'].values
+    return preds_all
+
+
+def _proba_hda(classes, y_proba) -> np.ndarray:
+    """Reordena predict_proba a columnas fijas H/D/A (NaN si la clase no está en el train)."""
+    proba = np.full((y_proba.shape[0], 3), np.nan)
+    for i, c in enumerate(np.asarray(classes).astype(str)):
+        if c in LABELS:
+            proba[:, LABELS.index(c)] = y_proba[:, i]
+    return proba
+
+
+# ============================================================
+# 2) Tareas de ajuste por fecha (serie o en paralelo)
+#    Cada tarea (train_idx, test_idx) sólo depende de filas anteriores a su fecha,
+#    así que el reparto en procesos no cambia el resultado: mismo código, mismos
+#    datos y BLAS limitado a 1 hilo en ambos caminos → salida idéntica byte a byte.
+# ============================================================
+def make_pipeline(C=1.0, max_iter=1000, random_state=None, tol=1e-4) -> Pipeline:
+    """SimpleImputer(median) → StandardScaler → LogisticRegression(lbfgs), como en MODELOS.ipynb."""
+    return Pipeline(steps=[
+        ('imp', SimpleImputer(strategy='median')),
+        ('scaler', StandardScaler(with_mean=True, with_std=True)),
+        ('logit', LogisticRegression(solver='lbfgs', C=C, max_iter=max_iter, tol=tol, random_state=random_state))
+    ])
+
+
+@traced
+def fit_predict_tasks(X, y, tasks, sample_weight, C=1.0, max_iter=1000, random_state=None, tol=1e-4):
+    """
+    Ajusta make_pipeline() desde cero para cada (train_idx, test_idx) de `tasks`.
+    Devuelve, en el mismo orden, tuplas (classes, y_pred, proba) con proba en el orden de classes.
+    """
+    from threadpoolctl import threadpool_limits
+
+    pipe = make_pipeline(C=C, max_iter=max_iter, random_state=random_state, tol=tol)
+    out = []
+    with threadpool_limits(limits=1):
+        for train_idx, test_idx in tasks:
+            pipe.fit(X[train_idx], y[train_idx], **{'logit__sample_weight': sample_weight})
+            X_test = X[test_idx]
+            out.append((pipe.named_steps['logit'].classes_, pipe.predict(X_test), pipe.predict_proba(X_test)))
+    return out
+
+
+@traced
+def run_fit_predict_tasks(X, y, tasks, sample_weight, n_jobs=1, chunk_size=None, backend="loky", **fit_kw):
+    """
+    Ejecuta `fit_predict_tasks` en serie (n_jobs=1) o repartiendo la lista de tareas
+    en bloques contiguos sobre un pool de procesos joblib. El orden de salida es el de `tasks`.
+
+    Con los tamaños actuales (20 temporadas, ~2.000 fechas de ajustes de milisegundos) el pool
+    es MÁS LENTO que la serie: arrancar los procesos, serializar X/tareas y devolver las probas
+    cuesta más de lo que se reparte (bench walkforward-par: 7.5s en serie vs 17.5s con 2 jobs;
+    33.3s vs 39.5s en una máquina de 1 core). Por eso n_jobs=1 es el valor por defecto (y el de
+    WF_N_JOBS en MODELOS); si joblib resuelve a un solo worker se va directamente a la serie.
+    """
+    if n_jobs == 1 or len(tasks) <= 1:
+        return fit_predict_tasks(X, y, tasks, sample_weight, **fit_kw)
+
+    from joblib import Parallel, delayed, effective_n_jobs
+
+    workers = min(effective_n_jobs(n_jobs), len(tasks))
+    if workers <= 1:
+        return fit_predict_tasks(X, y, tasks, sample_weight, **fit_kw)
+    if chunk_size is None:
+        chunk_size = max(1, int(np.ceil(len(tasks) / (workers * 4))))
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+    results = Parallel(n_jobs=workers, backend=backend)(
+        delayed(fit_predict_tasks)(X, y, chunk, sample_weight, **fit_kw) for chunk in chunks
+    )
+    return [r for chunk_res in results for r in chunk_res]
+
+
+# ============================================================
+# 3) Referencia: reconstruye el pipeline completo cada día
+# ============================================================
+@traced
+def walkforward_multinomial_accuracy(
+    df,
+    feature_cols,
+    date_col='Date',
+    label_col='FTR',
+    n_seasons_window=4,
+    season_size=380,
+    recent_weight=3.0,
+    older_weight=1.0,
+    C=1.0,
+    max_iter=1000,
+    verbose_every=0,
+    n_jobs=1,
+    chunk_size=None,
+    tol=1e-4
+):
+    """
+    Evaluación día a día (misma lógica que la celda 9 de MODELOS.ipynb), añade proba_H/D/A y claves:
+      - pred_key        = Season|YYYY-MM-DD|HomeTeam_norm|AwayTeam_norm (legible, puede llevar #k)
+      - pred_key_match  = Season|YYYY-MM-DD|home_norm|away_norm         (estable para merges)
+
+    n_jobs > 1 (o -1 = todos los cores) reparte las fechas en bloques de `chunk_size`
+    sobre un pool de procesos; la salida es idéntica a la de n_jobs=1, pero con los datos
+    actuales tarda más (ver run_fit_predict_tasks).
+    `tol` es la del lbfgs (1e-4 = la del notebook; 1e-8 da la referencia convergida).
+    """
+    df = _prepare_frame(df, feature_cols, date_col)
+    uniq_dates = df[date_col].sort_values().unique()
+
+    train_window = n_seasons_window * season_size
+    recent_block = season_size
+
+    # Pesos
+    sample_weight = np.full(train_window, older_weight, dtype=float)
+    if recent_block > 0:
+        sample_weight[-recent_block:] = recent_weight
+
+    X_all = df[feature_cols].to_numpy(dtype=float)
+    y_all = df[label_col].to_numpy()
+    dates = df[date_col].to_numpy()
+
+    # Tareas: train = últimas `train_window` filas antes de la fecha; test = filas de la fecha
+    tasks, task_dates = [], []
+    for d_i, current_date in enumerate(uniq_dates):
+        test_idx = np.where(dates == current_date)[0]
+        if test_idx.size == 0:
+            continue
+        train_idx_all = np.where(dates < current_date)[0]
+        if train_idx_all.size < train_window:
+            continue
+        tasks.append((train_idx_all[-train_window:], test_idx))
+        task_dates.append((d_i, current_date))
+
+    if not tasks:
+        raise RuntimeError("No se generaron predicciones; ¿hay suficientes datos previos para armar ventanas?")
+
+    results = run_fit_predict_tasks(X_all, y_all, tasks, sample_weight, n_jobs=n_jobs,
+                                    chunk_size=chunk_size, C=C, max_iter=max_iter, tol=tol)
+
+    rows = np.concatenate([test_idx for _, test_idx in tasks])
+    y_pred = np.concatenate([r[1] for r in results])
+    proba = np.vstack([_proba_hda(r[0], r[2]) for r in results])
+    preds_all = _assemble_preds(df, rows, y_all[rows], y_pred, proba)
+
+    if verbose_every:
+        offset = 0
+        for (d_i, current_date), (_, test_idx) in zip(task_dates, tasks):
+            if d_i % verbose_every == 0:
+                _log_day(d_i, len(uniq_dates), current_date, preds_all.iloc[offset:offset + test_idx.size])
+            offset += test_idx.size
+
+    return _finalize_preds(preds_all)
+
+
+def _log_day(d_i, n_dates, current_date, day_res):
+    mask_lbl = day_res['has_label'] == 1
+    if mask_lbl.any():
+        acc_day = (day_res.loc[mask_lbl, 'y_true'] == day_res.loc[mask_lbl, 'y_pred']).mean()
+        print(f"[{d_i+1}/{n_dates}] {str(current_date)[:10]}  "
+              f"test_n={len(day_res)}  scored_n={int(mask_lbl.sum())}  acc={acc_day:.3f}")
+    else:
+        print(f"[{d_i+1}/{n_dates}] {str(current_date)[:10]}  "
+              f"test_n={len(day_res)}  (sin labels válidas)")
+
+
+# ============================================================
+# 4) Estado de ventana deslizante: mediana + media/varianza
+# ============================================================
+class SlidingImputeScale:
+    """
+    Estadísticos de SimpleImputer(median) + StandardScaler sobre la ventana X[lo:hi],
+    actualizados al deslizar la ventana en lugar de recalcularse desde cero.
+
+    Por columna se guarda el array ordenado de valores no-NaN (mediana exacta) y
+    las sumas Σ(x-K), Σ(x-K)² con un desplazamiento K fijo (estabilidad numérica).
+    Las sumas se recalculan enteras cada `refresh_every` deslizamientos.
+    """
+
+    def __init__(self, X: np.ndarray, refresh_every: int = 64):
+        self.X = X
+        self.refresh_every = int(refresh_every)
+        self.lo = self.hi = 0
+        self._sorted: list[np.ndarray] = []
+        self._shift = np.zeros(X.shape[1])
+        self._s1 = np.zeros(X.shape[1])
+        self._s2 = np.zeros(X.shape[1])
+        self._since_refresh = 0
+
+    def reset(self, lo: int, hi: int):
+        self.lo, self.hi = lo, hi
+        self._sorted = []
+        for j in range(self.X.shape[1]):
+            col = self.X[lo:hi, j]
+            self._sorted.append(np.sort(col[~np.isnan(col)]))
+        self._refresh_sums(new_shift=True)
+
+    def _refresh_sums(self, new_shift: bool = False):
+        for j, arr in enumerate(self._sorted):
+            if new_shift:
+                self._shift[j] = arr[arr.size // 2] if arr.size else 0.0
+            dev = arr - self._shift[j]
+            self._s1[j] = dev.sum()
+            self._s2[j] = (dev * dev).sum()
+        self._since_refresh = 0
+
+    def slide(self, lo: int, hi: int):
+        """Mueve la ventana a X[lo:hi] (lo, hi no decrecientes)."""
+        if lo < self.lo or hi < self.hi or lo >= self.hi:
+            self.reset(lo, hi)
+            return
+        out_rows = self.X[self.lo:lo]
+        in_rows = self.X[self.hi:hi]
+        for j in range(self.X.shape[1]):
+            arr = self._sorted[j]
+            k = self._shift[j]
+            out = out_rows[:, j]
+            out = np.sort(out[~np.isnan(out)])
+            if out.size:
+                pos = np.searchsorted(arr, out, side='left')
+                pos += np.arange(out.size) - np.searchsorted(out, out, side='left')
+                arr = np.delete(arr, pos)
+                self._s1[j] -= (out - k).sum()
+                self._s2[j] -= ((out - k) ** 2).sum()
+            inc = in_rows[:, j]
+            inc = np.sort(inc[~np.isnan(inc)])
+            if inc.size:
+                arr = np.insert(arr, np.searchsorted(arr, inc, side='left'), inc)
+                self._s1[j] += (inc - k).sum()
+                self._s2[j] += ((inc - k) ** 2).sum()
+            self._sorted[j] = arr
+        self.lo, self.hi = lo, hi
+        self._since_refresh += 1
+        if self._since_refresh >= self.refresh_every:
+            self._refresh_sums()
+
+    def params(self):
+        """(active, median, mean, scale) para la ventana actual; active = columnas con algún no-NaN."""
+        n_rows = self.hi - self.lo
+        p = self.X.shape[1]
+        n = np.array([a.size for a in self._sorted])
+        active = n > 0
+        median = np.full(p, np.nan)
+        for j, arr in enumerate(self._sorted):
+            if arr.size:
+                h = arr.size // 2
+                median[j] = arr[h] if arr.size % 2 else (arr[h - 1] + arr[h]) / 2.0
+
+        # Columna imputada = valores observados + (n_rows - n) copias de la mediana
+        n_miss = n_rows - n
+        dm = np.where(active, median - self._shift, 0.0)
+        s1 = self._s1 + n_miss * dm
+        s2 = self._s2 + n_miss * dm * dm
+        mean_dev = s1 / n_rows
+        mean = self._shift + mean_dev
+        var = np.maximum(s2 / n_rows - mean_dev * mean_dev, 0.0)
+
+        # Igual que StandardScaler: varianza ~0 → escala 1
+        eps = np.finfo(np.float64).eps
+        constant = var <= n_rows * eps * var + (n_rows * mean * eps) ** 2
+        scale = np.where(constant, 1.0, np.sqrt(var))
+        return active, median, mean, scale
+
+
+def _transform(X, active, median, mean, scale):
+    Xa = X[:, active]
+    Xa = np.where(np.isnan(Xa), median[active], Xa)
+    return (Xa - mean[active]) / scale[active]
+
+
+# ============================================================
+# 5) Walk-forward incremental (warm start)
+# ============================================================
+@traced
+def walkforward_multinomial_incremental(
+    df,
+    feature_cols,
+    date_col='Date',
+    label_col='FTR',
+    n_seasons_window=4,
+    season_size=380,
+    recent_weight=3.0,
+    older_weight=1.0,
+    C=1.0,
+    max_iter=1000,
+    tol=1e-6,
+    warm_start=True,
+    refresh_every=64,
+    verbose_every=0,
+    return_stats=False
+):
+    """
+    Mismo contrato que `walkforward_multinomial_accuracy` (accuracy, preds_all), pero:
+      - la mediana y la media/escala de la ventana se actualizan al deslizarla
+      - cada lbfgs arranca de los coeficientes del día anterior (warm_start)
+      - las claves y el DataFrame de salida se construyen una vez al final
+
+    `tol` es la tolerancia del solver: con 1e-6 queda a ~1e-5 de la referencia convergida
+    (walkforward_multinomial_accuracy(tol=1e-8)); mídelo con `compare_walkforward_preds`.
+    Con return_stats=True devuelve también un dict con fits, fits/s e iteraciones lbfgs.
+    """
+    t0 = time.perf_counter()
+    df = _prepare_frame(df, feature_cols, date_col)
+    uniq_dates = df[date_col].sort_values().unique()
+
+    train_window = n_seasons_window * season_size
+    recent_block = season_size
+
+    X_all = df[feature_cols].to_numpy(dtype=float)
+    y_all = df[label_col].to_numpy()
+    dates = df[date_col].to_numpy()
+    valid_dates = uniq_dates[~pd.isna(uniq_dates)]
+    first_idx = np.searchsorted(dates[:np.count_nonzero(~pd.isna(dates))], valid_dates, side='left')
+    last_idx = np.searchsorted(dates[:np.count_nonzero(~pd.isna(dates))], valid_dates, side='right')
+
+    sample_weight = np.full(train_window, older_weight, dtype=float)
+    if recent_block > 0:
+        sample_weight[-recent_block:] = recent_weight
+
+    state = SlidingImputeScale(X_all, refresh_every=refresh_every)
+    logit = None
+    prev_active = None
+    prev_classes = None
+
+    test_rows, pred_blocks, proba_blocks = [], [], []
+    n_fits, n_iter_total, fit_time = 0, 0, 0.0
+    date_pos = {d: i for i, d in enumerate(uniq_dates)}
+
+    for current_date, start, stop in zip(valid_dates, first_idx, last_idx):
+        if start < train_window:
+            continue
+        lo, hi = start - train_window, start
+        if n_fits == 0:
+            state.reset(lo, hi)
+        else:
+            state.slide(lo, hi)
+        active, median, mean, scale = state.params()
+
+        y_train = y_all[lo:hi]
+        classes = np.unique(y_train)
+        reuse = (
+            warm_start and logit is not None
+            and np.array_equal(active, prev_active)
+            and np.array_equal(classes, prev_classes)
+        )
+        if not reuse:
+            logit = LogisticRegression(solver='lbfgs', C=C, max_iter=max_iter, tol=tol,
+                                       warm_start=warm_start)
+        prev_active, prev_classes = active, classes
+
+        X_train = _transform(X_all[lo:hi], active, median, mean, scale)
+        tf = time.perf_counter()
+        logit.fit(X_train, y_train, sample_weight=sample_weight)
+        fit_time += time.perf_counter() - tf
+        n_fits += 1
+        n_iter_total += int(np.max(logit.n_iter_))
+
+        X_test = _transform(X_all[start:stop], active, median, mean, scale)
+        y_proba = logit.predict_proba(X_test)
+        y_pred = logit.classes_[np.argmax(y_proba, axis=1)]
+
+        test_rows.append(np.arange(start, stop))
+        pred_blocks.append(y_pred)
+        proba_blocks.append(_proba_hda(logit.classes_, y_proba))
+
+        d_i = date_pos[current_date]
+        if verbose_every and (d_i % verbose_every == 0):
+            day_res = pd.DataFrame({'y_true': y_all[start:stop], 'y_pred': y_pred})
+            y_true_clean = day_res['y_true'].astype(str).str.upper().str.strip()
+            day_res['has_label'] = y_true_clean.isin(['H', 'D', 'A']).astype(int)
+            _log_day(d_i, len(uniq_dates), current_date, day_res)
+
+    if not test_rows:
+        raise RuntimeError("No se generaron predicciones; ¿hay suficientes datos previos para armar ventanas?")
+
+    rows = np.concatenate(test_rows)
+    preds_all = _assemble_preds(df, rows, y_all[rows], np.concatenate(pred_blocks), np.vstack(proba_blocks))
+    accuracy, preds_all = _finalize_preds(preds_all)
+
+    elapsed = time.perf_counter() - t0
+    stats = {
+        "n_fits": n_fits,
+        "elapsed_s": round(elapsed, 3),
+        "fit_s": round(fit_time, 3),
+        "fits_per_sec": round(n_fits / elapsed, 2) if elapsed > 0 else float("nan"),
+        "mean_lbfgs_iter": round(n_iter_total / n_fits, 2) if n_fits else float("nan"),
+        "warm_start": bool(warm_start),
+    }
+    if verbose_every:
+        print(f"[WF-INC] fits={stats['n_fits']} · {stats['fits_per_sec']} fits/s · "
+              f"iter lbfgs medio={stats['mean_lbfgs_iter']} · {stats['elapsed_s']}s")
+
+    if return_stats:
+        return accuracy, preds_all, stats
+    return accuracy, preds_all
+
+
+# ============================================================
+# 6) Equivalencia referencia vs incremental
+# ============================================================
+def compare_walkforward_preds(ref: pd.DataFrame, new: pd.DataFrame, atol: float = 1e-3) -> dict:
+    """
+    Compara dos preds_all fila a fila (mismo orden). Devuelve un informe con la
+    diferencia máxima en proba_H/D/A, nº de y_pred distintos y `ok` si todo cabe en `atol`.
+    Un y_pred distinto sólo se tolera si el partido está empatado dentro de `atol`
+    (dos probabilidades top a menos de 2·atol).
+    """
+    if len(ref) != len(new):
+        return {"ok": False, "reason": f"nº filas distinto: {len(ref)} vs {len(new)}"}
+    if not (ref['pred_key'].astype(str).to_numpy() == new['pred_key'].astype(str).to_numpy()).all():
+        return {"ok": False, "reason": "pred_key desalineadas"}
+
+    cols = ['proba_H', 'proba_D', 'proba_A']
+    P_ref = ref[cols].to_numpy(dtype=float)
+    P_new = new[cols].to_numpy(dtype=float)
+    max_abs = float(np.nanmax(np.abs(P_ref - P_new))) if len(ref) else 0.0
+
+    diff_pred = ref['y_pred'].astype(str).to_numpy() != new['y_pred'].astype(str).to_numpy()
+    top2 = np.sort(P_ref, axis=1)[:, -2:]
+    near_tie = (top2[:, 1] - top2[:, 0]) <= 2 * atol
+    n_diff = int(diff_pred.sum())
+    n_diff_unexplained = int((diff_pred & ~near_tie).sum())
+
+    return {
+        "ok": bool(max_abs <= atol and n_diff_unexplained == 0),
+        "n_rows": int(len(ref)),
+        "max_abs_proba_diff": max_abs,
+        "n_pred_diff": n_diff,
+        "n_pred_diff_unexplained": n_diff_unexplained,
+        "atol": atol,
+    }
@@ -0,0 +1,516 @@
+# engine/walkforward_smote.py
+# ============================================================
+# WALK-FORWARD MULTINOMIAL CON SMOTE + CALIBRACIÓN (MODELOS, "Con SMOTE")
+#  La variante de la celda "Con SMOTE" (ImbPipeline(imputar, escalar, SMOTE, logit) dentro de
+#  CalibratedClassifierCV(cv=3) reajustados desde cero en cada fecha) estaba comentada porque
+#  no cabía en la CI. Aquí quedan las dos:
+#   - walkforward_smote_calibrated_reference: port literal de la celda (referencia lenta)
+#   - walkforward_smote_calibrated: modo rápido sobre el estado del walk-forward incremental
+#      · imputación/escalado de la ventana con SlidingImputeScale (engine/walkforward.py)
+#      · SlidingClassKNN: k vecinos dentro de cada clase mantenidos al deslizar la ventana
+#        (sólo se recalculan las filas nuevas y las que perdieron un vecino)
+#      · SMOTE vectorizado sobre ese grafo + LogisticRegression lbfgs con warm start
+#      · calibración (Platt o isotónica, uno-contra-resto) sobre puntuaciones fuera de muestra
+#        cacheadas: las de la propia predicción walk-forward de cada partido (y un 3-fold
+#        inicial para la primera ventana), en vez de 3 ajustes más por fecha
+#  Diferencias deliberadas con la referencia: el bloque reciente pesa por sample_weight (como el
+#  walk-forward sin SMOTE) en lugar de replicarse, y el modelo final es uno solo sobre toda la
+#  ventana (no la media de los 3 modelos de los folds). Lo que sí se reproduce es el efecto de
+#  la réplica en la calibración: en los folds de la referencia las copias del bloque reciente
+#  caen también en entrenamiento, así que sus puntuaciones de calibración son en muestra (sin
+#  eso, con Platt, las probabilidades salen más planas y se predicen la mitad de empates).
+# ============================================================
+from __future__ import annotations
+
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+
+from engine.trace import traced
+from engine.walkforward import (LABELS, SlidingImputeScale, _assemble_preds, _finalize_preds, _log_day,
+                                _prepare_frame, _proba_hda, _transform)
+
+CALIBRATION_METHODS = ("sigmoid", "isotonic")
+
+
+# ============================================================
+# 1) Referencia: ImbPipeline(SMOTE) + CalibratedClassifierCV por fecha
+# ============================================================
+@traced
+def walkforward_smote_calibrated_reference(
+    df,
+    feature_cols,
+    date_col='Date',
+    label_col='FTR',
+    n_seasons_window=4,
+    season_size=380,
+    recent_weight=3.0,
+    older_weight=1.0,
+    C=1.0,
+    max_iter=1000,
+    smote_k_neighbors=5,
+    smote_sampling_strategy='auto',
+    smote_random_state=42,
+    calibrate=True,
+    calibration_method='sigmoid',
+    calibration_cv=3,
+    random_state=42,
+    verbose_every=0
+):
+    """
+    Misma lógica que la celda comentada de MODELOS (SMOTE en el entrenamiento de cada día,
+    bloque reciente replicado round(recent_weight/older_weight) veces, CalibratedClassifierCV),
+    con la salida de walkforward_multinomial_accuracy (proba_H/D/A, pred_key, pred_key_match).
+    """
+    from imblearn.over_sampling import SMOTE
+    from imblearn.pipeline import Pipeline as ImbPipeline
+    from sklearn.calibration import CalibratedClassifierCV
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import StandardScaler
+
+    df = _prepare_frame(df, feature_cols, date_col)
+    uniq_dates = df[date_col].sort_values().unique()
+    train_window = n_seasons_window * season_size
+    recent_block = season_size
+    denom = older_weight if older_weight > 0 else 1.0
+    recent_dup_factor = int(max(1, round(float(recent_weight) / float(denom))))
+
+    pipe_base = ImbPipeline(steps=[
+        ('imp', SimpleImputer(strategy='median')),
+        ('scaler', StandardScaler(with_mean=True, with_std=True)),
+        ('smote', SMOTE(sampling_strategy=smote_sampling_strategy, k_neighbors=smote_k_neighbors,
+                        random_state=smote_random_state)),
+        ('logit', LogisticRegression(solver='lbfgs', C=C, max_iter=max_iter, random_state=random_state)),
+    ])
+
+    X_all = df[feature_cols].to_numpy(dtype=float)
+    y_all = df[label_col].to_numpy()
+    y_clean = pd.Series(y_all).astype(str).str.upper().str.strip().to_numpy()
+    dates = df[date_col].to_numpy()
+
+    test_rows, pred_blocks, proba_blocks = [], [], []
+    for d_i, current_date in enumerate(uniq_dates):
+        test_idx = np.where(dates == current_date)[0]
+        if test_idx.size == 0:
+            continue
+        train_idx_all = np.where(dates < current_date)[0]
+        if train_idx_all.size < train_window:
+            continue
+        train_idx = train_idx_all[-train_window:]
+        train_idx = train_idx[np.isin(y_clean[train_idx], LABELS)]
+        if train_idx.size < 3:
+            continue
+        if recent_block > 0 and recent_dup_factor > 1:
+            cut = max(0, train_idx.size - recent_block)
+            train_idx = np.concatenate([train_idx[:cut]] + [train_idx[cut:]] * recent_dup_factor)
+
+        clf = CalibratedClassifierCV(estimator=pipe_base, method=calibration_method,
+                                     cv=calibration_cv) if calibrate else pipe_base
+        clf.fit(X_all[train_idx], y_clean[train_idx])
+        classes = clf.classes_ if hasattr(clf, "classes_") else clf.named_steps['logit'].classes_
+        proba = _proba_hda(classes, clf.predict_proba(X_all[test_idx]))
+        y_pred = np.array(LABELS)[np.nanargmax(proba, axis=1)]
+
+        test_rows.append(test_idx)
+        pred_blocks.append(y_pred)
+        proba_blocks.append(proba)
+        if verbose_every and (d_i % verbose_every == 0):
+            day_res = pd.DataFrame({'y_true': y_all[test_idx], 'y_pred': y_pred})
+            day_res['has_label'] = day_res['y_true'].astype(str).str.upper().str.strip().isin(LABELS).astype(int)
+            _log_day(d_i, len(uniq_dates), current_date, day_res)
+
+    if not test_rows:
+        raise RuntimeError("No se generaron predicciones; ¿hay suficientes datos previos para armar ventanas?")
+    rows = np.concatenate(test_rows)
+    preds_all = _assemble_preds(df, rows, y_all[rows], np.concatenate(pred_blocks), np.vstack(proba_blocks))
+    return _finalize_preds(preds_all)
+
+
+# ============================================================
+# 2) k vecinos por clase con ventana deslizante
+# ============================================================
+def _sq_dist(A: np.ndarray, B: np.ndarray) -> np.ndarray:
+    d = (A * A).sum(axis=1)[:, None] + (B * B).sum(axis=1)[None, :] - 2.0 * (A @ B.T)
+    return np.maximum(d, 0.0)
+
+
+class SlidingClassKNN:
+    """
+    Para cada fila de la ventana [lo, hi) con clase conocida, sus k vecinos más cercanos entre
+    las filas de la misma clase (el grafo que SMOTE usa para interpolar), en el espacio Z
+    imputado + escalado. Al deslizar sólo se recalculan las filas nuevas y las que tenían de
+    vecino una fila que sale; el resto incorpora las filas nuevas como candidatas. Las
+    distancias guardadas son las del escalado del día en que se calcularon: reset completo cada
+    `refresh_every` deslizamientos para seguir su deriva.
+    """
+
+    def __init__(self, codes: np.ndarray, k: int = 5, refresh_every: int = 19):
+        self.codes = codes                        # (N,) 0/1/2 = H/D/A, -1 sin etiqueta
+        self.k = int(k)
+        self.refresh_every = int(refresh_every)
+        self.nn = np.full((codes.size, self.k), -1, dtype=np.int64)
+        self.nd = np.full((codes.size, self.k), np.inf)
+        self.Z = None
+        self.lo = self.hi = 0
+        self.n_resets = 0
+        self._since_reset = 0
+
+    def _members(self, c: int) -> np.ndarray:
+        return self.lo + np.flatnonzero(self.codes[self.lo:self.hi] == c)
+
+    def _full(self, rows: np.ndarray, cand: np.ndarray):
+        if rows.size == 0:
+            return
+        d = _sq_dist(self.Z[rows], self.Z[cand])
+        d[rows[:, None] == cand[None, :]] = np.inf            # sin la propia fila
+        kk = min(self.k, max(cand.size - 1, 0))
+        self.nn[rows] = -1
+        self.nd[rows] = np.inf
+        if kk == 0:
+            return
+        part = np.argpartition(d, kk - 1, axis=1)[:, :kk]
+        pd_ = np.take_along_axis(d, part, axis=1)
+        order = np.argsort(pd_, axis=1, kind="stable")
+        self.nn[rows, :kk] = cand[np.take_along_axis(part, order, axis=1)]
+        self.nd[rows, :kk] = np.take_along_axis(pd_, order, axis=1)
+
+    def build(self, Z: np.ndarray, rows: np.ndarray):
+        """Grafo completo para un conjunto arbitrario de filas (p. ej. un fold de entrenamiento)."""
+        self.Z = Z
+        for c in range(len(LABELS)):
+            m = rows[self.codes[rows] == c]
+            self._full(m, m)
+
+    def reset(self, Z: np.ndarray, lo: int, hi: int):
+        self.lo, self.hi = lo, hi
+        self.build(Z, np.arange(lo, hi))
+        self.n_resets += 1
+        self._since_reset = 0
+
+    def slide(self, lo: int, hi: int):
+        if lo < self.lo or hi < self.hi or lo >= self.hi:
+            self.reset(self.Z, lo, hi)
+            return
+        gone = np.zeros(self.codes.size + 1, dtype=bool)       # última posición: relleno -1
+        gone[self.lo:lo] = True
+        gone[-1] = True
+        old_hi = self.hi
+        self.lo, self.hi = lo, hi
+        for c in range(len(LABELS)):
+            members = self._members(c)
+            new = members[members >= old_hi]
+            old = members[members < old_hi]
+            lost = gone[self.nn[old]].any(axis=1)
+            stale, keep = old[lost], old[~lost]
+            self._full(np.concatenate([stale, new]), members)
+            if keep.size and new.size:
+                d = _sq_dist(self.Z[keep], self.Z[new])
+                nd = np.concatenate([self.nd[keep], d], axis=1)
+                nn = np.concatenate([self.nn[keep], np.broadcast_to(new, d.shape)], axis=1)
+                order = np.argsort(nd, axis=1, kind="stable")[:, :self.k]
+                self.nd[keep] = np.take_along_axis(nd, order, axis=1)
+                self.nn[keep] = np.take_along_axis(nn, order, axis=1)
+        self._since_reset += 1
+
+    def stale(self) -> bool:
+        return self._since_reset >= self.refresh_every
+
+
+def smote_samples(Z: np.ndarray, rows: np.ndarray, codes: np.ndarray, weights: np.ndarray, knn: SlidingClassKNN,
+                  rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """
+    SMOTE 'auto' sobre las filas `rows` (índices absolutos de la ventana): cada clase se
+    completa hasta el peso de la mayoritaria con puntos x + u·(vecino − x), eligiendo la fila
+    base con probabilidad ∝ peso (equivale a la réplica del bloque reciente) y el vecino al
+    azar entre sus k. Devuelve (Z_sint, clase_sint).
+    """
+    wc = np.array([weights[codes[rows] == c].sum() for c in range(len(LABELS))])
+    target = wc.max()
+    Z_new, y_new = [], []
+    for c in range(len(LABELS)):
+        n_new = int(round(target - wc[c]))
+        base = rows[codes[rows] == c]
+        if n_new <= 0 or base.size == 0:
+            continue
+        nn = knn.nn[base]
+        has = (nn >= 0).sum(axis=1)
+        ok = has > 0
+        if not ok.any():
+            continue
+        base, nn, has = base[ok], nn[ok], has[ok]
+        p = weights[codes[rows] == c][ok]
+        pick = rng.choice(base.size, size=n_new, p=p / p.sum())
+        col = (rng.random(n_new) * has[pick]).astype(np.int64)
+        src, dst = base[pick], nn[pick, col]
+        step = rng.random((n_new, 1))
+        Z_new.append(Z[src] + step * (Z[dst] - Z[src]))
+        y_new.append(np.full(n_new, c))
+    if not Z_new:
+        return np.empty((0, Z.shape[1])), np.empty(0, dtype=np.int64)
+    return np.vstack(Z_new), np.concatenate(y_new)
+
+
+# ============================================================
+# 3) Calibración sobre puntuaciones fuera de muestra
+# ============================================================
+def fit_platt(f: np.ndarray, y: np.ndarray, w: np.ndarray | None = None, max_iter: int = 50) -> tuple[float, float]:
+    """
+    Sigmoide de Platt P(y=1|f) = 1 / (1 + exp(a·f + b)) con los objetivos suavizados de Platt
+    (como _SigmoidCalibration de sklearn), por Newton con búsqueda lineal.
+    """
+    w = np.ones_like(f) if w is None else w
+    n1 = float(w[y].sum())
+    n0 = float(w[~y].sum())
+    t = np.where(y, (n1 + 1.0) / (n1 + 2.0), 1.0 / (n0 + 2.0))
+
+    def loss(a, b):
+        z = a * f + b
+        # −[t·log σ(−z) + (1−t)·log σ(z)] estable
+        return float((w * (t * np.logaddexp(0, z) + (1 - t) * np.logaddexp(0, -z))).sum())
+
+    a, b = 0.0, float(np.log((n0 + 1.0) / (n1 + 1.0)))
+    cur = loss(a, b)
+    for _ in range(max_iter):
+        p = 1.0 / (1.0 + np.exp(a * f + b))
+        g = w * (t - p)
+        h = w * p * (1 - p)
+        grad = np.array([(g * f).sum(), g.sum()])
+        H = np.array([[(h * f * f).sum(), (h * f).sum()], [(h * f).sum(), h.sum()]]) + 1e-12 * np.eye(2)
+        step = np.linalg.solve(H, grad)
+        s = 1.0
+        while s > 1e-8:
+            na, nb = a - s * step[0], b - s * step[1]
+            new = loss(na, nb)
+            if new <= cur:
+                break
+            s *= 0.5
+        if s <= 1e-8 or cur - new < 1e-10 * max(1.0, abs(cur)):
+            a, b, cur = (na, nb, new) if s > 1e-8 else (a, b, cur)
+            break
+        a, b, cur = na, nb, new
+    return a, b
+
+
+class OvRCalibrator:
+    """Calibradores uno-contra-resto por clase (Platt o isotónica) + normalización a suma 1."""
+
+    def __init__(self, method: str = "sigmoid"):
+        if method not in CALIBRATION_METHODS:
+            raise ValueError(f"calibration_method desconocido: {method!r} (usa {CALIBRATION_METHODS})")
+        self.method = method
+        self.models: list = []
+
+    def fit(self, scores: np.ndarray, codes: np.ndarray, w: np.ndarray) -> "OvRCalibrator":
+        self.models = []
+        for c in range(scores.shape[1]):
+            yc = codes == c
+            if self.method == "sigmoid":
+                self.models.append(fit_platt(scores[:, c], yc, w))
+            else:
+                from sklearn.isotonic import IsotonicRegression
+                self.models.append(IsotonicRegression(out_of_bounds="clip", y_min=0.0, y_max=1.0)
+                                   .fit(scores[:, c], yc.astype(float), sample_weight=w))
+        return self
+
+    def predict_proba(self, scores: np.ndarray) -> np.ndarray:
+        P = np.zeros_like(scores)
+        for c, m in enumerate(self.models):
+            ok = np.isfinite(scores[:, c])                # clase ausente en el modelo → 0
+            if self.method == "sigmoid":
+                P[ok, c] = 1.0 / (1.0 + np.exp(m[0] * scores[ok, c] + m[1]))
+            else:
+                P[ok, c] = m.predict(scores[ok, c])
+        tot = P.sum(axis=1, keepdims=True)
+        return np.where(tot > 0, P / np.where(tot > 0, tot, 1.0), 1.0 / P.shape[1])
+
+
+# ============================================================
+# 4) Modo rápido
+# ============================================================
+@traced
+def walkforward_smote_calibrated(
+    df,
+    feature_cols,
+    date_col='Date',
+    label_col='FTR',
+    n_seasons_window=4,
+    season_size=380,
+    recent_weight=3.0,
+    older_weight=1.0,
+    C=1.0,
+    max_iter=1000,
+    tol=1e-4,
+    smote_k_neighbors=5,
+    smote_random_state=42,
+    calibrate=True,
+    calibration_method='sigmoid',
+    calibration_cv=3,
+    warm_start=True,
+    refresh_every=64,
+    knn_refresh_every=19,
+    verbose_every=0,
+    return_stats=False
+):
+    """
+    Mismo contrato que walkforward_multinomial_incremental (accuracy, preds_all[, stats]) con
+    SMOTE en el entrenamiento de cada fecha y probabilidades calibradas:
+      - ventana y escalado incrementales (SlidingImputeScale) + grafo k-NN por clase (SlidingClassKNN)
+      - lbfgs con warm start sobre ventana + sintéticos (pesos: older/recent como sin SMOTE; sintéticos 1)
+      - calibración sobre las puntuaciones (decision_function) fuera de muestra de las filas de la
+        ventana: la primera ventana con un `calibration_cv`-fold, después las del propio walk-forward;
+        con Platt y el bloque reciente replicado en la referencia (recent_weight/older_weight ≥ 1.5),
+        las de ese bloque son las del modelo del día, como le ocurre a CalibratedClassifierCV
+    Con calibrate=False devuelve las probabilidades del logit con SMOTE.
+    """
+    t0 = time.perf_counter()
+    df = _prepare_frame(df, feature_cols, date_col)
+    uniq_dates = df[date_col].sort_values().unique()
+    train_window = n_seasons_window * season_size
+    recent_block = season_size
+
+    X_all = df[feature_cols].to_numpy(dtype=float)
+    y_all = df[label_col].to_numpy()
+    code_of = {l: i for i, l in enumerate(LABELS)}
+    codes = pd.Series(y_all).astype(str).str.upper().str.strip().map(code_of).fillna(-1).to_numpy(np.int64)
+    dates = df[date_col].to_numpy()
+    n_valid = np.count_nonzero(~pd.isna(dates))
+    valid_dates = uniq_dates[~pd.isna(uniq_dates)]
+    first_idx = np.searchsorted(dates[:n_valid], valid_dates, side='left')
+    last_idx = np.searchsorted(dates[:n_valid], valid_dates, side='right')
+
+    window_weight = np.full(train_window, older_weight, dtype=float)
+    if recent_block > 0:
+        window_weight[-recent_block:] = recent_weight
+    denom = older_weight if older_weight > 0 else 1.0
+    # Platt: puntuaciones del bloque reciente en muestra, como en los folds de la referencia.
+    # Isotónica no: sin la media de 3 calibradores de la referencia, sobreajusta esos escalones
+    recent_in_sample = (calibration_method == 'sigmoid' and recent_block > 0
+                        and round(float(recent_weight) / float(denom)) > 1)
+
+    state = SlidingImputeScale(X_all, refresh_every=refresh_every)
+    knn = SlidingClassKNN(codes, k=smote_k_neighbors, refresh_every=knn_refresh_every)
+    scores = np.full((len(df), len(LABELS)), np.nan)        # puntuaciones fuera de muestra cacheadas
+    calibrator = OvRCalibrator(calibration_method) if calibrate else None
+    labels = np.array(LABELS)
+
+    logit, prev_active, prev_classes, Z = None, None, None, None
+    test_rows, pred_blocks, proba_blocks = [], [], []
+    n_fits, n_iter_total, n_syn_total, fit_time = 0, 0, 0, 0.0
+    date_pos = {d: i for i, d in enumerate(uniq_dates)}
+
+    def new_logit():
+        return LogisticRegression(solver='lbfgs', C=C, max_iter=max_iter, tol=tol, warm_start=warm_start)
+
+    def fit_smote(model, Z, rows, w, rng):
+        Z_syn, y_syn = smote_samples(Z, rows, codes, w, knn, rng)
+        Xf = np.vstack([Z[rows], Z_syn])
+        yf = labels[np.concatenate([codes[rows], y_syn])]
+        wf = np.concatenate([w, np.ones(len(y_syn))])
+        model.fit(Xf, yf, sample_weight=wf)
+        return model, len(y_syn)
+
+    def decision_hda(model, Zt):
+        s = np.full((Zt.shape[0], len(LABELS)), np.nan)
+        d = model.decision_function(Zt)
+        for i, c in enumerate(model.classes_):
+            s[:, code_of[c]] = d[:, i]
+        return s
+
+    for current_date, start, stop in zip(valid_dates, first_idx, last_idx):
+        if start < train_window:
+            continue
+        lo, hi = start - train_window, start
+        d_i = date_pos[current_date]
+        if n_fits == 0:
+            state.reset(lo, hi)
+        else:
+            state.slide(lo, hi)
+        active, median, mean, scale = state.params()
+        if Z is None or Z.shape[1] != int(active.sum()):
+            Z = np.zeros((len(df), int(active.sum())))
+        Z[lo:stop] = _transform(X_all[lo:stop], active, median, mean, scale)
+
+        if n_fits == 0 or knn.stale() or not np.array_equal(active, prev_active):
+            knn.reset(Z, lo, hi)
+        else:
+            knn.Z = Z
+            knn.slide(lo, hi)
+
+        rel = np.flatnonzero(codes[lo:hi] >= 0)
+        rows, w = lo + rel, window_weight[rel]
+        rng = np.random.default_rng([smote_random_state, d_i])
+
+        # Primera ventana: puntuaciones fuera de muestra por k-fold estratificado (como CalibratedClassifierCV)
+        if calibrate and n_fits == 0:
+            from sklearn.model_selection import StratifiedKFold
+            for tr, te in StratifiedKFold(n_splits=calibration_cv).split(rows, codes[rows]):
+                sub = SlidingClassKNN(codes, k=smote_k_neighbors)
+                sub.build(Z, rows[tr])
+                Z_syn, y_syn = smote_samples(Z, rows[tr], codes, w[tr], sub, rng)
+                m_cv = new_logit().fit(np.vstack([Z[rows[tr]], Z_syn]),
+                                       labels[np.concatenate([codes[rows[tr]], y_syn])],
+                                       sample_weight=np.concatenate([w[tr], np.ones(len(y_syn))]))
+                scores[rows[te]] = decision_hda(m_cv, Z[rows[te]])
+
+        classes = np.unique(codes[rows])
+        if (logit is None or not warm_start or not np.array_equal(active, prev_active)
+                or not np.array_equal(classes, prev_classes)):
+            logit = new_logit()
+        prev_active, prev_classes = active, classes
+        tf = time.perf_counter()
+        logit, n_syn = fit_smote(logit, Z, rows, w, rng)
+        fit_time += time.perf_counter() - tf
+        n_fits += 1
+        n_syn_total += n_syn
+        n_iter_total += int(np.max(logit.n_iter_))
+
+        Z_test = Z[start:stop]
+        test_scores = decision_hda(logit, Z_test)
+        if calibrate:
+            cal_scores = scores[rows]
+            if recent_in_sample:
+                recent = rows >= hi - recent_block
+                cal_scores[recent] = decision_hda(logit, Z[rows[recent]])
+            ok = np.isfinite(cal_scores).all(axis=1)
+            calibrator.fit(cal_scores[ok], codes[rows[ok]], w[ok])
+            proba = calibrator.predict_proba(test_scores)
+        else:
+            proba = _proba_hda(logit.classes_, logit.predict_proba(Z_test))
+        scores[start:stop] = test_scores
+        y_pred = labels[np.nanargmax(proba, axis=1)]
+
+        test_rows.append(np.arange(start, stop))
+        pred_blocks.append(y_pred)
+        proba_blocks.append(proba)
+        if verbose_every and (d_i % verbose_every == 0):
+            day_res = pd.DataFrame({'y_true': y_all[start:stop], 'y_pred': y_pred})
+            day_res['has_label'] = (codes[start:stop] >= 0).astype(int)
+            _log_day(d_i, len(uniq_dates), current_date, day_res)
+
+    if not test_rows:
+        raise RuntimeError("No se generaron predicciones; ¿hay suficientes datos previos para armar ventanas?")
+
+    rows = np.concatenate(test_rows)
+    preds_all = _assemble_preds(df, rows, y_all[rows], np.concatenate(pred_blocks), np.vstack(proba_blocks))
+    accuracy, preds_all = _finalize_preds(preds_all)
+
+    elapsed = time.perf_counter() - t0
+    stats = {
+        "n_fits": n_fits,
+        "elapsed_s": round(elapsed, 3),
+        "fit_s": round(fit_time, 3),
+        "fits_per_sec": round(n_fits / elapsed, 2) if elapsed > 0 else float("nan"),
+        "mean_lbfgs_iter": round(n_iter_total / n_fits, 2) if n_fits else float("nan"),
+        "mean_synthetic": round(n_syn_total / n_fits, 1) if n_fits else float("nan"),
+        "knn_resets": knn.n_resets,
+        "calibration": calibration_method if calibrate else None,
+    }
+    print(f"[WF-SMOTE] fits={stats['n_fits']} · {stats['fits_per_sec']} fits/s · "
+          f"iter lbfgs medio={stats['mean_lbfgs_iter']} · sintéticos medios={stats['mean_synthetic']} · "
+          f"{stats['elapsed_s']}s")
+
+    if return_stats:
+        return accuracy, preds_all, stats
+    return accuracy, preds_all
@@ -0,0 +1,2146 @@
+# scripts/bench.py
+# Benchmarks del motor (engine/) frente a la versión de los notebooks.
+#   python scripts/bench.py walkforward [--seasons 20] [--ref-tol 1e-8] [--atol 1e-3] [--parquet data/03_features/df_final.parquet]
+#   python scripts/bench.py walkforward-par [--n-jobs -1]
+#   python scripts/bench.py sweep [--seasons 20] [--n-jobs 1]
+#   python scripts/bench.py team-features [--seasons 20] [--baseline-rev <commit>]
+#   python scripts/bench.py team-join [--seasons 20] [--repeat 3]
+#   python scripts/bench.py incremental [--seasons 20] [--matchday 20] [--skip-notebook]
+#   python scripts/bench.py pipeline [--seasons 20] [--skip-papermill] [--baseline-rev REV]
+#   python scripts/bench.py fetch [--latency 0.3] [--seasons 21] [--clubs 20]
+#   python scripts/bench.py elo [--days 3] [--latency 0.1]
+#   python scripts/bench.py elo-index [--season 2024] [--repeat 50]
+#   python scripts/bench.py cumprofit [--seasons 50] [--n-jobs -1]
+#   python scripts/bench.py verify [--seasons 40] [--rows 2000]
+#   python scripts/bench.py metrics [--seasons 20] [--n-boot 2000]
+#   python scripts/bench.py radar [--seasons 20] [--extra-cols 250]
+#   python scripts/bench.py memory [--seasons 20] [--extra-cols 250]
+#   python scripts/bench.py teams [--seasons 20] [--repeat 3]
+#   python scripts/bench.py season-sim [--n-sims 100000] [--chunk 25000] [--played 0.5]
+#   python scripts/bench.py odds-ledger [--files 38] [--rows 10] [--seasons 20]
+#   python scripts/bench.py staking [--seasons 20] [--fractions 8] [--loop-strategies 20]
+#   python scripts/bench.py smote [--seasons 8] [--method sigmoid] [--max-delta-draws 0.015] [--skip-reference]
+#   python scripts/bench.py tm-scrape [--jobs 0] [--latency 0.1] [--sleep 0.1] [--workers 4]
+#   python scripts/bench.py regress [--threshold 1.5] [--update-baseline] [--cases walkforward radar ...]
+from pathlib import Path
+import argparse, json, sys, time
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import numpy as np
+import pandas as pd
+
+from engine.synthetic import make_df_final, make_matches
+
+BENCH_DIR = ROOT / "artifacts" / "bench"
+BASELINE = ROOT / "scripts" / "bench_baseline.json"
+DF_FINAL = ROOT / "data" / "03_features" / "df_final.parquet"
+
+# Copia de FEATURES_S13 (MODELOS.ipynb, celda 7)
+FEATURES_S13 = ['pimp1','pimpx','pimp2','relative_perf_diff','avg_xg_last7_diff','form_points_6_diff',
+                'home_total_gd_cum', 'away_total_gd_cum', 'h2h_win_rate_ewm_diff', 'home_total_matches_prev',
+                'away_total_matches_prev', 'home_avg_shotsontarget_last7', 'avg_shots_last7_diff',
+                'away_playstyle_equilibrado', 'home_prev_big_odds_win_any', 'total_gd_cum_diff']
+# Copia de FEATURES_S11p (MODELOS.ipynb, celda 7)
+FEATURES_S11p = ['pimp1','pimpx','pimp2','relative_perf_diff','avg_xg_last7_diff','form_points_6_diff',
+                 'home_total_gd_cum', 'away_total_gd_cum', 'h2h_win_rate_ewm_diff', 'home_total_matches_prev',
+                 'away_total_matches_prev', 'home_avg_shotsontarget_last7', 'avg_shots_last7_diff', 'away_gd_cum']
+
+
+def _load_df_final(parquet: str | None, seasons: int) -> tuple[pd.DataFrame, str]:
+    path = Path(parquet) if parquet else DF_FINAL
+    if path.exists():
+        return pd.read_parquet(path), str(path)
+    return make_df_final(n_seasons=seasons), f"synthetic({seasons} temporadas)"
+
+
+def _save(name: str, result: dict):
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    out = BENCH_DIR / f"{name}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"[bench] Resultado → {out}")
+
+
+# ============================================================
+# walkforward: referencia (pipeline completo por fecha) vs incremental
+# ============================================================
+def bench_walkforward(args) -> dict:
+    """
+    Incremental (tol del motor) vs referencia clásica convergida (--ref-tol). Con la tol del
+    notebook (1e-4) la referencia se queda a ~2e-3 de su óptimo y ningún motor puede casar
+    con ella a 1e-3: --ref-tol 1e-4 mide esa distancia.
+    """
+    from engine.walkforward import (
+        walkforward_multinomial_accuracy,
+        walkforward_multinomial_incremental,
+        compare_walkforward_preds,
+    )
+    df, src = _load_df_final(args.parquet, args.seasons)
+    print(f"[bench] walkforward · fuente={src} · filas={len(df)} · fechas={df['Date'].nunique()}")
+
+    inc_kw = {"tol": args.tol} if args.tol is not None else {}
+    acc_inc, preds_inc, stats = walkforward_multinomial_incremental(
+        df, FEATURES_S13, return_stats=True, **inc_kw
+    )
+    result = {"source": src, "rows": int(len(df)), "incremental": stats, "acc_incremental": acc_inc}
+
+    if not args.skip_reference:
+        t0 = time.perf_counter()
+        acc_ref, preds_ref = walkforward_multinomial_accuracy(df, FEATURES_S13, tol=args.ref_tol)
+        ref_s = time.perf_counter() - t0
+        report = compare_walkforward_preds(preds_ref, preds_inc, atol=args.atol)
+        result.update({
+            "reference": {
+                "elapsed_s": round(ref_s, 3),
+                "tol": args.ref_tol,
+                "fits_per_sec": round(stats["n_fits"] / ref_s, 2) if ref_s > 0 else None,
+            },
+            "acc_reference": acc_ref,
+            "speedup": round(ref_s / stats["elapsed_s"], 2) if stats["elapsed_s"] else None,
+            "equivalence": report,
+        })
+        print(f"[bench] referencia (tol={args.ref_tol:g}) {ref_s:.1f}s vs incremental {stats['elapsed_s']}s "
+              f"→ x{result['speedup']} · max|Δp|={report['max_abs_proba_diff']:.2e} · "
+              f"{'✅' if report['ok'] else '⚠️'} (atol={args.atol})")
+    return result
+
+
+# ============================================================
+# walkforward-par: ruta clásica en serie vs pool de procesos (debe ser idéntica)
+# ============================================================
+def bench_walkforward_par(args) -> dict:
+    from engine.walkforward import walkforward_multinomial_accuracy
+    from joblib import effective_n_jobs
+
+    df, src = _load_df_final(args.parquet, args.seasons)
+    workers = effective_n_jobs(args.n_jobs)
+    print(f"[bench] walkforward-par · fuente={src} · filas={len(df)} · workers={workers}")
+
+    t0 = time.perf_counter()
+    _, preds_ser = walkforward_multinomial_accuracy(df, FEATURES_S13, n_jobs=1)
+    ser_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    _, preds_par = walkforward_multinomial_accuracy(df, FEATURES_S13, n_jobs=args.n_jobs,
+                                                    chunk_size=args.chunk_size)
+    par_s = time.perf_counter() - t0
+
+    identical = preds_ser.to_csv(index=False).encode() == preds_par.to_csv(index=False).encode()
+    print(f"[bench] serie {ser_s:.1f}s vs paralelo {par_s:.1f}s ({workers} workers) → "
+          f"x{ser_s / par_s:.2f} · {'✅ idéntico' if identical else '❌ DIFERENTE'}")
+    if not identical:
+        sys.exit(1)
+    return {"source": src, "rows": int(len(df)), "workers": workers, "serial_s": round(ser_s, 3),
+            "parallel_s": round(par_s, 3), "speedup": round(ser_s / par_s, 2), "identical": identical}
+
+
+# ============================================================
+# sweep: 50 configuraciones (2 sets × 5 C × 5 pesos) vs un walk-forward incremental
+# ============================================================
+def bench_sweep(args) -> dict:
+    from engine.sweep import sweep_walkforward, summarize
+    from engine.walkforward import walkforward_multinomial_incremental, compare_walkforward_preds
+
+    df, src = _load_df_final(args.parquet, args.seasons)
+    print(f"[bench] sweep · fuente={src} · filas={len(df)} · fechas={df['Date'].nunique()}")
+
+    t0 = time.perf_counter()
+    _, preds_one = walkforward_multinomial_incremental(df, FEATURES_S13)
+    one_s = time.perf_counter() - t0
+
+    board, grid, stats, preds = sweep_walkforward(
+        df, {"S13": FEATURES_S13, "S11p": FEATURES_S11p}, Cs=(0.03, 0.1, 0.3, 1.0, 3.0),
+        weight_schemes={"r1": (1.0, 1.0), "r2": (2.0, 1.0), "r3": (3.0, 1.0), "r5": (5.0, 1.0),
+                        "r3o05": (3.0, 0.5)},
+        n_jobs=args.n_jobs, return_preds=True,
+    )
+    sweep_s = stats["elapsed_s"]
+    # la configuración por defecto de WF_KWARGS debe reproducir el walk-forward incremental
+    report = compare_walkforward_preds(preds_one, preds["S13|C=1|w=r3|win=4"], atol=args.atol)
+    top = summarize(board).head(5)
+    print(top[["config", "accuracy", "logloss", "brier", "roi"]].to_string(index=False))
+    print(f"[bench] 1 walk-forward {one_s:.1f}s · sweep de {len(grid)} configuraciones {sweep_s:.1f}s "
+          f"(x{sweep_s / one_s:.2f} de una ejecución; {len(grid)} ejecuciones ≈ {len(grid) * one_s:.0f}s) · "
+          f"max|Δp| S13/C=1/r3={report['max_abs_proba_diff']:.2e} {'✅' if report['ok'] else '⚠️'}")
+    return {"source": src, "rows": int(len(df)), "configs": int(len(grid)), "one_run_s": round(one_s, 3),
+            "sweep_s": sweep_s, "ratio_vs_one_run": round(sweep_s / one_s, 2), "sweep_stats": stats,
+            "equivalence": report, "top5": top.to_dict(orient="records")}
+
+
+# ============================================================
+# team-features: bucles por grupo de LIMPIEZA vs engine/team_features.py
+# ============================================================
+LEGACY_CLEAN_CELLS = (22, 58)                          # celdas de features por equipo/partido de LIMPIEZA
+LEGACY_TEAM_FEATURE_CELLS = (22, 32, 37, 38, 51, 58)   # las que sustituye engine/team_features.py
+LEGACY_NEW_FEATURE_CELLS = (19, 61)                    # creación de variables (build_new_features)
+
+
+def _baseline_notebook(name: str, rev: str | None = None) -> dict:
+    """Notebook tal y como estaba en `rev` (por defecto el commit raíz, antes de engine/)."""
+    import subprocess
+    git = lambda *a: subprocess.run(["git", "-C", str(ROOT), *a], check=True, capture_output=True).stdout
+    rev = rev or git("rev-list", "--max-parents=0", "HEAD").decode().split()[0]
+    return json.loads(git("show", f"{rev}:notebooks/{name}").decode("utf-8"))
+
+
+def _legacy_team_features(df: pd.DataFrame, columns, rev: str | None = None) -> tuple[pd.DataFrame, float]:
+    """
+    Ejecuta las celdas originales de LIMPIEZA_Y_CREACION_DE_VARS.ipynb (LEGACY_CLEAN_CELLS, del
+    notebook en `rev`) sobre df y devuelve `columns` alineadas con df por partido, más el tiempo
+    de las celdas LEGACY_TEAM_FEATURE_CELLS (iterrows + groupby.apply/transform(lambda)).
+    """
+    import warnings
+    nb = _baseline_notebook("LIMPIEZA_Y_CREACION_DE_VARS.ipynb", rev)
+    ns = {"pd": pd, "np": np, "df": df.copy(), "display": lambda *a, **k: None}
+    lo, hi = LEGACY_CLEAN_CELLS
+    cell_s = 0.0
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        for i, cell in enumerate(nb["cells"]):
+            if cell["cell_type"] == "code" and lo <= i <= hi:
+                t0 = time.perf_counter()
+                exec("".join(cell["source"]), ns)
+                if i in LEGACY_TEAM_FEATURE_CELLS:
+                    cell_s += time.perf_counter() - t0
+    key = ["Season", "Date", "HomeTeam_norm", "AwayTeam_norm"]
+    out = ns["df"].assign(Date=pd.to_datetime(ns["df"]["Date"]))[key + list(columns)]
+    out = df[key].assign(Date=pd.to_datetime(df["Date"])).merge(out, on=key, how="left", validate="one_to_one")
+    return out[list(columns)].set_index(df.index), cell_s
+
+
+def bench_team_features(args) -> dict:
+    """
+    Celdas originales de LIMPIEZA (notebook del commit raíz o --baseline-rev, ejecutadas tal
+    cual) vs build_team_features, columna a columna.
+    """
+    from engine.synthetic import make_clean_vars
+    from engine.team_features import build_team_features
+
+    df = make_clean_vars(n_seasons=args.seasons)
+    print(f"[bench] team-features · synthetic({args.seasons} temporadas) · filas={len(df)}")
+
+    build_team_features(df)  # calentamiento (imports / caches de pandas)
+    times = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        new = build_team_features(df)
+        times.append(time.perf_counter() - t0)
+    new_s = min(times)
+
+    ref, ref_s = _legacy_team_features(df, new.columns, args.baseline_rev)
+    diff_cols = []
+    for c in ref.columns:
+        a, b = ref[c].to_numpy(), new[c].to_numpy()
+        if a.dtype == object or b.dtype == object:
+            same = pd.Series(a).fillna('∅').astype(str).equals(pd.Series(b).fillna('∅').astype(str))
+        else:
+            same = np.array_equal(a.astype(float), b.astype(float), equal_nan=True)
+        if not same:
+            diff_cols.append(c)
+
+    speedup = ref_s / new_s
+    print(f"[bench] celdas {', '.join(map(str, LEGACY_TEAM_FEATURE_CELLS))} del notebook original {ref_s:.2f}s "
+          f"vs vectorizado {new_s:.3f}s → x{speedup:.1f} · "
+          f"{'✅ bit a bit' if not diff_cols else f'❌ difieren {diff_cols}'}")
+    if diff_cols:
+        sys.exit(1)
+    return {"seasons": args.seasons, "rows": int(len(df)), "columns": int(ref.shape[1]),
+            "legacy_s": round(ref_s, 3), "vectorized_s": round(new_s, 4), "speedup": round(speedup, 1),
+            "bit_identical": not diff_cols}
+
+
+# ============================================================
+# team-join: merges local/visitante de PREPROCESADO / LIMPIEZA vs engine/team_join.py
+# ============================================================
+def bench_team_join(args) -> dict:
+    """
+    Los bloques que se pegan por local y visitante (Transfermarkt previa de PREPROCESADO y
+    acumulados / posición / efectividad / rachas de LIMPIEZA) sobre df_new_features sintético:
+    cadena de df.merge + rename + drop vs TeamJoin. Comprueba columna a columna (dtypes incluidos).
+    """
+    from engine.match_features import build_new_features, transfermarkt_prev_season
+    from engine.synthetic import make_clean_vars
+    from engine.team_join import TeamJoin
+
+    df_new = build_new_features(make_clean_vars(n_seasons=args.seasons))
+    long = pd.concat([
+        df_new[['Season', 'Date', 'HomeTeam_norm', 'home_total_points_cum', 'home_prev_position',
+                'home_effectiveness', 'home_prev_big_odds_win_any']].set_axis(
+            ['Season', 'Date', 'Team', 'total_points_cum', 'prev_position', 'effectiveness', 'prev_big'], axis=1),
+        df_new[['Season', 'Date', 'AwayTeam_norm', 'away_total_points_cum', 'away_prev_position',
+                'away_effectiveness', 'away_prev_big_odds_win_any']].set_axis(
+            ['Season', 'Date', 'Team', 'total_points_cum', 'prev_position', 'effectiveness', 'prev_big'], axis=1),
+    ], ignore_index=True).sample(frac=1.0, random_state=0)
+    tables = [  # (tabla, columnas, clave sin equipo)
+        (transfermarkt_prev_season(df_new), [f'{v}_prev_season' for v in
+                                             ['avg_age', 'value_mio', 'value_avg_mio', 'squad_size', 'pct_foreigners']],
+         ['Season']),
+        (long[['Season', 'Date', 'Team', 'total_points_cum']], ['total_points_cum'], ['Season', 'Date']),
+        (long[['Season', 'Date', 'Team', 'prev_position']], ['prev_position'], ['Season', 'Date']),
+        (long[['Season', 'Date', 'Team', 'effectiveness']], ['effectiveness'], ['Season', 'Date']),
+        (long[['Date', 'Team', 'prev_big']].iloc[: len(long) * 9 // 10], ['prev_big'], ['Date']),   # con huecos
+    ]
+    base = df_new.drop(columns=[c for c in df_new.columns if c.startswith(('home_', 'away_'))])
+    base = base.sample(frac=1.0, random_state=1)                 # índice desordenado, como tras un sort
+
+    def merges():
+        out = base
+        for side, team in (('home', 'HomeTeam_norm'), ('away', 'AwayTeam_norm')):
+            for table, cols, on in tables:
+                for c in cols:                                   # un merge por variable, como la celda 11
+                    out = out.merge(table[on + ['Team', c]], left_on=on + [team], right_on=on + ['Team'],
+                                    how='left').rename(columns={c: f'{side}_{c}'}).drop(columns='Team')
+        return out
+
+    def planner():
+        plan = TeamJoin()
+        for table, cols, on in tables:
+            plan.add(table, cols, on=on)
+        return plan.attach(base.copy())
+
+    def best(fn):
+        times = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            out = fn()
+            times.append(time.perf_counter() - t0)
+        return out, min(times)
+
+    ref, t_merge = best(merges)
+    got, t_plan = best(planner)
+    n_cols = sum(len(c) for _, c, _ in tables)
+    diff = [c for c in ref.columns if c not in got.columns or not ref[c].equals(got[c]) or ref[c].dtype != got[c].dtype]
+    ok = not diff and list(ref.columns) == list(got.columns) and ref.index.equals(got.index)
+    print(f"[bench] team-join · {len(base)} partidos × {base.shape[1]} columnas · {len(tables)} tablas · "
+          f"{2 * n_cols} merges")
+    print(f"[bench] merges {t_merge * 1e3:.1f} ms vs planificador {t_plan * 1e3:.1f} ms → ×{t_merge / t_plan:.1f} · "
+          f"{'✅ columna a columna' if ok else f'❌ difieren {diff}'}")
+    if not ok:
+        sys.exit(1)
+    return {"seasons": args.seasons, "rows": int(len(base)), "merges": 2 * n_cols,
+            "merge_s": round(t_merge, 4), "planner_s": round(t_plan, 4), "identical": ok}
+
+
+def bench_incremental(args) -> dict:
+    """
+    Jornada k → k+1 sobre `seasons` temporadas sintéticas, tres caminos hasta df_final:
+      - notebook: celdas de creación de variables del LIMPIEZA original (commit raíz, antes de
+        build_new_features; LEGACY_NEW_FEATURE_CELLS) + preprocess
+      - motor completo: build_new_features + preprocess + escritura + commit del estado
+      - incremental: update_df_final
+    update_df_final arranca las ventanas/EWM por equipo del snapshot guardado en el corte y sólo
+    recorre las filas desde el corte; compara df_final y las features del estado con la
+    reconstrucción completa.
+    """
+    import json as _json, tempfile, warnings
+    from engine.incremental import FeatureState, update_df_final, compare_frames
+    from engine.match_features import build_new_features, preprocess
+    from engine.synthetic import make_clean_vars
+
+    prev = make_clean_vars(n_seasons=args.seasons, played_matchdays=args.matchday)
+    new = make_clean_vars(n_seasons=args.seasons, played_matchdays=args.matchday + 1)
+    print(f"[bench] incremental · synthetic({args.seasons} temporadas) · jornada {args.matchday} → "
+          f"{args.matchday + 1} · partidos={len(new)}")
+    result = {"seasons": args.seasons, "matchday": args.matchday}
+
+    if not args.skip_notebook:
+        nb = _baseline_notebook("LIMPIEZA_Y_CREACION_DE_VARS.ipynb")
+        ns = {"pd": pd, "np": np, "df": new.copy(), "display": lambda *a, **k: None}
+        lo, hi = LEGACY_NEW_FEATURE_CELLS
+        t0 = time.perf_counter()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)
+            for i, cell in enumerate(nb["cells"]):
+                if cell["cell_type"] == "code" and lo <= i <= hi:
+                    exec("".join(cell["source"]), ns)
+        preprocess(ns["df"])
+        result["notebook_s"] = round(time.perf_counter() - t0, 3)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / "df_final.parquet"
+        state = FeatureState(Path(tmp) / "state")
+
+        # Ronda anterior: camino completo (motor vectorizado) + estado
+        state.stage_input(prev)
+        preprocess(build_new_features(prev)).to_parquet(out, index=False)
+        state.commit(out, run_date="prev")
+
+        full_out = Path(tmp) / "full" / "df_final.parquet"
+        full_out.parent.mkdir()
+        full_state = FeatureState(Path(tmp) / "full" / "state")
+        full_state.stage_input(new)
+        t0 = time.perf_counter()
+        feats = build_new_features(new)
+        features_s = time.perf_counter() - t0
+        full = preprocess(feats)
+        full.to_parquet(full_out, index=False)
+        full_state.commit(full_out, run_date="new")
+        full_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        report = update_df_final(new, out, state, run_date="new")
+        inc_s = time.perf_counter() - t0
+        if not report["applied"]:
+            print(f"❌ Incremental no aplicado: {report['reason']}")
+            sys.exit(1)
+        check = compare_frames(full, pd.read_parquet(out))
+        check_feats = compare_frames(feats, state.load_features())
+        if not check_feats["identical"]:
+            check = {**check_feats, "identical": False, "frame": "features"}
+
+    if "notebook_s" in result:
+        print(f"[bench] notebooks (LIMPIEZA original {lo}-{hi} + PREPROCESADO) {result['notebook_s']:.2f}s vs incremental "
+              f"{inc_s:.2f}s → x{result['notebook_s'] / inc_s:.1f}")
+    print(f"[bench] motor completo {full_s:.2f}s (features {features_s:.2f}s) vs incremental {inc_s:.2f}s "
+          f"(features desde el corte {report['features_s']:.2f}s, {report['n_tail']} partidos) · recalculadas "
+          f"{report['n_patched']}/{len(full)} filas de PREPROCESADO · "
+          f"{'✅ idéntico a la reconstrucción completa' if check['identical'] else f'❌ difiere {check}'}")
+    if not check["identical"]:
+        sys.exit(1)
+    return {**result, "rows": int(len(full)), "full_s": round(full_s, 3), "full_features_s": round(features_s, 3),
+            "incremental_s": round(inc_s, 3), "incremental_features_s": report["features_s"],
+            "n_changed": report["n_changed"], "n_patched": report["n_patched"], "identical": check["identical"]}
+
+
+def bench_pipeline(args) -> dict:
+    """Arranque y extremo a extremo: papermill (kernel por notebook) vs pipeline en proceso."""
+    import json as _json
+    import os, tempfile
+    from engine import pipeline as P
+    from engine.match_features import build_new_features
+    from engine.synthetic import make_clean_vars
+
+    nb_dir = ROOT / "notebooks"
+    df_new = build_new_features(make_clean_vars(n_seasons=args.seasons))
+    result = {"seasons": args.seasons, "rows": int(len(df_new))}
+    cwd = Path.cwd()
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")]))
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        # Notebook mínimo: sólo coste de arranque
+        (tmp / "nb").mkdir()
+        (tmp / "nb" / "noop.ipynb").write_text(_json.dumps({
+            "cells": [{"cell_type": "code", "execution_count": None, "metadata": {}, "outputs": [],
+                       "source": ["x = 1"]}],
+            "metadata": {"kernelspec": {"name": "python3", "display_name": "Python 3", "language": "python"}},
+            "nbformat": 4, "nbformat_minor": 4}), encoding="utf-8")
+        (tmp / "data" / "02_processed").mkdir(parents=True)
+        df_new.to_parquet(tmp / "data" / "02_processed" / "df_new_features.parquet", index=False)
+        os.chdir(tmp)
+        try:
+            P.EXECUTED_DIR = tmp / "executed"
+            t0 = time.perf_counter()
+            P.run_notebook_inprocess("noop.ipynb", {}, notebooks_dir=tmp / "nb")
+            result["startup_inprocess_s"] = round(time.perf_counter() - t0, 4)
+
+            ctx = P.PipelineContext(run_date="2099-01-01")
+            t0 = time.perf_counter()
+            ns = P.run_notebook_inprocess("PREPROCESADO.ipynb", {"RUN_DATE": ctx.run_date}, notebooks_dir=nb_dir,
+                                          hooks=ctx.store.hooks())
+            result["preprocesado_inprocess_s"] = round(time.perf_counter() - t0, 3)
+            ref = pd.read_parquet(P.PQ_FINAL)
+
+            # PREPROCESADO original (celdas propias, antes de llamar a engine.match_features.preprocess)
+            (tmp / "nb_base").mkdir()
+            (tmp / "nb_base" / "PREPROCESADO.ipynb").write_text(
+                _json.dumps(_baseline_notebook("PREPROCESADO.ipynb", args.baseline_rev)), encoding="utf-8")
+            t0 = time.perf_counter()
+            P.run_notebook_inprocess("PREPROCESADO.ipynb", {"RUN_DATE": ctx.run_date}, notebooks_dir=tmp / "nb_base")
+            result["preprocesado_baseline_s"] = round(time.perf_counter() - t0, 3)
+            same_baseline = pd.read_parquet(P.PQ_FINAL).equals(ref)
+
+            t0 = time.perf_counter()
+            out = P.preprocess(ctx)
+            result["preprocess_engine_s"] = round(time.perf_counter() - t0, 3)
+            same = out.equals(ref)
+
+            if not args.skip_papermill:
+                t0 = time.perf_counter()
+                P.run_notebook_papermill("noop.ipynb", {}, notebooks_dir=tmp / "nb")
+                result["startup_papermill_s"] = round(time.perf_counter() - t0, 3)
+                t0 = time.perf_counter()
+                P.run_notebook_papermill("PREPROCESADO.ipynb", {"RUN_DATE": ctx.run_date}, notebooks_dir=nb_dir)
+                result["preprocesado_papermill_s"] = round(time.perf_counter() - t0, 3)
+                same = same and pd.read_parquet(P.PQ_FINAL).equals(ref)
+        finally:
+            os.chdir(cwd)
+
+    result["identical"] = bool(same)
+    result["identical_baseline"] = bool(same_baseline)
+    print(f"[bench] arranque: en proceso {result['startup_inprocess_s']}s"
+          + (f" vs papermill {result['startup_papermill_s']}s" if "startup_papermill_s" in result else ""))
+    print(f"[bench] PREPROCESADO: papermill {result.get('preprocesado_papermill_s', '-')}s · "
+          f"en proceso {result['preprocesado_inprocess_s']}s · motor {result['preprocess_engine_s']}s · "
+          f"{'✅ df_final idéntico' if same else '❌ df_final difiere'}")
+    print(f"[bench] PREPROCESADO original (celdas propias) {result['preprocesado_baseline_s']}s · "
+          f"{'✅ mismo df_final que engine.match_features.preprocess' if same_baseline else '❌ df_final difiere del original'}")
+    if not (same and same_baseline):
+        sys.exit(1)
+    return result
+
+def bench_fetch(args) -> dict:
+    """
+    Descargas de EXTRACCIÓN_DATOS contra el stub local (engine/http_stub.py):
+    requests.get en serie + sleep (notebook original) vs FetchClient en frío y en caliente.
+    """
+    import io, requests, tempfile
+    from engine.fetch import FetchClient, fetch_fd_csvs, fetch_clubelo_histories, fd_csv_url, clubelo_slug
+    from engine.http_stub import StubServer, CLUBS
+
+    seasons = [f"{y:02d}{y + 1:02d}" for y in range(5, 5 + args.seasons)]
+    current = seasons[-1]
+    clubs = [CLUBS[i % len(CLUBS)] + ("" if i < len(CLUBS) else str(i)) for i in range(args.clubs)]
+    with StubServer(latency=args.latency) as stub, tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        ref_fd = {}
+        for s in seasons:
+            r = requests.get(stub.base + "/" + fd_csv_url(s).split("://", 1)[1],
+                             headers={"User-Agent": "Mozilla/5.0", "Cache-Control": "no-cache"}, timeout=30)
+            r.raise_for_status()
+            ref_fd[s] = pd.read_csv(io.BytesIO(r.content))
+        ref_elo = {}
+        for c in clubs:
+            r = requests.get(f"{stub.base}/api.clubelo.com/{clubelo_slug(c)}", timeout=30)
+            ref_elo[c] = r.content
+            time.sleep(args.sleep)
+        seq_s = time.perf_counter() - t0
+        seq_requests = sum(stub.hits.values())
+
+        runs = {}
+        for label in ("frio", "caliente"):
+            stub.hits.clear()
+            client = FetchClient(cache_dir=tmp, stub_base=stub.base)
+            t0 = time.perf_counter()
+            fd = fetch_fd_csvs(client, seasons, ["SP1"], current)
+            elo = fetch_clubelo_histories(client, clubs, max_age=None)
+            runs[label] = {"s": round(time.perf_counter() - t0, 3), "requests": sum(stub.hits.values()),
+                           **client.stats}
+            client.close()
+        same = (all(fd[(s, "SP1")].equals(ref_fd[s]) for s in seasons)
+                and all(elo[c]["elo"].round(5).tolist() == pd.read_csv(io.BytesIO(ref_elo[c]))["Elo"].round(5).tolist()
+                        for c in clubs))
+
+    frozen_hits = runs["caliente"]["requests"] - 1 - len(clubs)   # vuelven a red: temporada actual + ClubElo
+    print(f"[bench] fetch · {len(seasons)} CSV + {len(clubs)} clubes · latencia {args.latency}s")
+    print(f"[bench] en serie + sleep {seq_s:.2f}s ({seq_requests} peticiones) · FetchClient frío "
+          f"{runs['frio']['s']}s · caliente {runs['caliente']['s']}s ({runs['caliente']['requests']} peticiones, "
+          f"{runs['caliente']['revalidated']} revalidadas 304) · "
+          f"{'✅ contenido idéntico' if same else '❌ contenido difiere'}")
+    if not same or frozen_hits != 0:
+        print(f"❌ Temporadas cerradas re-descargadas: {frozen_hits}")
+        sys.exit(1)
+    return {"seasons": len(seasons), "clubs": len(clubs), "latency_s": args.latency,
+            "sequential_s": round(seq_s, 3), "sequential_requests": seq_requests,
+            "cold": runs["frio"], "warm": runs["caliente"], "identical": same}
+
+def bench_elo(args) -> dict:
+    """
+    ClubElo contra el stub local: refresco con el histórico completo de cada club + dedupe
+    (notebook original) vs EloStore.update (snapshots por fecha desde el high-water mark).
+    """
+    import tempfile
+    from datetime import date, timedelta
+    from engine.elo_store import EloStore, norm
+    from engine.fetch import FetchClient, fetch_clubelo_histories
+    from engine.http_stub import StubServer, CLUBS
+
+    t1 = date.today() - timedelta(days=args.days)
+    t2 = date.today()
+
+    def full_refresh(client) -> pd.DataFrame:
+        frames = []
+        for club, hist in fetch_clubelo_histories(client, CLUBS, max_age=None).items():
+            frames.append(pd.DataFrame({"Date": hist.index.date, "Elo": hist["elo"].to_numpy(),
+                                        "Team": club, "team_norm": norm(club)}))
+        return (pd.concat(frames, ignore_index=True).sort_values(["Team", "Date"], kind="mergesort")
+                  .drop_duplicates(["Team", "Date"], keep="last").reset_index(drop=True))
+
+    with StubServer(latency=args.latency, today=str(t1)) as stub, tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        full_refresh(FetchClient(cache_dir=None, stub_base=stub.base)).to_parquet(tmp / "legacy.parquet", index=False)
+        store = EloStore(tmp / "clubelo", legacy=tmp / "legacy.parquet")
+        store.update(FetchClient(cache_dir=None, stub_base=stub.base), CLUBS, today=t1, verbose=False)  # ejecución anterior
+        stub.today = str(t2)
+
+        stub.hits.clear()
+        client = FetchClient(cache_dir=None, stub_base=stub.base)
+        t0 = time.perf_counter()
+        ref = full_refresh(client)
+        ref.to_parquet(tmp / "full.parquet", index=False)
+        full_s, full_req, full_bytes = time.perf_counter() - t0, sum(stub.hits.values()), client.stats["bytes"]
+
+        stub.hits.clear()
+        client = FetchClient(cache_dir=tmp / "http", stub_base=stub.base)
+        t0 = time.perf_counter()
+        report = store.update(client, CLUBS, today=t2, verbose=False)
+        delta_s, delta_req, delta_bytes = time.perf_counter() - t0, sum(stub.hits.values()), client.stats["bytes"]
+        same = store.load().equals(ref)
+
+    print(f"[bench] elo · {len(CLUBS)} clubes · {args.days} días desde la última ejecución")
+    print(f"[bench] histórico completo {full_s:.2f}s ({full_req} peticiones, {full_bytes / 1e3:.0f} kB) · "
+          f"delta {delta_s:.2f}s ({delta_req} peticiones, {delta_bytes / 1e3:.0f} kB, +{report['rows']} filas, "
+          f"particiones {report['partitions']}) · {'✅ idéntico' if same else '❌ difiere'}")
+    if not same:
+        sys.exit(1)
+    return {"clubs": len(CLUBS), "days": args.days, "latency_s": args.latency,
+            "full_s": round(full_s, 3), "full_requests": full_req, "full_bytes": full_bytes,
+            "delta_s": round(delta_s, 3), "delta_requests": delta_req, "delta_bytes": delta_bytes,
+            "rows": report["rows"], "partitions": report["partitions"], "identical": same}
+
+def bench_elo_index(args) -> dict:
+    """
+    Elo pre-partido de un lote de partidos (todos los cruces de una temporada a fecha fija):
+    merge_asof por equipo (attach_elo original) vs EloIndex.lookup (searchsorted en bloque).
+    """
+    import tempfile
+    from engine.elo_index import EloIndex
+
+    legacy = ROOT / "data" / "02_processed" / "clubelo_2005_2025.parquet"
+    elo = pd.read_parquet(legacy)
+    elo["Date"] = pd.to_datetime(elo["Date"])
+    teams = sorted(elo.loc[elo["Date"].dt.year == args.season, "Team"].unique())[:20]
+    pairs = [(h, a) for h in teams for a in teams if h != a]
+    rng = np.random.default_rng(0)
+    fixt = pd.DataFrame({"home": [h for h, _ in pairs], "away": [a for _, a in pairs],
+                         "Date_dt": pd.Timestamp(f"{args.season}-08-15")
+                                    + pd.to_timedelta(rng.integers(0, 280, len(pairs)), "D")})
+
+    def merge_asof_by_team(left, by_col, out_col):
+        parts = []
+        for team, sub in left.groupby(by_col, sort=False):
+            right = elo.loc[elo["Team"] == team, ["Date", "Elo"]].sort_values("Date")
+            m = pd.merge_asof(sub.reset_index().sort_values("Date_dt"),
+                              right.rename(columns={"Date": "_r", "Elo": out_col}),
+                              left_on="Date_dt", right_on="_r", direction="backward", allow_exact_matches=False)
+            parts.append(m.drop(columns=["_r"]).set_index("index"))
+        return pd.concat(parts).sort_index()
+
+    t0 = time.perf_counter()
+    ref = merge_asof_by_team(merge_asof_by_team(fixt, "home", "h_elo"), "away", "a_elo")
+    asof_ms = (time.perf_counter() - t0) * 1e3
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        EloIndex.from_store(Path(tmp) / "clubelo", legacy=legacy)
+        build_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        idx = EloIndex.from_store(Path(tmp) / "clubelo")
+        load_ms = (time.perf_counter() - t0) * 1e3
+        size_kb = (Path(tmp) / "clubelo" / "_index.npz").stat().st_size / 1e3
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        h = idx.lookup(fixt["home"], fixt["Date_dt"])
+        a = idx.lookup(fixt["away"], fixt["Date_dt"])
+        best = min(best, (time.perf_counter() - t0) * 1e3)
+    diff = float(max(np.nanmax(np.abs(h - ref["h_elo"].to_numpy())), np.nanmax(np.abs(a - ref["a_elo"].to_numpy()))))
+    same_nan = np.array_equal(np.isnan(h), ref["h_elo"].isna().to_numpy()) and \
+        np.array_equal(np.isnan(a), ref["a_elo"].isna().to_numpy())
+    ok = same_nan and diff < 1e-3      # Elo guardado en float32
+
+    print(f"[bench] elo-index · {len(fixt)} partidos ({len(teams)} equipos, temporada {args.season}) · "
+          f"índice {len(idx)} filas, {size_kb:.0f} kB")
+    print(f"[bench] merge_asof por equipo {asof_ms:.1f} ms · lookup {best:.3f} ms/lote (h+a) · "
+          f"construcción {build_s:.2f}s · carga {load_ms:.1f} ms · "
+          f"{'✅ mismo Elo' if ok else '❌ difiere'} (máx |Δ|={diff:.2e})")
+    if not ok:
+        sys.exit(1)
+    return {"season": args.season, "fixtures": len(fixt), "index_rows": len(idx), "index_kb": round(size_kb, 1),
+            "merge_asof_ms": round(asof_ms, 2), "lookup_ms": round(best, 4), "build_s": round(build_s, 3),
+            "load_ms": round(load_ms, 2), "max_abs_diff": diff, "identical_nan": same_nan}
+
+
+def _cumprofit_legacy(base: Path):
+    """Copia de la versión original de build_cumprofit_curves_from_matchlogs.py (en serie, iterrows)."""
+    TXT2LABEL = {"A": "Away", "D": "Draw", "H": "Home", "1": "Home", "0": "Draw", "2": "Away"}
+    curves = base / "cumprofit_curves"
+    curves.mkdir(parents=True, exist_ok=True)
+
+    def load(path):
+        df = pd.read_csv(path)
+        if "net_profit" not in df.columns:
+            df["net_profit"] = df["profit"]
+        df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+        return df
+
+    def label(both, cols):
+        for c in cols:
+            if c in both.columns:
+                raw = both[c].astype(str)
+                return raw.map(TXT2LABEL).fillna(raw)
+        return pd.Series("", index=both.index, dtype="string")
+
+    seasons = sorted({int(p.stem.split("_")[1]) for p in base.glob("matchlogs_*.csv") if "market" not in p.name})
+    index_rows = []
+    for s in seasons:
+        both = pd.merge(load(base / f"matchlogs_{s}.csv"), load(base / f"matchlogs_market_{s}.csv"),
+                        on=["Date", "HomeTeam_norm", "AwayTeam_norm"], how="inner", suffixes=("_model", "_b365"))
+        both = both.sort_values("Date").reset_index(drop=True)
+        m_ret = pd.to_numeric(both["net_profit_model"], errors="coerce").fillna(0.0)
+        b_ret = pd.to_numeric(both["net_profit_b365"], errors="coerce").fillna(0.0)
+        series_df = pd.DataFrame({
+            "match_num": np.arange(1, len(both) + 1, dtype=int), "date": both["Date"].dt.strftime("%Y-%m-%d"),
+            "model_cum": m_ret.cumsum().round(3), "bet365_cum": b_ret.cumsum().round(3),
+            "model_ret": m_ret.round(3), "bet365_ret": b_ret.round(3),
+            "home": both["HomeTeam_norm"].astype("string"), "away": both["AwayTeam_norm"].astype("string"),
+            "true_txt": label(both, ["y_true_model", "y_true"]).astype("string"),
+            "model_txt": label(both, ["y_pred_model", "y_pred"]).astype("string"),
+            "bet365_txt": label(both, ["y_pred_market"]).astype("string"),
+        })
+        n = len(series_df)
+        fm, fb = float(series_df["model_cum"].iloc[-1]), float(series_df["bet365_cum"].iloc[-1])
+        series_df.to_csv(curves / f"cumprofit_{s}.csv", index=False)
+        payload = {"train_until": s - 1, "test_season": s, "n_matches": n,
+                   "series": [{"i": int(r.match_num), "d": str(r.date), "m": float(r.model_cum),
+                               "b": float(r.bet365_cum), "hm": str(r.home), "aw": str(r.away),
+                               "t": str(r.true_txt), "pm": str(r.model_txt), "pb": str(r.bet365_txt)}
+                              for _, r in series_df.iterrows()],
+                   "final": {"model": fm, "bet365": fb, "roi_model": fm / n, "roi_bet365": fb / n}}
+        (curves / f"cumprofit_{s}.json").write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        index_rows.append({"test_season": s, "train_until": s - 1, "n_matches": n, "profit_model": fm,
+                           "profit_bet365": fb, "roi_model": fm / n, "roi_bet365": fb / n,
+                           "csv_file": f"cumprofit_{s}.csv", "json_file": f"cumprofit_{s}.json"})
+    pd.DataFrame(index_rows).sort_values("test_season").to_csv(base / "cumprofit_index.csv", index=False)
+    (base / "cumprofit_index.json").write_text(json.dumps(index_rows, ensure_ascii=False, indent=2), encoding="utf-8")
+
+def bench_cumprofit(args) -> dict:
+    """
+    Curvas cumprofit sobre matchlogs sintéticos (n temporadas × 380 partidos): script original
+    (read_csv sin dtypes + iterrows, en serie) vs engine/cumprofit.py (CSV con dtypes, almacén
+    Parquet de outputs y layout columnar). Las salidas rows se comparan byte a byte con las originales.
+    """
+    import contextlib, io, shutil, tempfile
+    from engine.cumprofit import build_all, pack_store
+    from engine.outputs_store import OutputsStore
+    from engine.synthetic import make_matchlogs
+
+    logs = make_matchlogs(n_seasons=args.seasons)
+
+    def files(base: Path) -> dict[str, bytes]:
+        return {str(p.relative_to(base)): p.read_bytes() for p in sorted(base.rglob("cumprofit*"))
+                if p.is_file()}
+
+    def timed(fn, base: Path) -> float:
+        best = float("inf")
+        for _ in range(args.repeat):
+            shutil.rmtree(base / "cumprofit_curves", ignore_errors=True)
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                fn()
+            best = min(best, time.perf_counter() - t0)
+        return best
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        for s, (model, market) in logs.items():
+            model.to_csv(base / f"matchlogs_{s}.csv", index=False)
+            market.to_csv(base / f"matchlogs_market_{s}.csv", index=False)
+
+        legacy_s = timed(lambda: _cumprofit_legacy(base), base)
+        ref = files(base)
+        runs = {}
+        for label, kw in (("csv_serie", {"n_jobs": 1, "source": "csv"}),
+                          ("csv_paralelo", {"n_jobs": args.n_jobs, "source": "csv"})):
+            runs[label] = timed(lambda: build_all(base, **kw), base)
+            runs[label + "_identical"] = files(base) == ref
+        t0 = time.perf_counter()
+        pack_store(base, OutputsStore(base / "_store"))
+        pack_s = time.perf_counter() - t0
+        runs["store"] = timed(lambda: build_all(base, source="store", store_dir=base / "_store"), base)
+        runs["store_identical"] = files(base) == ref
+        runs["columnar"] = timed(lambda: build_all(base, layout="columnar", source="csv"), base)
+        js_rows = sum(len(v) for k, v in ref.items() if k.endswith(".json") and "/" in k)
+        js_cols = sum(len(v) for k, v in files(base).items() if k.endswith(".json") and "/" in k)
+        sample = json.loads((base / "cumprofit_curves" / f"cumprofit_{min(logs)}.json").read_text(encoding="utf-8"))
+        ref_sample = json.loads(ref[f"cumprofit_curves/cumprofit_{min(logs)}.json"])
+        columnar_ok = [dict(zip(sample["series"], v)) for v in zip(*sample["series"].values())] == ref_sample["series"]
+
+    same = runs["csv_serie_identical"] and runs["csv_paralelo_identical"] and runs["store_identical"] and columnar_ok
+    print(f"[bench] cumprofit · {len(logs)} temporadas × {len(logs[min(logs)][0])} partidos")
+    print(f"[bench] original {legacy_s:.2f}s · CSV con dtypes en serie {runs['csv_serie']:.2f}s · "
+          f"paralelo {runs['csv_paralelo']:.2f}s · almacén Parquet {runs['store']:.2f}s "
+          f"(empaquetado {pack_s:.2f}s) · columnar {runs['columnar']:.2f}s "
+          f"(JSON {js_cols / 1e3:.0f} kB vs {js_rows / 1e3:.0f} kB) · "
+          f"{'✅ salidas idénticas' if same else '❌ salidas difieren'}")
+    if not same:
+        sys.exit(1)
+    return {"seasons": len(logs), "legacy_s": round(legacy_s, 3),
+            **{k: (round(v, 3) if isinstance(v, float) else v) for k, v in runs.items()},
+            "pack_s": round(pack_s, 3), "json_rows_bytes": js_rows, "json_columnar_bytes": js_cols,
+            "columnar_roundtrip": columnar_ok, "identical": same}
+
+
+def _fake_outputs(base: Path, seasons: list[int], rows: int, store: bool = False):
+    """
+    Árbol outputs/ con la forma que escribe MODELOS (sólo lo que mira verify_outputs);
+    con `store`, también el almacén Parquet (base/STORE_DIR) como hace MODELOS.
+    """
+    from engine.outputs_store import STORE_DIR, OutputsStore
+
+    rng = np.random.default_rng(0)
+    out = base / "outputs"
+    st = OutputsStore(base / STORE_DIR) if store else None
+    (out / "radar_prematch").mkdir(parents=True, exist_ok=True)
+    for f in ("metrics_main_by_season.csv",):
+        pd.DataFrame({"Season": seasons, "accuracy": 0.5}).to_csv(out / f, index=False)
+    for f, artifact in (("classification_report_by_season.csv", "classification_report"),
+                        ("metrics_market_by_season.csv", "metrics_market")):
+        df = pd.DataFrame({"Season": np.repeat(seasons, 5), "metric": "f1", "value": 0.4})
+        df.to_csv(out / f, index=False)
+        if st:
+            st.write(artifact, df)
+    for f in ("metrics_market_overall.json", "confusion_matrices_by_season.json", "roc_curves_by_season.json"):
+        (out / f).write_text("{}", encoding="utf-8")
+    (out / "future_predictions_summary_20250101-000001.json").write_text("{}", encoding="utf-8")
+    radar_cols = [f"{side}_{m}{suf}" for m in ("avg_xg", "avg_shotsontarget", "avg_shots_last7", "gd_cum",
+                                               "points_pct", "prev_position", "avg_corners_last7")
+                  for side in ("home", "away") for suf in ("", "_norm")]
+    for s in seasons:
+        for prefix in ("matchlogs", "matchlogs_market"):
+            (out / f"{prefix}_{s}.csv").write_text("Season\n", encoding="utf-8")
+        ids = pd.DataFrame({"Season": s, "Date": f"{s}-09-01", "Matchweek": np.arange(rows) // 10 + 1,
+                            "HomeTeam_norm": "a", "AwayTeam_norm": "b", "match_id": np.arange(rows)})
+        vals = pd.DataFrame(np.round(rng.random((rows, len(radar_cols))), 4), columns=radar_cols)
+        meta = pd.DataFrame({"generated_at": "2025-01-01T00:00:00", "norm_version": "v1",
+                             "schema_path": "schema.json"}, index=range(rows))
+        radar = pd.concat([ids, vals, meta], axis=1)
+        future = pd.concat([ids, vals.iloc[:, :8]], axis=1)
+        radar.to_csv(out / "radar_prematch" / f"radar_prematch_{s}.csv", index=False)
+        future.to_csv(out / f"future_predictions_{s}.csv", index=False)
+        if st:
+            st.write("radar_prematch", radar)
+            st.write("future_predictions", future)
+
+def _verify_legacy(base: Path) -> list[int]:
+    """Lecturas de la versión original de verify_outputs.py (cabecera + lista de dicts por CSV)."""
+    import csv, glob as _glob
+
+    def header(path):
+        with path.open(encoding="utf-8", newline="") as f:
+            return [h.strip() for h in next(csv.reader(f), [])]
+
+    def rows(path):
+        with path.open(encoding="utf-8", newline="") as f:
+            return [{k.strip(): v for k, v in r.items()} for r in csv.DictReader(f)]
+
+    def seasons(path):
+        return sorted({int(float(r.get("Season") or r.get("season"))) for r in rows(path)
+                       if r.get("Season") or r.get("season")})
+
+    out = base / "outputs"
+    seasons(out / "classification_report_by_season.csv")
+    seasons(out / "metrics_market_by_season.csv")
+    fut = sorted({y for p in _glob.glob(str(out / "future_predictions_*.csv")) for y in seasons(Path(p))})
+    for p in sorted(_glob.glob(str(out / "radar_prematch" / "radar_prematch_*.csv"))):
+        header(Path(p))
+        assert rows(Path(p))
+    return fut
+
+def bench_verify(args) -> dict:
+    """
+    verify_outputs sobre un outputs/ sintético (n temporadas de radares y future_predictions):
+    lecturas originales (dos aperturas + lista de dicts) vs escaneo único en streaming y en paralelo
+    vs manifest del almacén de outputs. Mide tiempo y pico de memoria Python (tracemalloc).
+    """
+    import contextlib, io, os, runpy, tempfile, tracemalloc
+
+    seasons = list(range(2025 - args.seasons, 2025))
+
+    def measure(fn):
+        t0 = time.perf_counter()
+        res = fn()
+        dt = time.perf_counter() - t0
+        tracemalloc.start()          # segunda ejecución sólo para el pico (tracemalloc ralentiza)
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return res, dt, peak
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        _fake_outputs(base, seasons, args.rows)
+        fut_ref, legacy_s, legacy_peak = measure(lambda: _verify_legacy(base))
+
+        def run_new() -> int:
+            cwd, argv = os.getcwd(), sys.argv
+            os.chdir(base)
+            sys.argv = ["verify_outputs.py", "--workers", str(args.workers)]
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    runpy.run_path(str(ROOT / "scripts" / "verify_outputs.py"), run_name="__main__")
+            except SystemExit as e:
+                return e.code
+            finally:
+                os.chdir(cwd)
+                sys.argv = argv
+            return 0
+        code, new_s, new_peak = measure(run_new)
+        report = json.loads((base / "artifacts" / "verify" / "report.json").read_text(encoding="utf-8"))
+
+        _fake_outputs(base, seasons, args.rows, store=True)
+        code_m, man_s, man_peak = measure(run_new)
+        report_m = json.loads((base / "artifacts" / "verify" / "report.json").read_text(encoding="utf-8"))
+
+    same = (code == 0 and report["passed"] and report["info"]["seasons_future"] == fut_ref
+            and code_m == 0 and report_m["passed"] and report_m["info"]["seasons_future"] == fut_ref
+            and report_m["info"]["scanned"] == 0)
+    print(f"[bench] verify · {len(seasons)} temporadas · {args.rows} filas por radar/future_predictions · "
+          f"{len(report['files'])} CSV")
+    print(f"[bench] original {legacy_s:.2f}s (pico {legacy_peak / 1e6:.1f} MB) · streaming {new_s:.2f}s "
+          f"(pico {new_peak / 1e6:.1f} MB, {args.workers} hilos) · manifest {man_s:.2f}s "
+          f"(pico {man_peak / 1e6:.1f} MB, {report_m['info']['scanned']} CSV abiertos) · "
+          f"{'✅ mismas temporadas, informe OK' if same else '❌ difiere'}")
+    if not same:
+        sys.exit(1)
+    return {"seasons": len(seasons), "rows": args.rows, "files": len(report["files"]),
+            "legacy_s": round(legacy_s, 3), "legacy_peak_mb": round(legacy_peak / 1e6, 2),
+            "streaming_s": round(new_s, 3), "streaming_peak_mb": round(new_peak / 1e6, 2),
+            "manifest_s": round(man_s, 3), "manifest_peak_mb": round(man_peak / 1e6, 2),
+            "workers": args.workers, "identical": same}
+
+
+def _fake_preds(n_seasons: int, seed: int = 0) -> pd.DataFrame:
+    """merged sintético (preds + Season + B365H/D/A): 380 partidos por temporada, ~3% sin etiqueta."""
+    rng = np.random.default_rng(seed)
+    n = 380 * n_seasons
+    P = rng.dirichlet([3, 2, 2.5], n).round(3)
+    P /= P.sum(1, keepdims=True)
+    y_true = np.array(list("HDA"), dtype=object)[rng.integers(0, 3, n)]
+    y_true[rng.random(n) < 0.03] = np.nan
+    odds = 0.93 / (P * rng.uniform(0.9, 1.1, (n, 3)))
+    odds[rng.random((n, 3)) < 0.02] = np.nan
+    m = pd.DataFrame({"Season": np.repeat(np.arange(2025 - n_seasons, 2025), 380),
+                      "y_true": y_true, "y_pred": np.array(list("HDA"))[P.argmax(1)],
+                      "proba_H": P[:, 0], "proba_D": P[:, 1], "proba_A": P[:, 2]})
+    m["has_label"] = m["y_true"].astype(str).str.upper().str.strip().isin(["H", "D", "A"]).astype(int)
+    m[["B365H", "B365D", "B365A"]] = odds
+    return m
+
+def _metrics_legacy(m: pd.DataFrame) -> tuple[pd.DataFrame, dict, dict]:
+    """
+    Copia condensada de las celdas de MODELOS.ipynb (métricas principales, matrices de confusión,
+    ROC): helpers por temporada dentro de groupby, roc_curve de sklearn por clase y temporada.
+    """
+    from sklearn.metrics import auc, roc_curve
+    labels, eps = ["H", "D", "A"], 1e-15
+    idx = {c: i for i, c in enumerate(labels)}
+    norm = lambda s: s.astype(str).str.upper().str.strip()
+
+    def onehot(y):
+        it = np.array([idx.get(v, -1) for v in y], dtype=int)
+        Y = np.zeros((len(y), 3), dtype=int)
+        Y[np.flatnonzero(it >= 0), it[it >= 0]] = 1
+        return Y
+
+    def roc_block(y, P):
+        P = np.clip(P.astype(float), 0.0, 1.0)
+        P = P / np.clip(P.sum(axis=1, keepdims=True), eps, None)
+        Y = onehot(y)
+        out, aucs = {"per_class": {}}, []
+        for j, lab in enumerate(labels):
+            fpr, tpr, thr = roc_curve(Y[:, j], P[:, j], drop_intermediate=True)
+            a = auc(fpr, tpr) if len(fpr) > 1 else np.nan
+            out["per_class"][lab] = {"fpr": fpr.tolist(), "tpr": tpr.tolist(), "thresholds": thr.tolist(),
+                                     "auc": float(a)}
+            aucs.append(a)
+        fpr, tpr, thr = roc_curve(Y.ravel(), P.ravel(), drop_intermediate=True)
+        out["micro"] = {"fpr": fpr.tolist(), "tpr": tpr.tolist(), "thresholds": thr.tolist(),
+                        "auc": float(auc(fpr, tpr))}
+        out["macro_auc"] = float(np.nanmean(aucs))
+        out["n_scored"] = int(len(y))
+        return out
+
+    def confusion(yt, yp):
+        it = np.array([idx.get(x, -1) for x in norm(yt)], dtype=int)
+        ip = np.array([idx.get(x, -1) for x in norm(yp)], dtype=int)
+        ok = (it >= 0) & (ip >= 0)
+        M = np.bincount(it[ok] * 3 + ip[ok], minlength=9).reshape(3, 3)
+        return M.tolist(), {lab: int(np.sum(it == idx[lab])) for lab in labels}
+
+    scored = m[m["has_label"] == 1].copy()
+    P_all = scored[["proba_H", "proba_D", "proba_A"]].to_numpy(dtype=float)
+    scored["conf"] = np.nanmax(P_all, axis=1)
+    srt = np.sort(P_all, axis=1)
+    scored["margin"] = srt[:, -1] - srt[:, -2]
+    scored["entropy"] = -(P_all * np.log(np.clip(P_all, eps, 1.0))).sum(axis=1)
+    yt, yp = norm(m["y_true"]).to_numpy(), norm(m["y_pred"]).to_numpy()
+    odds = np.select([yp == "H", yp == "D", yp == "A"],
+                     [m["B365H"].to_numpy(), m["B365D"].to_numpy(), m["B365A"].to_numpy()], np.nan)
+    m = m.assign(__bet__=np.isin(yt, labels) & np.isfinite(odds) & (odds >= 1.01), __odds__=odds,
+                 __win__=yp == yt, __over__=(1 / m[["B365H", "B365D", "B365A"]].clip(lower=1.0)).sum(axis=1,
+                                                                                         skipna=False))
+    rows, cm, roc = [], [], []
+    for s, grp in scored.groupby("Season"):
+        P = grp[["proba_H", "proba_D", "proba_A"]].to_numpy(dtype=float)
+        Y = onehot(norm(grp["y_true"]).to_numpy())
+        g = m[(m["Season"] == s) & m["__bet__"]]
+        wins = g[g["__win__"]]
+        rows.append({"Season": int(s), "accuracy": float((norm(grp["y_true"]) == norm(grp["y_pred"])).mean()),
+                     "logloss": float(-np.mean(np.log(np.clip(P, eps, 1 - eps)[Y.astype(bool)]))),
+                     "brier": float(np.mean(np.sum((np.clip(P, 0, 1) - Y) ** 2, axis=1))),
+                     "roi": float(np.where(g["__win__"], g["__odds__"] - 1, -1.0).sum() / len(g)),
+                     "n_bets": len(g), "n_wins": len(wins), "hit_rate": len(wins) / len(g),
+                     "avg_odds_win": float(wins["__odds__"].mean()), "avg_overround": float(g["__over__"].mean()),
+                     "avg_conf": grp["conf"].mean(), "avg_entropy": grp["entropy"].mean(),
+                     "avg_margin": grp["margin"].mean()})
+        M, support = confusion(grp["y_true"], grp["y_pred"])
+        cm.append({"Season": int(s), "matrix": M, "support": support, "n_scored": int(len(grp))})
+        roc.append({**roc_block(norm(grp["y_true"]).to_numpy(), P), "Season": int(s)})
+    overall = roc_block(norm(scored["y_true"]).to_numpy(), P_all)
+    return pd.DataFrame(rows), {"by_season": cm}, {"overall": overall, "by_season": roc}
+
+def bench_metrics(args) -> dict:
+    """
+    Métricas por temporada de MODELOS.ipynb (CSV principal + matrices de confusión + ROC) sobre
+    un merged sintético: celdas originales (groupby + helpers por temporada + roc_curve de sklearn)
+    vs engine/metrics.py (un array codificado, reduceat, un bincount y un lexsort). Aparte, el coste
+    del IC bootstrap (n_boot remuestreos por temporada).
+    """
+    from engine.metrics import MAIN_COLS, confusion_payload, encode, roc_payload, season_table
+
+    m = _fake_preds(args.seasons)
+    best_old = best_new = float("inf")
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        ref_tab, ref_cm, ref_roc = _metrics_legacy(m)
+        best_old = min(best_old, time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        enc = encode(m)
+        tab, cm, roc = season_table(enc, n_boot=0), confusion_payload(enc), roc_payload(enc)
+        best_new = min(best_new, time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    tab_ci = season_table(enc, n_boot=args.n_boot)
+    boot_s = time.perf_counter() - t0
+
+    diff = float(np.nanmax(np.abs(ref_tab[MAIN_COLS[1:]].to_numpy(float) - tab[MAIN_COLS[1:]].to_numpy(float))))
+    same_cm = [(b["matrix"], b["support"], b["n_scored"]) for b in ref_cm["by_season"]] == \
+        [(b["matrix"], b["support"], b["n_scored"]) for b in cm["by_season"]]
+
+    def flat(block):
+        curves = [block["per_class"][c] for c in ("H", "D", "A")] + [block["micro"]]
+        return np.concatenate([np.r_[c["fpr"], c["tpr"], c["thresholds"][1:], c["auc"]] for c in curves])
+    ref_blocks, new_blocks = [ref_roc["overall"], *ref_roc["by_season"]], [roc["overall"], *roc["by_season"]]
+    same_roc = len(ref_blocks) == len(new_blocks) and all(
+        len(flat(a)) == len(flat(b)) and np.allclose(flat(a), flat(b), rtol=0, atol=1e-12)
+        for a, b in zip(ref_blocks, new_blocks))
+    ok = diff < 1e-12 and same_cm and same_roc
+    width = float((tab_ci["accuracy_ci_high"] - tab_ci["accuracy_ci_low"]).mean())
+
+    print(f"[bench] metrics · {args.seasons} temporadas · {len(m)} partidos")
+    print(f"[bench] celdas originales {best_old:.3f}s · engine/metrics {best_new:.3f}s "
+          f"(×{best_old / best_new:.1f}) · bootstrap {args.n_boot} remuestreos {boot_s:.2f}s "
+          f"(IC95 accuracy ±{width / 2:.3f}) · "
+          f"{'✅ mismas métricas, matrices y curvas' if ok else '❌ difiere'} (máx |Δ|={diff:.1e})")
+    if not ok:
+        sys.exit(1)
+    return {"seasons": args.seasons, "rows": len(m), "legacy_s": round(best_old, 4), "engine_s": round(best_new, 4),
+            "n_boot": args.n_boot, "bootstrap_s": round(boot_s, 3), "max_abs_diff": diff,
+            "identical_confusion": same_cm, "identical_roc": same_roc}
+
+
+def _radar_source(n_seasons: int, extra_cols: int, seed: int = 0) -> pd.DataFrame:
+    """df_final sintético con todas las columnas del radar/barras + `extra_cols` features de relleno."""
+    rng = np.random.default_rng(seed)
+    df = make_df_final(n_seasons)
+    n = len(df)
+    for side in ("home", "away"):
+        df[f"{side}_avg_corners_last7"] = np.round(rng.uniform(2, 9, n), 3)
+        df[f"{side}_effectiveness"] = np.round(rng.uniform(0, 1, n), 3)
+        df[f"{side}_form_points_6"] = rng.integers(0, 19, n).astype(float)
+        df[f"{side}_form_gd_6"] = rng.integers(-12, 13, n).astype(float)
+        df[f"{side}_relative_perf"] = np.round(rng.uniform(0, 2.2, n), 3)
+        df[f"{side}_total_points_cum"] = rng.integers(0, 100, n).astype(float)
+        df[f"{side}_avg_shots_last7"] = np.round(rng.uniform(5, 25, n), 3)
+        df[f"{side}_avg_fouls_last7"] = np.round(rng.uniform(6, 20, n), 3)
+        df[f"{side}_avg_yellows_last7"] = np.round(rng.uniform(0, 4, n), 3)
+    df["overround"] = (1 / df[["B365H", "B365D", "B365A"]]).sum(axis=1)
+    pad = pd.DataFrame(rng.random((n, extra_cols)), columns=[f"feat_{i:03d}" for i in range(extra_cols)])
+    return pd.concat([df, pad], axis=1)
+
+
+def _radar_legacy(src: Path, out_dir: Path, today: pd.Timestamp, store) -> list[int]:
+    """
+    Copia condensada de la última celda de MODELOS.ipynb: parquet entero, match_id con apply,
+    *_norm con .map por valor y cada CSV de temporada reescrito (concat + sort + drop_duplicates).
+    """
+    from engine.radar import (BARS_INVERT, BARS_NORM_COLS, BARS_RANGES, BARS_RAW_COLS, BARS_RAW_LABEL,
+                              ID_COLS, MARKET_COLS, META_COLS, NORM_VERSION,
+                              RADAR_METRICS, RADAR_RANGES, _dedup, write_schemas)
+    df = pd.read_parquet(src).reset_index(drop=True)
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    df["Season"] = pd.to_numeric(df["Season"], errors="coerce").astype("Int64")
+    futuros = df.loc[df["Date"] >= today].copy()
+    futuros["match_id"] = futuros.apply(
+        lambda r: f"{int(r['Season'])}__{pd.to_datetime(r['Date']).date()}__{r['HomeTeam_norm']}__{r['AwayTeam_norm']}",
+        axis=1)
+    schema_path = write_schemas(out_dir)
+
+    def _norm(v, lo, hi, invert=False):
+        if pd.isna(v):
+            return np.nan
+        x = float(np.clip((v - lo) / (hi - lo + 1e-12), 0, 1))
+        return 1.0 - x if invert else x
+
+    radar_raw, radar_norm = [], []
+    for label, (h_col, a_col) in RADAR_METRICS.items():
+        lo, hi = RADAR_RANGES[label]
+        for c in (h_col, a_col):
+            futuros[f"{c}_norm"] = futuros[c].map(lambda x: _norm(x, lo, hi))
+            radar_raw.append(c)
+            radar_norm.append(f"{c}_norm")
+    for side in ("home", "away"):
+        pts = pd.to_numeric(futuros[f"{side}_total_points_cum"], errors="coerce")
+        mp = pd.to_numeric(futuros[f"{side}_total_matches_prev"], errors="coerce")
+        out = pd.Series(np.nan, index=pts.index, dtype=float)
+        out.loc[mp > 0] = pts.loc[mp > 0] / (3.0 * mp.loc[mp > 0])
+        futuros[f"{side}_points_pct"] = out.clip(lower=0.0, upper=1.0)
+    for raw, lab in BARS_RAW_LABEL.items():
+        if f"{raw}_norm" not in futuros.columns:
+            lo, hi = BARS_RANGES[lab]
+            futuros[f"{raw}_norm"] = futuros[raw].map(lambda x: _norm(x, lo, hi, invert=lab in BARS_INVERT))
+    futuros["has_odds"] = futuros[["B365H", "B365D", "B365A"]].notna().all(axis=1)
+    futuros["generated_at"] = pd.Timestamp.utcnow()
+    futuros["norm_version"] = NORM_VERSION
+    futuros["schema_path"] = str(schema_path)
+    final_cols = _dedup([c for c in ID_COLS + MARKET_COLS + ["has_odds"] + radar_raw + radar_norm
+                         + BARS_RAW_COLS + BARS_NORM_COLS + META_COLS if c in futuros.columns])
+    written = []
+    for season in sorted(futuros["Season"].dropna().unique().tolist()):
+        part = futuros.loc[futuros["Season"] == season, final_cols].copy()
+        out_path = out_dir / f"radar_prematch_{int(season)}.csv"
+        part = part.sort_values(["Date", "HomeTeam_norm", "AwayTeam_norm"]).reset_index(drop=True)
+        part["generated_at"] = pd.to_datetime(part["generated_at"], errors="coerce", utc=True)
+        if out_path.exists():
+            prev = pd.read_csv(out_path)
+            prev["generated_at"] = pd.to_datetime(prev["generated_at"], errors="coerce", utc=True)
+            merged = pd.concat([prev, part], ignore_index=True)
+            merged = merged.sort_values("generated_at", na_position="last")
+            merged = merged.drop_duplicates(subset=["match_id"], keep="last")
+            merged["generated_at"] = merged["generated_at"].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+        else:
+            part["generated_at"] = part["generated_at"].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+            merged = part
+        merged.to_csv(out_path, index=False, encoding="utf-8-sig")
+        store.write("radar_prematch", merged)
+        written.append(int(season))
+    return written
+
+
+def _radar_rows(out_dir: Path) -> pd.DataFrame:
+    """Contenido de todos los radar_prematch_*.csv (sin generated_at/schema_path), ordenado por match_id."""
+    d = pd.concat([pd.read_csv(p, encoding="utf-8-sig") for p in sorted(out_dir.glob("radar_prematch_*.csv"))],
+                  ignore_index=True).drop(columns=["generated_at", "schema_path"])
+    d["Date"] = pd.to_datetime(d["Date"], format="mixed")
+    return d.sort_values("match_id").reset_index(drop=True)
+
+
+def _same_rows(a: pd.DataFrame, b: pd.DataFrame, atol: float = 1e-12) -> bool:
+    """Mismas filas; los floats con tolerancia (la celda original relee y reescribe con 1 ulp de deriva)."""
+    if a.shape != b.shape or list(a.columns) != list(b.columns):
+        return False
+    num = a.select_dtypes("number").columns
+    rest = a.columns.difference(num)
+    return bool(np.allclose(a[num].to_numpy(float), b[num].to_numpy(float), rtol=0, atol=atol, equal_nan=True)
+                and a[rest].equals(b[rest]))
+
+
+def bench_radar(args) -> dict:
+    """
+    Exportador radar_prematch en una temporada simulada jornada a jornada: en cada ronda cambian
+    las cuotas de la próxima jornada y se añaden los datos nuevos. Celda original (parquet entero,
+    apply/map por fila, CSV reescrito) vs engine/radar.py (lectura podada, columnas vectorizadas,
+    upsert por (match_id, norm_version)). Las salidas deben tener el mismo contenido.
+    """
+    import tempfile
+    from engine.outputs_store import OutputsStore
+    from engine.radar import export_radar
+
+    df = _radar_source(args.seasons, args.extra_cols)
+    last = int(df["Season"].max())
+    rounds = sorted(df.loc[df["Season"] == last, "Matchweek"].unique().tolist())[:args.rounds]
+    rng = np.random.default_rng(1)
+    t_old = t_new = 0.0
+    touched = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        src = tmp / "df_final.parquet"
+        old_dir, new_dir = tmp / "legacy", tmp / "engine"
+        for d in (old_dir, new_dir):
+            d.mkdir()
+        old_store, new_store = OutputsStore(old_dir / "_store"), OutputsStore(new_dir / "_store")
+        for mw in rounds:
+            nxt = (df["Season"] == last) & (df["Matchweek"] == mw)
+            df.loc[nxt, ["B365H", "B365D", "B365A"]] = np.round(
+                df.loc[nxt, ["B365H", "B365D", "B365A"]].to_numpy() * rng.uniform(0.95, 1.05, (int(nxt.sum()), 3)), 2)
+            df.to_parquet(src, index=False)
+            today = df.loc[nxt, "Date"].min().normalize()
+            t0 = time.perf_counter()
+            _radar_legacy(src, old_dir, today, old_store)
+            t_old += time.perf_counter() - t0
+            t0 = time.perf_counter()
+            summary, _ = export_radar(src, new_dir, today, store=new_store)
+            t_new += time.perf_counter() - t0
+            touched.append(sum(s["new"] + s["changed"] for s in summary))
+        a, b = _radar_rows(old_dir), _radar_rows(new_dir)
+        same = _same_rows(a, b)
+
+    n = len(rounds)
+    print(f"[bench] radar · {args.seasons} temporadas · {df.shape[1]} columnas · {n} rondas de {last}")
+    print(f"[bench] celda original {t_old / n * 1e3:.0f} ms/ronda · engine/radar {t_new / n * 1e3:.0f} ms/ronda "
+          f"(×{t_old / t_new:.1f}) · filas escritas/ronda {np.mean(touched[1:] or touched):.0f} "
+          f"(de {len(b)}) · {'✅ mismo contenido' if same else '❌ difiere'}")
+    if not same:
+        sys.exit(1)
+    return {"seasons": args.seasons, "columns": int(df.shape[1]), "rounds": n,
+            "legacy_ms_per_round": round(t_old / n * 1e3, 1), "engine_ms_per_round": round(t_new / n * 1e3, 1),
+            "rows_touched_per_round": [int(x) for x in touched], "rows_total": len(b), "identical": same}
+
+
+# ============================================================
+# memory: lecturas de df_final en MODELOS (parquet entero, object/float64) vs engine/schema.py
+# ============================================================
+# Copia de DF_EXPORT_COLS (MODELOS.ipynb, celda 23)
+DF_EXPORT_COLS = ["Season", "Date", "HomeTeam_norm", "AwayTeam_norm", "HomeTeam", "AwayTeam", "FTR",
+                  "Matchweek", "MatchWeek", "matchweek", "Jornada", "Gameweek", "GW", "Week", "MD",
+                  "B365H", "B365D", "B365A", "pimp1", "pimpx", "pimp2"]
+
+
+def _memory_modelos(src: str, lean: bool) -> dict:
+    """
+    Recorrido de df por MODELOS en un proceso nuevo: lectura (celda 5), columnas derivadas
+    (celda 6), copia con claves de texto (celda 12), relectura (celda 23) y df con claves para
+    los matchlogs (celdas 46/52). Devuelve el pico de RSS sobre el proceso ya arrancado.
+    """
+    import gc, tracemalloc
+    from engine.schema import TeamIndex, memory_mb, read_table
+    from engine.trace import _peak_rss_mb, _rss_mb
+
+    def with_keys(d):
+        d = d.copy()
+        d["pred_key"] = (d["Season"].astype(str) + "|" + pd.to_datetime(d["Date"]).dt.strftime("%Y-%m-%d")
+                         + "|" + d["HomeTeam_norm"].astype(str) + "|" + d["AwayTeam_norm"].astype(str))
+        return d
+
+    gc.collect()
+    rss0 = _rss_mb()
+    tracemalloc.start()
+    teams = TeamIndex() if lean else None
+    df = read_table(src, lean=lean, teams=teams)
+    df_mb = memory_mb(df)
+    df["market_home_logit"] = np.log((df["pimp1"] + 1e-9) / (df["pimp2"] + 1e-9))
+    df["elo_diff"] = df["h_elo"] - df["a_elo"]
+    keyed = with_keys(df)
+    df = read_table(src, columns=DF_EXPORT_COLS if lean else None, lean=lean, teams=teams)
+    df_export_mb = memory_mb(df)
+    keyed = with_keys(df)
+    _, traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keyed
+    return {"df_mb": df_mb, "df_export_mb": df_export_mb, "traced_peak_mb": round(traced / 1024 ** 2, 1),
+            "rss_peak_mb": round(_peak_rss_mb() - rss0, 1)}
+
+
+def bench_memory(args) -> dict:
+    """
+    Memoria de df_final en MODELOS: lectura entera con object/float64 (celdas originales) vs
+    read_table(lean=True) + relectura podada a DF_EXPORT_COLS. Cada variante corre en un proceso
+    nuevo (spawn) para que el pico de RSS sea sólo suyo. Comprueba además que el orden por
+    (Season, Date, equipos) y las claves pred_key no cambian.
+    """
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing as mp
+    from engine.schema import TeamIndex, format_pred_keys, lean, match_keys, memory_mb
+
+    df = _radar_source(args.seasons, args.extra_cols)
+    teams = TeamIndex()
+    small = lean(df, teams=teams)
+    order_cols = ["Season", "Date", "HomeTeam_norm", "AwayTeam_norm"]
+    same_order = bool((df.sort_values(order_cols, kind="mergesort").index
+                       == small.sort_values(order_cols, kind="mergesort").index).all())
+    ref = (df["Season"].astype(str) + "|" + df["Date"].dt.strftime("%Y-%m-%d") + "|"
+           + df["HomeTeam_norm"] + "|" + df["AwayTeam_norm"])
+    same_keys = bool((format_pred_keys(match_keys(small, teams), teams).to_numpy() == ref.to_numpy()).all())
+
+    res = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        src = str(Path(tmp) / "df_final.parquet")
+        df.to_parquet(src, index=False)
+        for label, flag in (("legacy", False), ("lean", True)):
+            with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as ex:
+                res[label] = ex.submit(_memory_modelos, src, flag).result()
+
+    old, new = res["legacy"], res["lean"]
+    print(f"[bench] memory · {args.seasons} temporadas · {df.shape[1]} columnas · {len(df)} filas")
+    print(f"[bench] df_final en memoria: {old['df_mb']} MB → {new['df_mb']} MB (×{old['df_mb'] / new['df_mb']:.1f}) · "
+          f"relectura celda 23: {old['df_export_mb']} MB → {new['df_export_mb']} MB")
+    print(f"[bench] pico RSS: {old['rss_peak_mb']} MB → {new['rss_peak_mb']} MB "
+          f"(×{old['rss_peak_mb'] / max(new['rss_peak_mb'], 0.1):.1f}) · pico tracemalloc: "
+          f"{old['traced_peak_mb']} MB → {new['traced_peak_mb']} MB · "
+          f"{'✅ mismo orden y pred_key' if same_order and same_keys else '❌ orden/claves difieren'}")
+    if not (same_order and same_keys):
+        sys.exit(1)
+    return {"seasons": args.seasons, "columns": int(df.shape[1]), "rows": len(df),
+            "frame_mb": {"legacy": memory_mb(df), "lean": memory_mb(small)},
+            "legacy": old, "lean": new, "same_order": same_order, "same_pred_keys": same_keys}
+
+
+# ============================================================
+# teams: canonización fila a fila + merges por texto vs engine/teams.py
+# ============================================================
+def bench_teams(args) -> dict:
+    """
+    Nombres de equipo de df_final (con variantes de mayúsculas/acentos/sufijos de club):
+      - canonización: _canon_team de EXTRACCIÓN (.map, sin caché) vs TeamCanon (una vez por nombre)
+      - alineado de MODELOS: pred_key_match con _norm_name por fila + merge por texto vs
+        match_key_ids (int64) + merge por entero. Comprueba que ambos dan lo mismo.
+    """
+    import re, tempfile
+    from engine.teams import TEAM_ALIASES, TeamCanon, _cleanup, match_key_ids, text_key
+
+    df = make_df_final(n_seasons=args.seasons)
+    rng = np.random.default_rng(0)
+    variants = {t: [t, t.title(), t.upper() + " CF", f"{t.title()} FC"] for t in
+                pd.unique(df[["HomeTeam_norm", "AwayTeam_norm"]].to_numpy().ravel())}
+    pick = rng.integers(0, 4, (len(df), 2))
+    raw_home = pd.Series([variants[t][k] for t, k in zip(df["HomeTeam_norm"], pick[:, 0])])
+    raw_away = pd.Series([variants[t][k] for t, k in zip(df["AwayTeam_norm"], pick[:, 1])])
+
+    def canon_team(name):                    # copia de _canon_team (EXTRACCIÓN, celda 50)
+        base = text_key.__wrapped__(name)
+        if base in TEAM_ALIASES:
+            return TEAM_ALIASES[base]
+        s2 = _cleanup(base)
+        return TEAM_ALIASES.get(s2, s2)
+
+    def norm_name(s):                        # copia de _norm_name (MODELOS)
+        return re.sub(r'[^a-z0-9]+', '', str(s).strip().lower())
+
+    def best(fn):
+        out, t = None, float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            out = fn()
+            t = min(t, time.perf_counter() - t0)
+        return out, t
+
+    def canon_legacy():
+        return raw_home.map(canon_team), raw_away.map(canon_team)
+
+    def canon_new():
+        with tempfile.TemporaryDirectory() as tmp:
+            canon = TeamCanon(learned_path=Path(tmp) / "team_aliases.json", cutoff=None)
+            return canon(raw_home), canon(raw_away)
+
+    (h_old, a_old), t_canon_old = best(canon_legacy)
+    (h_new, a_new), t_canon_new = best(canon_new)
+    same_canon = bool((h_old == h_new).all() and (a_old == a_new).all())
+
+    preds = df[["Season", "Date", "HomeTeam_norm", "AwayTeam_norm"]].sample(frac=1.0, random_state=0)
+    preds["proba_H"] = rng.random(len(preds))
+    odds = df[["Season", "Date", "HomeTeam_norm", "AwayTeam_norm", "B365H", "B365D", "B365A"]]
+
+    def key_str(x):
+        day = x["Date"].dt.floor("D").dt.strftime("%Y-%m-%d")
+        return (x["Season"].astype("Int64").astype(str) + "|" + day + "|"
+                + x["HomeTeam_norm"].astype(str).map(norm_name) + "|"
+                + x["AwayTeam_norm"].astype(str).map(norm_name))
+
+    def align_legacy():
+        p, d = preds.assign(k=key_str(preds)), odds.assign(k=key_str(odds))
+        return p.merge(d.drop(columns=["Season", "Date", "HomeTeam_norm", "AwayTeam_norm"])
+                        .drop_duplicates("k"), on="k", how="left").drop(columns="k")
+
+    def align_new():
+        kp, kd = match_key_ids([preds, odds], ["HomeTeam_norm"] * 2, ["AwayTeam_norm"] * 2)
+        p, d = preds.assign(k=kp), odds.assign(k=kd)
+        return p.merge(d.drop(columns=["Season", "Date", "HomeTeam_norm", "AwayTeam_norm"])
+                        .drop_duplicates("k"), on="k", how="left").drop(columns="k")
+
+    m_old, t_align_old = best(align_legacy)
+    m_new, t_align_new = best(align_new)
+    same_align = m_old.equals(m_new)
+
+    ok = same_canon and same_align
+    print(f"[bench] teams · {args.seasons} temporadas · {len(df)} partidos · "
+          f"{len(variants) * 4} variantes de nombre")
+    print(f"[bench] canonización: .map {t_canon_old:.3f}s → TeamCanon {t_canon_new:.3f}s "
+          f"(×{t_canon_old / t_canon_new:.1f})")
+    print(f"[bench] alineado preds↔df: pred_key_match texto {t_align_old:.3f}s → int64 {t_align_new:.3f}s "
+          f"(×{t_align_old / t_align_new:.1f}) · {'✅ mismo resultado' if ok else '❌ resultados distintos'}")
+    if not ok:
+        sys.exit(1)
+    return {"seasons": args.seasons, "rows": len(df),
+            "canon_s": {"legacy": t_canon_old, "teams": t_canon_new},
+            "align_s": {"legacy": t_align_old, "teams": t_align_new},
+            "same_canon": same_canon, "same_align": same_align}
+
+
+# ============================================================
+# season-sim: Monte Carlo de la temporada, bucle por simulación vs engine/season_sim.py
+# ============================================================
+def bench_season_sim(args) -> dict:
+    """
+    Temporada sintética con una fracción `played` de las jornadas jugadas y el resto pendiente
+    (probabilidades Poisson): bucle Python por simulación (muestreo partido a partido + sort
+    de la tabla) medido en pocas simulaciones y extrapolado vs simulate() vectorizado.
+    Comprueba que los puntos esperados coinciden con el valor analítico (Σ 3·pH + pD).
+    """
+    import tracemalloc
+    from engine.season_sim import SeasonSetup, fixture_probs, remaining_fixtures, simulate
+
+    df = make_df_final(n_seasons=2)
+    season = df[df["Season"] == df["Season"].max()].copy()
+    dates = np.sort(season["Date"].unique())
+    future = season["Date"] >= dates[int(len(dates) * args.played)]
+    season.loc[future, ["FTHG", "FTAG"]] = np.nan
+    season.loc[future, "FTR"] = None
+    fixtures = fixture_probs(remaining_fixtures(season, season), season)
+    setup = SeasonSetup.from_frames(season, fixtures)
+
+    def loop_sims(n, seed=0):
+        rng = np.random.default_rng(seed)
+        teams = list(setup.teams)
+        pos_counts = {t: np.zeros(len(teams), dtype=np.int64) for t in teams}
+        for _ in range(n):
+            pts = dict(zip(teams, setup.points.tolist()))
+            gd = dict(zip(teams, setup.gd.tolist()))
+            for h, a, p in zip(setup.home, setup.away, setup.probs):
+                r = rng.choice(3, p=p)
+                th, ta = teams[h], teams[a]
+                pts[th] += (3, 1, 0)[r]
+                pts[ta] += (0, 1, 3)[r]
+                gd[th] += (1, 0, -1)[r]
+                gd[ta] -= (1, 0, -1)[r]
+            table = sorted(teams, key=lambda t: (-pts[t], -gd[t], rng.random()))
+            for k, t in enumerate(table):
+                pos_counts[t][k] += 1
+        return pos_counts
+
+    n_loop = max(1, min(args.loop_sims, args.n_sims))
+    t0 = time.perf_counter()
+    loop_sims(n_loop)
+    t_loop = (time.perf_counter() - t0) / n_loop * args.n_sims
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    res = simulate(setup, n_sims=args.n_sims, chunk=args.chunk)
+    t_vec = time.perf_counter() - t0
+    peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+
+    left = np.zeros(setup.n_teams)
+    np.add.at(left, setup.home, 3 * setup.probs[:, 0] + setup.probs[:, 1])
+    np.add.at(left, setup.away, 3 * setup.probs[:, 2] + setup.probs[:, 1])
+    summary = res.summary().set_index("Team").loc[setup.teams.astype(str)]
+    err = float(np.abs(summary["xPts"].to_numpy() - (setup.points + left)).max())
+    grid = np.arange(res.pts_counts.shape[1])
+    mean = res.pts_counts @ grid / args.n_sims
+    sd = np.sqrt(res.pts_counts @ grid ** 2 / args.n_sims - mean ** 2)
+    tol = float(5 * sd.max() / np.sqrt(args.n_sims))          # 5 errores estándar
+    ok = err < tol and np.allclose(res.pos_counts.sum(axis=0), args.n_sims)
+
+    print(f"[bench] season-sim · {len(fixtures)} partidos pendientes · {setup.n_teams} equipos · "
+          f"{args.n_sims} temporadas (lotes de {args.chunk})")
+    print(f"[bench] bucle por simulación (extrapolado de {n_loop}): {t_loop:.1f}s → vectorizado {t_vec:.2f}s "
+          f"(×{t_loop / t_vec:.0f}) · pico tracemalloc {peak_mb:.0f} MB")
+    print(f"[bench] |xPts − analítico| máx = {err:.4f} (tolerancia {tol:.4f}) · "
+          f"{'✅ consistente' if ok else '❌ inconsistente'}")
+    if not ok:
+        sys.exit(1)
+    return {"fixtures": len(fixtures), "teams": setup.n_teams, "n_sims": args.n_sims, "chunk": args.chunk,
+            "loop_s_extrapolated": t_loop, "vectorized_s": t_vec, "peak_traced_mb": peak_mb,
+            "max_xpts_error": err}
+
+
+def bench_odds_ledger(args) -> dict:
+    """
+    Una temporada de rondas: en la ronda r hay r ficheros b365_filled_*.csv (uno nuevo por
+    jornada, alguno reescrito). Celda original (relee y normaliza todos los CSV + merge y bucle
+    por columna) vs OddsLedger.sync (sólo los nuevos/cambiados) + apply_odds. Comprueba que las
+    cuotas resultantes son idénticas en cada ronda.
+    """
+    import tempfile
+    from engine.odds_ledger import OddsLedger, apply_odds
+    from engine.teams import map_unique, text_key
+
+    cols = ["B365H", "B365D", "B365A"]
+    live = make_matches(n_seasons=args.seasons)[["Date", "HomeTeam_norm", "AwayTeam_norm"]].copy()
+    live.columns = ["Date", "HomeTeam", "AwayTeam"]
+    live["Date"] = pd.to_datetime(live["Date"]).dt.strftime("%Y-%m-%d")
+    for c in cols:
+        live[c] = np.nan
+
+    def key(df):
+        return (df["Date"].astype(str) + "|" + map_unique(df["HomeTeam"].astype(str), text_key)
+                + "|" + map_unique(df["AwayTeam"].astype(str), text_key))
+
+    live["_TMP_KEY_"] = key(live)
+
+    def parse(p):
+        dfm = pd.read_csv(p)
+        dfm["Date"] = pd.to_datetime(dfm["Date"], errors="coerce").dt.strftime("%Y-%m-%d")
+        for c in cols:
+            dfm[c] = pd.to_numeric(dfm[c], errors="coerce")
+        dfm["_TMP_KEY_"] = key(dfm)
+        return dfm[["_TMP_KEY_"] + cols]
+
+    def legacy(paths, frame):
+        manual = pd.concat([parse(p) for p in paths], ignore_index=True)
+        manual = manual.drop_duplicates(subset=["_TMP_KEY_"], keep="last")
+        frame = frame.merge(manual, on="_TMP_KEY_", how="left", suffixes=("", "_MAN"))
+        for col in cols:
+            mask = frame[f"{col}_MAN"].notna()
+            frame.loc[mask, col] = frame.loc[mask, f"{col}_MAN"]
+            frame = frame.drop(columns=[f"{col}_MAN"])
+        frame["_FROM_MANUAL"] = frame["_TMP_KEY_"].isin(set(manual["_TMP_KEY_"]))
+        return frame
+
+    rng = np.random.default_rng(0)
+    last = live.iloc[-args.files * args.rows:]
+    t_old = t_new = 0.0
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        man_dir = Path(tmp) / "manual"
+        man_dir.mkdir()
+        ledger_root = Path(tmp) / "odds_ledger"
+        paths = []
+        for r in range(args.files):
+            block = last.iloc[r * args.rows:(r + 1) * args.rows][["Date", "HomeTeam", "AwayTeam"]].copy()
+            block[cols] = rng.uniform(1.2, 8.0, size=(len(block), 3)).round(2)
+            block.loc[block.index[rng.random(len(block)) < 0.1], "B365D"] = np.nan
+            p = man_dir / f"b365_filled_{r:03d}.csv"
+            block.to_csv(p, index=False)
+            paths.append(str(p))
+            if r >= 2 and r % 5 == 0:                        # corrección de un fichero antiguo
+                old = pd.read_csv(paths[r - 2])
+                old.loc[0, "B365H"] = float(old.loc[0, "B365H"]) + 0.05
+                old.to_csv(paths[r - 2], index=False)
+
+            t0 = time.perf_counter()
+            ref = legacy(paths, live.copy())
+            t_old += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            ledger = OddsLedger(ledger_root, key_col="_TMP_KEY_")
+            ledger.sync(paths, parse)
+            got, hit, _ = apply_odds(live.copy(), ledger.view(), "_TMP_KEY_", cols)
+            t_new += time.perf_counter() - t0
+
+            ok &= bool(np.array_equal(ref[cols].to_numpy(float), got[cols].to_numpy(float), equal_nan=True)
+                       and np.array_equal(ref["_FROM_MANUAL"].to_numpy(), hit))
+
+    print(f"[bench] odds-ledger · {len(live)} partidos · {args.files} rondas × {args.rows} cuotas por fichero")
+    print(f"[bench] releer todo + merge: {t_old:.2f}s → ledger + apply_odds: {t_new:.2f}s (×{t_old / t_new:.1f}) · "
+          f"{'✅ cuotas idénticas' if ok else '❌ cuotas distintas'}")
+    if not ok:
+        sys.exit(1)
+    return {"matches": len(live), "files": args.files, "rows": args.rows,
+            "reread_s": t_old, "ledger_s": t_new}
+
+
+def bench_staking(args) -> dict:
+    """
+    Rejilla de estrategias de stake (modelo / valor / favorito × plano / Kelly fraccional ×
+    ventaja × cuota máxima × prob. mínima) sobre matchlogs sintéticos: bucle Python por
+    estrategia y partido (medido en unas pocas y extrapolado) vs backtest() 2-D.
+    Comprueba profit, stake y drawdown de las estrategias del bucle.
+    """
+    from engine.staking import BacktestData, backtest, make_grid
+    from engine.synthetic import make_matchlogs
+
+    logs = make_matchlogs(n_seasons=args.seasons, first_season=2005)
+    data = BacktestData.from_frame(pd.concat([m for m, _ in logs.values()], ignore_index=True))
+    grid = make_grid(picks=("model", "value", "market"), stakes=("flat", "kelly"),
+                     kelly_fractions=tuple(np.linspace(0.05, 1.0, args.fractions)),
+                     min_edges=(-np.inf, -0.05, 0.0, 0.02, 0.05, 0.1, 0.15, 0.2),
+                     max_odds=(np.inf, 2.0, 3.0, 4.0, 6.0, 10.0), min_probs=(0.0, 0.3, 0.4, 0.5))
+    bankroll = 100.0
+
+    def loop_one(row):
+        sel = data.selection(row.pick)
+        out = {}
+        for season, (a, b) in data.bounds.items():
+            bank, peak, staked, dd = bankroll, bankroll, 0.0, 0.0
+            for t in range(a, b):
+                if not (sel["valid"][t] and sel["edge"][t] >= row.min_edge and sel["o"][t] <= row.max_odds
+                        and sel["p"][t] >= row.min_prob):
+                    continue
+                if row.stake == "flat":
+                    stake = 1.0
+                else:
+                    stake = bank * row.fraction * min(max(sel["edge"][t] / (sel["o"][t] - 1.0), 0.0), 1.0)
+                staked += stake
+                bank += stake * sel["ret"][t]
+                peak = max(peak, bank)
+                dd = max(dd, peak - bank)
+            out[season] = (bank - bankroll, staked, dd)
+        return out
+
+    rng = np.random.default_rng(0)
+    sample = grid.iloc[rng.choice(len(grid), size=min(args.loop_strategies, len(grid)), replace=False)]
+    t0 = time.perf_counter()
+    ref = {r.strategy: loop_one(r) for r in sample.itertuples(index=False)}
+    t_loop = (time.perf_counter() - t0) / len(sample) * len(grid)
+
+    t0 = time.perf_counter()
+    res = backtest(data, grid)
+    t_vec = time.perf_counter() - t0
+
+    got = res.by_season.set_index(["strategy", "Season"])
+    err = max(abs(got.loc[(k, s), col] - v[i]) / max(1.0, abs(v[i]))
+              for k, seasons in ref.items() for s, vals in seasons.items()
+              for i, col in enumerate(("profit", "staked", "max_drawdown")) for v in [vals])
+    ok = err < 1e-9
+    board = res.leaderboard(min_bets=100)
+    print(f"[bench] staking · {len(data.season)} partidos · {len(data.bounds)} temporadas · {len(grid)} estrategias")
+    print(f"[bench] bucle por estrategia (extrapolado de {len(sample)}): {t_loop:.1f}s → 2-D {t_vec:.2f}s "
+          f"(×{t_loop / t_vec:.0f})")
+    print(f"[bench] mejor ROI: {board['strategy'].iat[0]} ({board['roi'].iat[0]:+.3f}) · error relativo máx "
+          f"{err:.1e} · {'✅ consistente' if ok else '❌ inconsistente'}")
+    if not ok:
+        sys.exit(1)
+    return {"matches": int(len(data.season)), "seasons": len(data.bounds), "strategies": int(len(grid)),
+            "loop_s_extrapolated": t_loop, "vectorized_s": t_vec, "max_rel_error": float(err)}
+
+
+# ============================================================
+# smote: walk-forward "Con SMOTE" de referencia vs modo rápido (y vs sin SMOTE)
+# ============================================================
+def _preds_score(preds) -> dict:
+    """Accuracy, logloss y reparto de la clase predicha (tasa de empates) de un walk-forward."""
+    p = preds[preds["has_label"] == 1]
+    P = p[["proba_H", "proba_D", "proba_A"]].to_numpy(dtype=float)
+    P = np.clip(P / P.sum(axis=1, keepdims=True), 1e-15, 1.0)
+    y = p["y_true"].astype(str).str.upper().str.strip().map({"H": 0, "D": 1, "A": 2}).to_numpy()
+    return {"accuracy": round(float((p["y_true"] == p["y_pred"]).mean()), 4),
+            "logloss": round(float(-np.log(P[np.arange(len(y)), y]).mean()), 4),
+            "pred_draws": round(float((p["y_pred"] == "D").mean()), 4)}
+
+
+def _smote_parity(fast: dict, ref: dict, max_delta_logloss: float, max_delta_draws: float) -> dict:
+    """SMOTE rápido vs referencia: Δlogloss y Δ tasa de empates predichos dentro de tolerancia."""
+    d_ll = round(fast["logloss"] - ref["logloss"], 4)
+    d_draws = round(fast["pred_draws"] - ref["pred_draws"], 4)
+    ok = abs(d_ll) <= max_delta_logloss and abs(d_draws) <= max_delta_draws
+    return {"ok": ok, "delta_logloss": d_ll, "delta_pred_draws": d_draws,
+            "detail": f"Δlogloss={d_ll:+.4f} (máx {max_delta_logloss}) · empates predichos "
+                      f"{fast['pred_draws']:.1%} vs {ref['pred_draws']:.1%} (máx Δ {max_delta_draws:.1%})"}
+
+
+def bench_smote(args) -> dict:
+    """
+    Celda "Con SMOTE" de MODELOS (ImbPipeline + CalibratedClassifierCV por fecha) frente a
+    walkforward_smote_calibrated; el walk-forward incremental sin SMOTE como suelo de tiempo.
+    Compara tiempo, accuracy, logloss y tasa de empates predichos sobre las mismas predicciones.
+    """
+    import contextlib, io
+    from engine.walkforward import walkforward_multinomial_incremental
+    from engine.walkforward_smote import walkforward_smote_calibrated, walkforward_smote_calibrated_reference
+
+    df, src = _load_df_final(args.parquet, args.seasons)
+    print(f"[bench] smote · fuente={src} · filas={len(df)} · fechas={df['Date'].nunique()}")
+    score = _preds_score
+
+    runs = {
+        "plain": lambda: walkforward_multinomial_incremental(df, FEATURES_S13),
+        "smote_fast": lambda: walkforward_smote_calibrated(df, FEATURES_S13, calibration_method=args.method),
+    }
+    if not args.skip_reference:
+        runs["smote_reference"] = lambda: walkforward_smote_calibrated_reference(
+            df, FEATURES_S13, calibration_method=args.method)
+
+    result = {"source": src, "rows": int(len(df)), "calibration_method": args.method}
+    for name, fn in runs.items():
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, preds = fn()
+        result[name] = {"elapsed_s": round(time.perf_counter() - t0, 3), **score(preds)}
+        r = result[name]
+        print(f"[bench] {name:<16} {r['elapsed_s']:7.1f}s · acc={r['accuracy']:.4f} · "
+              f"logloss={r['logloss']:.4f} · empates predichos={r['pred_draws']:.1%}")
+
+    fast = result["smote_fast"]
+    print(f"[bench] SMOTE rápido ×{fast['elapsed_s'] / result['plain']['elapsed_s']:.2f} del walk-forward sin SMOTE")
+    if "smote_reference" in result:
+        ref = result["smote_reference"]
+        result["speedup"] = round(ref["elapsed_s"] / fast["elapsed_s"], 2)
+        parity = _smote_parity(fast, ref, args.max_delta_logloss, args.max_delta_draws)
+        result.update(delta_logloss=parity["delta_logloss"], delta_pred_draws=parity["delta_pred_draws"],
+                      parity_ok=parity["ok"])
+        print(f"[bench] referencia {ref['elapsed_s']:.1f}s vs rápido {fast['elapsed_s']:.1f}s → ×{result['speedup']} · "
+              f"{parity['detail']} · {'✅' if parity['ok'] else '❌'}")
+        if not parity["ok"]:
+            _save("smote", result)
+            sys.exit(1)
+    return result
+
+
+# ============================================================
+# tm-scrape: Transfermarkt en serie + BeautifulSoup (EXTRACCIÓN celdas 29-32) vs engine/transfermarkt.py
+# ============================================================
+def _tm_legacy_parse(content: bytes) -> dict:
+    """Copia de parse_tm_row_summary + parse_squad_table (EXTRACCIÓN_DATOS, celda 29)."""
+    from bs4 import BeautifulSoup
+    from engine.transfermarkt import parse_euro_value
+
+    soup = BeautifulSoup(content, "lxml")
+    out = {"avg_age": None, "value_mio": None, "value_avg_mio": None, "squad_size": None, "pct_foreigners": None}
+    tfoot = soup.find("tfoot")
+    if tfoot:
+        row = tfoot.find("tr")
+        age_td = row.find("td", class_="zentriert")
+        if age_td:
+            try:
+                out["avg_age"] = float(age_td.get_text(strip=True).replace(",", "."))
+            except ValueError:
+                pass
+        rechts_tds = row.find_all("td", class_="rechts")
+        if len(rechts_tds) >= 3:
+            out["value_mio"] = parse_euro_value(rechts_tds[1].get_text(strip=True))
+            out["value_avg_mio"] = parse_euro_value(rechts_tds[2].get_text(strip=True))
+    table = soup.find("table", class_="items")
+    tbody = table.find("tbody") if table else None
+    if tbody:
+        squad_size = n_extranjeros = 0
+        for row in tbody.find_all("tr", recursive=False):
+            cells = row.find_all("td", recursive=False)
+            if len(cells) < 4:
+                continue
+            flags = cells[3].find_all("img", class_="flaggenrahmen")
+            if not flags or flags[0].get("title", "").strip() not in ["España", "Spain"]:
+                n_extranjeros += 1
+            squad_size += 1
+        if squad_size:
+            out["squad_size"] = squad_size
+            out["pct_foreigners"] = round(100 * n_extranjeros / squad_size, 2)
+    return out
+
+
+def bench_tm_scrape(args) -> dict:
+    """
+    Contra el stub local (plantillas sintéticas con la estructura de Transfermarkt):
+    bucle en serie requests + sleep + BeautifulSoup (notebook original) vs scrape_transfermarkt
+    (pool + checkpoint). Comprueba además: reanudar tras un corte sólo pide lo pendiente, una
+    re-ejecución no toca la red, un fallido se reintenta en la siguiente pasada, y el refresco
+    anual (parquet importado + temporada nueva) sólo pide esa temporada.
+    """
+    import contextlib, io, requests, tempfile
+    from engine.fetch import FetchClient
+    from engine.http_stub import StubServer
+    from engine.transfermarkt import TM_HEADERS, VALUE_COLS, TMStore, club_seasons, scrape_transfermarkt
+
+    jobs = club_seasons()
+    if args.jobs:
+        jobs = jobs[:args.jobs]
+    host = {"www.transfermarkt.com": (args.concurrent, args.interval)}
+    result = {"jobs": len(jobs), "latency_s": args.latency, "sleep_s": args.sleep,
+              "host_limit": list(host["www.transfermarkt.com"])}
+
+    def hits(stub) -> int:
+        return sum(n for p, n in stub.hits.items() if p.startswith("/www.transfermarkt.com/"))
+
+    with tempfile.TemporaryDirectory() as tmp, StubServer(latency=args.latency, tm_dir=f"{tmp}/html") as stub:
+        tmp = Path(tmp)
+        client = lambda name: FetchClient(cache_dir=tmp / name, stub_base=stub.base, host_limits=host)
+        quiet = contextlib.redirect_stdout(io.StringIO())
+
+        # --- notebook original: una página tras otra + espera fija ---
+        t0 = time.perf_counter()
+        legacy = {}
+        for j in jobs:
+            r = requests.get(stub.base + "/" + j.url.split("://", 1)[1], headers=TM_HEADERS, timeout=30)
+            r.raise_for_status()
+            legacy[j.key] = _tm_legacy_parse(r.content)
+            time.sleep(args.sleep)
+        result["legacy_s"] = round(time.perf_counter() - t0, 3)
+
+        # --- corte a mitad + reanudación (checkpoint recargado de disco, caché HTTP vacía) ---
+        stub.hits.clear()
+        half = len(jobs) // 2
+        t0 = time.perf_counter()
+        with client("c1") as c:
+            scrape_transfermarkt(jobs[:half], TMStore(tmp / "store"), client=c, max_workers=args.workers)
+        with client("c2") as c, quiet:
+            rep = scrape_transfermarkt(jobs, TMStore(tmp / "store"), client=c, max_workers=args.workers)
+        result["pool_s"] = round(time.perf_counter() - t0, 3)
+        result["resume"] = {"skipped": rep["skipped"], "requests": hits(stub)}
+        resume_ok = rep["skipped"] == half and hits(stub) == len(jobs)
+
+        store = TMStore(tmp / "store")
+        frame = store.frame()
+        same = len(frame) == len(jobs) and all(
+            legacy[f"{r.Season}|{r.team_n}"] == {c: getattr(r, c) for c in VALUE_COLS}
+            for r in frame.itertuples(index=False))
+
+        # --- re-ejecución: todo en el checkpoint, cero peticiones ---
+        stub.hits.clear()
+        with client("c2") as c:
+            rep = scrape_transfermarkt(jobs, store, client=c)
+        result["rerun_requests"] = hits(stub)
+
+        # --- fallido (página sin tabla) → se reintenta y revalida en la siguiente pasada ---
+        bad = jobs[-1]
+        (tmp / "html").mkdir()
+        (tmp / "html" / f"{bad.team_slug}_{bad.season}.html").write_text("<html><body>Error</body></html>")
+        s2 = TMStore(tmp / "retry")
+        with client("c3") as c, quiet:
+            rep1 = scrape_transfermarkt([bad], s2, client=c)
+            (tmp / "html" / f"{bad.team_slug}_{bad.season}.html").unlink()
+            rep2 = scrape_transfermarkt([bad], TMStore(tmp / "retry"), client=c)
+        retry_ok = rep1["failed"] == 1 and rep2["ok"] == 1 and len(s2.failures()) == 1
+
+        # --- refresco anual: parquet sin la última temporada + todos los trabajos ---
+        last = max(j.season for j in jobs)
+        yearly = TMStore(tmp / "yearly")
+        yearly.seed(frame[frame["Season"] < last])
+        stub.hits.clear()
+        t0 = time.perf_counter()
+        with client("c4") as c:
+            rep = scrape_transfermarkt(jobs, yearly, client=c, max_workers=args.workers)
+        result["yearly"] = {"s": round(time.perf_counter() - t0, 3), "requests": hits(stub),
+                            "new_season_jobs": sum(j.season == last for j in jobs)}
+        yearly_ok = hits(stub) == result["yearly"]["new_season_jobs"] and yearly.frame().equals(frame)
+
+    result.update(identical=same, resume_ok=resume_ok, retry_ok=retry_ok, yearly_ok=yearly_ok)
+    print(f"[bench] tm-scrape · {len(jobs)} club-temporadas · latencia {args.latency}s · "
+          f"límite host {args.concurrent} simultáneas / {args.interval}s")
+    print(f"[bench] en serie + sleep {args.sleep}s: {result['legacy_s']:.2f}s · pool + checkpoint "
+          f"{result['pool_s']:.2f}s (corte a mitad + reanudación) → ×{result['legacy_s'] / result['pool_s']:.1f} · "
+          f"{'✅ valores idénticos' if same else '❌ valores difieren'}")
+    print(f"[bench] reanudación: {result['resume']['skipped']} saltadas, {result['resume']['requests']} peticiones "
+          f"en total {'✅' if resume_ok else '❌'} · re-ejecución: {result['rerun_requests']} peticiones "
+          f"{'✅' if result['rerun_requests'] == 0 else '❌'} · fallido reintentado {'✅' if retry_ok else '❌'}")
+    print(f"[bench] refresco anual: {result['yearly']['requests']} peticiones "
+          f"({result['yearly']['new_season_jobs']} de la temporada {last}) en {result['yearly']['s']:.2f}s "
+          f"{'✅' if yearly_ok else '❌'}")
+    if not (same and resume_ok and retry_ok and yearly_ok and result["rerun_requests"] == 0):
+        sys.exit(1)
+    return result
+
+
+# ============================================================
+# regress: rutas calientes sobre datos sintéticos del tamaño de LaLiga vs línea base
+# ============================================================
+def _calibrate(repeat: int = 5) -> float:
+    """Carga fija (sort + groupby de 1M filas): los tiempos se guardan en unidades de esta máquina."""
+    rng = np.random.default_rng(0)
+    x = rng.random(1_000_000)
+    frame = pd.DataFrame({"g": rng.integers(0, 1000, len(x)), "x": x})
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        np.sort(x)
+        frame.groupby("g")["x"].agg(["mean", "std"])
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _regress_cases(seasons: int, tmp: Path) -> dict:
+    """nombre → función sin argumentos (la preparación de datos no se mide)."""
+    import contextlib, io, shutil
+    from engine.match_features import build_new_features, preprocess
+    from engine.metrics import encode, season_table
+    from engine.radar import export_radar
+    from engine.synthetic import make_clean_vars
+    from engine.team_features import build_team_features
+    from engine.walkforward import walkforward_multinomial_incremental
+    from engine.walkforward_smote import walkforward_smote_calibrated
+
+    matches = make_matches(n_seasons=seasons)
+    clean = make_clean_vars(n_seasons=seasons)
+    df_new = build_new_features(clean)
+    df_final = make_df_final(n_seasons=seasons)
+    wf = df_final[df_final["Season"] > df_final["Season"].max() - 6]
+    preds = _fake_preds(seasons)
+    radar_src = tmp / "df_final.parquet"
+    radar = _radar_source(seasons, extra_cols=250)
+    radar.to_parquet(radar_src, index=False)
+    radar_today = radar.loc[radar["Season"] == radar["Season"].max(), "Date"].min()
+
+    def walkforward():
+        with contextlib.redirect_stdout(io.StringIO()):
+            walkforward_multinomial_incremental(wf, FEATURES_S13)
+
+    def smote():
+        with contextlib.redirect_stdout(io.StringIO()):
+            walkforward_smote_calibrated(wf, FEATURES_S13)
+
+    def radar_export():
+        shutil.rmtree(tmp / "radar", ignore_errors=True)
+        export_radar(radar_src, tmp / "radar", radar_today)       # alta de la temporada
+        export_radar(radar_src, tmp / "radar", radar_today)       # ronda sin cambios
+
+    return {
+        "team_features": lambda: build_team_features(matches),
+        "new_features": lambda: build_new_features(clean),
+        "preprocess": lambda: preprocess(df_new),
+        "walkforward": walkforward,
+        "smote": smote,
+        "metrics": lambda: season_table(encode(preds), n_boot=200),
+        "radar": radar_export,
+    }
+
+
+def _regress_parity(seasons: int) -> dict:
+    """
+    nombre de caso → comprobación de equivalencia (sin medir tiempo) que devuelve
+    {"ok": bool, "detail": str, ...}. Se ejecuta una vez por caso seleccionado.
+    """
+    import contextlib, io
+    from engine.walkforward import (compare_walkforward_preds, walkforward_multinomial_accuracy,
+                                    walkforward_multinomial_incremental)
+    from engine.walkforward_smote import walkforward_smote_calibrated, walkforward_smote_calibrated_reference
+
+    df_final = make_df_final(n_seasons=seasons)
+    wf = df_final[df_final["Season"] > df_final["Season"].max() - 6]
+
+    def walkforward():
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, inc = walkforward_multinomial_incremental(wf, FEATURES_S13)
+            _, ref = walkforward_multinomial_accuracy(wf, FEATURES_S13, tol=1e-8)
+        rep = compare_walkforward_preds(ref, inc)
+        return {"ok": rep["ok"], "detail": f"max|Δp|={rep.get('max_abs_proba_diff', float('nan')):.2e} "
+                                           f"vs clásico convergido (atol={rep.get('atol')})", **rep}
+
+    def smote():
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, fast = walkforward_smote_calibrated(wf, FEATURES_S13)
+            _, ref = walkforward_smote_calibrated_reference(wf, FEATURES_S13)
+        return _smote_parity(_preds_score(fast), _preds_score(ref), max_delta_logloss=0.01, max_delta_draws=0.02)
+
+    return {"walkforward": walkforward, "smote": smote}
+
+
+def bench_regress(args) -> dict:
+    """
+    Suite de regresión: cada ruta caliente se mide `repeat` veces (mínimo) sobre datos sintéticos
+    de `seasons` temporadas y se divide por una carga de calibración medida junto a ella (la
+    máquina puede ir más o menos cargada a lo largo de la suite), de modo que la línea base
+    (scripts/bench_baseline.json) sirve entre máquinas. Falla si alguna ruta supera
+    threshold × su valor base. Los casos con comprobación de equivalencia (_regress_parity)
+    fallan también si se salen de su tolerancia. Toda la suite queda además en una traza
+    (artifacts/trace/regress_*).
+    """
+    import tempfile, warnings
+    from engine.trace import span, tracing
+
+    baseline = json.loads(BASELINE.read_text(encoding="utf-8")) if BASELINE.exists() else {}
+    calib = _calibrate()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        cases = _regress_cases(args.seasons, Path(tmp))
+        names = args.cases or list(cases)
+        unknown = sorted(set(names) - set(cases))
+        if unknown:
+            print(f"❌ Casos desconocidos: {unknown} (disponibles: {', '.join(cases)})")
+            sys.exit(2)
+        with tracing("regress", seasons=args.seasons) as tracer:
+            for name in names:
+                cases[name]()                                     # calentamiento
+                times, calibs = [], []
+                for _ in range(args.repeat):
+                    calibs.append(_calibrate(repeat=2))           # velocidad de la máquina junto al caso
+                    with span(f"regress:{name}", cat="bench"):
+                        t0 = time.perf_counter()
+                        cases[name]()
+                        times.append(time.perf_counter() - t0)
+                best, unit = min(times), min(calibs)
+                base = baseline.get("cases", {}).get(name)
+                ratio = best / unit / base["score"] if base else None
+                results[name] = {"best_s": round(best, 4), "calibration_s": round(unit, 4),
+                                 "score": round(best / unit, 3), "ratio": round(ratio, 3) if ratio is not None else None,
+                                 "regressed": ratio is not None and ratio > args.threshold}
+        parity = {name: check() for name, check in _regress_parity(args.seasons).items() if name in names}
+
+    print(f"[bench] regress · {args.seasons} temporadas · calibración {calib * 1e3:.0f} ms · "
+          f"umbral ×{args.threshold} · traza → {tracer.path}")
+    for name, r in results.items():
+        mark = "—" if r["ratio"] is None else ("❌" if r["regressed"] else "✅")
+        vs = f"×{r['ratio']:.2f} vs base" if r["ratio"] is not None else "sin línea base"
+        print(f"  {mark} {name:<14} {r['best_s'] * 1e3:9.1f} ms · {r['score']:8.2f} u · {vs}")
+    for name, p in parity.items():
+        print(f"  {'✅' if p['ok'] else '❌'} {name:<14} equivalencia · {p['detail']}")
+
+    if args.update_baseline:
+        cases_base = {**baseline.get("cases", {}),
+                      **{n: {"score": r["score"], "best_s": r["best_s"]} for n, r in results.items()}}
+        BASELINE.write_text(json.dumps({"seasons": args.seasons, "calibration_s": round(calib, 4),
+                                        "updated_at": time.strftime("%Y-%m-%d"), "cases": cases_base},
+                                       ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"[bench] Línea base actualizada → {BASELINE}")
+    elif not baseline:
+        print(f"⚠️  No hay línea base ({BASELINE}); ejecuta con --update-baseline.")
+    regressed = [n for n, r in results.items() if r["regressed"]]
+    mismatched = [n for n, p in parity.items() if not p["ok"]]
+    result = {"seasons": args.seasons, "calibration_s": round(calib, 4), "threshold": args.threshold,
+              "cases": results, "regressed": regressed, "parity": parity, "mismatched": mismatched,
+              "trace": str(tracer.path)}
+    if (regressed and not args.update_baseline) or mismatched:
+        _save("regress", result)
+        if regressed and not args.update_baseline:
+            print(f"❌ Regresión en: {', '.join(regressed)}")
+        if mismatched:
+            print(f"❌ Fuera de tolerancia: {', '.join(mismatched)}")
+        sys.exit(1)
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks del motor (engine/)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    wf = sub.add_parser("walkforward", help="Walk-forward de referencia vs incremental (warm start)")
+    wf.add_argument("--parquet", default=None, help="df_final.parquet (por defecto data/03_features si existe).")
+    wf.add_argument("--seasons", type=int, default=20, help="Temporadas sintéticas si no hay parquet.")
+    wf.add_argument("--tol", type=float, default=None, help="Tolerancia lbfgs del motor incremental (por defecto la suya).")
+    wf.add_argument("--ref-tol", type=float, default=1e-8, help="Tolerancia lbfgs de la referencia (1e-4 = notebook).")
+    wf.add_argument("--atol", type=float, default=1e-3, help="Tolerancia en proba_H/D/A para la equivalencia.")
+    wf.add_argument("--skip-reference", action="store_true", help="No ejecutar la versión de referencia.")
+    wf.set_defaults(func=bench_walkforward, name="walkforward")
+
+    wp = sub.add_parser("walkforward-par", help="Walk-forward clásico en serie vs joblib (salida idéntica)")
+    wp.add_argument("--parquet", default=None, help="df_final.parquet (por defecto data/03_features si existe).")
+    wp.add_argument("--seasons", type=int, default=20, help="Temporadas sintéticas si no hay parquet.")
+    wp.add_argument("--n-jobs", type=int, default=-1, help="Procesos (-1 = todos los cores).")
+    wp.add_argument("--chunk-size", type=int, default=None, help="Fechas por bloque (por defecto ~4 bloques/worker).")
+    wp.set_defaults(func=bench_walkforward_par, name="walkforward_par")
+
+    sw = sub.add_parser("sweep", help="Barrido de 50 configuraciones vs un walk-forward incremental")
+    sw.add_argument("--parquet", default=None, help="df_final.parquet (por defecto data/03_features si existe).")
+    sw.add_argument("--seasons", type=int, default=20, help="Temporadas sintéticas si no hay parquet.")
+    sw.add_argument("--n-jobs", type=int, default=1, help="Procesos para los bloques de fechas (-1 = todos).")
+    sw.add_argument("--atol", type=float, default=5e-3, help="Tolerancia en proba_H/D/A para la equivalencia.")
+    sw.set_defaults(func=bench_sweep, name="sweep")
+
+    tf = sub.add_parser("team-features", help="Features de forma (LIMPIEZA) con bucles vs vectorizado")
+    tf.add_argument("--seasons", type=int, default=20, help="Temporadas sintéticas.")
+    tf.add_argument("--repeat", type=int, default=3, help="Repeticiones del builder (se toma el mínimo).")
+    tf.add_argument("--baseline-rev", default=None, help="Commit del notebook de referencia (por defecto el raíz).")
+    tf.set_defaults(func=bench_team_features, name="team_features")
+
+    tj = sub.add_parser("team-join", help="Uniones local/visitante: cadena de merges vs engine/team_join.py")
+    tj.add_argument("--seasons", type=int, default=20, help="Temporadas sintéticas.")
+    tj.add_argument("--repeat", type=int, default=3, help="Repeticiones (se toma el mínimo).")
+    tj.set_defaults(func=bench_team_join, name="team_join")
+
+    ic = sub.add_parser("incremental", help="df_final completo vs parche incremental de una jornada")
+    ic.add_argument("--seasons", type=int, default=20, help="Temporadas sintéticas.")
+    ic.add_argument("--matchday", type=int, default=20, help="Jornadas jugadas en la ronda anterior.")
+    ic.add_argument("--skip-notebook", action="store_true", help="No medir el camino de notebooks (celdas de LIMPIEZA).")
+    ic.set_defaults(func=bench_incremental, name="incremental")
+
+    pp = sub.add_parser("pipeline", help="Arranque + PREPROCESADO: papermill vs en proceso vs motor")
+    pp.add_argument("--seasons", type=int, default=20, help="Temporadas sintéticas.")
+    pp.add_argument("--skip-papermill", action="store_true", help="No lanzar kernels de Jupyter.")
+    pp.add_argument("--baseline-rev", default=None, help="Revisión del PREPROCESADO original (por defecto, el commit raíz).")
+    pp.set_defaults(func=bench_pipeline, name="pipeline")
+
+    fe = sub.add_parser("fetch", help="Descargas de EXTRACCIÓN_DATOS: en serie vs FetchClient (stub local)")
+    fe.add_argument("--latency", type=float, default=0.3, help="Latencia simulada por petición (s).")
+    fe.add_argument("--seasons", type=int, default=21, help="Temporadas de football-data.co.uk.")
+    fe.add_argument("--clubs", type=int, default=20, help="Clubes de ClubElo.")
+    fe.add_argument("--sleep", type=float, default=0.4, help="Sleep entre clubes del camino original.")
+    fe.set_defaults(func=bench_fetch, name="fetch")
+
+    el = sub.add_parser("elo", help="ClubElo: histórico completo por club vs actualización delta")
+    el.add_argument("--days", type=int, default=3, help="Días desde la última actualización.")
+    el.add_argument("--latency", type=float, default=0.1, help="Latencia simulada por petición (s).")
+    el.set_defaults(func=bench_elo, name="elo")
+
+    ei = sub.add_parser("elo-index", help="Elo pre-partido: merge_asof por equipo vs índice searchsorted")
+    ei.add_argument("--season", type=int, default=2024, help="Temporada de los cruces hipotéticos.")
+    ei.add_argument("--repeat", type=int, default=50, help="Repeticiones del lookup (se toma el mínimo).")
+    ei.set_defaults(func=bench_elo_index, name="elo_index")
+
+    cp = sub.add_parser("cumprofit", help="Curvas cumprofit: script original vs dtypes + columnar + paralelo")
+    cp.add_argument("--seasons", type=int, default=50, help="Temporadas sintéticas (380 partidos cada una).")
+    cp.add_argument("--n-jobs", type=int, default=-1, help="Hilos para las temporadas (-1 = todos los cores).")
+    cp.add_argument("--repeat", type=int, default=3, help="Repeticiones (se toma el mínimo).")
+    cp.set_defaults(func=bench_cumprofit, name="cumprofit")
+
+    vo = sub.add_parser("verify", help="verify_outputs: dos lecturas + lista de dicts vs escaneo único en streaming")
+    vo.add_argument("--seasons", type=int, default=40, help="Temporadas sintéticas en outputs/.")
+    vo.add_argument("--rows", type=int, default=2000, help="Filas por radar_prematch / future_predictions.")
+    vo.add_argument("--workers", type=int, default=8, help="Ficheros leídos a la vez.")
+    vo.set_defaults(func=bench_verify, name="verify")
+
+    me = sub.add_parser("metrics", help="Métricas por temporada: celdas de MODELOS vs engine/metrics.py (+ bootstrap)")
+    me.add_argument("--seasons", type=int, default=20, help="Temporadas sintéticas (380 partidos cada una).")
+    me.add_argument("--n-boot", type=int, default=2000, help="Remuestreos del IC bootstrap.")
+    me.add_argument("--repeat", type=int, default=3, help="Repeticiones (se toma el mínimo).")
+    me.set_defaults(func=bench_metrics, name="metrics")
+
+    ra = sub.add_parser("radar", help="Exportador radar_prematch: celda de MODELOS vs upsert incremental")
+    ra.add_argument("--seasons", type=int, default=20, help="Temporadas sintéticas.")
+    ra.add_argument("--extra-cols", type=int, default=250, help="Columnas de relleno (ancho de df_final).")
+    ra.add_argument("--rounds", type=int, default=8, help="Jornadas simuladas de la última temporada.")
+    ra.set_defaults(func=bench_radar, name="radar")
+
+    mm = sub.add_parser("memory", help="df_final en MODELOS: lectura entera object/float64 vs schema compacto + poda")
+    mm.add_argument("--seasons", type=int, default=20, help="Temporadas sintéticas.")
+    mm.add_argument("--extra-cols", type=int, default=250, help="Columnas de relleno (ancho de df_final).")
+    mm.set_defaults(func=bench_memory, name="memory")
+
+    tm = sub.add_parser("teams", help="Nombres de equipo: .map por fila + claves texto vs engine/teams.py")
+    tm.add_argument("--seasons", type=int, default=20, help="Temporadas sintéticas.")
+    tm.add_argument("--repeat", type=int, default=3, help="Repeticiones por variante (se toma el mínimo).")
+    tm.set_defaults(func=bench_teams, name="teams")
+
+    ss = sub.add_parser("season-sim", help="Monte Carlo de la clasificación: bucle por simulación vs vectorizado")
+    ss.add_argument("--n-sims", type=int, default=100_000, help="Temporadas simuladas.")
+    ss.add_argument("--chunk", type=int, default=25_000, help="Simulaciones por lote.")
+    ss.add_argument("--played", type=float, default=0.5, help="Fracción de jornadas ya jugadas.")
+    ss.add_argument("--loop-sims", type=int, default=200, help="Simulaciones del bucle de referencia.")
+    ss.set_defaults(func=bench_season_sim, name="season-sim")
+
+    ol = sub.add_parser("odds-ledger", help="Cuotas manuales: releer todos los CSV vs ledger incremental")
+    ol.add_argument("--files", type=int, default=38, help="Rondas (un b365_filled nuevo por ronda).")
+    ol.add_argument("--rows", type=int, default=10, help="Partidos por fichero.")
+    ol.add_argument("--seasons", type=int, default=20, help="Temporadas sintéticas del maestro FD.")
+    ol.set_defaults(func=bench_odds_ledger, name="odds-ledger")
+
+    sk = sub.add_parser("staking", help="Rejilla de estrategias de stake: bucle por estrategia vs backtest 2-D")
+    sk.add_argument("--seasons", type=int, default=20, help="Temporadas sintéticas de matchlogs.")
+    sk.add_argument("--fractions", type=int, default=8, help="Fracciones de Kelly en la rejilla.")
+    sk.add_argument("--loop-strategies", type=int, default=20, help="Estrategias del bucle de referencia.")
+    sk.set_defaults(func=bench_staking, name="staking")
+
+    sm = sub.add_parser("smote", help="Walk-forward con SMOTE + calibración: celda de MODELOS vs modo rápido")
+    sm.add_argument("--parquet", default=None, help="df_final.parquet (por defecto data/03_features si existe).")
+    sm.add_argument("--seasons", type=int, default=8, help="Temporadas sintéticas si no hay parquet.")
+    sm.add_argument("--method", default="sigmoid", choices=("sigmoid", "isotonic"), help="Calibración.")
+    sm.add_argument("--max-delta-logloss", type=float, default=0.01, help="Tolerancia en logloss vs referencia.")
+    sm.add_argument("--max-delta-draws", type=float, default=0.015,
+                    help="Tolerancia en la tasa de empates predichos vs referencia.")
+    sm.add_argument("--skip-reference", action="store_true", help="No ejecutar la versión de referencia.")
+    sm.set_defaults(func=bench_smote, name="smote")
+
+    ts = sub.add_parser("tm-scrape", help="Transfermarkt: bucle en serie + BeautifulSoup vs pool + checkpoint (stub)")
+    ts.add_argument("--jobs", type=int, default=0, help="Club-temporadas (0 = las 402 de SEASONS_MAP).")
+    ts.add_argument("--latency", type=float, default=0.1, help="Latencia simulada del stub (s).")
+    ts.add_argument("--sleep", type=float, default=0.1, help="Espera entre páginas del bucle original (s).")
+    ts.add_argument("--workers", type=int, default=4, help="Hilos del pool.")
+    ts.add_argument("--concurrent", type=int, default=4, help="Peticiones simultáneas al host.")
+    ts.add_argument("--interval", type=float, default=0.0, help="Intervalo mínimo entre peticiones al host (s).")
+    ts.set_defaults(func=bench_tm_scrape, name="tm-scrape")
+
+    rg = sub.add_parser("regress", help="Rutas calientes vs línea base (falla si alguna se ralentiza)")
+    rg.add_argument("--seasons", type=int, default=20, help="Temporadas sintéticas (380 partidos cada una).")
+    rg.add_argument("--repeat", type=int, default=3, help="Repeticiones por caso (se toma el mínimo).")
+    rg.add_argument("--threshold", type=float, default=1.5, help="Falla si tiempo/base supera este factor.")
+    rg.add_argument("--cases", nargs="+", default=None, help="Subconjunto de casos (por defecto todos).")
+    rg.add_argument("--update-baseline", action="store_true", help=f"Reescribe {BASELINE.name} con esta medición.")
+    rg.set_defaults(func=bench_regress, name="regress")
+
+    args = ap.parse_args()
+    result = args.func(args)
+    _save(args.name, result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# scripts/load_test_predictions.py
+# Prueba de carga de la API de predicción (scripts/serve_predictions.py): N conexiones
+# keep-alive concurrentes lanzando POST /predict con lotes de partidos; informa latencia
+# p50/p90/p99 por petición y throughput (peticiones/s y partidos/s).
+#   python scripts/load_test_predictions.py --url http://127.0.0.1:8765 [--requests 2000] [--concurrency 8] [--batch 10]
+#   python scripts/load_test_predictions.py --synthetic        (modelo sintético + servidor en proceso, sin datos)
+# Con --synthetic además comprueba que la API devuelve las mismas probabilidades que el
+# exportador de predicciones futuras (fit_predict_tasks) para los partidos pendientes.
+from pathlib import Path
+import argparse, asyncio, json, sys, tempfile, time
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import numpy as np
+
+REPORT_PATH = Path("artifacts") / "loadtest" / "predict.json"
+# FEATURES_S11 (MODELOS.ipynb, celda 7) + elo_diff
+FEATURES = ['pimp1', 'pimpx', 'pimp2', 'relative_perf_diff', 'avg_xg_last7_diff', 'form_points_6_diff',
+            'home_total_gd_cum', 'away_total_gd_cum', 'h2h_win_rate_ewm_diff', 'home_total_matches_prev',
+            'away_total_matches_prev', 'home_avg_shotsontarget_last7', 'avg_shots_last7_diff',
+            'away_playstyle_equilibrado', 'elo_diff']
+
+
+# ============================================================
+# Cliente HTTP/1.1 mínimo (keep-alive) sobre asyncio
+# ============================================================
+class Conn:
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def request(self, method: str, path: str, payload: dict | None = None) -> tuple[int, dict]:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while (h := await self.reader.readline()) not in (b"\r\n", b""):
+            k, _, v = h.decode("latin-1").partition(":")
+            if k.strip().lower() == "content-length":
+                length = int(v)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+
+async def run_load(host: str, port: int, bodies: list[dict], n_requests: int, concurrency: int,
+                   warmup: int) -> dict:
+    conns = [await Conn(host, port).open() for _ in range(concurrency)]
+    for i in range(warmup):                      # carga del modelo (LRU) y calentamiento
+        await conns[i % concurrency].request("POST", "/predict", bodies[i % len(bodies)])
+
+    lat, errors, server_ms = [], [], []
+    counter = iter(range(n_requests))
+
+    async def worker(conn: Conn):
+        for i in counter:
+            t0 = time.perf_counter()
+            code, resp = await conn.request("POST", "/predict", bodies[i % len(bodies)])
+            lat.append((time.perf_counter() - t0) * 1e3)
+            if code != 200:
+                errors.append(resp.get("error", code))
+            else:
+                server_ms.append(resp["ms"])
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(c) for c in conns))
+    wall = time.perf_counter() - t0
+    for c in conns:
+        await c.close()
+
+    lat = np.array(lat)
+    batch = float(np.mean([len(b["fixtures"]) for b in bodies]))
+    return {
+        "requests": n_requests, "concurrency": concurrency, "batch": batch, "errors": len(errors),
+        "first_errors": [str(e) for e in errors[:3]], "wall_s": round(wall, 3),
+        "rps": round(n_requests / wall, 1), "fixtures_per_s": round(n_requests * batch / wall, 1),
+        "p50_ms": round(float(np.percentile(lat, 50)), 3), "p90_ms": round(float(np.percentile(lat, 90)), 3),
+        "p99_ms": round(float(np.percentile(lat, 99)), 3), "max_ms": round(float(lat.max()), 3),
+        "server_p50_ms": round(float(np.percentile(server_ms, 50)), 3) if server_ms else None,
+    }
+
+
+# ============================================================
+# Modo sintético: artefacto de ronda + servidor en el mismo proceso
+# ============================================================
+def synthetic_setup(models_dir: Path, seasons: int):
+    """df_final sintético con las dos últimas jornadas pendientes → artefacto de la ronda."""
+    from joblib import dump
+    from engine.serving import artifact_name, build_round_artifact
+    from engine.synthetic import make_df_final
+
+    df = make_df_final(seasons)
+    df["elo_diff"] = df["h_elo"] - df["a_elo"]
+    last = df["Season"].max()
+    pending = (df["Season"] == last) & (df["Matchweek"] >= df.loc[df["Season"] == last, "Matchweek"].max() - 1)
+    df.loc[pending, "FTR"] = np.nan
+    run_date = str(df.loc[pending, "Date"].min().date())
+    art = build_round_artifact(df, FEATURES, run_date=run_date)
+    models_dir.mkdir(parents=True, exist_ok=True)
+    dump(art, models_dir / artifact_name(run_date))
+    return df, run_date
+
+
+def exporter_reference(df, run_date: str) -> dict:
+    """Probabilidades del exportador (una tarea por fecha futura) para los partidos pendientes."""
+    import pandas as pd
+    from engine.walkforward import LABELS, fit_predict_tasks
+
+    d = df.sort_values("Date", kind="mergesort").reset_index(drop=True)
+    X = d[FEATURES].to_numpy(dtype=float)
+    y = d["FTR"].astype(str).to_numpy()
+    valid = d["FTR"].isin(LABELS).to_numpy()
+    dates = d["Date"].to_numpy()
+    sw = np.full(4 * 380, 1.0)
+    sw[-380:] = 3.0
+    tasks = [(np.flatnonzero((dates < fd) & valid)[-len(sw):], np.flatnonzero((dates == fd) & ~valid))
+             for fd in np.unique(dates[~valid])]
+    ref = {}
+    for (_, test_idx), (classes, _, proba) in zip(tasks, fit_predict_tasks(X, y, tasks, sw, random_state=42)):
+        cols = [list(classes).index(c) for c in LABELS]
+        for i, p in zip(test_idx, proba[:, cols]):
+            ref[(d.at[i, "HomeTeam_norm"], d.at[i, "AwayTeam_norm"], str(pd.Timestamp(dates[i]).date()))] = p
+    return ref
+
+
+def make_bodies(df, batch: int, n_bodies: int = 64, seed: int = 0) -> list[dict]:
+    """Lotes mezclando partidos pendientes (con cuotas movidas) y cruces arbitrarios entre equipos."""
+    rng = np.random.default_rng(seed)
+    teams = sorted(set(df["HomeTeam_norm"]) | set(df["AwayTeam_norm"]))
+    bodies = []
+    for _ in range(n_bodies):
+        fixtures = []
+        for _ in range(batch):
+            h, a = rng.choice(teams, 2, replace=False)
+            o = np.round(rng.uniform([1.3, 2.8, 1.6], [5.0, 4.5, 7.0]), 2)
+            fixtures.append({"home": str(h), "away": str(a), "date": "2030-01-01",
+                             "B365H": float(o[0]), "B365D": float(o[1]), "B365A": float(o[2])})
+        bodies.append({"run_date": "latest", "fixtures": fixtures})
+    return bodies
+
+
+async def synthetic_main(args) -> dict:
+    from engine.serving import ModelRegistry, PredictionServer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        df, run_date = synthetic_setup(Path(tmp), args.seasons)
+        server = await PredictionServer(ModelRegistry(tmp), port=0).start()
+        try:
+            # equivalencia: partidos pendientes tal cual (sin tocar cuotas) vs exportador
+            ref = exporter_reference(df, run_date)
+            fixtures = [{"home": h, "away": a, "date": dt} for h, a, dt in ref]
+            conn = await Conn(server.host, server.port).open()
+            code, resp = await conn.request("POST", "/predict", {"run_date": run_date, "fixtures": fixtures})
+            await conn.close()
+            got = np.array([[p["proba_H"], p["proba_D"], p["proba_A"]] for p in resp["predictions"]])
+            diff = float(np.abs(got - np.array(list(ref.values()))).max())
+            res = await run_load(server.host, server.port, make_bodies(df, args.batch), args.requests,
+                                 args.concurrency, args.warmup)
+        finally:
+            await server.stop()
+    res.update({"mode": "synthetic", "run_date": run_date, "pending_fixtures": len(ref),
+                "max_abs_diff_vs_exporter": diff, "identical": code == 200 and diff < 1e-9,
+                "model_loads": server.registry.loads})
+    return res
+
+
+def main(argv: list[str] | None = None):
+    ap = argparse.ArgumentParser(description="Prueba de carga de POST /predict (latencia p50/p99, throughput).")
+    ap.add_argument("--url", default="http://127.0.0.1:8765", help="Servidor ya arrancado (serve_predictions.py).")
+    ap.add_argument("--synthetic", action="store_true", help="Modelo sintético + servidor en proceso.")
+    ap.add_argument("--seasons", type=int, default=8, help="Temporadas sintéticas (--synthetic).")
+    ap.add_argument("--run-date", default="latest", help="Modelo a consultar (con --url).")
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=8, help="Conexiones keep-alive simultáneas.")
+    ap.add_argument("--batch", type=int, default=10, help="Partidos por petición.")
+    ap.add_argument("--warmup", type=int, default=50)
+    ap.add_argument("--report", default=str(REPORT_PATH))
+    args = ap.parse_args(argv)
+
+    if args.synthetic:
+        res = asyncio.run(synthetic_main(args))
+    else:
+        import pandas as pd
+        from engine.serving import FeatureSnapshot, ModelRegistry
+        u = urlsplit(args.url)
+        # lotes con equipos reales del modelo local (mismo data/04_models que el servidor)
+        snap: FeatureSnapshot = ModelRegistry(ROOT / "data" / "04_models").get(args.run_date).snapshot
+        teams = sorted(snap.team) or sorted({t for k in snap.fixtures for t in k})
+        df = pd.DataFrame({"HomeTeam_norm": teams, "AwayTeam_norm": teams[::-1]})
+        bodies = make_bodies(df, args.batch)
+        for b in bodies:
+            b["run_date"] = args.run_date
+        res = asyncio.run(run_load(u.hostname, u.port or 80, bodies, args.requests, args.concurrency, args.warmup))
+        res.update({"mode": "url", "url": args.url})
+
+    print(f"[load] {res['requests']} peticiones · {res['concurrency']} conexiones · {res['batch']:.0f} partidos/lote")
+    print(f"[load] p50 {res['p50_ms']:.2f} ms · p90 {res['p90_ms']:.2f} ms · p99 {res['p99_ms']:.2f} ms · "
+          f"máx {res['max_ms']:.1f} ms · servidor p50 {res['server_p50_ms']} ms")
+    print(f"[load] {res['rps']:.0f} peticiones/s · {res['fixtures_per_s']:.0f} partidos/s · errores {res['errors']}")
+    if res.get("mode") == "synthetic":
+        print(f"[load] {'✅' if res['identical'] else '❌'} {res['pending_fixtures']} partidos pendientes: "
+              f"mismas probabilidades que el exportador (máx |Δ|={res['max_abs_diff_vs_exporter']:.1e})")
+    out = Path(args.report)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(res, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"[load] Informe → {out}")
+    if res["errors"] or not res.get("identical", True):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
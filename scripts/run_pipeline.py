@@ -0,0 +1,86 @@
+# scripts/run_pipeline.py
+# Punto de entrada único del pipeline (engine/pipeline.py), en un solo proceso:
+#   python scripts/run_pipeline.py stage1 [--run-date YYYY-MM-DD]
+#   python scripts/run_pipeline.py stage2 [--run-date ...] [--incremental] [--force-extract]
+#                                         [--stages clean_features preprocess model export]
+# --engine papermill ejecuta los mismos notebooks con un kernel por notebook (depuración).
+# Los tiempos de cada etapa se añaden a artifacts/pipeline/timings.json y cada ejecución deja
+# una traza (etapas, celdas y funciones del motor: wall/CPU/RSS/filas) en artifacts/trace/
+# (Chrome trace: chrome://tracing o ui.perfetto.dev). --no-trace la desactiva.
+from pathlib import Path
+from datetime import date
+import argparse, re, sys, time
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from engine.pipeline import PipelineContext, run_stage1, run_stage2, save_timings
+from engine.stage_cache import StageCache
+from engine.trace import tracing
+
+MANUAL_DIR = Path("manual")
+STAGES = ("clean_features", "preprocess", "model", "export")
+
+
+def detect_run_date_from_filled() -> str | None:
+    patt = re.compile(r"^b365_filled_(\d{4}-\d{2}-\d{2})\.csv$")
+    dates = [m.group(1) for p in MANUAL_DIR.glob("b365_filled_*.csv") if (m := patt.match(p.name))]
+    return sorted(dates)[-1] if dates else None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pipeline LaLiga en proceso (extract → clean_features → preprocess → model → export)")
+    sub = ap.add_subparsers(dest="stage", required=True)
+
+    s1 = sub.add_parser("stage1", help="extract + plantilla B365 (make_template)")
+    s1.add_argument("--run-date", default=None, help="RUN_DATE (YYYY-MM-DD). Si no, hoy.")
+    s1.add_argument("--skip-extract", action="store_true", help="No ejecutar EXTRACCIÓN_DATOS.")
+
+    s2 = sub.add_parser("stage2", help="consume B365 → df_final → MODELOS → export")
+    s2.add_argument("--run-date", default=None, help="RUN_DATE (YYYY-MM-DD). Si no, se detecta del CSV filled.")
+    s2.add_argument("--force-extract", action="store_true", help="Ejecutar EXTRACCIÓN_DATOS aunque exista su parquet.")
+    s2.add_argument("--incremental", action="store_true", help="Parchea df_final.parquet sólo con la jornada nueva.")
+    s2.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="Etapas a ejecutar.")
+
+    for p in (s1, s2):
+        p.add_argument("--engine", choices=("inprocess", "papermill"), default="inprocess",
+                       help="inprocess (por defecto) o papermill (un kernel por notebook, para depurar).")
+        p.add_argument("--no-cache", action="store_true", help="Ignora la caché de etapas.")
+        p.add_argument("--no-trace", action="store_true", help="No escribir la traza en artifacts/trace/.")
+    args = ap.parse_args()
+
+    if args.stage == "stage1":
+        rd = args.run_date or date.today().strftime("%Y-%m-%d")
+    else:
+        rd = args.run_date or detect_run_date_from_filled()
+        if not rd:
+            print("❌ No se encontró manual/b365_filled_YYYY-MM-DD.csv ni se pasó --run-date.")
+            sys.exit(1)
+
+    ctx = PipelineContext(run_date=rd, engine=args.engine, incremental=getattr(args, "incremental", False))
+    cache = None if args.no_cache else StageCache()
+    t0 = time.perf_counter()
+    with tracing(args.stage, enabled=not args.no_trace, run_date=rd, engine=args.engine) as tracer:
+        try:
+            if args.stage == "stage1":
+                run_stage1(ctx, cache=cache, skip_extract=args.skip_extract)
+            else:
+                run_stage2(ctx, cache=cache, force_extract=args.force_extract, stages=tuple(args.stages))
+        finally:
+            path = save_timings(ctx, label=args.stage)
+            print(f"\n[TIMING] {args.stage} · {args.engine} · {time.perf_counter() - t0:.1f}s · "
+                  f"parquet desde memoria={ctx.store.hits} · detalle → {path}")
+    if tracer is not None:
+        funcs = [a for a in tracer.summary() if a["cat"] == "func"][:5]
+        top = ", ".join(f"{a['name']} {a['wall_s']:.1f}s" for a in funcs)
+        print(f"[TRACE] {tracer.path} · funciones más lentas: {top or '—'}")
+
+    if args.stage == "stage1":
+        print(f"\n✅ Stage 1 completado. Rellena manual/b365_template_{rd}.csv y guárdalo como b365_filled_{rd}.csv.")
+    else:
+        print("\n✅ Stage 2 completado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,25 @@
 # scripts/run_stage1.py
+# Camino papermill (un kernel por notebook), para depurar. El pipeline normal es
+# scripts/run_pipeline.py stage1 (en proceso).
 from pathlib import Path
-import argparse
+from datetime import date
+import argparse, sys
 import papermill as pm
 
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
 NOTEBOOKS_DIR = Path("notebooks")
 OUT_DIR = Path("artifacts/executed")
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
 DEFAULT_NB2 = "LIMPIEZA_Y_CREACION_DE_VARS.ipynb"
 
+# Entradas/salidas de NB2 en modo make_template (caché por huella: engine/stage_cache.py)
+from engine.pipeline import CLEAN_INPUTS, CLEAN_CODE as NB2_CODE, TEMPLATE_OUTPUTS as NB2_OUTPUTS
+NB2_INPUTS = CLEAN_INPUTS[:3]
+
 def pick_nb1(nb2_name: str) -> str | None:
     """Elige NB1 como el .ipynb que va antes alfabéticamente que NB2 (si existe)."""
     nbs = sorted(p.name for p in NOTEBOOKS_DIR.glob("*.ipynb") if ".ipynb_checkpoints" not in str(p))
@@ -33,7 +44,8 @@ def main():
     ap = argparse.ArgumentParser(description="Stage 1: NB1 -> NB2 (make_template)")
     ap.add_argument("--nb2", default=DEFAULT_NB2, help="Nombre del NB2 (por defecto: LIMPIEZA_Y_CREACION_DE_VARS.ipynb)")
     ap.add_argument("--nb1", default=None, help="Nombre del NB1 (opcional; si no se pasa, se detecta automáticamente)")
-    ap.add_argument("--run-date", default=None, help="RUN_DATE (YYYY-MM-DD). Si no se pasa, lo decide el notebook.")
+    ap.add_argument("--run-date", default=None, help="RUN_DATE (YYYY-MM-DD). Si no se pasa, hoy.")
+    ap.add_argument("--no-cache", action="store_true", help="Ejecuta NB2 aunque su huella no cambie.")
     args = ap.parse_args()
 
     nb2 = args.nb2
@@ -42,10 +54,11 @@ def main():
     if nb1:
         run_notebook(nb1)  # NB1 sin parámetros
 
-    params_nb2 = {"MODE": "make_template"}
-    if args.run_date:
-        params_nb2["RUN_DATE"] = args.run_date
-    run_notebook(nb2, params_nb2)
+    # NB1 descarga datos externos: se ejecuta siempre. NB2 se salta si sus entradas no cambian.
+    from engine.stage_cache import Stage, StageCache
+    params_nb2 = {"MODE": "make_template", "RUN_DATE": args.run_date or date.today().strftime("%Y-%m-%d")}
+    stage = Stage("limpieza_template", nb2, inputs=NB2_INPUTS, outputs=NB2_OUTPUTS, params=params_nb2, code=NB2_CODE)
+    StageCache().run(stage, lambda st: run_notebook(st.notebook, st.params), force=args.no_cache)
 
     print("\n✅ Stage 1 completado. Se ha creado la plantilla b365_template_YYYY-MM-DD.csv en manual/.")
     print("   Rellénala con B365H/B365D/B365A y guarda como b365_filled_YYYY-MM-DD.csv.")
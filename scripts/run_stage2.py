@@ -1,8 +1,14 @@
 # scripts/run_stage2.py
+# Camino papermill (un kernel por notebook), para depurar. El pipeline normal es
+# scripts/run_pipeline.py stage2 (en proceso).
 from pathlib import Path
-import argparse, re, sys
+import argparse, re, shutil, sys
 import papermill as pm
 
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
 NOTEBOOKS_DIR = Path("notebooks")
 MANUAL_DIR = Path("manual")
 OUT_DIR = Path("artifacts/executed")
@@ -17,6 +23,13 @@ REQ_PQ_FOR_NB2 = Path("data/02_processed/fd_xg_elo_transfermarkt_2005_2025.parqu
 # Parquet que MODELOS necesita (producido por PREPROCESADO/NB3)
 REQ_PQ_FOR_MODELOS = Path("data/03_features/df_final.parquet")
 
+# --- Entradas/salidas declaradas por etapa (caché por huella: engine/stage_cache.py) ---
+from engine.pipeline import (
+    CLEAN_INPUTS as NB2_INPUTS, CLEAN_OUTPUTS as NB2_OUTPUTS, CLEAN_CODE as NB2_CODE,
+    PREPROC_INPUTS, PREPROC_CODE,
+    MODEL_INPUTS as MODELOS_INPUTS, MODEL_OUTPUTS as MODELOS_OUTPUTS, MODEL_CODE as MODELOS_CODE,
+)
+
 def detect_run_date_from_filled() -> str | None:
     patt = re.compile(r"^b365_filled_(\d{4}-\d{2}-\d{2})\.csv$")
     if not MANUAL_DIR.exists():
@@ -84,7 +97,30 @@ def ensure_parquet_for_nb2(nb2_name: str, nb1_forced: str | None, force_run_nb1:
     print(f"[i] {REQ_PQ_FOR_NB2} no existe (o forzado). Ejecutando NB1: {nb1}")
     run_notebook(nb1)
 
+def verify_incremental(nb2: str, nb_preproc: str | None, rd: str):
+    """
+    Reconstrucción completa (NB2 + PREPROCESADO sin INCREMENTAL) y comparación exacta con el
+    df_final.parquet parcheado. Sale con código 1 si difieren.
+    """
+    import pandas as pd
+    from engine.incremental import compare_frames
+
+    patched_copy = REQ_PQ_FOR_MODELOS.with_name("df_final.incremental.parquet")
+    shutil.copyfile(REQ_PQ_FOR_MODELOS, patched_copy)
+    print("[VERIFY] Reconstrucción completa para comparar con el parche incremental...")
+    run_notebook(nb2, {"MODE": "consume", "RUN_DATE": rd, "INCREMENTAL": False})
+    if nb_preproc:
+        run_notebook(nb_preproc, {"RUN_DATE": rd})
+    report = compare_frames(pd.read_parquet(REQ_PQ_FOR_MODELOS), pd.read_parquet(patched_copy))
+    patched_copy.unlink()
+    if not report["identical"]:
+        print(f"❌ df_final incremental != reconstrucción completa: {report}")
+        sys.exit(1)
+    print("✅ df_final incremental idéntico a la reconstrucción completa.")
+
 def main():
+    from engine.stage_cache import Stage, StageCache
+
     ap = argparse.ArgumentParser(description="Stage 2: NB2 (consume) -> NB3 (prepro) -> MODELOS -> resto")
     ap.add_argument("--nb2", default=DEFAULT_NB2, help="Nombre de NB2 (consume).")
     ap.add_argument("--nb1", default=None, help="Nombre de NB1 (opcional, si falta parquet de NB2).")
@@ -93,8 +129,24 @@ def main():
     ap.add_argument("--rest", nargs="*", help="Resto de notebooks a ejecutar después (opcional).")
     ap.add_argument("--run-date", default=None, help="RUN_DATE (YYYY-MM-DD). Si no, se detecta del CSV filled.")
     ap.add_argument("--force-run-nb1", action="store_true", help="Ejecutar NB1 siempre antes de NB2.")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Parchea df_final.parquet sólo con la jornada nueva (engine/incremental.py).")
+    ap.add_argument("--verify-full", action="store_true",
+                    help="Con --incremental: reconstruye completo y exige df_final idéntico.")
+    ap.add_argument("--no-cache", action="store_true", help="Ejecuta todas las etapas (ignora la caché).")
+    ap.add_argument("--force", nargs="*", default=[], metavar="ETAPA",
+                    help="Etapas a re-ejecutar aunque su huella no cambie (limpieza, preprocesado, modelos, ...).")
     args = ap.parse_args()
 
+    cache = None if args.no_cache else StageCache()
+
+    def execute(stage: Stage) -> bool:
+        """Ejecuta la etapa (o la salta si su huella está en la caché). True si se ejecutó."""
+        if cache is None:
+            run_notebook(stage.notebook, stage.params)
+            return True
+        return cache.run(stage, lambda st: run_notebook(st.notebook, st.params), force=stage.name in args.force)
+
     # RUN_DATE
     rd = args.run_date or detect_run_date_from_filled()
     if not rd:
@@ -105,14 +157,23 @@ def main():
     ensure_parquet_for_nb2(args.nb2, args.nb1, args.force_run_nb1)
 
     # 1) NB2 en modo consume
-    run_notebook(args.nb2, {"MODE": "consume", "RUN_DATE": rd})
+    nb2_params = {"MODE": "consume", "RUN_DATE": rd}
+    if args.incremental:
+        nb2_params["INCREMENTAL"] = True
+    execute(Stage("limpieza", args.nb2, inputs=NB2_INPUTS, outputs=NB2_OUTPUTS,
+                  params=nb2_params, code=NB2_CODE))
 
     # 2) PREPROCESADO (NB3) → genera df_final.parquet
     nb_preproc = args.nb_preproc or find_nb_by_keywords(["PREPRO", "PROCESADO", "FEATURE"])
     if nb_preproc:
-        run_notebook(nb_preproc, {"RUN_DATE": rd})
+        execute(Stage("preprocesado", nb_preproc, inputs=PREPROC_INPUTS, outputs=(str(REQ_PQ_FOR_MODELOS),),
+                      params={"RUN_DATE": rd}, deps=("limpieza",), code=PREPROC_CODE))
     else:
         print("⚠️  No encontré NB de PREPROCESADO por nombre. Continuo, pero puede faltar df_final.parquet.")
+    if args.incremental and args.verify_full:
+        from engine.incremental import FeatureState
+        if FeatureState(REQ_PQ_FOR_MODELOS.parent / "state").applied_incremental(rd):
+            verify_incremental(args.nb2, nb_preproc, rd)
 
     # 2b) guardrail: debe existir df_final.parquet tras el preprocesado
     if not REQ_PQ_FOR_MODELOS.exists():
@@ -123,15 +184,19 @@ def main():
     # 3) MODELOS
     nb_modelos = args.nb_modelos or find_nb_by_keywords(["MODELO"])
     if nb_modelos:
-        run_notebook(nb_modelos, {"RUN_DATE": rd})
+        execute(Stage("modelos", nb_modelos, inputs=MODELOS_INPUTS, outputs=MODELOS_OUTPUTS,
+                      params={"RUN_DATE": rd}, code=MODELOS_CODE))
     else:
         print("❌ No encontré el notebook de MODELOS por nombre. Pásalo con --nb-modelos.")
         sys.exit(1)
 
     # 4) Resto de notebooks
-    rest = args.rest if args.rest else pick_rest_after(args.nb2, nb_preproc or "", nb_modelos)
+    #    (NB1 es la etapa fuente: sólo se ejecuta en el paso 0)
+    nb1 = args.nb1 or pick_nb1(args.nb2)
+    rest = args.rest if args.rest else pick_rest_after(args.nb2, nb_preproc or "", nb_modelos, nb1 or "")
     for nb in rest:
-        run_notebook(nb, {"RUN_DATE": rd})
+        # sin salidas declaradas: se ejecutan siempre
+        execute(Stage(Path(nb).stem.lower(), nb, params={"RUN_DATE": rd}, deps=("modelos",)))
 
     print("\n✅ Stage 2 completado. (Si tienes verify_outputs.py, ejecútalo en el workflow).")
 
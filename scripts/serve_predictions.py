@@ -0,0 +1,58 @@
+# scripts/serve_predictions.py
+# Servidor local de predicciones sobre los modelos por ronda que guarda MODELOS
+# (data/04_models/logit_<RUN_DATE>.joblib, engine/serving.py).
+#   python scripts/serve_predictions.py [--port 8765] [--models data/04_models] [--cache 4] [--no-elo]
+#   curl -s localhost:8765/predict -d '{"fixtures": [{"home": "Sevilla", "away": "Betis",
+#        "date": "2025-03-02", "B365H": 2.1, "B365D": 3.3, "B365A": 3.6}]}'
+from pathlib import Path
+import argparse, asyncio, sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from engine.serving import ModelRegistry, PredictionServer
+
+MODELS_DIR = ROOT / "data" / "04_models"
+ELO_DIR = ROOT / "data" / "02_processed" / "clubelo"
+ELO_LEGACY = ROOT / "data" / "02_processed" / "clubelo_2005_2025.parquet"
+
+
+def load_elo(enabled: bool):
+    """Índice Elo de EXTRACCIÓN_DATOS (si existe): Elo a la fecha del partido en vez del snapshot."""
+    if not enabled or not (ELO_DIR.exists() or ELO_LEGACY.exists()):
+        return None
+    from engine.elo_index import EloIndex
+    try:
+        return EloIndex.from_store(ELO_DIR, legacy=ELO_LEGACY if ELO_LEGACY.exists() else None)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Índice Elo no disponible ({e}); se usa el Elo del snapshot.")
+        return None
+
+
+def main(argv: list[str] | None = None):
+    ap = argparse.ArgumentParser(description="API local de predicción (asyncio, HTTP/1.1 + JSON).")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--models", default=str(MODELS_DIR), help="Carpeta con logit_<RUN_DATE>.joblib.")
+    ap.add_argument("--cache", type=int, default=4, help="Modelos en memoria (LRU).")
+    ap.add_argument("--max-batch", type=int, default=1000, help="Partidos máximos por petición.")
+    ap.add_argument("--no-elo", action="store_true", help="No cargar el índice Elo.")
+    args = ap.parse_args(argv)
+
+    registry = ModelRegistry(args.models, capacity=args.cache)
+    avail = registry.available()
+    if not avail:
+        print(f"⚠️  No hay modelos en {args.models} (ejecuta MODELOS para la ronda). El servidor arranca igual.")
+    server = PredictionServer(registry, elo=load_elo(not args.no_elo), host=args.host, port=args.port,
+                              max_batch=args.max_batch)
+    print(f"[serve] {server.base} · modelos: {', '.join(avail) or '—'} · "
+          f"Elo: {'índice' if server.elo is not None else 'snapshot'} · caché LRU {args.cache}")
+    try:
+        asyncio.run(server.run_forever())
+    except KeyboardInterrupt:
+        print("[serve] parado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,63 +1,22 @@
 # scripts/verify_outputs.py
+# Verificación de outputs/ antes de publicar (CI · export del pipeline).
+#   python scripts/verify_outputs.py [--report artifacts/verify/report.json] [--workers 8]
+# Lo que está en el almacén de outputs (data/05_store, engine/outputs_store.py) se valida con su
+# manifest, sin abrir los datos; el resto de CSV se lee una sola vez en streaming (engine/verify.py)
+# y en paralelo. El informe JSON recoge cada check y los tiempos por fichero. Código 1 si algo falla.
 from pathlib import Path
-import sys, glob, re
+import argparse, glob, re, sys
 
-BASE = Path("outputs")
-RADAR_DIR = BASE / "radar_prematch"
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
 
-# ---------------------------
-# Logging helpers
-# ---------------------------
-def fail(msg: str):
-    print(f"❌ {msg}")
-    sys.exit(1)
+from engine.outputs_store import STORE_DIR, OutputsStore
+from engine.verify import Report, manifest_scan, scan_many, split_by_manifest
 
-def warn(msg: str):
-    print(f"⚠️  {msg}")
-
-def ok(msg: str):
-    print(f"OK {msg}")
-
-# ---------------------------
-# CSV helpers (robustos)
-# ---------------------------
-_BOM = "\ufeff"
-
-def _norm_header(x: str) -> str:
-    if x is None:
-        return ""
-    return x.replace("\r", "").replace("\n", "").strip().lstrip(_BOM)
-
-def _read_csv_header(path: Path):
-    if not path.exists():
-        return []
-    import csv
-    with path.open(encoding="utf-8", newline="") as f:
-        r = csv.reader(f)
-        return [_norm_header(h) for h in next(r, [])]
-
-def _read_csv_rows(path: Path):
-    if not path.exists():
-        return []
-    import csv
-    with path.open(encoding="utf-8", newline="") as f:
-        r = csv.DictReader(f)
-        rows = []
-        for row in r:
-            rows.append({ _norm_header(k): v for k, v in row.items() })
-        return rows
-
-def _read_seasons_from_csv(path: Path):
-    rows = _read_csv_rows(path)
-    seasons = set()
-    for r in rows:
-        s = r.get("Season") or r.get("season")
-        if s:
-            try:
-                seasons.add(int(float(s)))
-            except Exception:
-                pass
-    return sorted(seasons)
+BASE = Path("outputs")
+RADAR_DIR = BASE / "radar_prematch"
+REPORT_PATH = Path("artifacts") / "verify" / "report.json"
 
 # ---------------------------
 # Requisitos base
@@ -73,117 +32,152 @@ REQUIRED_FILES = [
 
 SUMMARY_RE = re.compile(r"^future_predictions_summary_\d{8}-\d{6}\.json$")
 
+# ---------------------------
+# RADAR PREMATCH (CLAVE)
+# ---------------------------
+RADAR_MIN_COLS = {
+    "season", "date", "matchweek",
+    "hometeam_norm", "awayteam_norm",
+    "match_id", "generated_at", "norm_version"
+}
+
+RADAR_NORM_HINTS = {
+    "home_avg_xg", "away_avg_xg",
+    "home_avg_shotsontarget", "away_avg_shotsontarget"
+}
+
 # ---------------------------
 # Checks
 # ---------------------------
-def check_required_files():
+def check_required_files(rep: Report):
     miss = [f for f in REQUIRED_FILES if not (BASE / f).exists()]
     if miss:
         for m in miss:
             print(f"- Falta outputs/{m}")
-        fail("Faltan archivos obligatorios.")
-    ok("ficheros obligatorios presentes")
+        rep.fail("required_files", "Faltan archivos obligatorios.")
+        return
+    rep.ok("required_files", "ficheros obligatorios presentes")
 
-def check_future_summaries():
+def check_future_summaries(rep: Report):
     files = [Path(p).name for p in glob.glob(str(BASE / "future_predictions_summary_*.json"))]
     good = [f for f in files if SUMMARY_RE.match(f)]
     if not good:
-        fail("No se encontró ningún future_predictions_summary válido.")
-    ok(f"future_predictions_summary OK (encontrados: {len(good)})")
+        rep.fail("future_summaries", "No se encontró ningún future_predictions_summary válido.")
+        return
+    rep.ok("future_summaries", f"future_predictions_summary OK (encontrados: {len(good)})")
 
-def check_matchlogs(prefix, seasons):
+def check_matchlogs(rep: Report, prefix, seasons):
     if not seasons:
-        warn(f"No se pudieron inferir temporadas ({prefix}); se omite check.")
+        rep.warn(prefix, f"No se pudieron inferir temporadas ({prefix}); se omite check.")
         return
-    miss = []
-    for y in seasons:
-        p = BASE / f"{prefix}_{y}.csv"
-        if not p.exists():
-            miss.append(p.name)
+    miss = [f"{prefix}_{y}.csv" for y in seasons if not (BASE / f"{prefix}_{y}.csv").exists()]
     if miss:
         for m in miss:
             print("-", m)
-        fail(f"Matchlogs {prefix} incompletos.")
-    ok(f"matchlogs {prefix} por temporada presentes")
-
-# ---------------------------
-# RADAR PREMATCH (CLAVE)
-# ---------------------------
-RADAR_MIN_COLS = {
-    "season", "date", "matchweek",
-    "hometeam_norm", "awayteam_norm",
-    "match_id", "generated_at", "norm_version"
-}
-
-RADAR_NORM_HINTS = {
-    "home_avg_xg", "away_avg_xg",
-    "home_avg_shotsontarget", "away_avg_shotsontarget"
-}
+        rep.fail(prefix, f"Matchlogs {prefix} incompletos.")
+        return
+    rep.ok(prefix, f"matchlogs {prefix} por temporada presentes")
 
-def check_radar_prematch(seasons_expected):
+def check_radar_prematch(rep: Report, radar_scans, seasons_expected):
     if not RADAR_DIR.exists():
-        fail("No existe outputs/radar_prematch/. No se han generado radares.")
-
-    radar_files = sorted(glob.glob(str(RADAR_DIR / "radar_prematch_*.csv")))
-    if not radar_files:
-        fail("No se encontró ningún radar_prematch_*.csv")
-
-    ok(f"radar_prematch: encontrados {len(radar_files)} CSV")
+        rep.fail("radar_prematch", "No existe outputs/radar_prematch/. No se han generado radares.")
+        return
+    if not radar_scans:
+        rep.fail("radar_prematch", "No se encontró ningún radar_prematch_*.csv")
+        return
+    rep.ok("radar_prematch", f"radar_prematch: encontrados {len(radar_scans)} CSV")
 
     # Si sabemos temporadas → exigir 1 por temporada
+    bad = False
     if seasons_expected:
         expected = {f"radar_prematch_{y}.csv" for y in seasons_expected}
-        found = {Path(p).name for p in radar_files}
-        miss = expected - found
+        miss = expected - {s.name for s in radar_scans if s.exists}
         if miss:
             for m in sorted(miss):
                 print("-", m)
-            fail("Faltan radares por temporada.")
-
-    # Validación de estructura
-    for p in radar_files:
-        path = Path(p)
-        header = {h.lower() for h in _read_csv_header(path)}
-        rows = _read_csv_rows(path)
-
-        if not rows:
-            fail(f"{path.name} está vacío.")
-
-        if not RADAR_MIN_COLS.issubset(header):
+            rep.fail("radar_prematch", "Faltan radares por temporada.")
+            bad = True
+
+    # Estructura: cabecera y primera fila, del mismo escaneo (o del manifest)
+    for scan in radar_scans:
+        header = scan.header_lower
+        if not scan.exists:
+            rep.fail("radar_prematch", f"{scan.name}: está en el almacén pero falta la vista CSV.")
+        elif scan.error:
+            rep.fail("radar_prematch", f"{scan.name} no se pudo leer: {scan.error}")
+        elif not scan.rows:
+            rep.fail("radar_prematch", f"{scan.name} está vacío.")
+        elif not RADAR_MIN_COLS.issubset(header):
             missing = RADAR_MIN_COLS - header
-            fail(f"{path.name} carece de columnas mínimas: {', '.join(missing)}")
-
-        if not any(h.endswith("_norm") and any(k in h for k in RADAR_NORM_HINTS) for h in header):
-            fail(f"{path.name} no contiene métricas *_norm válidas para radar.")
+            rep.fail("radar_prematch", f"{scan.name} carece de columnas mínimas: {', '.join(missing)}")
+        elif not any(h.endswith("_norm") and any(k in h for k in RADAR_NORM_HINTS) for h in header):
+            rep.fail("radar_prematch", f"{scan.name} no contiene métricas *_norm válidas para radar.")
+        else:
+            continue
+        bad = True
 
-    ok("radar_prematch válidos y completos")
+    if not bad:
+        rep.ok("radar_prematch", "radar_prematch válidos y completos")
 
 # ---------------------------
 # MAIN
 # ---------------------------
-def main():
-    if not BASE.exists():
-        fail("No existe outputs/.")
-
-    check_required_files()
-    check_future_summaries()
-
-    seasons_main = _read_seasons_from_csv(BASE / "classification_report_by_season.csv")
-    print(f"Temporadas detectadas (main): {seasons_main}")
-    check_matchlogs("matchlogs", seasons_main)
-
-    seasons_mkt = _read_seasons_from_csv(BASE / "metrics_market_by_season.csv")
-    print(f"Temporadas detectadas (market): {seasons_mkt}")
-    check_matchlogs("matchlogs_market", seasons_mkt)
-
-    seasons_future = []
-    for p in glob.glob(str(BASE / "future_predictions_*.csv")):
-        seasons_future += _read_seasons_from_csv(Path(p))
-    seasons_future = sorted(set(seasons_future))
-    print(f"Temporadas detectadas (future predictions): {seasons_future}")
-
-    check_radar_prematch(seasons_future)
+def main(argv: list[str] | None = None):
+    ap = argparse.ArgumentParser(description="Verifica outputs/ (CSV en streaming, en paralelo).")
+    ap.add_argument("--report", default=str(REPORT_PATH), help="Informe JSON (checks + tiempos por fichero).")
+    ap.add_argument("--workers", type=int, default=8, help="Ficheros leídos a la vez.")
+    args = ap.parse_args(argv)
 
+    rep = Report()
+    if not BASE.exists():
+        rep.fail("outputs", "No existe outputs/.")
+    else:
+        check_required_files(rep)
+        check_future_summaries(rep)
+
+        # Lo que está en el almacén sale del manifest; el resto, un único escaneo (en paralelo)
+        # de los CSV. De los radares basta la cabecera y la primera fila.
+        store = OutputsStore(STORE_DIR)
+        future = sorted(glob.glob(str(BASE / "future_predictions_*.csv")))
+        radars = sorted(glob.glob(str(RADAR_DIR / "radar_prematch_*.csv")))
+        man_future, future = split_by_manifest(store, "future_predictions", future, BASE,
+                                               "future_predictions_{season}.csv")
+        man_radar, radars = split_by_manifest(store, "radar_prematch", radars, RADAR_DIR,
+                                              "radar_prematch_{season}.csv")
+        singles = {}
+        for artifact, csv_name in (("classification_report", "classification_report_by_season.csv"),
+                                   ("metrics_market", "metrics_market_by_season.csv")):
+            singles[artifact] = manifest_scan(store, artifact, BASE / csv_name) if store.has(artifact) \
+                else BASE / csv_name
+        to_scan = [p for p in singles.values() if isinstance(p, Path)]
+        scans = scan_many([*to_scan, *future, *[(p, 1) for p in radars]], max_workers=args.workers)
+        by_path = {s.path: s for s in scans}
+        scan_main, scan_mkt = (s if not isinstance(s, Path) else by_path[str(s)] for s in singles.values())
+        scan_future = man_future + [by_path[p] for p in future]
+        scan_radar = sorted(man_radar + [by_path[p] for p in radars], key=lambda s: s.name)
+        rep.add_scans([scan_main, scan_mkt, *scan_future, *scan_radar])
+
+        seasons_main = scan_main.seasons
+        print(f"Temporadas detectadas (main): {seasons_main}")
+        check_matchlogs(rep, "matchlogs", seasons_main)
+
+        seasons_mkt = scan_mkt.seasons
+        print(f"Temporadas detectadas (market): {seasons_mkt}")
+        check_matchlogs(rep, "matchlogs_market", seasons_mkt)
+
+        seasons_future = sorted({y for s in scan_future for y in s.seasons})
+        print(f"Temporadas detectadas (future predictions): {seasons_future}")
+        check_radar_prematch(rep, scan_radar, seasons_future)
+
+        rep.info = {"seasons_main": seasons_main, "seasons_market": seasons_mkt,
+                    "seasons_future": seasons_future, "radar_files": len(scan_radar),
+                    "from_manifest": sum(s.source == "manifest" for s in rep.files.values()),
+                    "scanned": len(scans)}
+
+    path = rep.save(args.report)
+    print(f"Informe → {path}")
+    if rep.failed:
+        sys.exit(1)
     print("✔ outputs/ verificado correctamente.")
 
 if __name__ == "__main__":